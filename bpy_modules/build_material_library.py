@@ -0,0 +1,217 @@
+"""Compiles the materials of a materials directory into a single library .blend with downscaled textures.
+
+Each material .blend is appended once, the images of its node tree are scaled down to --texture_size (largest
+side, aspect ratio kept) and packed, so the library is self-contained. The manifest (utils/material_library.py)
+records the content hash of each material file, so a rebuild only compiles new or changed materials.
+Render workers load all materials of the library with a single bpy.data.libraries.load call
+(render.py --material_library).
+
+Run:
+    blender -b -P ./bpy_modules/build_material_library.py -- --material_dir /path/to/materials
+        --library_dir /path/to/material_library --res_x 256 --res_y 256 [--rcfg_file /path/to/rcfg.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import bpy
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils import material_library  # pylint: disable=wrong-import-position
+from utils import trace_utils  # pylint: disable=wrong-import-position
+
+NO_MATERIAL = ["none", None]
+
+
+def get_node_images(node_tree: bpy.types.NodeTree) -> list[bpy.types.Image]:
+    """Returns the images of all image texture nodes in the node tree, including nested node groups."""
+    images = []
+    for node in node_tree.nodes:
+        if node.type == "TEX_IMAGE" and node.image is not None:
+            images.append(node.image)
+        elif node.type == "GROUP" and node.node_tree is not None:
+            images += get_node_images(node.node_tree)
+    return images
+
+
+def get_texture_memory(images: list[bpy.types.Image]) -> int:
+    """Returns the bytes of the decoded pixel buffers of the images (accessing the size loads an image)."""
+    n_bytes = 0
+    for image in images:
+        width, height = image.size
+        n_bytes += width * height * image.channels * (4 if image.is_float else 1)
+    return n_bytes
+
+
+def downscale_textures(material: bpy.types.Material, texture_size: int) -> list[dict]:
+    """Scales the images of the material down so their largest side is at most texture_size and packs them.
+
+    Returns:
+        list[dict]: Image name, source size and size of each texture.
+    """
+    textures = []
+    if material.node_tree is None:
+        return textures
+    for image in set(get_node_images(material.node_tree)):
+        source_size = list(image.size)
+        scale = texture_size / max(source_size) if max(source_size) > 0 else 1.0
+        if scale < 1.0:
+            image.scale(max(1, round(source_size[0] * scale)), max(1, round(source_size[1] * scale)))
+        # Scaled images are packed as PNG, the library does not depend on the texture files
+        image.pack()
+        textures.append({"image": image.name, "source_size": source_size, "size": list(image.size)})
+    return textures
+
+
+def get_referenced_materials(rcfg_file: str) -> list[str]:
+    """Returns the distinct materials of all single parts of the RCFG."""
+    with open(rcfg_file, "r") as f:
+        rcfg = json.load(f)
+    return sorted(
+        {
+            single_part["material"]
+            for part in rcfg["parts"]
+            for single_part in part.get("single_parts", [])
+            if single_part["material"] not in NO_MATERIAL
+        }
+    )
+
+
+def build_library(material_dir: str, library_dir: str, texture_size: int, material_fns: list[str] = None) -> dict:
+    """Builds or updates the material library and returns its manifest.
+
+    Args:
+        material_dir (str): Directory with one .blend file per material.
+        library_dir (str): Directory of the library .blend and its manifest (created if not existent).
+        texture_size (int): Maximum size of the largest side of each texture.
+        material_fns (list[str]): Material files to include. All .blend files of material_dir if None.
+    """
+    if material_fns is None:
+        material_fns = sorted(fn for fn in os.listdir(material_dir) if fn.endswith(".blend"))
+    os.makedirs(library_dir, exist_ok=True)
+    manifest = material_library.load_manifest(library_dir)
+    library_file = os.path.join(library_dir, manifest["library"])
+    plan = material_library.plan_build(manifest, material_dir, material_fns, texture_size)
+    print(f"Material library: keep {len(plan['keep'])}, build {len(plan['build'])}, remove {len(plan['remove'])}")
+
+    if plan["keep"] and os.path.isfile(library_file):
+        bpy.ops.wm.open_mainfile(filepath=library_file)
+    else:
+        bpy.ops.wm.read_homefile(use_empty=True)
+    for material_fn in plan["remove"]:
+        material = bpy.data.materials.get(manifest["materials"][material_fn]["material"])
+        if material is not None:
+            bpy.data.materials.remove(material)
+    materials = {fn: manifest["materials"][fn] for fn in plan["keep"]}
+
+    for material_fn in plan["build"]:
+        with trace_utils.span("material_compile", material=material_fn) as attrs:
+            with bpy.data.libraries.load(os.path.join(material_dir, material_fn), link=False) as (data_from, data_to):
+                data_to.materials = data_from.materials[:1]
+            material = data_to.materials[0]
+            # Materials are not assigned to objects in the library
+            material.use_fake_user = True
+            textures = downscale_textures(material, texture_size)
+            materials[material_fn] = {
+                "hash": plan["hashes"][material_fn],
+                "material": material.name,
+                "textures": textures,
+            }
+            attrs["n_textures"] = len(textures)
+
+    # Images of removed materials
+    if hasattr(bpy.data, "orphans_purge"):
+        bpy.data.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
+    tmp_file = f"{library_file}.tmp{os.getpid()}.blend"
+    bpy.ops.wm.save_as_mainfile(filepath=tmp_file, compress=True)
+    os.replace(tmp_file, library_file)
+    manifest = {"texture_size": texture_size, "library": manifest["library"], "materials": materials}
+    material_library.save_manifest(library_dir, manifest)
+    return manifest
+
+
+def load_material_library(library_dir: str) -> dict:
+    """Loads all materials of a compiled library with one libraries.load call.
+
+    Returns:
+        dict: Blender material of each material file name (like render.get_bpy_materials).
+    """
+    manifest = material_library.load_manifest(library_dir)
+    assert manifest["materials"], f"No material library in {library_dir}, run build_material_library.py"
+    names = {entry["material"]: material_fn for material_fn, entry in manifest["materials"].items()}
+    with bpy.data.libraries.load(os.path.join(library_dir, manifest["library"]), link=False) as (data_from, data_to):
+        data_to.materials = [name for name in data_from.materials if name in names]
+        requested = list(data_to.materials)
+    # Appended materials may be renamed on name collisions, the order of data_to.materials is kept
+    return {names[name]: material for name, material in zip(requested, data_to.materials) if material is not None}
+
+
+def get_args():
+    """Returns script arguments as python variables."""
+    parser = argparse.ArgumentParser()
+    # Only consider script args, ignore blender args
+    _, all_arguments = parser.parse_known_args()
+    double_dash_index = all_arguments.index("--")
+    script_args = all_arguments[double_dash_index + 1 :]
+
+    parser.add_argument(
+        "--material_dir",
+        help="Data directory for materials (one .blend file per material).",
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        "--library_dir",
+        help="Directory of the compiled library and its manifest.",
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        "--rcfg_file",
+        help="Only include the materials referenced by this render configuration.",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--texture_size",
+        help="Maximum texture size in pixels. Defaults to the render resolution times "
+        f"{material_library.TEXTURE_SIZE_FACTOR}, rounded up to a power of two.",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--res_x",
+        help="Pixel Resolution in X direction of the renders.",
+        default=256,
+        type=int,
+    )
+    parser.add_argument(
+        "--res_y",
+        help="Pixel Resolution in Y direction of the renders.",
+        default=256,
+        type=int,
+    )
+    parser.add_argument(
+        "--trace_dir",
+        help="Record spans to {trace_dir}/build_material_library.{pid}.trace.jsonl (see utils/trace_utils.py).",
+        type=str,
+        default=None,
+    )
+    args, _ = parser.parse_known_args(script_args)
+    return args
+
+
+if __name__ == "__main__":
+    tstart = time.time()
+    args = get_args()
+    trace_utils.init_tracer(args.trace_dir, "build_material_library")
+    texture_size = args.texture_size or material_library.get_texture_size(args.res_x, args.res_y)
+    material_fns = get_referenced_materials(args.rcfg_file) if args.rcfg_file else None
+    with trace_utils.span("build_material_library", texture_size=texture_size):
+        manifest = build_library(args.material_dir, args.library_dir, texture_size, material_fns)
+    print(
+        f"Compiled {len(manifest['materials'])} materials (max texture size {texture_size}) "
+        f"into {args.library_dir} in {time.time() - tstart:.2f} seconds"
+    )
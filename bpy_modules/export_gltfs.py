@@ -1,13 +1,29 @@
 import json
 import os
+import sys
 import time
 import argparse
 import bpy
 import mathutils
+import numpy as np
 from typing import Generator
 
 import builtins as __builtin__
 
+# Make shared modules of the project root importable from within blender
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bpy_modules import scene_stats  # pylint: disable=wrong-import-position
+from utils import geometry_fingerprint  # pylint: disable=wrong-import-position
+from utils import rcfg_validation  # pylint: disable=wrong-import-position
+from utils import trace_utils  # pylint: disable=wrong-import-position
+from utils import progress_metrics  # pylint: disable=wrong-import-position
+
+# Mesh compression of the exported GLBs. Blender's glTF exporter only supports Draco (KHR_draco_mesh_compression),
+# which includes the quantization of vertex attributes. meshopt and KHR_mesh_quantization are not supported.
+MESH_COMPRESSIONS = ["none", "draco"]
+# Images are only needed if the materials of the GLB are used, render.py replaces them
+IMAGE_FORMATS = ["JPEG", "AUTO", "NONE"]
+
 #########################################
 
 # PRINT TO SYSTEM CONSOLE
@@ -220,22 +236,58 @@ def add_object_to_collection(collection: bpy.types.Collection, object_to_add: bp
     collection.objects.link(object_to_add)
 
 
-def export_gltf(bpy_objs_to_export: list, file_path: str) -> None:
+def get_export_options(
+    mesh_compression: str = "none",
+    draco_level: int = 6,
+    position_bits: int = 14,
+    normal_bits: int = 10,
+    texcoord_bits: int = 12,
+    image_format: str = "JPEG",
+) -> dict:
+    """Returns the keyword arguments of bpy.ops.export_scene.gltf for the given compression settings.
+
+    Args:
+        mesh_compression (str): One of MESH_COMPRESSIONS.
+        draco_level (int): Draco compression level [0, 10], higher is smaller and slower to encode.
+        position_bits (int): Draco quantization bits of vertex positions, 0 for lossless.
+        normal_bits (int): Draco quantization bits of normals.
+        texcoord_bits (int): Draco quantization bits of texture coordinates.
+        image_format (str): One of IMAGE_FORMATS, NONE exports no images.
+    """
+    assert mesh_compression in MESH_COMPRESSIONS, f"Unknown mesh compression {mesh_compression}"
+    assert image_format in IMAGE_FORMATS, f"Unknown image format {image_format}"
+    export_options = {"export_image_format": image_format}
+    if mesh_compression == "draco":
+        export_options.update(
+            {
+                "export_draco_mesh_compression_enable": True,
+                "export_draco_mesh_compression_level": draco_level,
+                "export_draco_position_quantization": position_bits,
+                "export_draco_normal_quantization": normal_bits,
+                "export_draco_texcoord_quantization": texcoord_bits,
+            }
+        )
+    return export_options
+
+
+def export_gltf(bpy_objs_to_export: list, file_path: str, export_options: dict = None) -> None:
     """Export gltf
 
     Args:
         bpy_objs_to_export: The blender
         file_path (str): path to output gltf file
+        export_options (dict): Compression options (see get_export_options). Defaults to uncompressed meshes
+            and JPEG images.
     """
     select(bpy_objs_to_export)
     bpy.ops.export_scene.gltf(
         filepath=file_path,
         export_format="GLB",
         use_selection=True,
-        export_image_format="JPEG",
         export_cameras=True,
         export_lights=True,
         export_extras=True,
+        **(export_options or get_export_options()),
     )
 
 
@@ -462,6 +514,39 @@ def get_bpy_single_parts(part: dict) -> list[bpy.types.Object]:
     return bpy_single_parts
 
 
+def get_mesh_data(objects: list) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the triangulated world space geometry of all mesh objects (with modifiers applied).
+
+    Args:
+        objects (list[bpy.types.Object]): Objects of a part.
+
+    Returns:
+        np.ndarray, np.ndarray: vertices of shape (n_vertices, 3) and triangle vertex indices of shape (n_faces, 3)
+    """
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    vertices, faces = [], []
+    n_vertices = 0
+    for obj in objects:
+        if obj.type != "MESH":
+            continue
+        obj_eval = obj.evaluated_get(depsgraph)
+        mesh = obj_eval.to_mesh()
+        mesh.calc_loop_triangles()
+        co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", co)
+        triangles = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get("vertices", triangles)
+        obj_eval.to_mesh_clear()
+
+        matrix_world = np.array(obj.matrix_world)
+        vertices.append(co.reshape(-1, 3) @ matrix_world[:3, :3].T + matrix_world[:3, 3])
+        faces.append(triangles.reshape(-1, 3).astype(np.int64) + n_vertices)
+        n_vertices += len(co) // 3
+    if not vertices:
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64)
+    return np.concatenate(vertices), np.concatenate(faces)
+
+
 def get_bpy_cameras(part: dict) -> list[bpy.types.Object]:
     """Returns a list of cameras for the given machine part.
 
@@ -486,18 +571,32 @@ class SceneExporter:
     of that part.
     """
 
-    def __init__(self, rcfg: dict, out_dir: str):
+    def __init__(
+        self,
+        rcfg: dict,
+        out_dir: str,
+        dedup_geometry: bool = False,
+        fingerprint_tolerance: float = 1e-4,
+        export_options: dict = None,
+    ):
         """Creates a new SceneExporter instance
 
         Args:
             rcfg (dict): The render configuration. Contains machine parts along with their single parts, lights, cameras
             out_dir (str): Path to the output directory.
+            dedup_geometry (bool): Whether to skip the export of parts whose geometry equals an already exported part.
+                Skipped parts are recorded as aliases in {out_dir}/aliases.json.
+            fingerprint_tolerance (float): Quantization step of geometry fingerprints in scene units.
+            export_options (dict): Compression options of the GLBs (see get_export_options).
         """
         # Set parts
         # -> See Part definition in Render Config (RCFG)
         self.parts = []
         self._set_parts(rcfg)
         self.out_dir = out_dir
+        self.export_options = export_options
+        # Fingerprints of exported parts, None if duplicates are exported as well
+        self.fingerprints = geometry_fingerprint.FingerprintRegistry(fingerprint_tolerance) if dedup_geometry else None
 
     def _set_parts(self, rcfg) -> None:
         """Sets the self.parts attribute of the SceneExporter.
@@ -578,39 +677,72 @@ class SceneExporter:
     def export_gltfs(self) -> None:
         """Export gltf files based on scene descriptions parsed from a valid config file."""
         for part in self.parts:
-            ### CREATE BPY SCENE COMPONENTS
-            bpy_single_parts = get_bpy_single_parts(part)
+            with trace_utils.span("export_part", part_id=part["id"]) as attrs:
+                self.export_part(part, attrs)
+
+        if self.fingerprints is not None:
+            manifest_path = self.fingerprints.write(self.out_dir)
+            print(f"Aliased {len(self.fingerprints.aliases)} duplicate parts, see {manifest_path}")
+
+    def export_part(self, part: dict, attrs: dict) -> None:
+        """Exports a single part with its cameras and lights to {out_dir}/{part_id}.glb.
+
+        Args:
+            part (dict): A machine part description from the render configuration (rcfg).
+            attrs (dict): Attributes of the part's trace span, extended by scene stats.
+        """
+        ### CREATE BPY SCENE COMPONENTS
+        bpy_single_parts = get_bpy_single_parts(part)
+        attrs.update(scene_stats.get_scene_stats(bpy_single_parts))
+
+        ### SKIP DUPLICATE GEOMETRY
+        if self.fingerprints is not None:
+            with trace_utils.span("fingerprint", part_id=part["id"]):
+                vertices, faces = get_mesh_data(bpy_single_parts)
+                fingerprint = geometry_fingerprint.get_geometry_fingerprint(
+                    vertices, faces, tolerance=self.fingerprints.tolerance
+                )
+            canonical_id = self.fingerprints.register(part["id"], fingerprint)
+            if canonical_id is not None:
+                print(f"Skipping {part['id']}: same geometry as {canonical_id}")
+                attrs["alias_of"] = canonical_id
+                return
+
+        with trace_utils.span("create_scene_components", part_id=part["id"]):
             bpy_cameras = get_bpy_cameras(part)
             bpy_lights = get_bpy_lights(part)
-            # MATERIALS
-            # NOTE: Moved material assignment to render.py as advanced materials are not properly converted from blender->gltf
-            #       Just Uncomment if you use basic materials only using blenders Principled BSDF shader node or other materials
-            #       that can be mapped to gltf properly
-            # ENVMAPS
-            # NOTE: Moved Envmap assignment to render.py as for now it's not possible to define envmaps in a gltf file from blender.
-
-            ### TRANSLATE PART TO WORLD CENTER
-            # get the bounding sphere center
-            bsphere_center, _ = get_bounding_sphere(bpy_single_parts)
-            # unparent single parts from collections
-            original_parents = unparent(bpy_single_parts)
-            translate_objects_by(bpy_single_parts, -1 * bsphere_center)
-
-            ### COLLECT OBJS TO EXPORT
-            bpy_objs_to_export = []
-            # NOTE: Sometimes not all single part objects are exported by adding the collection, so we add all single parts instead
-            bpy_objs_to_export += bpy_single_parts
-            bpy_objs_to_export += bpy_cameras
-            bpy_objs_to_export += bpy_lights
-            export_gltf(bpy_objs_to_export=bpy_objs_to_export, file_path=f"{self.out_dir}/{part['id']}.glb")
-
-            # Reparent single parts
-            for p, c in zip(original_parents, bpy_single_parts):
-                parent([c], p)
-
-            # delete cameras and lights that are not needed anymore
-            delete_objects(bpy_cameras)
-            delete_objects(bpy_lights)
+        # MATERIALS
+        # NOTE: Moved material assignment to render.py as advanced materials are not properly converted from blender->gltf
+        #       Just Uncomment if you use basic materials only using blenders Principled BSDF shader node or other materials
+        #       that can be mapped to gltf properly
+        # ENVMAPS
+        # NOTE: Moved Envmap assignment to render.py as for now it's not possible to define envmaps in a gltf file from blender.
+
+        ### TRANSLATE PART TO WORLD CENTER
+        # get the bounding sphere center
+        bsphere_center, _ = get_bounding_sphere(bpy_single_parts)
+        # unparent single parts from collections
+        original_parents = unparent(bpy_single_parts)
+        translate_objects_by(bpy_single_parts, -1 * bsphere_center)
+
+        ### COLLECT OBJS TO EXPORT
+        bpy_objs_to_export = []
+        # NOTE: Sometimes not all single part objects are exported by adding the collection, so we add all single parts instead
+        bpy_objs_to_export += bpy_single_parts
+        bpy_objs_to_export += bpy_cameras
+        bpy_objs_to_export += bpy_lights
+        with trace_utils.span("gltf_write", part_id=part["id"]) as write_attrs:
+            file_path = f"{self.out_dir}/{part['id']}.glb"
+            export_gltf(bpy_objs_to_export=bpy_objs_to_export, file_path=file_path, export_options=self.export_options)
+            write_attrs["bytes"] = os.path.getsize(file_path)
+
+        # Reparent single parts
+        for p, c in zip(original_parents, bpy_single_parts):
+            parent([c], p)
+
+        # delete cameras and lights that are not needed anymore
+        delete_objects(bpy_cameras)
+        delete_objects(bpy_lights)
 
 
 def get_args():
@@ -633,7 +765,89 @@ def get_args():
         type=str,
         required=True,
     )
+    parser.add_argument(
+        "--dedup_geometry",
+        help="Do not export parts with the same geometry (fingerprint) as an already exported part. "
+        "They are aliased in {out_dir}/aliases.json and get the images of the exported part when rendering.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--fingerprint_tolerance",
+        help="Quantization step of geometry fingerprints in scene units.",
+        type=float,
+        default=1e-4,
+    )
+    parser.add_argument(
+        "--mesh_compression",
+        help="Mesh compression of the GLBs. draco: KHR_draco_mesh_compression with quantized vertex attributes "
+        "(see --draco_*), smaller files at the cost of decoding on import.",
+        type=str,
+        default="none",
+        choices=MESH_COMPRESSIONS,
+    )
+    parser.add_argument(
+        "--draco_level",
+        help="Draco compression level [0, 10].",
+        type=int,
+        default=6,
+        choices=range(0, 11),
+        metavar="[0, 10]",
+    )
+    parser.add_argument(
+        "--draco_position_bits",
+        help="Draco quantization bits of vertex positions (0: lossless).",
+        type=int,
+        default=14,
+    )
+    parser.add_argument(
+        "--draco_normal_bits",
+        help="Draco quantization bits of normals.",
+        type=int,
+        default=10,
+    )
+    parser.add_argument(
+        "--draco_texcoord_bits",
+        help="Draco quantization bits of texture coordinates.",
+        type=int,
+        default=12,
+    )
+    parser.add_argument(
+        "--image_format",
+        help="Image format of the GLB textures. NONE: no images, only if render.py assigns all materials.",
+        type=str,
+        default="JPEG",
+        choices=IMAGE_FORMATS,
+    )
+    parser.add_argument(
+        "--part_ids",
+        help="Only export these parts of the RCFG (e.g. one batch of pipeline.py).",
+        type=str,
+        nargs="+",
+        default=None,
+    )
+    parser.add_argument(
+        "--report_dir",
+        help="Directory of export_status.json. Defaults to --out_dir.",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--metrics_port",
+        help="Serve live progress metrics in Prometheus format on this port (/metrics). "
+        "Progress is always written to {report_dir}/export_status.json.",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--trace_dir",
+        help="Record spans of the export stages to {trace_dir}/export.{pid}.trace.jsonl "
+        "(see utils/trace_utils.py).",
+        type=str,
+        default=None,
+    )
     args, _ = parser.parse_known_args(script_args)
+    if args.part_ids and args.dedup_geometry:
+        parser.error("--dedup_geometry needs all parts in one export, it can not be combined with --part_ids")
     return args
 
 
@@ -644,23 +858,56 @@ if __name__ == "__main__":
 
     rcfg_file = args.rcfg_file
     out_dir = args.out_dir
+    report_dir = args.report_dir or out_dir
     os.makedirs(out_dir, exist_ok=True)
-
-    # Get opened blender file path to reload scene when needed
-    if bpy.data.filepath:
-        blend_file = bpy.data.filepath
-        open_scene(blend_file)
-    else:
-        create_scene(name="scene")
-    # Load RCFG data
-    with open(rcfg_file, "r") as rcfg_json:
-        rcfg_data = json.load(rcfg_json)
-
-    scene_exporter = SceneExporter(
-        rcfg=rcfg_data,
-        out_dir=out_dir,
-    )
-    scene_exporter.export_gltfs()
+    os.makedirs(report_dir, exist_ok=True)
+    trace_utils.init_tracer(args.trace_dir, "export")
+
+    with trace_utils.span("gltf_export") as export_attrs:
+        # Get opened blender file path to reload scene when needed
+        with trace_utils.span("scene_load"):
+            if bpy.data.filepath:
+                blend_file = bpy.data.filepath
+                open_scene(blend_file)
+            else:
+                create_scene(name="scene")
+            # Load RCFG data
+            with open(rcfg_file, "r") as rcfg_json:
+                rcfg_data = json.load(rcfg_json)
+            # Fail before any work if the RCFG does not match its schema
+            with trace_utils.span("rcfg_validation"):
+                rcfg_validation.get_validator(rcfg_validation.get_schema_file(rcfg_data)).validate(rcfg_data)
+            if args.part_ids:
+                part_ids = set(args.part_ids)
+                rcfg_data["parts"] = [part for part in rcfg_data["parts"] if part["id"] in part_ids]
+
+            scene_exporter = SceneExporter(
+                rcfg=rcfg_data,
+                out_dir=out_dir,
+                dedup_geometry=args.dedup_geometry,
+                fingerprint_tolerance=args.fingerprint_tolerance,
+                export_options=get_export_options(
+                    mesh_compression=args.mesh_compression,
+                    draco_level=args.draco_level,
+                    position_bits=args.draco_position_bits,
+                    normal_bits=args.draco_normal_bits,
+                    texcoord_bits=args.draco_texcoord_bits,
+                    image_format=args.image_format,
+                ),
+            )
+        export_attrs["n_parts"] = len(scene_exporter.parts)
+        # Live progress: status file and optional Prometheus endpoint, fed by the export_part spans
+        metrics = progress_metrics.ProgressMetrics(
+            "export",
+            n_parts=len(scene_exporter.parts),
+            status_file=f"{report_dir}/export_status.json",
+            port=args.metrics_port,
+            part_span="export_part",
+            image_span=None,
+            print_fn=print,
+        )
+        scene_exporter.export_gltfs()
+        metrics.close()
 
     tend = time.time() - tstart
     print("-" * 20)
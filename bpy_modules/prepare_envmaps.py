@@ -0,0 +1,137 @@
+"""Prepares the envmaps referenced by an RCFG for rendering at a given resolution.
+
+Fails before any rendering if an envmap is missing (including "none" placeholders) and writes a downsampled copy
+of each envmap, sized to the render resolution and the cameras' field of view, to the cache directory
+(see utils/envmap_cache.py). render.py --envmap_cache_dir runs the same preparation and loads the cached copies.
+
+Run:
+    blender -b -P ./bpy_modules/prepare_envmaps.py -- --rcfg_file /path/to/rcfg.json --envmap_dir /path/to/envmaps
+        --envmap_cache_dir /path/to/cache --res_x 256 --res_y 256
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import bpy
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils import envmap_cache  # pylint: disable=wrong-import-position
+from utils import trace_utils  # pylint: disable=wrong-import-position
+
+
+def write_cache_file(envmap_file: str, cache_file: str, width: int, height: int) -> tuple[int, int]:
+    """Decodes the envmap, scales it down to width x height (never up) and writes it to cache_file.
+
+    HDR envmaps are written as half float OpenEXR, 8 bit envmaps as PNG. The file is written under a temporary
+    name and renamed, so concurrent render processes never read a partial file.
+
+    Returns:
+        int, int: Width and height of the source image.
+    """
+    image = bpy.data.images.load(envmap_file)
+    source_size = tuple(image.size)
+    if source_size[0] > width:
+        image.scale(width, height)
+    tmp_file = f"{cache_file}.tmp{os.getpid()}{os.path.splitext(cache_file)[1]}"
+    image.filepath_raw = tmp_file
+    if envmap_cache.is_hdr(envmap_file):
+        image.file_format = "OPEN_EXR"
+        image.use_half_precision = True
+    else:
+        image.file_format = "PNG"
+    image.save()
+    bpy.data.images.remove(image)
+    os.replace(tmp_file, cache_file)
+    return source_size
+
+
+def prepare_envmaps(rcfg: dict, envmap_dir: str, cache_dir: str, res_x: int, res_y: int) -> dict:
+    """Checks the envmaps referenced by the RCFG and returns the cached copy of each envmap.
+
+    Existing cache files are reused, missing ones are written.
+
+    Args:
+        rcfg (dict): Render configuration (only parts that are rendered).
+        envmap_dir (str): Directory with the source envmaps.
+        cache_dir (str): Directory of the cached copies (created if not existent).
+        res_x (int): Render resolution width.
+        res_y (int): Render resolution height.
+
+    Returns:
+        dict: Path of the cached copy of each envmap_fname.
+    """
+    (width, height), cache_files = envmap_cache.get_cache_files(rcfg, envmap_dir, cache_dir, res_x, res_y)
+    os.makedirs(cache_dir, exist_ok=True)
+    envmap_files = {}
+    for envmap_fname, (envmap_file, cache_file) in cache_files.items():
+        with trace_utils.span("envmap_cache", envmap=envmap_fname, width=width, height=height) as attrs:
+            attrs["hit"] = os.path.isfile(cache_file)
+            if not attrs["hit"]:
+                attrs["source_size"] = write_cache_file(envmap_file, cache_file, width, height)
+                attrs["source_bytes"] = os.path.getsize(envmap_file)
+                attrs["cache_bytes"] = os.path.getsize(cache_file)
+        envmap_files[envmap_fname] = cache_file
+    return envmap_files
+
+
+def get_args():
+    """Returns script arguments as python variables."""
+    parser = argparse.ArgumentParser()
+    # Only consider script args, ignore blender args
+    _, all_arguments = parser.parse_known_args()
+    double_dash_index = all_arguments.index("--")
+    script_args = all_arguments[double_dash_index + 1 :]
+
+    parser.add_argument(
+        "--rcfg_file",
+        help="Render configuration file.",
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        "--envmap_dir",
+        help="Data directory for envmaps.",
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        "--envmap_cache_dir",
+        help="Directory of the downsampled envmap copies.",
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        "--res_x",
+        help="Pixel Resolution in X direction of the renders.",
+        default=256,
+        type=int,
+    )
+    parser.add_argument(
+        "--res_y",
+        help="Pixel Resolution in Y direction of the renders.",
+        default=256,
+        type=int,
+    )
+    parser.add_argument(
+        "--trace_dir",
+        help="Record spans to {trace_dir}/prepare_envmaps.{pid}.trace.jsonl (see utils/trace_utils.py).",
+        type=str,
+        default=None,
+    )
+    args, _ = parser.parse_known_args(script_args)
+    return args
+
+
+if __name__ == "__main__":
+    tstart = time.time()
+    args = get_args()
+    trace_utils.init_tracer(args.trace_dir, "prepare_envmaps")
+    with open(args.rcfg_file, "r") as rcfg_json:
+        rcfg_data = json.load(rcfg_json)
+    with trace_utils.span("prepare_envmaps"):
+        envmap_files = prepare_envmaps(rcfg_data, args.envmap_dir, args.envmap_cache_dir, args.res_x, args.res_y)
+    for envmap_fname, cache_file in envmap_files.items():
+        print(f"{envmap_fname} -> {cache_file}")
+    print(f"Prepared {len(envmap_files)} envmaps in {time.time() - tstart:.2f} seconds")
@@ -1,13 +1,41 @@
 """ Render gltf files via Blender Software """
 import argparse
 import os
+import shutil
+import sys
 import time
 import bpy
 import mathutils
 import json
 
+import numpy as np
+
 import builtins as __builtin__
 
+# Make shared modules of the project root importable from within blender
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bpy_modules import build_material_library  # pylint: disable=wrong-import-position
+from bpy_modules import prepare_envmaps  # pylint: disable=wrong-import-position
+from bpy_modules import scene_stats  # pylint: disable=wrong-import-position
+from utils import shard_writer as shards  # pylint: disable=wrong-import-position
+from utils import depth_raster  # pylint: disable=wrong-import-position
+from utils import depth_stack as depth_stacks  # pylint: disable=wrong-import-position
+from utils import envmap_cache  # pylint: disable=wrong-import-position
+from utils import geometry_fingerprint  # pylint: disable=wrong-import-position
+from utils import rcfg_validation  # pylint: disable=wrong-import-position
+from utils import trace_utils  # pylint: disable=wrong-import-position
+from utils import progress_metrics  # pylint: disable=wrong-import-position
+from utils import material_index  # pylint: disable=wrong-import-position
+from utils import output_sink  # pylint: disable=wrong-import-position
+from utils import render_profiles  # pylint: disable=wrong-import-position
+
+EXR_CODECS = ["ZIP", "PIZ", "DWAA", "ZIPS", "RLE", "PXR24", "NONE"]
+# RGBA: depth in R, G and B (the layout before --depth_exr_color_mode), BW: single channel, smaller files
+EXR_COLOR_MODES = ["RGBA", "BW"]
+RENDER_MODES = ["full", "depth"]
+SCENE_MODES = ["reset", "session"]
+RIG_TYPES = ["CAMERA", "LIGHT"]
+
 #########################################
 
 # PRINT TO SYSTEM CONSOLE
@@ -92,12 +120,20 @@ def get_bpy_materials(materials_dir: str) -> dict:
         materials_dir (str): Path to directory containing .blend files that contain a material.
     """
     bpy_materials = {}
-    for material_fn in os.listdir(material_dir):
+    for material_fn in os.listdir(materials_dir):
         if material_fn.endswith(".blend"):
             bpy_materials[material_fn] = import_materials_from_blend(f"{materials_dir}/{material_fn}")[0]
     return bpy_materials
 
 
+def load_bpy_materials(materials_dir: str = None, material_library_dir: str = None) -> dict:
+    """Returns the blender materials of a compiled material library (one load call, downscaled textures, see
+    build_material_library.py) if material_library_dir is set, else of the .blend files in materials_dir."""
+    if material_library_dir:
+        return build_material_library.load_material_library(material_library_dir)
+    return get_bpy_materials(materials_dir)
+
+
 def apply_material(ob: bpy.types.Object, mat: bpy.types.Material) -> bpy.types.Material:
     """Apply material to given ob by material id
 
@@ -114,29 +150,73 @@ def apply_material(ob: bpy.types.Object, mat: bpy.types.Material) -> bpy.types.M
     return mat
 
 
-def apply_materials(scene: bpy.types.Scene, rcfg_part: dict, bpy_materials: dict) -> None:
+def strip_vertex_colors(meshes: list[bpy.types.Mesh]) -> int:
+    """Removes all Vertex Color layers of the given meshes, without logging each layer like remove_vertex_colors.
+
+    Args:
+        meshes (list[bpy.types.Mesh]): Meshes to remove the Vertex Colors from.
+
+    Returns:
+        int: Number of removed layers.
+    """
+    n_removed = 0
+    for mesh in meshes:
+        vertex_colors = mesh.vertex_colors
+        n_removed += len(vertex_colors)
+        while vertex_colors:
+            vertex_colors.remove(vertex_colors[0])
+    return n_removed
+
+
+def apply_materials(scene: bpy.types.Scene, rcfg_part: dict, bpy_materials: dict) -> dict:
     """Applies blender materials to all objects in the current scene.
 
+    Each mesh object gets the material of the first single part (in RCFG order) whose id is a prefix of the
+    object name and that has a material (see utils/material_index.py). Materials are assigned once per mesh,
+    grouped by material, and the Vertex Colors of all meshes are removed.
+
     Args:
         scene (bpy.types.Scene): The blender scene.
         rcfg_part (dict): Machine part definition. Includes single_parts withmaterial definitions.
         bpy_materials (dict): Material dictionary that maps material names to actual blender materials.
+
+    Returns:
+        dict: Number of mesh objects with an applied material (n_matched), matching only single parts without
+            material (n_no_material) and matching no single part (n_unmatched), and the unmatched object names.
     """
+    index = material_index.MaterialIndex(rcfg_part["single_parts"])
+    report = {"n_matched": 0, "n_no_material": 0, "n_unmatched": 0, "unmatched": []}
+    meshes, mesh_materials = {}, {}
     for bpy_obj in scene.objects:
-        # Reset obj color for all mesh objects
-        if bpy_obj.type == "MESH":
-            remove_vertex_colors(bpy_obj)
-            # Check for obj references in render config
-            for rcfg_single_part in rcfg_part["single_parts"]:
-                if bpy_obj.name.startswith(rcfg_single_part["id"]):
-                    # Do nothing if no material defined
-                    if rcfg_single_part["material"] in ["none", None]:
-                        print(f"Apply material: {bpy_obj.name}: {rcfg_single_part['material']}")
-                        continue
-                    # Apply material to mesh obj
-                    print(f"Apply material: {bpy_obj.name}: {rcfg_single_part['material']}")
-                    apply_material(bpy_obj, bpy_materials[rcfg_single_part["material"]])
-                    break
+        if bpy_obj.type != "MESH":
+            continue
+        meshes[bpy_obj.data.name] = bpy_obj.data
+        material, matched = index.lookup(bpy_obj.name)
+        if material is not None:
+            # Objects sharing a mesh share its materials, the last object wins
+            mesh_materials[bpy_obj.data.name] = material
+            report["n_matched"] += 1
+        elif matched:
+            report["n_no_material"] += 1
+        else:
+            report["n_unmatched"] += 1
+            report["unmatched"].append(bpy_obj.name)
+
+    report["n_vertex_colors_removed"] = strip_vertex_colors(meshes.values())
+    meshes_by_material = {}
+    for mesh_name, material in mesh_materials.items():
+        meshes_by_material.setdefault(material, []).append(meshes[mesh_name])
+    for material, material_meshes in meshes_by_material.items():
+        bpy_material = bpy_materials[material]
+        for mesh in material_meshes:
+            # Replace former materials of the mesh
+            mesh.materials.clear()
+            mesh.materials.append(bpy_material)
+    print(
+        f"Applied {len(meshes_by_material)} materials to {report['n_matched']} objects of {rcfg_part['id']} "
+        f"({report['n_no_material']} without material, {report['n_unmatched']} unmatched)"
+    )
+    return report
 
 
 #########################################
@@ -216,8 +296,18 @@ def objs_set_hide_render(objs: list[bpy.types.Object], hide_render: bool) -> Non
         obj.hide_render = hide_render
 
 
-def get_compositor_depthmap_node_tree():
-    """Returns a Blender Compositor node tree that renders a normalized depth map."""
+def get_compositor_depthmap_node_tree(
+    exr_codec: str = "ZIP", exr_color_depth: str = "32", exr_color_mode: str = "RGBA"
+):
+    """Returns a Blender Compositor node tree that renders a normalized depth map.
+
+    The raw depth is written as OPEN_EXR.
+
+    Args:
+        exr_codec (str): OPEN_EXR compression codec. One of EXR_CODECS
+        exr_color_depth (str): "16" (half float) or "32" (full float)
+        exr_color_mode (str): Channels of the EXR files. One of EXR_COLOR_MODES
+    """
     bpy.context.scene.use_nodes = True
     bpy.context.scene.render.use_compositing = True
     bpy.context.scene.view_layers["ViewLayer"].use_pass_z = True
@@ -248,11 +338,33 @@ def get_compositor_depthmap_node_tree():
     # Depth map as OPEN_EXR
     depth_file_output_exr = tree.nodes.new(type="CompositorNodeOutputFile")
     depth_file_output_exr.format.file_format = "OPEN_EXR"
+    depth_file_output_exr.format.color_mode = exr_color_mode
+    depth_file_output_exr.format.color_depth = exr_color_depth
+    depth_file_output_exr.format.exr_codec = exr_codec
     tree.links.new(rl.outputs[2], depth_file_output_exr.inputs[0])
 
     return tree, depth_file_output_png, depth_file_output_exr
 
 
+def read_depth_exr(file_path: str) -> "np.ndarray":
+    """Returns the depth channel of an EXR depth map as float32 array of shape (height, width), top row first."""
+    image = bpy.data.images.load(file_path)
+    width, height = image.size
+    pixels = np.empty(width * height * image.channels, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    bpy.data.images.remove(image)
+    # Blender stores pixels bottom row first
+    return pixels.reshape(height, width, -1)[::-1, :, 0].copy()
+
+
+def add_output_stats(output_stats: dict, output: str, file_paths: list[str], seconds: float = 0.0) -> None:
+    """Adds the number of files, bytes and write seconds of an output (e.g. rgb, depth_exr) to output_stats."""
+    stats = output_stats.setdefault(output, {"files": 0, "bytes": 0, "seconds": 0.0})
+    stats["files"] += len(file_paths)
+    stats["bytes"] += sum(os.path.getsize(file_path) for file_path in file_paths)
+    stats["seconds"] += seconds
+
+
 def setup_gpu_cycles() -> None:
     """Applies setup for GPU usage while rendering with Cycles render engine."""
     # Render settings CYCLES GPU rendering
@@ -278,6 +390,8 @@ def apply_render_settings(
     res_y: int = 256,
     out_format: str = "PNG",
     out_quality: int = 100,
+    samples: int = 4096,
+    cycles_settings: dict = None,
 ) -> None:
     """asd
 
@@ -288,6 +402,9 @@ def apply_render_settings(
         res_y (int): Render image resolution height.
         out_format (str): Image output format. One of ["PNG", "JPG"]
         out_quality (int): Output quality in percent. Integer Range [0, 100]
+        samples (int): Maximum number of Cycles samples per pixel.
+        cycles_settings (dict): Cycles settings that override samples and the defaults below, e.g. a profile
+            resolved from the part's materials (see utils/render_profiles.py).
     """
     scene = bpy.context.scene
 
@@ -302,7 +419,7 @@ def apply_render_settings(
         scene.cycles.seed = 0
         scene.cycles.feature_set = "SUPPORTED"
 
-        scene.cycles.samples = 4096
+        scene.cycles.samples = samples
         scene.cycles.use_adaptive_sampling = True
         scene.cycles.adaptive_threshold = 0.01
         scene.cycles.time_limit = 0
@@ -327,10 +444,23 @@ def apply_render_settings(
 
         scene.render.use_persistent_data = True
 
+        apply_cycles_settings(scene, cycles_settings or {})
+
     if engine.lower() == "cycles" and device.lower() == "gpu":
         setup_gpu_cycles()
 
 
+def apply_cycles_settings(scene: bpy.types.Scene, cycles_settings: dict) -> None:
+    """Sets the given scene.cycles attributes, e.g. a profile resolved from the part's materials.
+
+    Args:
+        scene (bpy.types.Scene): The blender scene.
+        cycles_settings (dict): scene.cycles attribute names and values (see utils/render_profiles.py).
+    """
+    for key, value in cycles_settings.items():
+        setattr(scene.cycles, key, value)
+
+
 def load_gltf(file_path) -> None:
     """Loads gltf file into active scene.
 
@@ -347,11 +477,127 @@ def load_gltf(file_path) -> None:
         bpy.context.scene.world = new_world
 
 
-def export_render_settings(out_path: str) -> None:
+def purge_orphans() -> int:
+    """Removes all datablocks without users (meshes, materials and images of removed parts).
+
+    Returns:
+        int: Number of removed datablocks, -1 if unknown (operator fallback of older Blender versions).
+    """
+    if hasattr(bpy.data, "orphans_purge"):
+        return bpy.data.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
+    bpy.ops.outliner.orphans_purge(do_recursive=True)
+    return -1
+
+
+class RenderSession:
+    """Scene scaffolding that is built once and kept for all parts (--scene_mode session).
+
+    Instead of opening a new empty scene for every part, the world, the compositor node tree, the render settings
+    and the materials are created once. Per part, only the objects of its GLB are imported and removed again.
+    The cameras and lights of the GLB (the rig) are kept if the next part defines the same cameras and lights in
+    its RCFG, their transforms are restored, as the render loop zooms the cameras to the part. Datablocks of
+    removed objects (meshes, GLB materials, images) become orphans and are purged every purge_every parts.
+
+    Args:
+        mode (str): Render mode, the compositor and the materials are only needed in mode full.
+        materials_dir (str): Directory with material .blend files, loaded once. None to skip materials.
+        material_library_dir (str): Compiled material library, loaded instead of materials_dir if set.
+        exr_codec (str): Compression codec of the depth EXR files.
+        exr_color_depth (str): "16" (half float) or "32" (full float) depth EXR files.
+        exr_color_mode (str): Channels of the depth EXR files (RGBA or BW).
+        purge_every (int): Purge orphan datablocks after every n-th part. 0 to never purge.
+    """
+
+    def __init__(
+        self,
+        mode: str = "full",
+        materials_dir: str = None,
+        material_library_dir: str = None,
+        exr_codec: str = "ZIP",
+        exr_color_depth: str = "32",
+        exr_color_mode: str = "RGBA",
+        purge_every: int = 10,
+    ):
+        new_empty_scene()
+        world = bpy.data.worlds.new("World")
+        world.use_nodes = True
+        bpy.context.scene.world = world
+        self.compositor = None
+        if mode == "full":
+            self.compositor = get_compositor_depthmap_node_tree(
+                exr_codec=exr_codec, exr_color_depth=exr_color_depth, exr_color_mode=exr_color_mode
+            )
+        self.bpy_materials = {}
+        if (materials_dir or material_library_dir) and mode == "full":
+            self.bpy_materials = load_bpy_materials(materials_dir, material_library_dir)
+            # Unassigned materials have no users and would be purged
+            for bpy_material in self.bpy_materials.values():
+                bpy_material.use_fake_user = True
+        self.envmap_node = None
+        self.purge_every = purge_every
+        self.n_parts = 0
+        self.rig, self.rig_key, self.rig_transforms = [], None, {}
+        self.n_rig_reused = 0
+
+    def import_part(self, file_path: str, rcfg_part: dict) -> None:
+        """Imports the GLB of a part and keeps the previous rig if the part's cameras and lights are the same."""
+        object_names = set(bpy.data.objects.keys())
+        load_gltf(file_path)
+        imported = [obj for obj in bpy.data.objects if obj.name not in object_names]
+        imported_rig = [obj for obj in imported if obj.type in RIG_TYPES]
+        rig_key = json.dumps([rcfg_part["scene"]["cameras"], rcfg_part["scene"]["lights"]], sort_keys=True)
+        if rig_key == self.rig_key and len(imported_rig) == len(self.rig):
+            remove_objects(imported_rig)
+            for obj in self.rig:
+                obj.matrix_world, ortho_scale = self.rig_transforms[obj.name]
+                if obj.type == "CAMERA":
+                    obj.data.ortho_scale = ortho_scale
+            self.n_rig_reused += 1
+        else:
+            remove_objects(self.rig)
+            self.rig, self.rig_key = imported_rig, rig_key
+            self.rig_transforms = {
+                obj.name: (obj.matrix_world.copy(), obj.data.ortho_scale if obj.type == "CAMERA" else None)
+                for obj in imported_rig
+            }
+
+    def set_envmap(self, file_path: str) -> None:
+        """Uses the image as HDRI envmap. The world nodes are created once, loaded images are kept."""
+        if self.envmap_node is None:
+            _, self.envmap_node = add_hdri_map(file_path)
+        else:
+            self.envmap_node.image = bpy.data.images.load(file_path, check_existing=True)
+        self.envmap_node.image.use_fake_user = True
+
+    def clear_part(self) -> dict:
+        """Removes all objects except the rig and purges orphan datablocks on schedule.
+
+        Returns:
+            dict: Span attributes (n_removed, n_purged if purged).
+        """
+        rig_names = {obj.name for obj in self.rig}
+        part_objects = [obj for obj in bpy.data.objects if obj.name not in rig_names]
+        attrs = {"n_removed": len(part_objects)}
+        remove_objects(part_objects)
+        self.n_parts += 1
+        if self.purge_every and self.n_parts % self.purge_every == 0:
+            with trace_utils.span("orphan_purge") as purge_attrs:
+                purge_attrs["n_purged"] = attrs["n_purged"] = purge_orphans()
+        return attrs
+
+
+def remove_objects(objects: list) -> None:
+    """Removes the given objects from all scenes and bpy.data, their data becomes orphan."""
+    for obj in objects:
+        bpy.data.objects.remove(obj, do_unlink=True)
+
+
+def export_render_settings(out_path: str, depth_settings: dict = None) -> None:
     """Exports the current render settings as json. file.
 
     Args:
         out_path (str): The path of the exported json file.
+        depth_settings (dict): Depth output settings (EXR codec, color depth, stack format) to add.
     """
 
     render_settings = {
@@ -386,17 +632,52 @@ def export_render_settings(out_path: str) -> None:
             "use_persistent_data": bpy.context.scene.render.use_persistent_data,
         },
     }
+    if depth_settings is not None:
+        render_settings["depth"] = depth_settings
     with open(out_path, "w") as outfile:
         json.dump(render_settings, outfile)
 
 
+def normalize_mesh_scale() -> bpy.types.Object:
+    """Selects all mesh objects and scales them, so the largest dimension out of all objects equals 1.
+
+    Returns:
+        bpy.types.Object: The empty parent object that carries the scale.
+    """
+    bpy.ops.object.select_by_type(extend=False, type="MESH")
+
+    # scale all objects so largest dimension out of all objects equals 1
+    # 1. Add selected objects to empty parent object
+    parent_obj = bpy.data.objects.new("Empty", None)
+    for obj in bpy.context.selected_objects:
+        obj.parent = parent_obj
+    # 2. Rescale mesh objects so largest dimension out of all objects equals 1
+    max_xdim, max_ydim, max_zdim = 0, 0, 0
+    for obj in parent_obj.children:
+        max_xdim = obj.dimensions.x if obj.dimensions.x > max_xdim else max_xdim
+        max_ydim = obj.dimensions.y if obj.dimensions.y > max_ydim else max_ydim
+        max_zdim = obj.dimensions.z if obj.dimensions.z > max_zdim else max_zdim
+    max_dim = max(max_xdim, max_ydim, max_zdim)
+    parent_obj.scale = (1 / max_dim, 1 / max_dim, 1 / max_dim)
+    return parent_obj
+
+
 def render(
     scene: bpy.types.Scene,
     rcfg_part: dict,
     part_id: str,
     envmap_dir: str,
     out_dir: str,
-) -> None:
+    shard_writer: "shards.BackgroundShardWriter" = None,
+    exr_codec: str = "ZIP",
+    exr_color_depth: str = "32",
+    exr_color_mode: str = "RGBA",
+    depth_stack_format: str = "none",
+    depth_stack_dir: str = None,
+    output_stats: dict = None,
+    session: RenderSession = None,
+    envmap_files: dict = None,
+) -> int:
     """Renders the given rcfg_part as defined in it's render_setups.
 
     Parses render_setups for the given rcfg_part and activates defined scene components
@@ -408,7 +689,21 @@ def render(
         part_id (str): Id of the part to render.
         envmap_dir (str): Directory containing envmap files.
         out_dir (str): Output directory.
+        shard_writer (shards.BackgroundShardWriter): If set, the rendered files of each setup are
+            moved into tar shards by the writer. out_dir is used as staging directory in that case.
+        exr_codec (str): Compression codec of the depth EXR files.
+        exr_color_depth (str): "16" (half float) or "32" (full float) depth EXR files.
+        exr_color_mode (str): Channels of the depth EXR files (RGBA or BW).
+        depth_stack_format (str): If npz or npy, all depth maps of the part are collected into a single stack
+            in depth_stack_dir (see utils/depth_stack.py), which replaces the per-image EXR files.
+        depth_stack_dir (str): Output directory of depth stacks.
+        output_stats (dict): If set, number of files, bytes and write seconds of each output are added to it.
+        session (RenderSession): If set, its compositor and world are reused instead of created for the part.
+        envmap_files (dict): File to load for each envmap_fname, e.g. cached copies (see prepare_envmaps.py).
+            Envmaps are loaded from envmap_dir if not set.
 
+    Returns:
+        int: Number of rendered images.
     """
     # Load render setups
     render_setups = rcfg_part["scene"]["render_setups"]
@@ -421,26 +716,26 @@ def render(
     objs_set_hide_render(lights, True)
 
     # DEPTH MAP RENDER SETUP
-    depthmap_node_tree, depth_file_output_png, depth_file_output_exr = get_compositor_depthmap_node_tree()
-
-    bpy.ops.object.select_by_type(extend=False, type="MESH")
+    if session is None:
+        depthmap_node_tree, depth_file_output_png, depth_file_output_exr = get_compositor_depthmap_node_tree(
+            exr_codec=exr_codec,
+            exr_color_depth=exr_color_depth,
+            exr_color_mode=exr_color_mode,
+        )
+    else:
+        depthmap_node_tree, depth_file_output_png, depth_file_output_exr = session.compositor
+    depth_maps, depth_image_indices = [], []
 
-    # scale all objects so largest dimension out of all objects equals 1
-    # 1. Add selected objects to empty parent object
-    parent_obj = bpy.data.objects.new("Empty", None)
-    for obj in bpy.context.selected_objects:
-        obj.parent = parent_obj
-    # 2. Rescale mesh objects so largest dimension out of all objects equals 1
-    max_xdim, max_ydim, max_zdim = 0, 0, 0
-    for obj in parent_obj.children:
-        max_xdim = obj.dimensions.x if obj.dimensions.x > max_xdim else max_xdim
-        max_ydim = obj.dimensions.y if obj.dimensions.y > max_ydim else max_ydim
-        max_zdim = obj.dimensions.z if obj.dimensions.z > max_zdim else max_zdim
-    max_dim = max(max_xdim, max_ydim, max_zdim)
-    parent_obj.scale = (1 / max_dim, 1 / max_dim, 1 / max_dim)
+    normalize_mesh_scale()
 
     # Render Loop
+    n_rendered = 0
     for i, render_setup in enumerate(render_setups):
+        # Skip setups that failed the view check in preprocessing (see preprocessing/check_views.py)
+        if not render_setup.get("view_check", {}).get("valid", True):
+            print(f"Skipping render setup {i} of {part_id}: {render_setup['view_check']['reasons']}")
+            continue
+
         # CAMERA: load, add to scene, zoom to object
         render_camera = cameras[render_setup["camera_i"]]
         scene.camera = render_camera
@@ -453,9 +748,16 @@ def render(
         objs_set_hide_render(render_lights, False)
 
         # ENVMAPS: load, add to blender, use as hdri envmap
-        render_envmap_fn = f"{envmap_dir}/{render_setup['envmap_fname']}"
-        add_image_to_blender(render_envmap_fn)
-        add_hdri_map(render_envmap_fn)
+        if envmap_files is not None:
+            render_envmap_fn = envmap_files[render_setup["envmap_fname"]]
+        else:
+            render_envmap_fn = f"{envmap_dir}/{render_setup['envmap_fname']}"
+        with trace_utils.span("envmap_setup", part_id=part_id, image_i=i, envmap=render_setup["envmap_fname"]):
+            if session is None:
+                add_image_to_blender(render_envmap_fn)
+                add_hdri_map(render_envmap_fn)
+            else:
+                session.set_envmap(render_envmap_fn)
 
         # RENDER
         scene.render.filepath = f"{out_dir}/render/rgb/{part_id}/{part_id}_{i:03d}"
@@ -467,22 +769,327 @@ def render(
         depth_file_output_exr.base_path = f"{out_dir}/render/depth_exr/{part_id}"
         depth_file_output_exr.file_slots[0].path = f"{part_id}_{i:03d}_depth"
 
-        bpy.ops.render.render(write_still=True)
+        # Includes writing the RGB image and the compositor's depth map outputs
+        with trace_utils.span("cycles_render", part_id=part_id, image_i=i):
+            bpy.ops.render.render(write_still=True)
+        n_rendered += 1
+
+        # Rename and collect the written files and hand them over to the depth stack or shard writer
+        with trace_utils.span("file_moves", part_id=part_id, image_i=i):
+            ## fix depth map filename by removing frame number
+            os.rename(
+                f"{depth_file_output_png.base_path}/{depth_file_output_png.file_slots[0].path}0001.png",
+                f"{depth_file_output_png.base_path}/{depth_file_output_png.file_slots[0].path}.png",
+            )
+            os.rename(
+                f"{depth_file_output_exr.base_path}/{depth_file_output_exr.file_slots[0].path}0001.exr",
+                f"{depth_file_output_exr.base_path}/{depth_file_output_exr.file_slots[0].path}.exr",
+            )
 
-        ## fix depth map filename by removing frame number
-        os.rename(
-            f"{depth_file_output_png.base_path}/{depth_file_output_png.file_slots[0].path}0001.png",
-            f"{depth_file_output_png.base_path}/{depth_file_output_png.file_slots[0].path}.png",
-        )
-        os.rename(
-            f"{depth_file_output_exr.base_path}/{depth_file_output_exr.file_slots[0].path}0001.exr",
-            f"{depth_file_output_exr.base_path}/{depth_file_output_exr.file_slots[0].path}.exr",
-        )
+            rgb_file = f"{scene.render.filepath}{scene.render.file_extension}"
+            depth_png_file = f"{depth_file_output_png.base_path}/{depth_file_output_png.file_slots[0].path}.png"
+            depth_exr_file = f"{depth_file_output_exr.base_path}/{depth_file_output_exr.file_slots[0].path}.exr"
+            if output_stats is not None:
+                add_output_stats(output_stats, "rgb", [rgb_file])
+                add_output_stats(output_stats, "depth_png", [depth_png_file])
+                add_output_stats(output_stats, "depth_exr", [depth_exr_file])
+
+            ## Collect the depth map for the part's depth stack, which replaces the EXR file
+            sample_files = {f"rgb{scene.render.file_extension}": rgb_file, "depth.png": depth_png_file}
+            if depth_stack_format != "none":
+                depth_maps.append(read_depth_exr(depth_exr_file))
+                depth_image_indices.append(i)
+                os.remove(depth_exr_file)
+            else:
+                sample_files["depth.exr"] = depth_exr_file
+
+            ## Hand over finished files to the shard writer
+            if shard_writer is not None:
+                shard_writer.submit(
+                    key=shards.get_sample_key(part_id, i),
+                    files=sample_files,
+                    metadata={
+                        "part_id": part_id,
+                        "image_i": i,
+                        "render_setup": render_setup,
+                        "camera": rcfg_part["scene"]["cameras"][render_setup["camera_i"]],
+                        "lights": [rcfg_part["scene"]["lights"][light_i] for light_i in render_setup["lights_i"]],
+                    },
+                )
 
         ## CLEANUP
         # Hide lights again after rendered
         objs_set_hide_render(render_lights, True)
 
+    if depth_stack_format != "none" and depth_maps:
+        tstart = time.time()
+        with trace_utils.span("depth_stack_write", part_id=part_id, n_images=len(depth_maps)):
+            stack_files = depth_stacks.write_depth_stack(
+                depth_stack_dir,
+                part_id,
+                depth_maps,
+                depth_image_indices,
+                stack_format=depth_stack_format,
+                dtype="float16" if exr_color_depth == "16" else "float32",
+            )
+        if output_stats is not None:
+            add_output_stats(output_stats, f"depth_stack_{depth_stack_format}", stack_files, time.time() - tstart)
+    return n_rendered
+
+
+def get_scene_triangles(objects: list) -> tuple:
+    """Returns the triangles of all given mesh objects in world space (with modifiers applied).
+
+    Args:
+        objects (list[bpy.types.Object]): Objects of the part.
+
+    Returns:
+        np.ndarray, np.ndarray: vertex positions of shape (n_vertices, 3) and vertex indices of the triangles
+            of shape (n_triangles, 3)
+    """
+    bpy.context.view_layer.update()
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    vertices, triangles, n_vertices = [np.empty((0, 3))], [np.empty((0, 3), dtype=np.int64)], 0
+    for obj in objects:
+        if obj.type != "MESH":
+            continue
+        obj_eval = obj.evaluated_get(depsgraph)
+        mesh = obj_eval.to_mesh()
+        mesh.calc_loop_triangles()
+        co = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+        mesh.vertices.foreach_get("co", co)
+        matrix = np.array(obj_eval.matrix_world)
+        vertices.append(co.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3])
+        tris = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int64)
+        mesh.loop_triangles.foreach_get("vertices", tris)
+        triangles.append(tris.reshape(-1, 3) + n_vertices)
+        n_vertices += len(mesh.vertices)
+        obj_eval.to_mesh_clear()
+    return np.concatenate(vertices), np.concatenate(triangles)
+
+
+def raster_depth(
+    vertices: "np.ndarray", triangles: "np.ndarray", scene: bpy.types.Scene, camera: bpy.types.Object
+) -> "np.ndarray":
+    """Returns the depth map of the camera view like Cycles' Z pass: distance along the view axis of the nearest
+    surface at each pixel center and BLENDER_BACKGROUND_DEPTH for pixels without geometry.
+
+    All pixels are computed in one batched numpy z-buffer pass (see utils/depth_raster.py) instead of one
+    Python call per pixel. The result equals a ray cast through each pixel center. Geometry is clipped at the
+    camera's clip_start and clip_end like in Cycles.
+
+    Args:
+        vertices (np.ndarray): Vertex positions in world space, see get_scene_triangles.
+        triangles (np.ndarray): Vertex indices of the triangles.
+        scene (bpy.types.Scene): Scene with the render resolution.
+        camera (bpy.types.Object): Perspective or orthographic camera.
+
+    Returns:
+        np.ndarray: float32 depth map of shape (res_y, res_x), top row first
+    """
+    # Corners of the camera frame in camera space: top right, bottom right, bottom left, top left
+    top_right, _, bottom_left, top_left = [np.array(corner) for corner in camera.data.view_frame(scene=scene)]
+    matrix = np.array(camera.matrix_world)
+    rotation = matrix[:3, :3] / np.linalg.norm(matrix[:3, :3], axis=0)
+    return depth_raster.rasterize_depth(
+        (vertices - matrix[:3, 3]) @ rotation,
+        triangles,
+        (top_left[0], top_right[0], top_left[1], bottom_left[1], -top_left[2]),
+        (scene.render.resolution_x, scene.render.resolution_y),
+        ortho=camera.data.type == "ORTHO",
+        clip_start=camera.data.clip_start,
+        clip_end=camera.data.clip_end,
+    )
+
+
+def get_depth_png_values(depth: "np.ndarray") -> "np.ndarray":
+    """Returns the depth map normalized and inverted like the compositor's depth PNG
+    (Normalize, Map Value [0, 255] and Invert nodes, see get_compositor_depthmap_node_tree).
+
+    Near geometry is white, far geometry and the background are black.
+    """
+    hit = depth < depth_stacks.BLENDER_BACKGROUND_DEPTH
+    if not hit.any():
+        return np.zeros_like(depth)
+    # The Normalize node ignores the background depth when determining the range
+    depth_min, depth_max = float(depth[hit].min()), float(depth[hit].max())
+    factor = 1.0 / (depth_max - depth_min) if depth_max != depth_min else 0.0
+    normalized = np.minimum((depth.astype(np.float64) - depth_min) * factor, 255.0)
+    return np.clip(1.0 - normalized, 0.0, 1.0).astype(np.float32)
+
+
+def save_single_channel_image(
+    scene: bpy.types.Scene,
+    values: "np.ndarray",
+    file_path: str,
+    file_format: str = "PNG",
+    color_depth: str = "8",
+    exr_codec: str = "ZIP",
+    color_mode: str = "BW",
+) -> None:
+    """Writes a single channel image with the scene's output color management, like the compositor's
+    File Output nodes.
+
+    Args:
+        scene (bpy.types.Scene): Scene whose image settings and color management are used.
+        values (np.ndarray): Pixel values of shape (height, width), top row first.
+        file_path (str): Output file path.
+        file_format (str): PNG or OPEN_EXR.
+        color_depth (str): "8" or "16" for PNG, "16" or "32" for OPEN_EXR.
+        exr_codec (str): Compression codec of OPEN_EXR files. One of EXR_CODECS
+        color_mode (str): BW, or RGBA to write the values into R, G and B.
+    """
+    height, width = values.shape
+    image = bpy.data.images.new("single_channel_output", width, height, float_buffer=True)
+    pixels = np.ones((height, width, 4), dtype=np.float32)
+    # Blender stores pixels bottom row first
+    pixels[..., :3] = values[::-1, :, None]
+    image.pixels.foreach_set(pixels.ravel())
+    # save_render uses the scene's image settings, restore them afterwards so that the scene's output
+    # format (e.g. in render_settings.json) is not changed by writing depth and mask images
+    image_settings = scene.render.image_settings
+    saved_settings = {
+        name: getattr(image_settings, name) for name in ["file_format", "color_mode", "color_depth", "exr_codec"]
+    }
+    try:
+        image_settings.file_format = file_format
+        image_settings.color_mode = color_mode
+        image_settings.color_depth = color_depth
+        if file_format == "OPEN_EXR":
+            image_settings.exr_codec = exr_codec
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        image.save_render(file_path, scene=scene)
+    finally:
+        bpy.data.images.remove(image)
+        # The file format first, color mode and depth are only valid for some formats
+        for name, value in saved_settings.items():
+            setattr(image_settings, name, value)
+
+
+def render_depth(
+    scene: bpy.types.Scene,
+    rcfg_part: dict,
+    part_id: str,
+    out_dir: str,
+    shard_writer: "shards.BackgroundShardWriter" = None,
+    exr_codec: str = "ZIP",
+    exr_color_depth: str = "32",
+    exr_color_mode: str = "RGBA",
+    depth_stack_format: str = "none",
+    depth_stack_dir: str = None,
+    output_stats: dict = None,
+    session: RenderSession = None,  # pylint: disable=unused-argument
+) -> int:
+    """Renders depth maps and silhouette masks of the given rcfg_part by rasterizing instead of Cycles.
+
+    The part's triangles are collected once, then the depth of each valid render setup's camera view is
+    rasterized in one batched pass (see raster_depth). Cameras are placed like in render. Writes the depth PNG
+    and EXR with the names and the normalization of render's compositor outputs and binary masks to
+    render/mask/{part_id}/{part_id}_{i:03d}_mask.png.
+
+    Args:
+        scene (bpy.types.Scene): The scene to render from.
+        rcfg_part (dict): Machine part definition.
+        part_id (str): Id of the part to render.
+        out_dir (str): Output directory.
+        shard_writer (shards.BackgroundShardWriter): If set, the written files of each setup are
+            moved into tar shards by the writer. out_dir is used as staging directory in that case.
+        exr_codec (str): Compression codec of the depth EXR files.
+        exr_color_depth (str): "16" (half float) or "32" (full float) depth EXR files.
+        exr_color_mode (str): Channels of the depth EXR files (RGBA or BW).
+        depth_stack_format (str): If npz or npy, all depth maps of the part are collected into a single stack
+            in depth_stack_dir (see utils/depth_stack.py), which replaces the per-image EXR files.
+        depth_stack_dir (str): Output directory of depth stacks.
+        output_stats (dict): If set, number of files, bytes and write seconds of each output are added to it.
+        session (RenderSession): Unused, rasterizing needs no scaffolding besides the scene.
+
+    Returns:
+        int: Number of rendered depth maps.
+    """
+    render_setups = rcfg_part["scene"]["render_setups"]
+    cameras = [obj for obj in scene.objects if obj.type == "CAMERA"]
+    normalize_mesh_scale()
+    with trace_utils.span("scene_triangles", part_id=part_id):
+        vertices, triangles = get_scene_triangles([obj for obj in scene.objects if obj.type == "MESH"])
+    depth_maps, depth_image_indices = [], []
+
+    n_rendered = 0
+    for i, render_setup in enumerate(render_setups):
+        # Skip setups that failed the view check in preprocessing (see preprocessing/check_views.py)
+        if not render_setup.get("view_check", {}).get("valid", True):
+            print(f"Skipping render setup {i} of {part_id}: {render_setup['view_check']['reasons']}")
+            continue
+
+        # CAMERA: zoom to object like in render
+        render_camera = cameras[render_setup["camera_i"]]
+        scene.camera = render_camera
+        bpy.ops.view3d.camera_to_view_selected()
+        bpy.context.view_layer.update()
+
+        with trace_utils.span("depth_raster", part_id=part_id, image_i=i):
+            depth = raster_depth(vertices, triangles, scene, render_camera)
+        n_rendered += 1
+
+        with trace_utils.span("depth_write", part_id=part_id, image_i=i):
+            depth_png_file = f"{out_dir}/render/depth_png/{part_id}/{part_id}_{i:03d}_depth.png"
+            depth_exr_file = f"{out_dir}/render/depth_exr/{part_id}/{part_id}_{i:03d}_depth.exr"
+            mask_file = f"{out_dir}/render/mask/{part_id}/{part_id}_{i:03d}_mask.png"
+            save_single_channel_image(scene, get_depth_png_values(depth), depth_png_file)
+            # The view transform would change the mask values, "Standard" keeps 0 and 1
+            view_transform = scene.view_settings.view_transform
+            scene.view_settings.view_transform = "Standard"
+            save_single_channel_image(
+                scene, (depth < depth_stacks.BLENDER_BACKGROUND_DEPTH).astype(np.float32), mask_file
+            )
+            scene.view_settings.view_transform = view_transform
+            sample_files = {"depth.png": depth_png_file, "mask.png": mask_file}
+            if depth_stack_format != "none":
+                depth_maps.append(depth)
+                depth_image_indices.append(i)
+            else:
+                save_single_channel_image(
+                    scene,
+                    depth,
+                    depth_exr_file,
+                    file_format="OPEN_EXR",
+                    color_depth=exr_color_depth,
+                    exr_codec=exr_codec,
+                    color_mode=exr_color_mode,
+                )
+                sample_files["depth.exr"] = depth_exr_file
+            if output_stats is not None:
+                for output, file_path in [("depth_png", depth_png_file), ("mask", mask_file)]:
+                    add_output_stats(output_stats, output, [file_path])
+                if "depth.exr" in sample_files:
+                    add_output_stats(output_stats, "depth_exr", [depth_exr_file])
+
+            if shard_writer is not None:
+                shard_writer.submit(
+                    key=shards.get_sample_key(part_id, i),
+                    files=sample_files,
+                    metadata={
+                        "part_id": part_id,
+                        "image_i": i,
+                        "render_setup": render_setup,
+                        "camera": rcfg_part["scene"]["cameras"][render_setup["camera_i"]],
+                    },
+                )
+
+    if depth_stack_format != "none" and depth_maps:
+        tstart = time.time()
+        with trace_utils.span("depth_stack_write", part_id=part_id, n_images=len(depth_maps)):
+            stack_files = depth_stacks.write_depth_stack(
+                depth_stack_dir,
+                part_id,
+                depth_maps,
+                depth_image_indices,
+                stack_format=depth_stack_format,
+                dtype="float16" if exr_color_depth == "16" else "float32",
+            )
+        if output_stats is not None:
+            add_output_stats(output_stats, f"depth_stack_{depth_stack_format}", stack_files, time.time() - tstart)
+    return n_rendered
+
 
 def get_args():
     """Returns script arguments as python variables."""
@@ -504,11 +1111,25 @@ def get_args():
         type=str,
         default=None,
     )
+    parser.add_argument(
+        "--material_library",
+        help="Directory of a compiled material library (see build_material_library.py), "
+        "loaded in one call instead of the .blend files of --material_dir.",
+        type=str,
+        default=None,
+    )
     parser.add_argument(
         "--envmap_dir",
-        help="Data directory for envmaps.",
+        help="Data directory for envmaps. Required in mode full.",
         type=str,
-        required=True,
+        default=None,
+    )
+    parser.add_argument(
+        "--envmap_cache_dir",
+        help="Load envmaps from downsampled copies sized to the render resolution in this directory, "
+        "created if missing (see prepare_envmaps.py).",
+        type=str,
+        default=None,
     )
     parser.add_argument(
         "--rcfg_file",
@@ -549,6 +1170,100 @@ def get_args():
         type=str,
         choices=["JPEG", "PNG"],
     )
+    parser.add_argument(
+        "--out_mode",
+        help="files: write each image to render/{rgb,depth_png,depth_exr}/{part_id}/. "
+        "shards: stream images into size-bounded tar shards in render/shards/ (WebDataset layout).",
+        default="files",
+        type=str,
+        choices=["files", "shards"],
+    )
+    parser.add_argument(
+        "--shard_size_mb",
+        help="Maximum file size of a tar shard in MB, including tar headers and padding (out_mode shards).",
+        default=1024,
+        type=int,
+    )
+    parser.add_argument(
+        "--staging_dir",
+        help="Render into a staging directory on node-local disk or tmpfs (e.g. an emptyDir volume). "
+        "The images of each finished part are uploaded to --out_dir by a background thread "
+        "(see utils/output_sink.py), so rendering does not wait for the output volume.",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--output_backend",
+        help="Storage backend of the uploads (--staging_dir). objectdir is a local stand-in of an object store.",
+        default="local",
+        type=str,
+        choices=list(output_sink.BACKENDS),
+    )
+    parser.add_argument(
+        "--max_staging_mb",
+        help="Rendering waits while more MB are staged and not yet uploaded (--staging_dir).",
+        default=4096,
+        type=int,
+    )
+    parser.add_argument(
+        "--upload_retries",
+        help="Retries of a failed upload before rendering is aborted (--staging_dir).",
+        default=3,
+        type=int,
+    )
+    parser.add_argument(
+        "--depth_exr_codec",
+        help="Compression codec of the depth EXR files.",
+        default="ZIP",
+        type=str,
+        choices=EXR_CODECS,
+    )
+    parser.add_argument(
+        "--depth_exr_color_depth",
+        help="Float precision of the depth EXR files. 16: half float, 32: full float.",
+        default="32",
+        type=str,
+        choices=["16", "32"],
+    )
+    parser.add_argument(
+        "--depth_exr_color_mode",
+        help="Channels of the depth EXR files. RGBA: depth in R, G and B, BW: single channel (smaller files).",
+        default="RGBA",
+        type=str,
+        choices=EXR_COLOR_MODES,
+    )
+    parser.add_argument(
+        "--depth_stack",
+        help="Collect all depth maps of a part into a single stack in render/depth_stack/ instead of one EXR "
+        "per image. npz: compressed, npy: memory-mappable with a JSON header.",
+        default="none",
+        type=str,
+        choices=depth_stacks.DEPTH_STACK_FORMATS,
+    )
+    parser.add_argument(
+        "--mode",
+        help="full: Cycles render of RGB images and depth maps. "
+        "depth: only depth maps and silhouette masks, rasterized from the part's triangles "
+        "(no materials, envmaps or Cycles).",
+        default="full",
+        type=str,
+        choices=RENDER_MODES,
+    )
+    parser.add_argument(
+        "--scene_mode",
+        help="reset: open a new empty scene for every part. "
+        "session: build world, compositor, render settings and materials once and only import/remove the objects "
+        "of each part (see RenderSession).",
+        default="reset",
+        type=str,
+        choices=SCENE_MODES,
+    )
+    parser.add_argument(
+        "--purge_every",
+        help="Purge orphan datablocks of removed parts after every n-th part (scene_mode session). 0: never.",
+        default=10,
+        type=int,
+    )
     parser.add_argument(
         "--engine",
         help="Rendering engine",
@@ -561,8 +1276,57 @@ def get_args():
         default="GPU",
         type=str,
     )
+    parser.add_argument(
+        "--samples",
+        help="Maximum number of Cycles samples per pixel (adaptive sampling may stop earlier).",
+        default=4096,
+        type=int,
+    )
+    parser.add_argument(
+        "--adaptive_settings",
+        help="Resolve Cycles samples and light path bounces per part from the materials of its single parts "
+        "(see utils/render_profiles.py), e.g. deep transmission bounces only for transparent parts. "
+        "The settings used are written to {report_dir}/part_render_settings.json.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--render_profiles_file",
+        help="JSON rule table {profiles, rules} that replaces the default rules (--adaptive_settings).",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--part_ids",
+        help="Only render the GLBs of these parts (e.g. one batch of pipeline.py).",
+        type=str,
+        nargs="+",
+        default=None,
+    )
+    parser.add_argument(
+        "--report_dir",
+        help="Directory of the status, settings and report JSON files. Defaults to --out_dir.",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--metrics_port",
+        help="Serve live progress metrics in Prometheus format on this port (/metrics). "
+        "Progress is always written to {report_dir}/render_status.json.",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--trace_dir",
+        help="Record spans of the render stages to {trace_dir}/render.{pid}.trace.jsonl (see utils/trace_utils.py).",
+        type=str,
+        default=None,
+    )
 
     args, _ = parser.parse_known_args(script_args)
+    if args.mode == "full" and args.envmap_dir is None:
+        parser.error("--envmap_dir is required in mode full")
+    if args.staging_dir and args.out_mode == "shards":
+        parser.error("--staging_dir is only supported with --out_mode files")
     return args
 
 
@@ -576,55 +1340,271 @@ if __name__ == "__main__":
     envmap_dir = args.envmap_dir
     rcfg_file = args.rcfg_file
     out_dir = args.out_dir
+    report_dir = args.report_dir or out_dir
+    os.makedirs(report_dir, exist_ok=True)
     res_x = args.res_x
     res_y = args.res_y
     out_format = args.out_format
     out_quality = args.out_quality
     engine = args.engine
     device = args.device
-
-    # Load RCFG data
-    with open(rcfg_file, "r") as rcfg_json:
-        rcfg_data = json.load(rcfg_json)
-
-    sorted_input_files = sorted(os.listdir(gltf_dir), key=lambda x: x.split("_")[0])
-
-    for glb_fname in sorted_input_files:
-        if not glb_fname.endswith(".glb"):
-            continue
-        new_empty_scene()
-        load_gltf(os.path.join(gltf_dir, glb_fname))
-        part_id = glb_fname[:-4]  # Remove .glb from glb filename
-        scene = bpy.context.scene
-        for part in rcfg_data["parts"]:
-            if part["id"] == part_id:
-                rcfg_part = part
-                break
-
-        if material_dir:
-            bpy_materials = get_bpy_materials(material_dir)
-            apply_materials(
-                scene,
-                rcfg_part,
-                bpy_materials,
+    out_mode = args.out_mode
+    output_stats = {}
+    n_rendered, n_parts = 0, 0
+    adaptive_settings = args.adaptive_settings and args.mode == "full" and engine.lower() == "cycles"
+    profiles, rules = render_profiles.PROFILES, render_profiles.RULES
+    if args.render_profiles_file:
+        profiles, rules = render_profiles.load_rule_table(args.render_profiles_file)
+    part_render_settings = {}
+    material_report = {}
+    trace_utils.init_tracer(args.trace_dir, "render")
+    with trace_utils.span("render", gltf_dir=gltf_dir) as render_attrs:
+        # Shards: Blender writes each image into a staging directory, from where it is moved into a shard
+        shard_writer = None
+        render_out_dir = out_dir
+        if out_mode == "shards":
+            shard_writer = shards.BackgroundShardWriter(
+                f"{out_dir}/render/shards",
+                max_shard_bytes=args.shard_size_mb * 1024 * 1024,
             )
-        apply_render_settings(
-            device=device,
-            engine=engine,
-            res_x=res_x,
-            res_y=res_y,
-            out_format=out_format,
-            out_quality=out_quality,
+            render_out_dir = f"{out_dir}/render/shards/staging"
+        # Staging: Blender writes to node-local disk, finished parts are uploaded to out_dir in the background
+        sink = None
+        if args.staging_dir:
+            # The manifest is a report of this process: with --report_dir inside out_dir (pipeline.py batches)
+            # every process has its own, merged after all batches
+            manifest_name = os.path.relpath(f"{report_dir}/{output_sink.MANIFEST_FILENAME}", out_dir)
+            if manifest_name.startswith(".."):
+                manifest_name = output_sink.MANIFEST_FILENAME
+            sink = output_sink.OutputSink(
+                out_dir,
+                args.staging_dir,
+                backend=args.output_backend,
+                max_staging_bytes=args.max_staging_mb * 1024 * 1024,
+                max_retries=args.upload_retries,
+                manifest_name=manifest_name.replace(os.sep, "/"),
+            )
+            render_out_dir = sink.staging_dir
+
+        # Load RCFG data
+        with open(rcfg_file, "r") as rcfg_json:
+            rcfg_data = json.load(rcfg_json)
+        # Fail before any work if the RCFG does not match its schema
+        with trace_utils.span("rcfg_validation"):
+            rcfg_validation.get_validator(rcfg_validation.get_schema_file(rcfg_data)).validate(rcfg_data)
+
+        sorted_input_files = sorted(os.listdir(gltf_dir), key=lambda x: x.split("_")[0])
+        if args.part_ids:
+            part_ids = set(args.part_ids)
+            sorted_input_files = [fn for fn in sorted_input_files if fn[:-4] in part_ids]
+
+        # Live progress: status file and optional Prometheus endpoint, fed by the spans of the render loop
+        glb_part_ids = {fn[:-4] for fn in sorted_input_files if fn.endswith(".glb")}
+        n_images_total = sum(
+            1
+            for part in rcfg_data["parts"]
+            if part["id"] in glb_part_ids
+            for render_setup in part["scene"]["render_setups"]
+            if render_setup.get("view_check", {}).get("valid", True)
         )
-        render(
-            scene,
-            rcfg_part=rcfg_part,
-            part_id=part_id,
-            envmap_dir=envmap_dir,
-            out_dir=out_dir,
+        metrics = progress_metrics.ProgressMetrics(
+            "render",
+            n_parts=len(glb_part_ids),
+            n_images=n_images_total,
+            status_file=f"{report_dir}/render_status.json",
+            port=args.metrics_port,
+            part_span="render_part",
+            image_span="cycles_render" if args.mode == "full" else "depth_raster",
+            print_fn=print,
         )
 
+        # Fail before any rendering on missing envmaps, optionally load them from resolution-matched copies
+        envmap_files = None
+        if args.mode == "full":
+            rendered_rcfg = {"parts": [part for part in rcfg_data["parts"] if part["id"] in glb_part_ids]}
+            if args.envmap_cache_dir:
+                with trace_utils.span("envmap_prepare"):
+                    envmap_files = prepare_envmaps.prepare_envmaps(
+                        rendered_rcfg, envmap_dir, args.envmap_cache_dir, res_x, res_y
+                    )
+            else:
+                with trace_utils.span("envmap_check"):
+                    envmap_cache.check_envmaps(envmap_cache.get_referenced_envmaps(rendered_rcfg), envmap_dir)
+
+        render_device = device if args.mode == "full" else "CPU"
+        session = None
+        if args.scene_mode == "session":
+            with trace_utils.span("session_setup"):
+                session = RenderSession(
+                    mode=args.mode,
+                    materials_dir=material_dir,
+                    material_library_dir=args.material_library,
+                    exr_codec=args.depth_exr_codec,
+                    exr_color_depth=args.depth_exr_color_depth,
+                    exr_color_mode=args.depth_exr_color_mode,
+                    purge_every=args.purge_every,
+                )
+                apply_render_settings(
+                    device=render_device,
+                    engine=engine,
+                    res_x=res_x,
+                    res_y=res_y,
+                    out_format=out_format,
+                    out_quality=out_quality,
+                    samples=args.samples,
+                )
+
+        for glb_fname in sorted_input_files:
+            if not glb_fname.endswith(".glb"):
+                continue
+            part_id = glb_fname[:-4]  # Remove .glb from glb filename
+            with trace_utils.span("render_part", part_id=part_id) as part_attrs:
+                if sink is not None:
+                    with trace_utils.span("staging_wait", part_id=part_id):
+                        sink.wait_for_space()
+                for part in rcfg_data["parts"]:
+                    if part["id"] == part_id:
+                        rcfg_part = part
+                        break
+                with trace_utils.span("glb_import", part_id=part_id):
+                    if session is None:
+                        new_empty_scene()
+                        load_gltf(os.path.join(gltf_dir, glb_fname))
+                    else:
+                        session.import_part(os.path.join(gltf_dir, glb_fname), rcfg_part)
+                scene = bpy.context.scene
+
+                if (material_dir or args.material_library) and args.mode == "full":
+                    with trace_utils.span("material_application", part_id=part_id) as material_attrs:
+                        if session is not None:
+                            bpy_materials = session.bpy_materials
+                        else:
+                            bpy_materials = load_bpy_materials(material_dir, args.material_library)
+                        material_report[part_id] = apply_materials(
+                            scene,
+                            rcfg_part,
+                            bpy_materials,
+                        )
+                        material_attrs.update(
+                            {k: v for k, v in material_report[part_id].items() if k.startswith("n_")}
+                        )
+                with trace_utils.span("render_settings", part_id=part_id) as settings_attrs:
+                    cycles_settings = None
+                    if adaptive_settings:
+                        profile, cycles_settings = render_profiles.resolve_settings(
+                            rcfg_part, args.samples, profiles, rules
+                        )
+                        part_render_settings[part_id] = {
+                            "profile": profile,
+                            "materials": render_profiles.get_part_materials(rcfg_part),
+                            "cycles": cycles_settings,
+                        }
+                        settings_attrs["profile"] = part_attrs["profile"] = profile
+                        part_attrs["samples"] = cycles_settings["samples"]
+                    if session is None:
+                        apply_render_settings(
+                            device=render_device,
+                            engine=engine,
+                            res_x=res_x,
+                            res_y=res_y,
+                            out_format=out_format,
+                            out_quality=out_quality,
+                            samples=args.samples,
+                            cycles_settings=cycles_settings,
+                        )
+                    elif cycles_settings is not None:
+                        apply_cycles_settings(scene, cycles_settings)
+                part_attrs.update(scene_stats.get_scene_stats(list(scene.objects)))
+                render_kwargs = {
+                    "rcfg_part": rcfg_part,
+                    "part_id": part_id,
+                    "out_dir": render_out_dir,
+                    "shard_writer": shard_writer,
+                    "exr_codec": args.depth_exr_codec,
+                    "exr_color_depth": args.depth_exr_color_depth,
+                    "exr_color_mode": args.depth_exr_color_mode,
+                    "depth_stack_format": args.depth_stack,
+                    # Shards only take the per-image files of the staging directory, stacks go to out_dir
+                    "depth_stack_dir": f"{sink.staging_dir if sink is not None else out_dir}/render/depth_stack",
+                    "output_stats": output_stats,
+                    "session": session,
+                }
+                if args.mode == "depth":
+                    part_attrs["n_images"] = render_depth(scene, **render_kwargs)
+                else:
+                    part_attrs["n_images"] = render(
+                        scene, envmap_dir=envmap_dir, envmap_files=envmap_files, **render_kwargs
+                    )
+                if session is not None:
+                    with trace_utils.span("scene_cleanup", part_id=part_id) as cleanup_attrs:
+                        cleanup_attrs.update(session.clear_part())
+                if sink is not None:
+                    with trace_utils.span("staging_commit", part_id=part_id) as commit_attrs:
+                        commit_attrs["n_files"] = sink.commit()
+            n_rendered += part_attrs["n_images"]
+            n_parts += 1
+
+        if sink is not None:
+            with trace_utils.span("output_flush") as flush_attrs:
+                flush_attrs.update(sink.close())
+            print(
+                f"Uploaded {flush_attrs['files']} files ({flush_attrs['bytes'] / 1e6:.1f} MB, "
+                f"{flush_attrs['retries']} retries) to {args.output_backend} backend, "
+                f"{flush_attrs['upload_seconds']:.2f}s in uploader thread, {flush_attrs['wait_seconds']:.2f}s waited"
+            )
+
+        # Duplicate parts (see export_gltfs.py --dedup_geometry) get the images of the part with the same geometry
+        aliases = geometry_fingerprint.load_aliases(gltf_dir)
+        # Object storage has no links, readers resolve aliases from the aliases file of the GLTF export
+        if aliases and out_mode == "files" and (sink is None or args.output_backend == "local"):
+            with trace_utils.span("alias_linking", n_aliases=len(aliases)):
+                n_linked = sum(
+                    geometry_fingerprint.link_alias_renders(f"{out_dir}/render", alias_id, canonical_id)
+                    for alias_id, canonical_id in aliases.items()
+                )
+            print(f"Linked {n_linked} files for {len(aliases)} aliased parts")
+
+        if shard_writer is not None:
+            with trace_utils.span("shard_finalize"):
+                shard_writer.close()
+                shards.merge_indices(f"{out_dir}/render/shards")
+                shutil.rmtree(render_out_dir, ignore_errors=True)
+                if aliases:
+                    # Shard readers resolve aliases from the manifest instead of duplicated samples
+                    shutil.copy(f"{gltf_dir}/{geometry_fingerprint.ALIASES_FILENAME}", f"{out_dir}/render/shards")
+            print(
+                f"Wrote {shard_writer.writer.n_samples} samples into {shard_writer.writer.n_shards} shards "
+                f"({shard_writer.writer.bytes_written / 1e6:.1f} MB, "
+                f"{shard_writer.write_seconds:.2f}s in writer thread)"
+            )
+        render_attrs.update({"n_parts": n_parts, "n_images": n_rendered})
+        if session is not None:
+            render_attrs["n_rig_reused"] = session.n_rig_reused
+
     # Export detailed render settings
-    export_render_settings(out_path=f"{out_dir}/render_settings.json")
+    export_render_settings(
+        out_path=f"{report_dir}/render_settings.json",
+        depth_settings={
+            "mode": args.mode,
+            "exr_codec": args.depth_exr_codec,
+            "exr_color_depth": args.depth_exr_color_depth,
+            "exr_color_mode": args.depth_exr_color_mode,
+            "stack": args.depth_stack,
+        },
+    )
+    if adaptive_settings:
+        # The global render_settings.json holds the settings of the last part, these are the ones actually used
+        with open(f"{report_dir}/part_render_settings.json", "w") as f:
+            json.dump(part_render_settings, f, indent=4)
+    if material_report:
+        # Objects matched and unmatched by the single parts of each part (see apply_materials)
+        with open(f"{report_dir}/material_report.json", "w") as f:
+            json.dump(material_report, f, indent=4)
+    # Export bytes written per output (seconds are only measured for depth stacks, blender writes the other files)
+    with open(f"{report_dir}/output_stats.json", "w") as f:
+        json.dump(output_stats, f, indent=4)
+    for output, stats in output_stats.items():
+        print(f"{output}: {stats['files']} files, {stats['bytes'] / 1e6:.2f} MB, {stats['seconds']:.2f}s")
     tend = time.time() - tstart
-    print(f"Rendered {len(os.listdir(gltf_dir))} imgs in {tend} seconds")
+    print(f"Rendered {n_rendered} imgs of {n_parts} parts in {tend} seconds")
+    metrics.close()
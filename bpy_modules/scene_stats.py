@@ -0,0 +1,20 @@
+"""Scene statistics of Blender objects recorded in the trace spans of export_gltfs.py and render.py."""
+import numpy as np
+
+
+def get_scene_stats(objects: list) -> dict:
+    """Returns the number of objects, triangles and distinct materials of the given objects (used in trace spans).
+
+    Args:
+        objects (list[bpy.types.Object]): Objects to count.
+    """
+    n_triangles, materials = 0, set()
+    for obj in objects:
+        if obj.type != "MESH":
+            continue
+        # Each polygon with n loops is split into n - 2 triangles
+        loop_totals = np.empty(len(obj.data.polygons), dtype=np.int32)
+        obj.data.polygons.foreach_get("loop_total", loop_totals)
+        n_triangles += int(loop_totals.sum()) - 2 * len(loop_totals)
+        materials.update(slot.material.name for slot in obj.material_slots if slot.material is not None)
+    return {"n_objects": len(objects), "n_triangles": n_triangles, "n_materials": len(materials)}
@@ -0,0 +1,489 @@
+"""Pipelined run of preprocessing, GLTF export and rendering (replaces the sequential shell scripts).
+
+Preprocessing writes the RCFG of all parts. Its parts are then split into batches of --batch_size parts, which
+stream through the export and render stages (see utils/stage_runner.py): each batch is exported by one Blender
+process (export_gltfs.py --part_ids) and rendered by one Blender process (render.py --part_ids), so batch k renders
+while batch k+1 exports. --export_workers and --render_workers set the processes per stage, --max_queued_batches
+bounds the exported batches waiting for rendering.
+
+Logs, status and report files of each batch are written to {out_dir}/pipeline/batch_{k:04d}/. The reports of all
+render batches are merged into {out_dir} like a single render run, and {out_dir}/pipeline_report.json holds
+the busy, starved and blocked time and the utilization of each stage.
+
+With --dry_run nothing is exported or rendered: the render time of each part is predicted after preprocessing
+(see utils/cost_model.py) and written to {out_dir}/cost_estimate.json.
+
+Run from project root (same inputs as scripts/run_minimal_example.sh):
+    python pipeline.py --topex_metadata_file ./data/mini_example/mini_example.xlsx \
+        --topex_blend_file ./data/mini_example/mini_example.blend --materials_dir ./data/mini_example/materials \
+        --envmaps_dir ./data/mini_example/envmaps --out_dir ./out/1-mini-example --n_images_per_part 3 \
+        --batch_size 4 --trace_dir ./out/1-mini-example/trace
+"""
+import argparse
+import json
+import logging
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import click
+
+from utils import cost_model, logger_utils, output_sink, render_profiles, stage_runner, timer_utils, trace_utils
+from preprocessing.preprocessing_controller import PreprocessingController
+
+LOGGER = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+RCFG_NAME = "rcfg.json"
+# Reports keyed by part id, merged over the render batches
+PART_REPORTS = ["part_render_settings.json", "material_report.json"]
+
+
+def get_batches(rcfg_file: str, batch_size: int, part_ids_file: str = None) -> list[list[str]]:
+    """Returns the part ids of the RCFG split into batches in RCFG order.
+
+    Args:
+        rcfg_file (str): Path of the RCFG.
+        batch_size (int): Number of parts per batch.
+        part_ids_file (str): Only include the part ids listed in this file (one per line).
+    """
+    with open(rcfg_file, "r") as f:
+        part_ids = [part["id"] for part in json.load(f)["parts"]]
+    if part_ids_file:
+        with open(part_ids_file, "r") as f:
+            selected_ids = {line.strip() for line in f if line.strip()}
+        part_ids = [part_id for part_id in part_ids if part_id in selected_ids]
+    return [part_ids[i : i + batch_size] for i in range(0, len(part_ids), batch_size)]
+
+
+def get_batch_dir(out_dir: str, batch_i: int) -> str:
+    return f"{out_dir}/pipeline/batch_{batch_i:04d}"
+
+
+def run_command(command: list[str], log_file: str) -> None:
+    """Runs a command with its output written to the log file, raises if it fails."""
+    with open(log_file, "w") as log:
+        returncode = subprocess.run(command, stdout=log, stderr=subprocess.STDOUT, check=False).returncode
+    if returncode != 0:
+        raise RuntimeError(f"exit code {returncode}, see {log_file}")
+
+
+def get_worker_args(extra_args: str) -> list[str]:
+    """Returns the passed through arguments of a Blender script for the current stage worker.
+
+    Concurrent workers of a stage cannot serve metrics on the same port, so --metrics_port is offset by the index
+    of the worker (see stage_runner.get_worker_index).
+    """
+    tokens = shlex.split(extra_args)
+    for i, token in enumerate(tokens):
+        if token == "--metrics_port" and i + 1 < len(tokens):
+            tokens[i + 1] = str(int(tokens[i + 1]) + stage_runner.get_worker_index())
+        elif token.startswith("--metrics_port="):
+            tokens[i] = f"--metrics_port={int(token.split('=', 1)[1]) + stage_runner.get_worker_index()}"
+    return tokens
+
+
+def get_preprocessing_command(args: SimpleNamespace) -> list[str]:
+    command = [
+        sys.executable,
+        f"{PROJECT_DIR}/preprocessing.py",
+        "--out_dir",
+        args.out_dir,
+        "--n_images_per_part",
+        str(args.n_images_per_part),
+        "--camera_def_mode",
+        args.camera_def_mode,
+        "--light_def_mode",
+        args.light_def_mode,
+        "--material_def_mode",
+        args.material_def_mode,
+        "--envmap_def_mode",
+        args.envmap_def_mode,
+        "--camera_seed",
+        str(args.camera_seed),
+        "--light_seed",
+        str(args.light_seed),
+        "--n_workers",
+        str(args.preprocessing_workers),
+    ]
+    for option in ["topex_metadata_file", "topex_blend_file", "materials_dir", "obj_dir", "trace_dir"]:
+        if getattr(args, option):
+            command += [f"--{option}", getattr(args, option)]
+    return command
+
+
+def get_export_command(args: SimpleNamespace, rcfg_file: str, part_ids: list[str], batch_dir: str) -> list[str]:
+    command = [args.blender]
+    if args.topex_blend_file:
+        command.append(args.topex_blend_file)
+    command += ["--background", "--python", f"{PROJECT_DIR}/bpy_modules/export_gltfs.py", "--"]
+    command += ["--rcfg_file", rcfg_file, "--out_dir", f"{args.out_dir}/gltf", "--report_dir", batch_dir]
+    if args.trace_dir:
+        command += ["--trace_dir", args.trace_dir]
+    return command + get_worker_args(args.export_args) + ["--part_ids", *part_ids]
+
+
+def get_render_command(args: SimpleNamespace, rcfg_file: str, part_ids: list[str], batch_dir: str) -> list[str]:
+    command = [args.blender, "--background", "--python", f"{PROJECT_DIR}/bpy_modules/render.py", "--"]
+    command += ["--gltf_dir", f"{args.out_dir}/gltf", "--out_dir", args.out_dir, "--rcfg_file", rcfg_file]
+    command += ["--report_dir", batch_dir]
+    command += ["--res_x", str(args.res_x), "--res_y", str(args.res_y), "--engine", args.engine]
+    command += ["--device", args.device, "--out_format", args.out_format, "--out_quality", str(args.out_quality)]
+    if args.materials_dir:
+        command += ["--material_dir", args.materials_dir]
+    if args.envmaps_dir:
+        command += ["--envmap_dir", args.envmaps_dir]
+    if args.trace_dir:
+        command += ["--trace_dir", args.trace_dir]
+    return command + get_worker_args(args.render_args) + ["--part_ids", *part_ids]
+
+
+def check_render_args(render_args: str) -> None:
+    """Raises if the render arguments cannot be used for batches."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--out_mode", type=str, default="files")
+    if parser.parse_known_args(shlex.split(render_args))[0].out_mode == "shards":
+        # Every batch would start again at shard 0 of the same directory and share its staging directory
+        raise click.UsageError(
+            "--out_mode shards is not supported by pipeline.py, pack the files with scripts/utils/pack_shards.py"
+        )
+
+
+def get_render_settings(args: SimpleNamespace) -> tuple[dict, dict, list]:
+    """Returns the settings of the render stage used by the cost model, and its render profiles and rules.
+
+    Samples and render profiles are only set through --render_args.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--samples", type=int, default=4096)
+    parser.add_argument("--adaptive_settings", action="store_true")
+    parser.add_argument("--render_profiles_file", type=str, default=None)
+    render_args, _ = parser.parse_known_args(shlex.split(args.render_args))
+    profiles, rules = None, None
+    if render_args.render_profiles_file:
+        profiles, rules = render_profiles.load_rule_table(render_args.render_profiles_file)
+    settings = {
+        "res_x": args.res_x,
+        "res_y": args.res_y,
+        "samples": render_args.samples,
+        "adaptive_settings": render_args.adaptive_settings,
+    }
+    return settings, profiles, rules
+
+
+def estimate_costs(args: SimpleNamespace, rcfg_file: str, part_ids: list[str]) -> None:
+    """Logs the predicted render time of the parts and writes the estimates to {out_dir}/cost_estimate.json."""
+    with open(rcfg_file, "r") as f:
+        rcfg = json.load(f)
+    selected_ids = set(part_ids)
+    rcfg["parts"] = [part for part in rcfg["parts"] if part["id"] in selected_ids]
+    settings, profiles, rules = get_render_settings(args)
+    model = cost_model.load_model(args.cost_model_file)
+    # GLBs of a previous export of the run, else the OBJ files of the RCFG
+    mesh_stats = cost_model.inspect_parts(rcfg, f"{args.out_dir}/gltf")
+    estimates = cost_model.estimate_parts(rcfg, mesh_stats, settings, model, profiles, rules)
+    out_file = f"{args.out_dir}/{cost_model.ESTIMATES_NAME}"
+    cost_model.write_estimates(out_file, estimates, settings, model)
+    for line in cost_model.format_estimates(estimates):
+        LOGGER.info(line)
+    if model["calibration"] is None:
+        LOGGER.info("Uncalibrated cost model, see scripts/utils/estimate_costs.py calibrate")
+    LOGGER.info(f"Estimates written to {out_file}")
+
+
+def merge_render_reports(batch_dirs: list[str], out_dir: str) -> None:
+    """Merges the report files of render runs of disjoint parts into out_dir, like the reports of a single run."""
+    for report_name in PART_REPORTS:
+        merged = {}
+        for batch_dir in batch_dirs:
+            if os.path.isfile(f"{batch_dir}/{report_name}"):
+                with open(f"{batch_dir}/{report_name}", "r") as f:
+                    merged.update(json.load(f))
+        if merged:
+            with open(f"{out_dir}/{report_name}", "w") as f:
+                json.dump(merged, f, indent=4)
+
+    output_stats = {}
+    for batch_dir in batch_dirs:
+        if not os.path.isfile(f"{batch_dir}/output_stats.json"):
+            continue
+        with open(f"{batch_dir}/output_stats.json", "r") as f:
+            for output, stats in json.load(f).items():
+                merged_stats = output_stats.setdefault(output, {"files": 0, "bytes": 0, "seconds": 0.0})
+                for key in merged_stats:
+                    merged_stats[key] += stats[key]
+    with open(f"{out_dir}/output_stats.json", "w") as f:
+        json.dump(output_stats, f, indent=4)
+
+    # Upload manifests of render runs with --staging_dir (local backend), one per batch
+    upload_manifest = []
+    for batch_dir in batch_dirs:
+        if os.path.isfile(f"{batch_dir}/{output_sink.MANIFEST_FILENAME}"):
+            with open(f"{batch_dir}/{output_sink.MANIFEST_FILENAME}", "r") as f:
+                upload_manifest += f.readlines()
+    if upload_manifest:
+        with open(f"{out_dir}/{output_sink.MANIFEST_FILENAME}", "w") as f:
+            f.writelines(upload_manifest)
+
+    # All batches render with the same settings
+    for batch_dir in batch_dirs:
+        if os.path.isfile(f"{batch_dir}/render_settings.json"):
+            shutil.copy(f"{batch_dir}/render_settings.json", f"{out_dir}/render_settings.json")
+            break
+
+
+def log_report(report: dict) -> None:
+    """Logs the utilization table of the stages."""
+    LOGGER.info(
+        f"Pipeline wall time {report['wall_seconds']:.1f}s, "
+        f"stages one after another ~{report['sequential_seconds']:.1f}s"
+    )
+    LOGGER.info(
+        f"{'stage':10s}{'workers':>8s}{'batches':>8s}{'busy s':>10s}{'starved s':>11s}{'blocked s':>11s}{'util':>7s}"
+    )
+    for name, stats in report["stages"].items():
+        # Stages without any batch (e.g. after a failed export) have no utilization
+        utilization = f"{stats['utilization']:.1%}" if stats["utilization"] is not None else "-"
+        LOGGER.info(
+            f"{name:10s}{stats['n_workers']:>8d}{stats['n_batches']:>8d}{stats['busy_seconds']:>10.1f}"
+            f"{stats['starved_seconds']:>11.1f}{stats['blocked_seconds']:>11.1f}{utilization:>7s}"
+        )
+
+
+@click.command()
+@click.option(
+    "--topex_metadata_file",
+    help="Path to xlsx metadata file for topex metadata (machine-metadata.xlsx)",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True),
+    default=None,
+)
+@click.option(
+    "--topex_blend_file",
+    help="Path to blender file from topex (machine.blend), opened by the export",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True),
+    default=None,
+)
+@click.option(
+    "--materials_dir",
+    help="Path to blender materials directory for topex machine parts",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, readable=True),
+    default=None,
+)
+@click.option(
+    "--obj_dir",
+    help="Input directory for .obj files for data not related to topex. (e.g. ModelNet)",
+    type=click.Path(exists=False, file_okay=False, dir_okay=True),
+    default=None,
+)
+@click.option(
+    "--envmaps_dir",
+    help="Path to the environment maps used by the renders",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, readable=True),
+    default=None,
+)
+@click.option(
+    "--out_dir",
+    help="Output directory of the run (created if not existent)",
+    type=click.Path(exists=False, file_okay=False, dir_okay=True),
+    required=True,
+)
+@click.option(
+    "--rcfg_file",
+    help="Use this RCFG instead of running preprocessing",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True),
+    default=None,
+)
+@click.option(
+    "--part_ids_file",
+    help="Only export and render the parts listed in this file, one id per line (e.g. one shard of a Kubernetes job)",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True),
+    default=None,
+)
+@click.option(
+    "--run_mode",
+    help="1: preprocessing only, 2: preprocessing and GLTF export, 3: preprocessing, GLTF export and rendering",
+    type=click.IntRange(min=1, max=3),
+    show_default=True,
+    default=3,
+)
+@click.option(
+    "--n_images_per_part",
+    help="Number of images to render for each part",
+    type=click.INT,
+    show_default=True,
+    default=10,
+)
+@click.option(
+    "--camera_def_mode",
+    help="Camera definition mode",
+    type=click.Choice(choices=PreprocessingController.CAMERA_DEF_MODES),
+    show_default=True,
+    show_choices=True,
+    default=PreprocessingController.CAMERA_DEF_MODES[0],
+)
+@click.option(
+    "--light_def_mode",
+    help="Light definition mode",
+    type=click.Choice(choices=PreprocessingController.LIGHT_DEF_MODES),
+    show_default=True,
+    show_choices=True,
+    default=PreprocessingController.LIGHT_DEF_MODES[0],
+)
+@click.option(
+    "--material_def_mode",
+    help="Material definition mode",
+    type=click.Choice(choices=PreprocessingController.MATERIAL_DEF_MODES),
+    show_default=True,
+    show_choices=True,
+    default=PreprocessingController.MATERIAL_DEF_MODES[0],
+)
+@click.option(
+    "--envmap_def_mode",
+    help="Environment Map definition mode",
+    type=click.Choice(choices=PreprocessingController.ENVMAP_DEF_MODES),
+    show_default=True,
+    show_choices=True,
+    default=PreprocessingController.ENVMAP_DEF_MODES[0],
+)
+@click.option("--camera_seed", help="Random camera seed for reproducibility", type=int, show_default=True, default=42)
+@click.option("--light_seed", help="Random light seed for reproducibility", type=int, show_default=True, default=43)
+@click.option(
+    "--preprocessing_workers",
+    help="Number of worker processes used to sample scenes in preprocessing",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=1,
+)
+@click.option(
+    "--batch_size",
+    help="Parts per export and render process. Larger batches amortize Blender startup, smaller ones overlap more",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=16,
+)
+@click.option(
+    "--export_workers",
+    help="Concurrent export processes (each opens the .blend file)",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=1,
+)
+@click.option(
+    "--render_workers",
+    help="Concurrent render processes (e.g. one per GPU)",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=1,
+)
+@click.option(
+    "--max_queued_batches",
+    help="Exported batches waiting for rendering, export pauses while the queue is full",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=2,
+)
+@click.option("--blender", help="Blender executable", type=str, show_default=True, default="blender")
+@click.option("--res_x", help="Pixel resolution in X direction", type=int, show_default=True, default=256)
+@click.option("--res_y", help="Pixel resolution in Y direction", type=int, show_default=True, default=256)
+@click.option("--engine", help="Render engine", type=str, show_default=True, default="CYCLES")
+@click.option("--device", help="Render device", type=str, show_default=True, default="GPU")
+@click.option("--out_format", help="Output image format", type=str, show_default=True, default="PNG")
+@click.option("--out_quality", help="Output image quality", type=int, show_default=True, default=100)
+@click.option(
+    "--export_args",
+    help='Further arguments of export_gltfs.py, e.g. "--mesh_compression draco". '
+    "--metrics_port is offset by the index of the export worker",
+    type=str,
+    default="",
+)
+@click.option(
+    "--render_args",
+    help='Further arguments of render.py, e.g. "--scene_mode session --samples 64". '
+    "--metrics_port is offset by the index of the render worker, --out_mode shards is not supported",
+    type=str,
+    default="",
+)
+@click.option(
+    "--dry_run",
+    help="Only predict the render time of each part (after preprocessing) and write {out_dir}/cost_estimate.json",
+    is_flag=True,
+)
+@click.option(
+    "--cost_model_file",
+    help="Calibrated cost model of --dry_run (scripts/utils/estimate_costs.py calibrate)",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True),
+    default=None,
+)
+@click.option(
+    "--trace_dir",
+    help="Record spans of all stages to {trace_dir}/*.trace.jsonl (see utils/trace_utils.py)",
+    type=click.Path(file_okay=False, dir_okay=True, writable=True),
+    default=None,
+)
+def main(**kwargs):
+    args = SimpleNamespace(**kwargs)
+    check_render_args(args.render_args)
+    out_dir = args.out_dir
+
+    # Init Logger
+    log_dir = f"{out_dir}/logs"
+    os.makedirs(log_dir, exist_ok=True)
+    logger_utils.init_logger(output_path=log_dir)
+
+    tstart = timer_utils.time_now()
+    LOGGER.info("Start pipeline with options:")
+    LOGGER.info(args)
+    trace_utils.init_tracer(args.trace_dir, "pipeline")
+
+    with trace_utils.span("pipeline", out_dir=out_dir) as pipeline_attrs:
+        rcfg_file = args.rcfg_file
+        if rcfg_file is None:
+            # Every later stage reads the RCFG of all parts, so preprocessing is not overlapped
+            with trace_utils.span("pipeline_preprocessing"):
+                run_command(get_preprocessing_command(args), f"{log_dir}/preprocessing.log")
+            rcfg_file = f"{out_dir}/{RCFG_NAME}"
+            LOGGER.info(f"Preprocessing done after {timer_utils.time_since(tstart)}")
+        if args.run_mode == 1:
+            return
+
+        batches = get_batches(rcfg_file, args.batch_size, args.part_ids_file)
+        if args.dry_run:
+            estimate_costs(args, rcfg_file, [part_id for batch in batches for part_id in batch])
+            return
+        pipeline_attrs.update({"n_parts": sum(len(batch) for batch in batches), "n_batches": len(batches)})
+        for batch_i in range(len(batches)):
+            os.makedirs(get_batch_dir(out_dir, batch_i), exist_ok=True)
+
+        def export_batch(batch_i: int, part_ids: list[str]) -> None:
+            batch_dir = get_batch_dir(out_dir, batch_i)
+            run_command(get_export_command(args, rcfg_file, part_ids, batch_dir), f"{batch_dir}/export.log")
+
+        def render_batch(batch_i: int, part_ids: list[str]) -> None:
+            batch_dir = get_batch_dir(out_dir, batch_i)
+            run_command(get_render_command(args, rcfg_file, part_ids, batch_dir), f"{batch_dir}/render.log")
+
+        def on_batch_done(stage: stage_runner.Stage, batch_i: int, seconds: float) -> None:
+            LOGGER.info(
+                f"{stage.name} batch {batch_i + 1}/{len(batches)} ({len(batches[batch_i])} parts) done in "
+                f"{seconds:.1f}s [{stage.n_batches}/{len(batches)}]"
+            )
+
+        stages = [stage_runner.Stage("export", export_batch, n_workers=args.export_workers)]
+        if args.run_mode == 3:
+            stages.append(stage_runner.Stage("render", render_batch, n_workers=args.render_workers))
+        report = stage_runner.run_stages(stages, batches, args.max_queued_batches, on_batch_done)
+        if args.run_mode == 3:
+            merge_render_reports([get_batch_dir(out_dir, batch_i) for batch_i in range(len(batches))], out_dir)
+
+    report.update({"n_parts": pipeline_attrs["n_parts"], "batch_size": args.batch_size, "rcfg_file": rcfg_file})
+    with open(f"{out_dir}/pipeline_report.json", "w") as f:
+        json.dump(report, f, indent=4)
+    log_report(report)
+    LOGGER.info(f"Pipeline finished in {timer_utils.time_since(tstart)}")
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -3,7 +3,7 @@ from types import SimpleNamespace
 import logging
 import click
 
-from utils import logger_utils, timer_utils
+from utils import logger_utils, timer_utils, trace_utils
 from preprocessing.preprocessing_controller import PreprocessingController
 
 LOG_DELIM = "* " * 20
@@ -35,6 +35,14 @@ LOG_DELIM = "* " * 20
     show_default=True,
     default=None,
 )
+@click.option(
+    "--mesh_dir",
+    help="Directory with previously exported .glb files of the parts (named by part id). Required by camera_def_mode "
+    "importance: run the preprocessing with another camera_def_mode, export_gltfs.py on its RCFG, then the "
+    "preprocessing again with --mesh_dir set to the export directory",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, readable=True),
+    default=None,
+)
 @click.option(
     "--out_dir",
     help="Output root directory (created if not existent)",
@@ -51,7 +59,8 @@ LOG_DELIM = "* " * 20
 )
 @click.option(
     "--camera_def_mode",
-    help="Camera definition mode",
+    help="Camera definition mode. importance places cameras at the most informative views of the part meshes and needs "
+    "--mesh_dir",
     type=click.Choice(choices=PreprocessingController.CAMERA_DEF_MODES),
     show_default=True,
     show_choices=True,
@@ -95,6 +104,54 @@ LOG_DELIM = "* " * 20
     show_default=True,
     default=43,
 )
+@click.option(
+    "--shared_scenes",
+    help="Use the same cameras and lights for all parts instead of sampling them for each part",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--n_workers",
+    help="Number of worker processes used to sample scenes",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=1,
+)
+@click.option(
+    "--view_check",
+    help="Check render setups for degenerate views (light inside or behind the part, thin silhouette) before rendering. "
+    "flag: mark invalid setups, resample: resample cameras/lights of invalid setups. Uses part meshes if available",
+    type=click.Choice(choices=PreprocessingController.VIEW_CHECK_MODES),
+    show_default=True,
+    show_choices=True,
+    default=PreprocessingController.VIEW_CHECK_MODES[0],
+)
+@click.option(
+    "--cache_dir",
+    help="Cache of prepared metadata and parsed parts, keyed by the metadata file content and the parser version. "
+    "Default: {out_dir}/cache",
+    type=click.Path(file_okay=False, dir_okay=True, writable=True),
+    default=None,
+)
+@click.option(
+    "--no_cache",
+    help="Always read the metadata file and parse the parts, do not read or write the cache",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--trace_dir",
+    help="Record spans of all preprocessing stages to {trace_dir}/preprocessing.{pid}.trace.jsonl "
+    "(see utils/trace_utils.py)",
+    type=click.Path(file_okay=False, dir_okay=True, writable=True),
+    default=None,
+)
+@click.option(
+    "--compact_rcfg",
+    help="Write the RCFG without indentation (faster and smaller for large machines)",
+    is_flag=True,
+    default=False,
+)
 def main(**kwargs):
     args = SimpleNamespace(**kwargs)
 
@@ -102,6 +159,7 @@ def main(**kwargs):
     blend_file = args.topex_blend_file
     materials_dir = args.materials_dir
     obj_dir = args.obj_dir
+    mesh_dir = args.mesh_dir
     out_dir = args.out_dir
     n_images_per_part = args.n_images_per_part
     camera_def_mode = args.camera_def_mode
@@ -110,6 +168,12 @@ def main(**kwargs):
     envmap_def_mode = args.envmap_def_mode
     camera_seed = args.camera_seed
     light_seed = args.light_seed
+    shared_scenes = args.shared_scenes
+    n_workers = args.n_workers
+    compact_rcfg = args.compact_rcfg
+    view_check = args.view_check
+    trace_dir = args.trace_dir
+    cache_dir = None if args.no_cache else args.cache_dir or f"{out_dir}/cache"
 
     # Init Logger
     LOGGER = logging.getLogger(__name__)
@@ -121,28 +185,36 @@ def main(**kwargs):
     tstart = timer_utils.time_now()
     LOGGER.info("Start preprocessing with options:")
     LOGGER.info(args)
+    trace_utils.init_tracer(trace_dir, "preprocessing")
 
     ##### Start Actual Preprocessing
-    ppc = PreprocessingController(
-        metadata_file=metadata_file,
-        blend_file=blend_file,
-        materials_dir=materials_dir,
-        obj_dir=obj_dir,
-        output_dir=out_dir,
-        n_images=n_images_per_part,
-        camera_def_mode=camera_def_mode,
-        light_def_mode=light_def_mode,
-        material_def_mode=material_def_mode,
-        envmap_def_mode=envmap_def_mode,
-        camera_seed=camera_seed,
-        light_seed=light_seed,
-    )
-    if materials_dir:
-        ppc.assign_materials()
-    ppc.build_scenes()
-    ppc.export_rcfg_json(filename="rcfg.json")
-    if metadata_file:
-        ppc.export_augmented_metadata(filename="metadata", fileformats=["csv", "xlsx"])
+    with trace_utils.span("preprocessing", out_dir=out_dir):
+        ppc = PreprocessingController(
+            metadata_file=metadata_file,
+            blend_file=blend_file,
+            materials_dir=materials_dir,
+            obj_dir=obj_dir,
+            output_dir=out_dir,
+            n_images=n_images_per_part,
+            camera_def_mode=camera_def_mode,
+            light_def_mode=light_def_mode,
+            material_def_mode=material_def_mode,
+            envmap_def_mode=envmap_def_mode,
+            camera_seed=camera_seed,
+            light_seed=light_seed,
+            shared_scenes=shared_scenes,
+            mesh_dir=mesh_dir,
+            view_check=view_check,
+            cache_dir=cache_dir,
+        )
+        if materials_dir:
+            ppc.assign_materials()
+        ppc.build_scenes(n_workers=n_workers)
+        ppc.export_rcfg_json(filename="rcfg.json", indent=None if compact_rcfg else 4)
+        if view_check != "disabled":
+            ppc.export_view_check_stats(filename="view_check_stats.json")
+        if metadata_file:
+            ppc.export_augmented_metadata(filename="metadata", fileformats=["csv", "xlsx"])
 
     # Log preprocessing time
     tend = timer_utils.time_since(tstart)
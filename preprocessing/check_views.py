@@ -0,0 +1,244 @@
+""" Functions to check render setups for degenerate or occluded views before rendering """
+import numpy as np
+
+from preprocessing import define_lights
+from preprocessing.models.scene import Scene
+from preprocessing.utils import mesh, sampling, viewpoints
+
+VIEW_CHECK_MODES = ["disabled", "flag", "resample"]
+VIEW_CHECK_REASONS = ["light_inside_part", "light_behind_part", "degenerate_silhouette"]
+# Keys of the random streams used for resampling and for the surface samples of the check geometry,
+# derived from a part's light seed (see sampling.derive_seed)
+VIEW_CHECK_SEED_KEY = 0x7649
+VIEW_CHECK_GEOMETRY_SEED_KEY = 0x764A
+
+# Minimum fraction of the visible surface that must be lit by at least one light of a setup
+MIN_LIT_FRACTION = 0.1
+# Minimum silhouette area of a view relative to the largest silhouette of the part
+MIN_SILHOUETTE_RATIO = 0.2
+# Without a mesh, a light is considered behind the part if it encloses a larger angle with the camera than this
+MAX_BOUNDS_LIGHT_ANGLE = np.deg2rad(120)
+# Maximum number of checks (including the first one) per render setup in mode resample
+MAX_ATTEMPTS = 10
+
+
+def get_check_geometry(
+    mesh_file: str,
+    n_points: int = 4000,
+    resolution: int = 32,
+    rng: "np.random.Generator" = None,
+) -> dict:
+    """Returns the surface samples of a part's mesh in render space used by check_view.
+
+    The mesh is normalized like in the render script (centered, largest dimension equals 1).
+
+    Args:
+        mesh_file (str): Path to a .glb or .obj file or None. Only the unit bounds are checked without a mesh.
+        n_points (int): Number of surface points used as splats.
+        resolution (int): Resolution of the depth buffers.
+        rng (np.random.Generator): Random generator for surface sampling. Defaults to an unseeded generator.
+
+    Returns:
+        dict: points, normals, half_dims (bounding box), extent (bounding radius), resolution and
+        max_silhouette (largest silhouette coverage of 64 evenly spread views)
+    """
+    if mesh_file is None:
+        return {"points": None, "half_dims": np.full(3, 0.5), "resolution": resolution}
+
+    vertices, faces = mesh.load_mesh(mesh_file)
+    vertices = mesh.normalize_mesh(vertices)
+    points, face_ids = mesh.sample_surface(vertices, faces, n_points=n_points, rng=rng)
+    normals, _ = mesh.get_face_normals_and_areas(vertices, faces)
+    extent = np.linalg.norm(points, axis=1).max()
+    reference_views = sampling.sphere_equidistant(n_samples=64)
+    max_silhouette = max(
+        len(viewpoints.rasterize_points(points, direction, resolution=resolution, extent=extent)[0])
+        for direction in reference_views
+    )
+    return {
+        "points": points,
+        "normals": normals[face_ids],
+        "half_dims": np.abs(points).max(axis=0),
+        "extent": extent,
+        "resolution": resolution,
+        "max_silhouette": max_silhouette,
+    }
+
+
+def is_enclosed(points: "np.ndarray", position: "np.ndarray", cell_size: float) -> bool:
+    """Returns whether position lies inside the surface given by points.
+
+    Casts six axis-aligned rays of width cell_size from position. The position is enclosed if every ray hits
+    the surface.
+    """
+    for axis in range(3):
+        other = [a for a in range(3) if a != axis]
+        in_cell = np.all(np.abs(points[:, other] - position[other]) <= cell_size / 2, axis=1)
+        along = points[in_cell, axis] - position[axis]
+        if not ((along > 0).any() and (along < 0).any()):
+            return False
+    return True
+
+
+def get_lit_fraction(geometry: dict, camera_position: "np.ndarray", light_position: "np.ndarray") -> float:
+    """Returns the fraction of the surface visible from the camera that faces the light and is not shadowed.
+
+    Shadows are resolved with an orthographic depth buffer seen from the light's direction,
+    which approximates the point light well for lights outside the part's bounding sphere.
+    """
+    points, normals = geometry["points"], geometry["normals"]
+    resolution, extent = geometry["resolution"], geometry["extent"]
+    _, front, _ = viewpoints.rasterize_points(points, camera_position, resolution=resolution, extent=extent)
+    if len(front) == 0:
+        return 0.0
+
+    # Orient normals towards the camera, the face winding of exported meshes is not reliable
+    visible_normals = normals[front]
+    visible_normals = visible_normals * np.where(visible_normals @ camera_position < 0, -1.0, 1.0)[:, None]
+    facing = np.einsum("ij,ij->i", visible_normals, light_position - points[front]) > 0
+
+    light_distance = np.linalg.norm(light_position)
+    if light_distance == 0:
+        return float(facing.mean())
+    light_pixels, light_depth = viewpoints.project_points(
+        points, light_position, resolution=resolution, extent=extent
+    )
+    depth_buffer = np.full(resolution * resolution, np.inf)
+    np.minimum.at(depth_buffer, light_pixels, light_depth)
+    tolerance = 4 * extent / resolution
+    unshadowed = light_depth[front] <= depth_buffer[light_pixels[front]] + tolerance
+    return float((facing & unshadowed).mean())
+
+
+def get_view_direction(camera: "np.void") -> "np.ndarray":
+    """Returns the direction from which the part is seen by a camera (CAMERA_DTYPE), i.e. position - target.
+
+    The camera looks at its target and is zoomed to the part along its view axis before rendering
+    (camera_to_view_selected), so only this direction matters, e.g. for cameras inside the bounding box
+    or looking away from the part.
+    """
+    return camera["position"] - camera["target"]
+
+
+def check_view(geometry: dict, camera_position: "np.ndarray", light_positions: "np.ndarray") -> list[str]:
+    """Returns the reasons (see VIEW_CHECK_REASONS) why a camera and its lights give a useless render.
+
+    An empty list means the view is valid.
+
+    Args:
+        geometry (dict): Part geometry (see get_check_geometry)
+        camera_position (np.ndarray): Direction from which the camera sees the part (see get_view_direction).
+            Only its direction matters, the camera is zoomed to the part before rendering. A camera on its target
+            has no view direction and gives a degenerate silhouette.
+        light_positions (np.ndarray): Positions of the lights of shape (n_lights, 3)
+    """
+    reasons = []
+    points = geometry["points"]
+    inside_bounds = np.all(np.abs(light_positions) <= geometry["half_dims"], axis=1)
+    has_direction = np.linalg.norm(camera_position) > 0
+    if points is None:
+        if inside_bounds.any():
+            reasons.append("light_inside_part")
+        if not has_direction:
+            return reasons + ["degenerate_silhouette"]
+        camera_direction = camera_position / np.linalg.norm(camera_position)
+        light_directions = light_positions / np.linalg.norm(light_positions, axis=1, keepdims=True)
+        if len(light_positions) and np.all(light_directions @ camera_direction < np.cos(MAX_BOUNDS_LIGHT_ANGLE)):
+            reasons.append("light_behind_part")
+        return reasons
+
+    cell_size = 2 * geometry["extent"] / geometry["resolution"]
+    if any(is_enclosed(points, position, cell_size) for position in light_positions[inside_bounds]):
+        reasons.append("light_inside_part")
+    if not has_direction:
+        return reasons + ["degenerate_silhouette"]
+    if len(light_positions) and all(
+        get_lit_fraction(geometry, camera_position, position) < MIN_LIT_FRACTION for position in light_positions
+    ):
+        reasons.append("light_behind_part")
+    pixels, _, _ = viewpoints.rasterize_points(
+        points, camera_position, resolution=geometry["resolution"], extent=geometry["extent"]
+    )
+    if len(pixels) < MIN_SILHOUETTE_RATIO * geometry["max_silhouette"]:
+        reasons.append("degenerate_silhouette")
+    return reasons
+
+
+def check_scene(
+    scene: Scene,
+    geometry: dict,
+    view_check: str,
+    light_def_mode: str,
+    rng: "np.random.Generator",
+) -> Scene:
+    """Checks each render setup of the scene and records the result as view_check in the render setup.
+
+    In mode resample, the lights (light reasons) and the camera (degenerate_silhouette) of an invalid setup
+    are resampled until the setup is valid or MAX_ATTEMPTS is reached. For lights behind the part, lights and camera
+    are resampled alternately. Resampled cameras keep their target and their distance to it (1 for cameras on
+    their target).
+
+    Returns a new Scene. The given scene is not modified, as its arrays and lists may be shared with other scenes.
+
+    Args:
+        scene (Scene): Scene to check
+        geometry (dict): Part geometry (see get_check_geometry)
+        view_check (str): View check mode, flag or resample
+        light_def_mode (str): Light definition mode used for resampling lights
+        rng (np.random.Generator): Random generator used for resampling
+    """
+    assert view_check in VIEW_CHECK_MODES[1:], f"Unknown view check mode {view_check}"
+    camera_array = scene.camera_array.copy()
+    light_array = scene.light_array.copy()
+
+    render_setups = []
+    for render_setup in scene.render_setups:
+        render_setup = dict(render_setup)
+        camera_i, lights_i = render_setup["camera_i"], render_setup["lights_i"]
+        reasons = check_view(geometry, get_view_direction(camera_array[camera_i]), light_array[lights_i]["position"])
+        all_reasons = set(reasons)
+        attempts = 1
+        while reasons and view_check == "resample" and attempts < MAX_ATTEMPTS:
+            # A light behind the part can also be fixed by moving the camera, which is the only option
+            # if the light mode cannot place lights on the camera's side (e.g. range-uniform above the part)
+            move_camera = "light_behind_part" in reasons and attempts % 2 == 0
+            if "degenerate_silhouette" in reasons or move_camera:
+                distance = np.linalg.norm(get_view_direction(camera_array[camera_i])) or 1.0
+                direction = sampling.sphere_uniform(n_samples=1, r_factor=1.0, rng=rng)[0]
+                camera_array[camera_i]["position"] = (
+                    camera_array[camera_i]["target"] + direction / np.linalg.norm(direction) * distance
+                )
+            if "light_inside_part" in reasons or ("light_behind_part" in reasons and not move_camera):
+                new_lights = define_lights.sample_lights(light_def_mode, len(lights_i), [rng])[0]
+                light_array["position"][lights_i] = new_lights["position"]
+            attempts += 1
+            reasons = check_view(
+                geometry, get_view_direction(camera_array[camera_i]), light_array[lights_i]["position"]
+            )
+            all_reasons.update(reasons)
+
+        render_setup["view_check"] = {
+            "valid": not reasons,
+            "reasons": [reason for reason in VIEW_CHECK_REASONS if reason in all_reasons],
+            "attempts": attempts,
+        }
+        render_setups.append(render_setup)
+
+    return Scene(cameras=camera_array, lights=light_array, envmaps=scene.envmaps, render_setups=render_setups)
+
+
+def get_view_check_stats(render_setups: list[dict]) -> dict:
+    """Returns the rejection statistics of checked render setups (see check_scene).
+
+    A setup counts as rejected if its first check failed, regardless of whether it was resampled successfully.
+    """
+    checks = [render_setup["view_check"] for render_setup in render_setups if "view_check" in render_setup]
+    n_rejected = sum(1 for check in checks if check["attempts"] > 1 or not check["valid"])
+    return {
+        "n_setups": len(checks),
+        "n_rejected": n_rejected,
+        "n_invalid": sum(1 for check in checks if not check["valid"]),
+        "n_resampled": sum(1 for check in checks if check["attempts"] > 1 and check["valid"]),
+        "rejection_rate": n_rejected / len(checks) if checks else 0.0,
+        "reasons": {reason: sum(1 for check in checks if reason in check["reasons"]) for reason in VIEW_CHECK_REASONS},
+    }
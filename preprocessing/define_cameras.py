@@ -1,35 +1,60 @@
 """ Functions for camera definition """
+import logging
 import numpy as np
 import math
 import preprocessing.utils.sampling as sampling
-from preprocessing.models.camera import Camera
+import preprocessing.utils.viewpoints as viewpoints
+from preprocessing.models.camera import Camera, cameras_to_array, get_camera_array
 
+LOGGER = logging.getLogger(__name__)
 
-def get_cameras_sphere_uniform(n: int, seed: int) -> list[Camera]:
+
+def _get_roll_angles(n: int) -> "np.ndarray":
+    """Returns n camera roll angles evenly spread in [0, 90) degrees."""
+    return np.linspace(start=0.0, stop=math.radians(90), num=n, endpoint=False)
+
+
+def _get_rolled_cameras(cam_positions: "np.ndarray") -> list[Camera]:
+    """Returns a list of cameras for the given positions, rolled by angles evenly spread in [0, 90) degrees."""
+    roll_angles = _get_roll_angles(len(cam_positions)).tolist()
+    return [
+        Camera(position=cam_pos, local_rotation=[0.0, 0.0, roll_angles[i]])
+        for i, cam_pos in enumerate(cam_positions.tolist())
+    ]
+
+
+def get_cameras_sphere_uniform(n: int, rng: "np.random.Generator") -> list[Camera]:
     """Returns a list of cameras that were sampled on a sphere surface.
 
     Args:
         n (int): Number of cameras to sample
+        rng (np.random.Generator): Random generator to sample positions from
     """
-    cam_positions = sampling.sphere_uniform(n_samples=n, seed=seed)
-    roll_angles = np.linspace(start=0.0, stop=math.radians(90), num=n, endpoint=False)
-    return [
-        Camera(position=cam_pos, local_rotation=[0.0, 0.0, roll_angles[i]]) for i, cam_pos in enumerate(cam_positions)
-    ]
+    cam_positions = sampling.sphere_uniform(n_samples=n, rng=rng)
+    return _get_rolled_cameras(cam_positions)
+
+
+def get_cameras_sphere_uniform_batch(n: int, rngs: list["np.random.Generator"]) -> "np.ndarray":
+    """Returns a structured camera array (CAMERA_DTYPE) of shape (len(rngs), n) with cameras
+    that were sampled on a sphere surface for each given random generator.
+
+    Args:
+        n (int): Number of cameras to sample per generator
+        rngs (list<np.random.Generator>): Random generators, one for each part
+    """
+    cam_positions = sampling.sphere_uniform_batch(rngs=rngs, n_samples=n)
+    return get_camera_array(cam_positions, roll_angles=_get_roll_angles(n))
 
 
-def get_cameras_sphere_equidistant(n: int, seed: int) -> list[Camera]:
+def get_cameras_sphere_equidistant(n: int) -> list[Camera]:
     """Returns a list of cameras that were sampled on a sphere surface and
     share roughly the same distance to each their neighbours.
 
     Args:
         n (int): Number of cameras to sample
     """
-    cam_positions = sampling.sphere_equidistant(n_samples=n, seed=seed)
-    roll_angles = np.linspace(start=0.0, stop=math.radians(90), num=n, endpoint=False)
-    return [
-        Camera(position=cam_pos, local_rotation=[0.0, 0.0, roll_angles[i]]) for i, cam_pos in enumerate(cam_positions)
-    ]
+    cam_positions = sampling.sphere_equidistant(n_samples=n)
+    return _get_rolled_cameras(cam_positions)
 
 
 def get_cameras_circular(n: int) -> list[Camera]:
@@ -135,6 +160,80 @@ def get_cameras_n_agonal_antiprism(
     return [Camera(position=cam_pos.tolist()) for cam_pos in cam_positions]
 
 
-def get_cameras_importance(n: int) -> list[Camera]:
-    pass
-    # TODO: Sample cameras that show significant/important object information
+def get_cameras_importance(n: int, mesh_file: str, rng: "np.random.Generator" = None, **kwargs) -> list[Camera]:
+    """Returns a list of cameras that show significant/important object information.
+
+    Views are selected from a dense set of candidates on the unit sphere by scoring the part's mesh
+    with a software rasterizer (see viewpoints.get_importance_viewpoints) and picking the top-n diverse views.
+
+    Args:
+        n (int): Number of cameras
+        mesh_file (str): Path to a .glb or .obj file of the part
+        rng (np.random.Generator): Random generator used for surface sampling
+        kwargs: Further arguments of viewpoints.get_importance_viewpoints (n_candidates, metric, diversity, ...)
+    """
+    cam_positions = viewpoints.get_importance_viewpoints(mesh_file, n, rng=rng, **kwargs)
+    return _get_rolled_cameras(cam_positions)
+
+
+def get_cameras_importance_batch(
+    n: int,
+    rngs: list["np.random.Generator"],
+    mesh_files: list[str],
+) -> "np.ndarray":
+    """Returns a structured camera array (CAMERA_DTYPE) of shape (len(rngs), n) with importance-driven cameras
+    for each part's mesh file. Parts without a mesh file fall back to sphere-equidistant cameras.
+
+    Args:
+        n (int): Number of cameras per part
+        rngs (list<np.random.Generator>): Random generators, one for each part
+        mesh_files (list<str>): Path to a .glb or .obj file for each part or None
+    """
+    assert len(mesh_files) == len(rngs)
+    fallback_positions = sampling.sphere_equidistant(n_samples=n)
+    cam_positions = np.empty((len(rngs), n, 3))
+    for i, (rng, mesh_file) in enumerate(zip(rngs, mesh_files)):
+        if mesh_file is None:
+            LOGGER.warning(f"No mesh for part {i}. Using sphere-equidistant cameras instead of importance.")
+            cam_positions[i] = fallback_positions
+            continue
+        cam_positions[i] = viewpoints.get_importance_viewpoints(mesh_file, n, rng=rng)
+    return get_camera_array(cam_positions, roll_angles=_get_roll_angles(n))
+
+
+def sample_cameras(
+    camera_def_mode: str,
+    n: int,
+    rngs: list["np.random.Generator"],
+    mesh_files: list[str] = None,
+) -> "np.ndarray":
+    """Returns a structured camera array (CAMERA_DTYPE) of shape (len(rngs), n_cameras)
+    with cameras for each given random generator depending on the camera_def_mode.
+
+    Deterministic modes are computed once and the resulting (read-only) array is broadcast to all parts.
+
+    Args:
+        camera_def_mode (str): Camera definition mode (see PreprocessingController.CAMERA_DEF_MODES)
+        n (int): Number of cameras per part
+        rngs (list<np.random.Generator>): Random generators, one for each part
+        mesh_files (list<str>): Path to a mesh file for each part or None (used by mode importance only)
+    """
+    if camera_def_mode == "sphere-uniform":
+        return get_cameras_sphere_uniform_batch(n=n, rngs=rngs)
+    if camera_def_mode == "importance":
+        mesh_files = [None] * len(rngs) if mesh_files is None else mesh_files
+        return get_cameras_importance_batch(n=n, rngs=rngs, mesh_files=mesh_files)
+    if camera_def_mode == "sphere-equidistant":
+        cameras = get_cameras_sphere_equidistant(n=n)
+    if camera_def_mode == "circular":
+        cameras = get_cameras_circular(n=n)
+    if camera_def_mode == "isocahedral":
+        cameras = get_cameras_isocahedral()
+    if camera_def_mode == "dodecahedral":
+        cameras = get_cameras_dodecahedral()
+    if camera_def_mode == "dodecahedral-16":
+        cameras = get_cameras_dodecahedral_16()
+    if camera_def_mode == "n-gonal-antiprism":
+        cameras = get_cameras_n_agonal_antiprism(n_cameras=n)
+    cameras = cameras_to_array(cameras)
+    return np.broadcast_to(cameras, (len(rngs), len(cameras)))
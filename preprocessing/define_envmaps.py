@@ -1 +1,20 @@
 """ Functions for envmap definition """
+
+
+def get_envmaps(envmap_def_mode: str, n: int) -> list[str]:
+    """Returns a list of envmap filenames depending on the envmap_def_mode.
+
+    Args:
+        envmap_def_mode (str): Environment Map definition mode (see PreprocessingController.ENVMAP_DEF_MODES)
+        n (int): Number of envmaps
+    """
+    # No envmaps
+    if envmap_def_mode == "disabled":
+        envmaps = []
+    if envmap_def_mode == "white":
+        envmaps = ["white.jpg" for _ in range(0, n)]
+    if envmap_def_mode == "gray":
+        envmaps = ["gray.png" for _ in range(0, n)]
+    if envmap_def_mode == "static":
+        envmaps = ["default.hdr" for _ in range(0, n)]
+    return envmaps
@@ -1,13 +1,16 @@
 """ Functions for light definition """
+import numpy as np
 from preprocessing.utils import sampling
-from preprocessing.models.light import Light
+from preprocessing.models.light import Light, get_light_array
+
+RANGE_UNIFORM_RANGES = {"xrange": (-1.0, 1.0), "yrange": (-1.0, 1.0), "zrange": (1.0, 1.0)}
 
 
 def get_lights_range_uniform(n: int,
-                             xrange=(-1.0, 1.0),
-                             yrange=(-1.0, 1.0),
-                             zrange=(1.0, 1.0),
-                             seed: int = 42) -> list[Light]:
+                             xrange=RANGE_UNIFORM_RANGES["xrange"],
+                             yrange=RANGE_UNIFORM_RANGES["yrange"],
+                             zrange=RANGE_UNIFORM_RANGES["zrange"],
+                             rng: 'np.random.Generator' = None) -> list[Light]:
     """ Returns a list of lights with positions sampled from the given ranges.
 
         Args:
@@ -15,22 +18,42 @@ def get_lights_range_uniform(n: int,
             xrange (Tuple): Defines (min, max) range for axis
             yrange (Tuple): Defines (min, max) range for axis
             zrange (Tuple): Defines (min, max) range for axis
+            rng (np.random.Generator): Random generator to sample positions from
     """
     light_positions = sampling.range_uniform(
         n_samples=n,
         xrange=xrange,
         yrange=yrange,
         zrange=zrange,
-        seed=seed,
+        rng=rng,
     )
-    return [Light(position=light_pos.tolist()) for light_pos in light_positions]
+    return [Light(position=light_pos) for light_pos in light_positions.tolist()]
 
 
-def get_lights_sphere_uniform(n: int, seed: int = 42) -> list[Light]:
+def get_lights_sphere_uniform(n: int, rng: 'np.random.Generator' = None) -> list[Light]:
     """ Returns a list of lights that were sampled on a sphere surface.
 
         Args:
             n (int): Number of lights to sample
+            rng (np.random.Generator): Random generator to sample positions from
+    """
+    light_positions = sampling.sphere_uniform(n_samples=n, rng=rng)
+    return [Light(position=light_pos) for light_pos in light_positions.tolist()]
+
+
+def sample_lights(light_def_mode: str, n: int, rngs: list['np.random.Generator']) -> 'np.ndarray':
+    """ Returns a structured light array (LIGHT_DTYPE) of shape (len(rngs), n)
+        with lights for each given random generator depending on the light_def_mode.
+
+        Args:
+            light_def_mode (str): Light definition mode (see PreprocessingController.LIGHT_DEF_MODES)
+            n (int): Number of lights per part
+            rngs (list<np.random.Generator>): Random generators, one for each part
     """
-    light_positions = sampling.sphere_uniform(n_samples=n, seed=seed)
-    return [Light(position=light_pos) for light_pos in light_positions]
\ No newline at end of file
+    # Add lights - sphere uniform
+    if light_def_mode == "sphere-uniform":
+        light_positions = sampling.sphere_uniform_batch(rngs=rngs, n_samples=n)
+    # Add lights - random within range
+    if light_def_mode == "range-uniform":
+        light_positions = sampling.range_uniform_batch(rngs=rngs, n_samples=n, **RANGE_UNIFORM_RANGES)
+    return get_light_array(light_positions)
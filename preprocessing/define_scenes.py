@@ -0,0 +1,147 @@
+""" Functions for scene definition """
+import math
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from preprocessing import check_views, define_cameras, define_lights, define_envmaps
+from preprocessing.models.scene import Scene
+from preprocessing.utils import sampling
+
+
+def compose_render_setups(cameras: list, lights: list, envmaps: list) -> list[dict]:
+    """Compose Render Setups from lists of cameras, lights and envmaps.
+
+    Returns a dictionary that contains camera_i, lights_i and envmaps_fname keys,
+    which reference an item in the respective list by its index (camera, lights) or filename (envmaps).
+
+    Args:
+        cameras (list): List of cameras
+        lights (list): List of lights
+        envmaps (list): List of envmaps (filenames)
+
+    """
+    render_setups = []
+    for i, _ in enumerate(cameras):
+        render_setup = {
+            "camera_i": i,
+            "lights_i": [i],
+            "envmap_fname": envmaps[i] if len(envmaps) == len(cameras) else "none",
+        }
+        render_setups.append(render_setup)
+    return render_setups
+
+
+def sample_scenes(
+    n_images: int,
+    camera_def_mode: str,
+    light_def_mode: str,
+    envmap_def_mode: str,
+    camera_seeds: list,
+    light_seeds: list,
+    mesh_files: list = None,
+    view_check: str = "disabled",
+) -> list[Scene]:
+    """Returns a Scene for each pair of camera and light seeds.
+
+    Cameras and lights of all scenes are sampled in batched array operations.
+    All scenes share the same envmaps and render_setups lists, copy them before modifying a single scene.
+    If view_check is enabled, each scene is checked (see check_views.check_scene) and receives its own render_setups.
+
+    Args:
+        n_images (int): Number of cameras, lights and envmaps per scene
+        camera_def_mode (str): Camera definition mode
+        light_def_mode (str): Light definition mode
+        envmap_def_mode (str): Environment Map definition mode
+        camera_seeds (list<np.random.SeedSequence>): Camera seed sequences, one for each scene
+        light_seeds (list<np.random.SeedSequence>): Light seed sequences, one for each scene
+        mesh_files (list<str>): Mesh file of each scene's part or None (used by camera mode importance and view checks)
+        view_check (str): View check mode (see check_views.VIEW_CHECK_MODES). Defaults to disabled.
+    """
+    assert len(camera_seeds) == len(light_seeds)
+    mesh_files = [None] * len(camera_seeds) if mesh_files is None else mesh_files
+
+    cameras = define_cameras.sample_cameras(
+        camera_def_mode, n_images, sampling.get_rngs(camera_seeds), mesh_files=mesh_files
+    )
+    lights = define_lights.sample_lights(light_def_mode, n_images, sampling.get_rngs(light_seeds))
+    envmaps = define_envmaps.get_envmaps(envmap_def_mode, n_images)
+
+    render_setups = compose_render_setups(cameras=cameras[0], lights=lights[0], envmaps=envmaps) if len(cameras) else []
+    scenes = [
+        Scene(cameras=part_cameras, lights=part_lights, envmaps=envmaps, render_setups=render_setups)
+        for part_cameras, part_lights in zip(cameras, lights)
+    ]
+    if view_check == "disabled":
+        return scenes
+
+    return [
+        check_views.check_scene(
+            scene,
+            check_views.get_check_geometry(
+                mesh_file,
+                rng=np.random.default_rng(sampling.derive_seed(light_seed, check_views.VIEW_CHECK_GEOMETRY_SEED_KEY)),
+            ),
+            view_check,
+            light_def_mode,
+            rng=np.random.default_rng(sampling.derive_seed(light_seed, check_views.VIEW_CHECK_SEED_KEY)),
+        )
+        for scene, mesh_file, light_seed in zip(scenes, mesh_files, light_seeds)
+    ]
+
+
+def build_scenes(
+    n_scenes: int,
+    n_images: int,
+    camera_def_mode: str,
+    light_def_mode: str,
+    envmap_def_mode: str,
+    camera_seed: int,
+    light_seed: int,
+    shared: bool = False,
+    n_workers: int = 1,
+    mesh_files: list = None,
+    view_check: str = "disabled",
+) -> list[Scene]:
+    """Returns n_scenes Scenes, one for each part.
+
+    Each scene samples cameras and lights from its own random stream, which is spawned from camera_seed and
+    light_seed respectively. This makes the scene of a part reproducible, independent of the number
+    of workers. If shared is set, all scenes are sampled from the same stream (identical rigs for all parts).
+
+    Args:
+        n_scenes (int): Number of scenes to build
+        n_images (int): Number of cameras, lights and envmaps per scene
+        camera_def_mode (str): Camera definition mode
+        light_def_mode (str): Light definition mode
+        envmap_def_mode (str): Environment Map definition mode
+        camera_seed (int): Root seed for cameras
+        light_seed (int): Root seed for lights
+        shared (bool): Whether all scenes share the same cameras and lights. Defaults to False.
+        n_workers (int): Number of worker processes. Scenes are sampled in the current process if <= 1. Defaults to 1.
+        mesh_files (list<str>): Mesh file of each part or None (used by camera mode importance and view checks)
+        view_check (str): View check mode (see check_views.VIEW_CHECK_MODES). Defaults to disabled.
+    """
+    mesh_files = [None] * n_scenes if mesh_files is None else mesh_files
+    camera_seeds = sampling.spawn_seeds(camera_seed, n_scenes, shared=shared)
+    light_seeds = sampling.spawn_seeds(light_seed, n_scenes, shared=shared)
+    modes = (camera_def_mode, light_def_mode, envmap_def_mode)
+
+    if n_workers <= 1 or n_scenes < 2:
+        return sample_scenes(n_images, *modes, camera_seeds, light_seeds, mesh_files, view_check)
+
+    # Split into a few chunks per worker to balance load
+    chunk_size = max(1, math.ceil(n_scenes / (n_workers * 4)))
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [
+            executor.submit(
+                sample_scenes,
+                n_images,
+                *modes,
+                camera_seeds[start : start + chunk_size],
+                light_seeds[start : start + chunk_size],
+                mesh_files[start : start + chunk_size],
+                view_check,
+            )
+            for start in range(0, n_scenes, chunk_size)
+        ]
+        return [scene for future in futures for scene in future.result()]
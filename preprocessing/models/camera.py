@@ -1,21 +1,35 @@
-""" Class model of a single part. (A part that has no sub-parts)"""
+""" Class model of a camera and its array representation."""
 import logging
+import numpy as np
 
 LOGGER = logging.getLogger(__name__)
 
 CAMERA_TYPES = ['persp', 'ortho', 'pano']
 
+# Structured array representation of cameras. Scenes store their cameras in this form.
+CAMERA_DTYPE = np.dtype([
+    ('position', 'f8', 3),
+    ('target', 'f8', 3),
+    ('local_rotation', 'f8', 3),
+    ('focal_length', 'f8'),
+    ('type_camera', 'U5'),
+])
+
 
 class Camera:
 
+    __slots__ = ('position', 'type_camera', 'focal_length', 'local_rotation', 'target')
+
     def __init__(
         self,
         position: list,
         type_camera: str = 'persp',
         focal_length: float = 50.0,
-        target: list = [0, 0, 0],
-        local_rotation: list[float] = [0.0, 0.0, 0.0],
+        target: list = None,
+        local_rotation: list[float] = None,
     ):
+        target = [0, 0, 0] if target is None else target
+        local_rotation = [0.0, 0.0, 0.0] if local_rotation is None else local_rotation
 
         ## Validate parameters
         # Validate position
@@ -38,8 +52,76 @@ class Camera:
         self.local_rotation = local_rotation
         self.target = target
 
+    def to_dict(self) -> dict:
+        """Returns the RCFG representation of this camera."""
+        return {key: getattr(self, key) for key in self.__slots__}
+
     def __str__(self):
         result_str = f'{self.__class__}\n'
-        for key, value in self.__dict__.items():
-            result_str += f'    {str(key)}: {str(value)}\n'
+        for key in self.__slots__:
+            result_str += f'    {str(key)}: {str(getattr(self, key))}\n'
         return result_str
+
+
+def get_camera_array(
+    positions: 'np.ndarray',
+    roll_angles: 'np.ndarray' = None,
+    type_camera: str = 'persp',
+    focal_length: float = 50.0,
+) -> 'np.ndarray':
+    """Returns a structured camera array (CAMERA_DTYPE) for the given positions.
+
+    Args:
+        positions (np.ndarray): Camera positions of shape (..., 3).
+        roll_angles (np.ndarray): Local Z-axis rotation in radians for each camera. Broadcast against positions[..., 0].
+        type_camera (str): Camera type of all cameras.
+        focal_length (float): Focal length of all cameras.
+    """
+    assert type_camera.lower() in CAMERA_TYPES
+    assert focal_length > 0
+    positions = np.asarray(positions, dtype='f8')
+    cameras = np.zeros(positions.shape[:-1], dtype=CAMERA_DTYPE)
+    cameras['position'] = positions
+    if roll_angles is not None:
+        cameras['local_rotation'][..., 2] = roll_angles
+    cameras['focal_length'] = focal_length
+    cameras['type_camera'] = type_camera
+    return cameras
+
+
+def cameras_to_array(cameras: list[Camera]) -> 'np.ndarray':
+    """Returns a structured camera array (CAMERA_DTYPE) of the given Camera objects."""
+    return np.array(
+        [(c.position, c.target, c.local_rotation, c.focal_length, c.type_camera) for c in cameras],
+        dtype=CAMERA_DTYPE,
+    )
+
+
+def get_target_lists(targets: 'np.ndarray') -> list[list]:
+    """Returns the targets as lists. Integral values are returned as int, like the default target [0, 0, 0]
+    of Camera objects, so that the RCFG keeps the same numbers as before the array representation."""
+    if not targets.any():
+        return [[0, 0, 0] for _ in range(len(targets))]
+    return [[int(v) if v.is_integer() else v for v in target] for target in targets.tolist()]
+
+
+def camera_array_to_dicts(cameras: 'np.ndarray') -> list[dict]:
+    """Returns the RCFG representation of each camera in the given structured camera array."""
+    return [{
+        'focal_length': focal_length,
+        'local_rotation': local_rotation,
+        'position': position,
+        'target': target,
+        'type_camera': type_camera,
+    } for position, target, local_rotation, focal_length, type_camera in zip(
+        cameras['position'].tolist(),
+        get_target_lists(cameras['target']),
+        cameras['local_rotation'].tolist(),
+        cameras['focal_length'].tolist(),
+        cameras['type_camera'].tolist(),
+    )]
+
+
+def camera_array_to_cameras(cameras: 'np.ndarray') -> list[Camera]:
+    """Returns a Camera object for each camera in the given structured camera array."""
+    return [Camera(**camera) for camera in camera_array_to_dicts(cameras)]
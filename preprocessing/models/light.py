@@ -1,20 +1,32 @@
-""" Class model of a single part. (A part that has no sub-parts)"""
+""" Class model of a light and its array representation."""
 import logging
+import numpy as np
 
 LOGGER = logging.getLogger(__name__)
 
 LIGHT_TYPES = ['point', 'sun', 'spot', 'area']
 
+# Structured array representation of lights. Scenes store their lights in this form.
+LIGHT_DTYPE = np.dtype([
+    ('position', 'f8', 3),
+    ('target', 'f8', 3),
+    ('intensity', 'i8'),
+    ('type_light', 'U5'),
+])
+
 
 class Light:
 
+    __slots__ = ('position', 'type_light', 'intensity', 'target')
+
     def __init__(
         self,
         position: list,
         type_light: str = 'point',
         intensity: int = 100,
-        target: list = [0, 0, 0],
+        target: list = None,
     ):
+        target = [0, 0, 0] if target is None else target
 
         ## Validate parameters
         # Validate position
@@ -36,8 +48,66 @@ class Light:
         self.intensity = intensity
         self.target = target
 
+    def to_dict(self) -> dict:
+        """Returns the RCFG representation of this light."""
+        return {key: getattr(self, key) for key in self.__slots__}
+
     def __str__(self):
         result_str = f'{self.__class__}\n'
-        for key, value in self.__dict__.items():
-            result_str += f'    {str(key)}: {str(value)}\n'
-        return result_str
\ No newline at end of file
+        for key in self.__slots__:
+            result_str += f'    {str(key)}: {str(getattr(self, key))}\n'
+        return result_str
+
+
+def get_light_array(positions: 'np.ndarray', type_light: str = 'point', intensity: int = 100) -> 'np.ndarray':
+    """Returns a structured light array (LIGHT_DTYPE) for the given positions.
+
+    Args:
+        positions (np.ndarray): Light positions of shape (..., 3).
+        type_light (str): Light type of all lights.
+        intensity (int): Intensity of all lights.
+    """
+    assert type_light.lower() in LIGHT_TYPES
+    assert intensity > 0
+    positions = np.asarray(positions, dtype='f8')
+    lights = np.zeros(positions.shape[:-1], dtype=LIGHT_DTYPE)
+    lights['position'] = positions
+    lights['intensity'] = intensity
+    lights['type_light'] = type_light
+    return lights
+
+
+def lights_to_array(lights: list[Light]) -> 'np.ndarray':
+    """Returns a structured light array (LIGHT_DTYPE) of the given Light objects."""
+    return np.array(
+        [(l.position, l.target, l.intensity, l.type_light) for l in lights],
+        dtype=LIGHT_DTYPE,
+    )
+
+
+def get_target_lists(targets: 'np.ndarray') -> list[list]:
+    """Returns the targets as lists. Integral values are returned as int, like the default target [0, 0, 0]
+    of Light objects, so that the RCFG keeps the same numbers as before the array representation."""
+    if not targets.any():
+        return [[0, 0, 0] for _ in range(len(targets))]
+    return [[int(v) if v.is_integer() else v for v in target] for target in targets.tolist()]
+
+
+def light_array_to_dicts(lights: 'np.ndarray') -> list[dict]:
+    """Returns the RCFG representation of each light in the given structured light array."""
+    return [{
+        'intensity': intensity,
+        'position': position,
+        'target': target,
+        'type_light': type_light,
+    } for position, target, intensity, type_light in zip(
+        lights['position'].tolist(),
+        get_target_lists(lights['target']),
+        lights['intensity'].tolist(),
+        lights['type_light'].tolist(),
+    )]
+
+
+def light_array_to_lights(lights: 'np.ndarray') -> list[Light]:
+    """Returns a Light object for each light in the given structured light array."""
+    return [Light(**light) for light in light_array_to_dicts(lights)]
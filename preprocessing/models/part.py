@@ -9,15 +9,18 @@ LOGGER = logging.getLogger(__name__)
 
 class Part:
 
+    __slots__ = ('id', 'name', 'hierarchy', 'single_parts', 'is_spare', 'scene')
+
     def __init__(
         self,
         id: str,
         name: str,
         hierarchy: str,
         is_spare: bool = False,
-        single_parts: list[SinglePart] = [],
+        single_parts: list[SinglePart] = None,
         scene: Scene = None,
     ):
+        single_parts = [] if single_parts is None else single_parts
 
         ## Validate parameters
         assert isinstance(id, str)
@@ -33,16 +36,30 @@ class Part:
         self.hierarchy = hierarchy
         self.single_parts = single_parts
         self.is_spare = is_spare
-        self.scene = None
+        self.scene = scene
 
     def __eq__(self, other):
         if not isinstance(other, Part):
-            return NotImplementedError
+            return NotImplemented
 
         return self.id == other.id
 
+    def __hash__(self):
+        return hash(self.id)
+
+    def to_dict(self) -> dict:
+        """Returns the RCFG representation of this part."""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'hierarchy': self.hierarchy,
+            'single_parts': [single_part.to_dict() for single_part in self.single_parts],
+            'is_spare': self.is_spare,
+            'scene': self.scene.to_dict() if self.scene is not None else None,
+        }
+
     def __str__(self):
         result_str = f'{self.__class__}\n'
-        for key, value in self.__dict__.items():
-            result_str += f'    {str(key)}: {str(value)}\n'
+        for key in self.__slots__:
+            result_str += f'    {str(key)}: {str(getattr(self, key))}\n'
         return result_str
@@ -1,26 +1,51 @@
-""" Class model of a single part. (A part that has no sub-parts)"""
+""" Class model of a scene. (Cameras, lights, envmaps and render setups of a part)"""
 import logging
-from preprocessing.models.camera import Camera
-from preprocessing.models.light import Light
+import numpy as np
+
+from preprocessing.models.camera import (
+    Camera,
+    CAMERA_DTYPE,
+    cameras_to_array,
+    camera_array_to_cameras,
+    camera_array_to_dicts,
+)
+from preprocessing.models.light import (
+    Light,
+    LIGHT_DTYPE,
+    lights_to_array,
+    light_array_to_lights,
+    light_array_to_dicts,
+)
 
 LOGGER = logging.getLogger(__name__)
 
 
 class Scene:
+    """A scene stores its cameras and lights as structured arrays (see CAMERA_DTYPE, LIGHT_DTYPE).
+
+    The cameras and lights properties accept and return lists of Camera and Light objects,
+    while camera_array and light_array give direct access to the underlying arrays.
+    """
+
+    __slots__ = ('camera_array', 'light_array', 'envmaps', 'render_setups')
 
     def __init__(
         self,
-        cameras: list[Camera] = [],
-        lights: list = [Light],
-        envmaps: list = ["default.hdr"],
-        render_setups: list = [],
+        cameras: 'list[Camera] | np.ndarray' = None,
+        lights: 'list[Light] | np.ndarray' = None,
+        envmaps: list = None,
+        render_setups: list = None,
     ):
+        cameras = np.zeros(0, dtype=CAMERA_DTYPE) if cameras is None else cameras
+        lights = np.zeros(0, dtype=LIGHT_DTYPE) if lights is None else lights
+        envmaps = [] if envmaps is None else envmaps
+        render_setups = [] if render_setups is None else render_setups
 
         ## Validate parameters
         # Validate cameras
-        assert isinstance(lights, list)
+        assert isinstance(cameras, (list, np.ndarray))
         # Validate lights
-        assert isinstance(cameras, list)
+        assert isinstance(lights, (list, np.ndarray))
         # Validate envmaps
         assert isinstance(envmaps, list)
         # Validate render_setups
@@ -32,8 +57,41 @@ class Scene:
         self.envmaps = envmaps
         self.render_setups = render_setups
 
+    @property
+    def cameras(self) -> list[Camera]:
+        return camera_array_to_cameras(self.camera_array)
+
+    @cameras.setter
+    def cameras(self, cameras: 'list[Camera] | np.ndarray'):
+        if isinstance(cameras, np.ndarray):
+            assert cameras.dtype == CAMERA_DTYPE
+            self.camera_array = cameras
+        else:
+            self.camera_array = cameras_to_array(cameras)
+
+    @property
+    def lights(self) -> list[Light]:
+        return light_array_to_lights(self.light_array)
+
+    @lights.setter
+    def lights(self, lights: 'list[Light] | np.ndarray'):
+        if isinstance(lights, np.ndarray):
+            assert lights.dtype == LIGHT_DTYPE
+            self.light_array = lights
+        else:
+            self.light_array = lights_to_array(lights)
+
+    def to_dict(self) -> dict:
+        """Returns the RCFG representation of this scene."""
+        return {
+            'cameras': camera_array_to_dicts(self.camera_array),
+            'lights': light_array_to_dicts(self.light_array),
+            'envmaps': self.envmaps,
+            'render_setups': self.render_setups,
+        }
+
     def __str__(self):
         result_str = f'{self.__class__}\n'
-        for key, value in self.__dict__.items():
-            result_str += f'    {str(key)}: {str(value)}\n'
-        return result_str
\ No newline at end of file
+        for key in self.__slots__:
+            result_str += f'    {str(key)}: {str(getattr(self, key))}\n'
+        return result_str
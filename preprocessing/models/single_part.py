@@ -6,6 +6,8 @@ LOGGER = logging.getLogger(__name__)
 
 class SinglePart:
 
+    __slots__ = ('id', 'name', 'material')
+
     def __init__(
         self,
         id: str,
@@ -25,11 +27,18 @@ class SinglePart:
 
     def __eq__(self, other):
         if not isinstance(other, SinglePart):
-            return NotImplementedError
+            return NotImplemented
         return self.id == other.id
 
+    def __hash__(self):
+        return hash(self.id)
+
+    def to_dict(self) -> dict:
+        """Returns the RCFG representation of this single part."""
+        return {'id': self.id, 'name': self.name, 'material': self.material}
+
     def __str__(self):
         result_str = f'{self.__class__}\n'
-        for key, value in self.__dict__.items():
-            result_str += f'    {str(key)}: {str(value)}\n'
-        return result_str
\ No newline at end of file
+        for key in self.__slots__:
+            result_str += f'    {str(key)}: {str(getattr(self, key))}\n'
+        return result_str
@@ -9,7 +9,7 @@ from utils import timer_utils
 LOGGER = logging.getLogger(__name__)
 
 
-def get_unique_single_parts(metadata: "pd.DataFrame", parent_part: Part):
+def get_unique_single_parts(metadata: "pd.DataFrame", parent_part: Part, single_parts_index: dict = None):
     """Recursively iterates over children of the given parent_part until parent_part is a
     single_part (has no sub-parts).
 
@@ -21,8 +21,12 @@ def get_unique_single_parts(metadata: "pd.DataFrame", parent_part: Part):
             A Pandas DataFrame containing cols [part_id, part_name, part_hierarchy,
             part_material, part_is_spare]. Each row represents a part.
         parent_part (Part): The part to identify included single_parts for.
+        single_parts_index (dict): Maps SinglePart ids to SinglePart objects. SingleParts are looked up here
+            before a new one is created, so assemblies share SinglePart instances. Defaults to a new index.
 
     """
+    if single_parts_index is None:
+        single_parts_index = {}
 
     # Hierarchy Example: '1.2.5'
     # Every part that starts with the same hierarchy as parent_part and continue with a '.' are direct subparts of parent_part
@@ -30,12 +34,15 @@ def get_unique_single_parts(metadata: "pd.DataFrame", parent_part: Part):
 
     # All single_parts of parent_part are going to be stored here
     single_parts_unique = []
+    single_part_ids = set()
     # If parent_part has no subparts, it is a single part itself
-    # so add it to the single_parts list if it is not added already
+    # so add it to the single_parts list (interned via single_parts_index)
     if len(subparts) == 0:
-        single_part = SinglePart(id=parent_part.id, name=parent_part.name)
-        if single_part not in single_parts_unique:
-            single_parts_unique.append(single_part)
+        single_part = single_parts_index.get(parent_part.id)
+        if single_part is None:
+            single_part = SinglePart(id=parent_part.id, name=parent_part.name)
+            single_parts_index[single_part.id] = single_part
+        single_parts_unique.append(single_part)
 
     # If paren_part has subparts, determine their subparts by calling this function again
     # with subpart being the new parent_part
@@ -47,9 +54,10 @@ def get_unique_single_parts(metadata: "pd.DataFrame", parent_part: Part):
                 hierarchy=subpart["part_hierarchy"],
                 is_spare=subpart["part_is_spare"],
             )
-            single_parts = get_unique_single_parts(metadata, parent_part=part)
+            single_parts = get_unique_single_parts(metadata, parent_part=part, single_parts_index=single_parts_index)
             for single_part in single_parts:
-                if single_part not in single_parts_unique:
+                if single_part.id not in single_part_ids:
+                    single_part_ids.add(single_part.id)
                     single_parts_unique.append(single_part)
 
     LOGGER.debug(f"PARENT: {parent_part.id}")
@@ -65,6 +73,7 @@ def parse_parts(metadata: "pd.DataFrame"):
 
     - Each part is added only once (no duplicates, key = Part.id)
     - Each SinglePart of a Part is added only once (SinglePart.id)
+    - SinglePart objects are shared by all Parts that contain them
 
     Args:
         metadata (pandas.DataFrame):
@@ -73,7 +82,9 @@ def parse_parts(metadata: "pd.DataFrame"):
 
     """
     parts = []
+    part_ids = set()
     part_duplicates = []
+    single_parts_index = {}
 
     for i, row in metadata.iterrows():
         # Init Part (without single_parts)
@@ -85,7 +96,7 @@ def parse_parts(metadata: "pd.DataFrame"):
         )
 
         # Check if part is duplicate
-        if part in parts:
+        if part.id in part_ids:
             part_duplicates.append(part)
             continue
 
@@ -93,10 +104,11 @@ def parse_parts(metadata: "pd.DataFrame"):
         LOGGER.debug("# " * 10)
         LOGGER.debug(f'# Single parts for: {row["part_id"]}')
         LOGGER.debug("# " * 10)
-        single_parts = get_unique_single_parts(metadata, part)
+        single_parts = get_unique_single_parts(metadata, part, single_parts_index=single_parts_index)
         part.single_parts = single_parts
 
         parts.append(part)
+        part_ids.add(part.id)
 
     LOGGER.debug(f"--Returning {len(parts)} parts")
     LOGGER.debug(f"--Ignoring {len(part_duplicates)} duplicates")
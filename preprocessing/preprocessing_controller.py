@@ -1,20 +1,21 @@
 """ Takes Metadata, blender file and configuration arguments to prepare a configuration file for GLTF-Scene-Exports of machine parts."""
+import copy
 import os
 import logging
 import json
-import jsonschema
 
 from preprocessing.utils.metadata import prepare_metadata
+from preprocessing.utils import parse_cache
+from preprocessing.utils import rcfg as rcfg_serializer
 from preprocessing.parse_parts import parse_parts
-from preprocessing import define_cameras, define_lights, define_materials
-from preprocessing.models.scene import Scene
-from utils import timer_utils
+from preprocessing import check_views, define_materials, define_scenes
+from utils import geometry_fingerprint, rcfg_validation, timer_utils, trace_utils
 
 LOGGER = logging.getLogger(__name__)
 LOG_DELIM = "- " * 20
 
-RCFG_VAL_SCHEMA_FILE_TOPEX = "./validation/schemas/rcfg_schema_topex.json"
-RCFG_VAL_SCHEMA_FILE_OBJ = "./validation/schemas/rcfg_schema_obj.json"
+RCFG_VAL_SCHEMA_FILE_TOPEX = rcfg_validation.SCHEMA_FILES["topex"]
+RCFG_VAL_SCHEMA_FILE_OBJ = rcfg_validation.SCHEMA_FILES["obj"]
 
 
 class PreprocessingController:
@@ -26,10 +27,12 @@ class PreprocessingController:
         "dodecahedral",
         "dodecahedral-16",
         "n-gonal-antiprism",
+        "importance",
     ]
     LIGHT_DEF_MODES = ["sphere-uniform", "range-uniform"]
     MATERIAL_DEF_MODES = ["disabled", "static", "random"]
     ENVMAP_DEF_MODES = ["disabled", "white", "gray", "static"]
+    VIEW_CHECK_MODES = check_views.VIEW_CHECK_MODES
 
     def __init__(
         self,
@@ -45,6 +48,10 @@ class PreprocessingController:
         envmap_def_mode: str,
         camera_seed: int,
         light_seed: int,
+        shared_scenes: bool = False,
+        mesh_dir: str = None,
+        view_check: str = "disabled",
+        cache_dir: str = None,
     ):
         ## Validate parameters
         assert (metadata_file and blend_file) or obj_dir, "Either metadata_file and blend_file or obj_dir must be set"
@@ -72,30 +79,7 @@ class PreprocessingController:
         # validate camera_def_mode
         assert isinstance(camera_def_mode, str)
         assert camera_def_mode.lower() in self.CAMERA_DEF_MODES
-        if camera_def_mode == "isocahedral":
-            if n_images != 12:
-                LOGGER.warn(
-                    f"{n_images=} were entered, but in {camera_def_mode=} n_images is fixed to 12. Setting n_images to 12."
-                )
-                n_images = 12
-        if camera_def_mode == "dodecahedral-16":
-            if n_images != 16:
-                LOGGER.warn(
-                    f"{n_images=} were entered, but in {camera_def_mode=} n_images is fixed to 16. Setting n_images to 16."
-                )
-                n_images = 16
-        if camera_def_mode == "dodecahedral":
-            if n_images != 20:
-                LOGGER.warn(
-                    f"{n_images=} were entered, but in {camera_def_mode=} n_images is fixed to 20. Setting n_images to 20."
-                )
-            n_images = 20
-        if camera_def_mode == "n-gonal-antiprism":
-            if n_images % 2 != 0:
-                LOGGER.warn(
-                    f"With camera_def_mode {camera_def_mode}, an even value is needed for the value of images per part {n_images}. n_images={n_images + 1} is set instead."
-                )
-                n_images += 1
+        n_images = self.fix_n_images(camera_def_mode, n_images)
         # validate light_def_mode
         assert isinstance(light_def_mode, str)
         assert light_def_mode.lower() in self.LIGHT_DEF_MODES
@@ -108,6 +92,20 @@ class PreprocessingController:
         # validate seeds
         assert isinstance(camera_seed, int)
         assert isinstance(light_seed, int)
+        assert isinstance(shared_scenes, bool)
+        if mesh_dir:
+            assert isinstance(mesh_dir, str)
+            assert os.path.isdir(mesh_dir)
+        # validate view_check
+        assert isinstance(view_check, str)
+        assert view_check.lower() in self.VIEW_CHECK_MODES
+        if cache_dir:
+            assert isinstance(cache_dir, str)
+        if camera_def_mode == "importance" and metadata_file and blend_file:
+            assert mesh_dir, (
+                f"{camera_def_mode=} needs the GLBs of the parts in mesh_dir. Run the preprocessing with another "
+                "camera_def_mode and bpy_modules/export_gltfs.py on its RCFG first"
+            )
 
         ## Assign options
         self.metadata_file = metadata_file
@@ -122,27 +120,54 @@ class PreprocessingController:
         self.envmap_def_mode = envmap_def_mode.lower()
         self.camera_seed = camera_seed
         self.light_seed = light_seed
+        # Whether all parts share the same cameras and lights or each part samples its own
+        self.shared_scenes = shared_scenes
+        # Directory with .glb files of parts (e.g. from a previous GLTF export), named by part id
+        self.mesh_dir = mesh_dir
+        # Whether render setups are checked for degenerate views and if invalid ones are flagged or resampled
+        self.view_check = view_check.lower()
+        # Directory of the metadata and part parsing cache, None to always parse
+        self.cache_dir = cache_dir
 
         # Topex: Prepare Metadata and get Machine parts
         if self.metadata_file and blend_file:
             self.rcfg_val_schema_file = RCFG_VAL_SCHEMA_FILE_TOPEX
-            # Prepared metadata.xlsx file as pandas DataFrame
-            # rows: parts
-            # cols: part_id, part_name, part_hierarchy, part_material, part_is_spare
-            self.metadata = prepare_metadata(metadata_file)
-
+            # Prepared metadata and parsed parts of a previous run with the same metadata file and parser
+            cache = parse_cache.ParseCache(cache_dir, metadata_file) if cache_dir else None
+            cached = None
+            if cache is not None:
+                with trace_utils.span("parse_cache_load", key=cache.key) as attrs:
+                    cached = cache.load()
+                    attrs["hit"] = cached is not None
             # A scene described by Cameras, Lights and envmaps and render_setups, that is used for
             # all parts
             self.global_scene = None
 
-            # Parse Parts
-            tstart = timer_utils.time_now()
-            LOGGER.info(LOG_DELIM)
-            LOGGER.info(f"Parsing unique Parts and SingleParts from {metadata_file}")
-            # List of all Parts to render
-            self.parts = parse_parts(self.metadata)
-            tend = timer_utils.time_since(tstart)
-            LOGGER.info(f"Done in {tend}")
+            if cached is not None:
+                self.metadata, self.parts = cached
+                LOGGER.info(LOG_DELIM)
+                LOGGER.info(f"Loaded {len(self.parts)} parsed Parts of {metadata_file} from cache {cache.entry_dir}")
+            else:
+                # Prepared metadata.xlsx file as pandas DataFrame
+                # rows: parts
+                # cols: part_id, part_name, part_hierarchy, part_material, part_is_spare
+                with trace_utils.span("metadata_load", metadata_file=metadata_file) as attrs:
+                    self.metadata = prepare_metadata(metadata_file)
+                    attrs["n_rows"] = len(self.metadata)
+
+                # Parse Parts
+                tstart = timer_utils.time_now()
+                LOGGER.info(LOG_DELIM)
+                LOGGER.info(f"Parsing unique Parts and SingleParts from {metadata_file}")
+                # List of all Parts to render
+                with trace_utils.span("part_parsing") as attrs:
+                    self.parts = parse_parts(self.metadata)
+                    attrs["n_parts"] = len(self.parts)
+                tend = timer_utils.time_since(tstart)
+                LOGGER.info(f"Done in {tend}")
+                if cache is not None:
+                    with trace_utils.span("parse_cache_save", key=cache.key):
+                        cache.save(self.metadata, self.parts)
 
         # OBJ files: Parse directory structure
         # Structure is expected to be:
@@ -164,6 +189,86 @@ class PreprocessingController:
                             }
                             self.parts.append(part)
 
+    @staticmethod
+    def fix_n_images(camera_def_mode: str, n_images: int) -> int:
+        """Returns the number of images per part, adjusted to camera modes with a fixed or even number of views.
+
+        Args:
+            camera_def_mode (str): Camera definition mode.
+            n_images (int): Requested number of images per part.
+        """
+        if camera_def_mode == "isocahedral":
+            if n_images != 12:
+                LOGGER.warn(
+                    f"{n_images=} were entered, but in {camera_def_mode=} n_images is fixed to 12. Setting n_images to 12."
+                )
+                n_images = 12
+        if camera_def_mode == "dodecahedral-16":
+            if n_images != 16:
+                LOGGER.warn(
+                    f"{n_images=} were entered, but in {camera_def_mode=} n_images is fixed to 16. Setting n_images to 16."
+                )
+                n_images = 16
+        if camera_def_mode == "dodecahedral":
+            if n_images != 20:
+                LOGGER.warn(
+                    f"{n_images=} were entered, but in {camera_def_mode=} n_images is fixed to 20. Setting n_images to 20."
+                )
+            n_images = 20
+        if camera_def_mode == "n-gonal-antiprism":
+            if n_images % 2 != 0:
+                LOGGER.warn(
+                    f"With camera_def_mode {camera_def_mode}, an even value is needed for the value of images per part {n_images}. n_images={n_images + 1} is set instead."
+                )
+                n_images += 1
+        return n_images
+
+    def get_variant(
+        self,
+        output_dir: str,
+        n_images: int,
+        camera_def_mode: str,
+        light_def_mode: str,
+        material_def_mode: str,
+        envmap_def_mode: str,
+        camera_seed: int,
+        light_seed: int,
+    ) -> "PreprocessingController":
+        """Returns a controller with other scene and material options that reuses the loaded metadata and parts.
+
+        The parts are deep copied, so materials and scenes of the variant do not affect this controller.
+
+        Args:
+            output_dir (str): Output directory of the variant.
+            n_images (int): Number of images per part.
+            camera_def_mode (str): Camera definition mode.
+            light_def_mode (str): Light definition mode.
+            material_def_mode (str): Material definition mode.
+            envmap_def_mode (str): Environment map definition mode.
+            camera_seed (int): Camera seed.
+            light_seed (int): Light seed.
+        """
+        assert camera_def_mode.lower() in self.CAMERA_DEF_MODES
+        assert light_def_mode.lower() in self.LIGHT_DEF_MODES
+        assert material_def_mode.lower() in self.MATERIAL_DEF_MODES
+        assert envmap_def_mode.lower() in self.ENVMAP_DEF_MODES
+        assert isinstance(camera_seed, int)
+        assert isinstance(light_seed, int)
+        os.makedirs(output_dir, exist_ok=True)
+
+        variant = copy.copy(self)
+        variant.output_dir = output_dir
+        variant.n_images = self.fix_n_images(camera_def_mode, n_images)
+        variant.camera_def_mode = camera_def_mode.lower()
+        variant.light_def_mode = light_def_mode.lower()
+        variant.material_def_mode = material_def_mode.lower()
+        variant.envmap_def_mode = envmap_def_mode.lower()
+        variant.camera_seed = camera_seed
+        variant.light_seed = light_seed
+        variant.parts = copy.deepcopy(self.parts)
+        return variant
+
+    @trace_utils.traced("material_assignment")
     def assign_materials(self):
         """Assign materials to single parts depending on self.material_def_mode."""
 
@@ -193,92 +298,71 @@ class PreprocessingController:
         tend = timer_utils.time_since(tstart)
         LOGGER.info(f"Done in {tend}")
 
-    def _sample_cameras(self, n_images: int):
-        """Assign Cameras to single parts depending on self.camera-def_mode."""
-        # Add cameras - sphere uniform
-        if self.camera_def_mode == "sphere-uniform":
-            cameras = define_cameras.get_cameras_sphere_uniform(n=n_images, seed=self.camera_seed)
-        if self.camera_def_mode == "sphere-equidistant":
-            cameras = define_cameras.get_cameras_sphere_equidistant(n=n_images, seed=self.camera_seed)
-        if self.camera_def_mode == "circular":
-            cameras = define_cameras.get_cameras_circular(n=n_images)
-        if self.camera_def_mode == "isocahedral":
-            cameras = define_cameras.get_cameras_isocahedral()
-        if self.camera_def_mode == "dodecahedral":
-            cameras = define_cameras.get_cameras_dodecahedral()
-        if self.camera_def_mode == "dodecahedral-16":
-            cameras = define_cameras.get_cameras_dodecahedral_16()
-        if self.camera_def_mode == "n-gonal-antiprism":
-            cameras = define_cameras.get_cameras_n_agonal_antiprism(n_cameras=n_images)
-
-        return cameras
-
-    def _sample_lights(self, n_images: int):
-        """Sample lightsetups depending on self.light_def_mode."""
-        # Add lights - sphere uniform
-        if self.light_def_mode == "sphere-uniform":
-            lights = define_lights.get_lights_sphere_uniform(n=n_images, seed=self.light_seed)
-        # Add lights - random within range
-        if self.light_def_mode == "range-uniform":
-            lights = define_lights.get_lights_range_uniform(n=n_images, seed=self.light_seed)
-        return lights
-
-    def _assign_envmaps(self, n_images: int):
-        """Assign Environment Maps to single parts depending on self.envmap_def_mode."""
-        # No envmaps
-        if self.envmap_def_mode == "disabled":
-            envmaps = []
-        if self.envmap_def_mode == "white":
-            envmaps = ["white.jpg" for _ in range(0, n_images)]
-        if self.envmap_def_mode == "gray":
-            envmaps = ["gray.png" for _ in range(0, n_images)]
-        if self.envmap_def_mode == "static":
-            envmaps = ["default.hdr" for _ in range(0, n_images)]
-        return envmaps
-
-    def _compose_render_setups(self, cameras: list, lights: list, envmaps: list):
-        """Compose Render Setups from lists of cameras, lights and envmaps.
-
-        Returns a dictionary that contains camera_i, lights_i and envmaps_fname keys,
-        which reference an item in the respective list by its index (camera, lights) or filename (envmaps).
+    def get_mesh_files(self) -> list:
+        """Returns the path of a mesh file (.obj or .glb) for each part or None if no mesh is available."""
+        mesh_files = []
+        aliases = geometry_fingerprint.load_aliases(self.mesh_dir) if self.mesh_dir else {}
+        for part in self.parts:
+            if type(part) is dict:
+                mesh_files.append(part["path"])
+                continue
+            # Duplicate parts of an export with dedup_geometry have no GLB, they use the one of their canonical part
+            glb_file = f"{self.mesh_dir}/{aliases.get(part.id, part.id)}.glb" if self.mesh_dir else None
+            mesh_files.append(glb_file if glb_file and os.path.isfile(glb_file) else None)
+        return mesh_files
+
+    def check_mesh_files(self, mesh_files: list):
+        """Fails if a part has no mesh file, before any scene is sampled (camera_def_mode importance)."""
+        missing_ids = [
+            part["id"] if type(part) is dict else part.id
+            for part, mesh_file in zip(self.parts, mesh_files)
+            if mesh_file is None
+        ]
+        assert self.mesh_dir or not missing_ids, (
+            "camera_def_mode importance needs the GLBs of the parts in mesh_dir. Run the preprocessing with another "
+            "camera_def_mode and bpy_modules/export_gltfs.py on its RCFG first"
+        )
+        assert not missing_ids, (
+            f"camera_def_mode importance needs a GLB of every part, but {len(missing_ids)} of {len(self.parts)} parts "
+            f"have none in {self.mesh_dir} (e.g. {', '.join(missing_ids[:5])}). Export the GLBs with "
+            "bpy_modules/export_gltfs.py from an RCFG of the same metadata file"
+        )
+
+    @trace_utils.traced("scene_building")
+    def build_scenes(self, n_workers: int = 1):
+        """Build a scene for each part depending on the camera, light and envmap definition modes.
 
         Args:
-            cameras (list): List of cameras
-            lights (list): List of lights
-            envmaps (list): List of envmaps (filenames)
-
+            n_workers (int): Number of worker processes used for sampling. Defaults to 1.
         """
-        render_setups = []
-        for i, _ in enumerate(cameras):
-            render_setup = {
-                "camera_i": i,
-                "lights_i": [i],
-                "envmap_fname": envmaps[i] if len(envmaps) == len(cameras) else "none",
-            }
-            render_setups.append(render_setup)
-        return render_setups
-
-    def build_scenes(self):
         tstart = timer_utils.time_now()
         LOGGER.info(LOG_DELIM)
-        LOGGER.info(f"Define Scenes")
+        LOGGER.info(
+            f"Define Scenes [shared={self.shared_scenes}, n_workers={n_workers}, view_check={self.view_check}]"
+        )
+
+        mesh_files = None
+        if self.camera_def_mode == "importance" or self.view_check != "disabled":
+            mesh_files = self.get_mesh_files()
+        if self.camera_def_mode == "importance":
+            self.check_mesh_files(mesh_files)
 
         # Build scenes of for each part exclusively
         # self.n_images is equal to the number of cameras, lights and envmaps needed
-        for part in self.parts:
-            cameras = self._sample_cameras(self.n_images)
-            lights = self._sample_lights(self.n_images)
-            envmaps = self._assign_envmaps(self.n_images)
-            render_setups = self._compose_render_setups(
-                cameras=cameras,
-                lights=lights,
-                envmaps=envmaps,
-            )
-            scene = Scene()
-            scene.cameras = cameras
-            scene.lights = lights
-            scene.envmaps = envmaps
-            scene.render_setups = render_setups
+        scenes = define_scenes.build_scenes(
+            n_scenes=len(self.parts),
+            n_images=self.n_images,
+            camera_def_mode=self.camera_def_mode,
+            light_def_mode=self.light_def_mode,
+            envmap_def_mode=self.envmap_def_mode,
+            camera_seed=self.camera_seed,
+            light_seed=self.light_seed,
+            shared=self.shared_scenes,
+            n_workers=n_workers,
+            mesh_files=mesh_files,
+            view_check=self.view_check,
+        )
+        for part, scene in zip(self.parts, scenes):
             if type(part) is dict:
                 part["scene"] = scene
             else:
@@ -287,13 +371,53 @@ class PreprocessingController:
         tend = timer_utils.time_since(tstart)
         LOGGER.info(f"Done in {tend}")
 
+    def get_view_check_stats(self) -> dict:
+        """Returns the view check rejection statistics of each part and in total (see check_views.get_view_check_stats)."""
+        parts_render_setups = {}
+        for part in self.parts:
+            part_id, scene = (part["id"], part["scene"]) if type(part) is dict else (part.id, part.scene)
+            parts_render_setups[part_id] = scene.render_setups if scene else []
+        parts_stats = {
+            part_id: check_views.get_view_check_stats(render_setups)
+            for part_id, render_setups in parts_render_setups.items()
+        }
+        total_stats = check_views.get_view_check_stats(
+            [render_setup for render_setups in parts_render_setups.values() for render_setup in render_setups]
+        )
+        return {"view_check": self.view_check, "total": total_stats, "parts": parts_stats}
+
+    def export_view_check_stats(self, filename: str = "view_check_stats.json"):
+        """Writes the view check rejection statistics to the output directory.
+
+        Args:
+            filename (str): Filename of the statistics json file.
+        """
+        stats = self.get_view_check_stats()
+        total = stats["total"]
+        LOGGER.info(LOG_DELIM)
+        LOGGER.info(
+            f"View check [mode={self.view_check}]: {total['n_rejected']}/{total['n_setups']} render setups rejected "
+            f"({total['rejection_rate']:.1%}), {total['n_resampled']} resampled, {total['n_invalid']} invalid"
+        )
+        LOGGER.info(f"Rejection reasons: {total['reasons']}")
+        with open(f"{self.output_dir}/{filename}", "w") as f:
+            json.dump(stats, f, indent=4)
+
+    @trace_utils.traced("metadata_export")
     def export_augmented_metadata(self, filename: str = "metadata", fileformats: list[str] = ["csv", "xlsx"]):
         if "csv" in fileformats:
             self.metadata.to_csv(path_or_buf=f"{self.output_dir}/{filename}.csv")
         if "xlsx" in fileformats:
             self.metadata.to_excel(excel_writer=f"{self.output_dir}/{filename}.xlsx")
 
-    def export_rcfg_json(self, filename: str = "rcfg.json"):
+    @trace_utils.traced("rcfg_export")
+    def export_rcfg_json(self, filename: str = "rcfg.json", indent: int = 4):
+        """Validates and writes the RCFG to the output directory.
+
+        Args:
+            filename (str): Filename of the RCFG json file.
+            indent (int): JSON indentation. None writes compact JSON, which is considerably faster for large RCFGs.
+        """
         tstart = timer_utils.time_now()
         rcfg_path = f"{self.output_dir}/{filename}"
 
@@ -303,38 +427,24 @@ class PreprocessingController:
         LOGGER.info(LOG_DELIM)
         LOGGER.info(f"Exporting rcfg [path={rcfg_path}]")
 
-        self.val_rcfg_json()
-        rcfg = json.loads(self.get_rcfg_json())
-        with open(f"{self.output_dir}/{filename}", "w") as f:
-            json.dump(
-                rcfg,
-                f,
-                default=lambda o: o.__dict__,
-                indent=4,
-                sort_keys=True,
-            )
+        # Each part is validated right before it is written, a partially written RCFG is removed on errors
+        validator = rcfg_validation.get_validator(self.rcfg_val_schema_file)
+        try:
+            with open(rcfg_path, "w") as f:
+                rcfg_serializer.dump_rcfg(self.parts, f, indent=indent, validate_part=validator.validate_part)
+        except rcfg_validation.RcfgValidationError as err:
+            os.remove(rcfg_path)
+            LOGGER.error(f"Schema validation error: {err}")
+            raise
         tend = timer_utils.time_since(tstart)
         LOGGER.info(f"Done in {tend}")
 
     def get_rcfg_json(self):
-        return json.dumps(
-            {"parts": self.parts},
-            default=lambda o: o.__dict__,
-            indent=4,
-            sort_keys=True,
-        )
+        return rcfg_serializer.dumps_rcfg(self.parts, indent=4)
 
+    @trace_utils.traced("rcfg_validation")
     def val_rcfg_json(self):
-        with open(self.rcfg_val_schema_file, "r", encoding="UTF-8") as json_file:
-            rcfg_schema = json.loads(json_file.read())
-        rcfg = self.get_rcfg_json()
-        try:
-            jsonschema.validate(
-                instance=json.loads(rcfg),
-                schema=rcfg_schema,
-            )
-        except jsonschema.exceptions.ValidationError as err:
-            LOGGER.error("Schema validation Error:", err)
-
-        except jsonschema.exceptions.SchemaError as err:
-            LOGGER.error("Schema Error:", err)
+        """Validates the parts against the RCFG schema without serializing them. Raises RcfgValidationError."""
+        validator = rcfg_validation.get_validator(self.rcfg_val_schema_file)
+        for i, part in enumerate(self.parts):
+            validator.validate_part(rcfg_serializer.part_to_dict(part), i)
@@ -0,0 +1,358 @@
+""" Mesh loading (GLB, OBJ), mesh statistics and surface sampling without Blender """
+import json
+import os
+import struct
+import numpy as np
+
+GLB_MAGIC = b"glTF"
+GLB_CHUNK_JSON = 0x4E4F534A
+GLB_CHUNK_BIN = 0x004E4942
+
+# glTF accessor component types and element sizes
+GLTF_COMPONENT_TYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+GLTF_TYPE_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+GLTF_MODE_TRIANGLES = 4
+GLTF_MODE_TRIANGLE_STRIP = 5
+GLTF_MODE_TRIANGLE_FAN = 6
+
+
+def read_glb(file_path: str, read_bin: bool = True) -> tuple[dict, bytes]:
+    """Returns the JSON document and binary buffer of a .glb file.
+
+    Args:
+        file_path (str): Path to the .glb file.
+        read_bin (bool): If False, the binary buffer is skipped (returned empty), e.g. to read only the counts and
+            bounds of the accessors.
+    """
+    with open(file_path, "rb") as f:
+        magic, version, length = struct.unpack("<4sII", f.read(12))
+        assert magic == GLB_MAGIC, f"{file_path} is not a binary glTF file"
+        assert version == 2, f"Unsupported glTF version {version} in {file_path}"
+
+        gltf, bin_chunk = None, b""
+        offset = 12
+        while offset < length:
+            chunk_length, chunk_type = struct.unpack("<II", f.read(8))
+            if chunk_type == GLB_CHUNK_JSON:
+                gltf = json.loads(f.read(chunk_length))
+            elif chunk_type == GLB_CHUNK_BIN and read_bin:
+                bin_chunk = f.read(chunk_length)
+            else:
+                f.seek(chunk_length, os.SEEK_CUR)
+            offset += 8 + chunk_length
+    assert gltf is not None, f"{file_path} has no JSON chunk"
+    return gltf, bin_chunk
+
+
+def read_accessor(gltf: dict, bin_chunk: bytes, accessor_i: int) -> "np.ndarray":
+    """Returns the data of a glTF accessor as array of shape (count, n_components).
+
+    Normalized integer accessors are converted to floats in [0, 1] or [-1, 1].
+
+    Args:
+        gltf (dict): The glTF JSON document.
+        bin_chunk (bytes): The binary buffer of the .glb file.
+        accessor_i (int): Index of the accessor.
+    """
+    accessor = gltf["accessors"][accessor_i]
+    dtype = np.dtype(GLTF_COMPONENT_TYPES[accessor["componentType"]])
+    n_components = GLTF_TYPE_SIZES[accessor["type"]]
+    count = accessor["count"]
+    if "bufferView" not in accessor:
+        return np.zeros((count, n_components), dtype=dtype)
+    assert "sparse" not in accessor, "Sparse accessors are not supported"
+
+    buffer_view = gltf["bufferViews"][accessor["bufferView"]]
+    assert buffer_view["buffer"] == 0, "Only the GLB binary buffer is supported"
+    offset = buffer_view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+    stride = buffer_view.get("byteStride", dtype.itemsize * n_components)
+    values = np.ndarray(
+        shape=(count, n_components),
+        dtype=dtype,
+        buffer=bin_chunk,
+        offset=offset,
+        strides=(stride, dtype.itemsize),
+    )
+    if accessor.get("normalized", False):
+        values = np.maximum(values / np.iinfo(dtype).max, -1.0)
+    return values
+
+
+def get_node_matrix(node: dict) -> "np.ndarray":
+    """Returns the local 4x4 transformation matrix of a glTF node."""
+    if "matrix" in node:
+        # glTF matrices are stored column-major
+        return np.array(node["matrix"], dtype=np.float64).reshape(4, 4).T
+    x, y, z, w = node.get("rotation", [0.0, 0.0, 0.0, 1.0])
+    rotation = np.array(
+        [
+            [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+            [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+            [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+        ]
+    )
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.array(node.get("scale", [1.0, 1.0, 1.0]))
+    matrix[:3, 3] = node.get("translation", [0.0, 0.0, 0.0])
+    return matrix
+
+
+def iter_nodes(gltf: dict):
+    """Yields (node, world_matrix) for every node of the default scene."""
+    nodes = gltf.get("nodes", [])
+    if "scenes" in gltf:
+        roots = gltf["scenes"][gltf.get("scene", 0)].get("nodes", [])
+    else:
+        children = {child for node in nodes for child in node.get("children", [])}
+        roots = [i for i in range(len(nodes)) if i not in children]
+
+    stack = [(node_i, np.eye(4)) for node_i in roots]
+    while stack:
+        node_i, parent_matrix = stack.pop()
+        node = nodes[node_i]
+        world_matrix = parent_matrix @ get_node_matrix(node)
+        yield node, world_matrix
+        stack.extend((child, world_matrix) for child in node.get("children", []))
+
+
+def iter_mesh_nodes(gltf: dict):
+    """Yields (node, world_matrix) for every node of the default scene that references a mesh."""
+    for node, world_matrix in iter_nodes(gltf):
+        if "mesh" in node:
+            yield node, world_matrix
+
+
+def load_glb_mesh(file_path: str) -> tuple["np.ndarray", "np.ndarray"]:
+    """Returns all triangles of a .glb file in world space as (vertices, faces).
+
+    Cameras, lights and non-triangle primitives are ignored.
+
+    Args:
+        file_path (str): Path to the .glb file.
+
+    Returns:
+        np.ndarray, np.ndarray: vertices of shape (n_vertices, 3) and triangle vertex indices of shape (n_faces, 3)
+    """
+    gltf, bin_chunk = read_glb(file_path)
+    assert "KHR_draco_mesh_compression" not in gltf.get(
+        "extensionsRequired", []
+    ), f"{file_path} uses Draco compression, which is not supported"
+
+    vertices, faces = [], []
+    n_vertices = 0
+    for node, world_matrix in iter_mesh_nodes(gltf):
+        for primitive in gltf["meshes"][node["mesh"]]["primitives"]:
+            if primitive.get("mode", GLTF_MODE_TRIANGLES) != GLTF_MODE_TRIANGLES:
+                continue
+            positions = read_accessor(gltf, bin_chunk, primitive["attributes"]["POSITION"]).astype(np.float64)
+            if "indices" in primitive:
+                indices = read_accessor(gltf, bin_chunk, primitive["indices"]).reshape(-1, 3).astype(np.int64)
+            else:
+                indices = np.arange(len(positions)).reshape(-1, 3)
+            vertices.append(positions @ world_matrix[:3, :3].T + world_matrix[:3, 3])
+            faces.append(indices + n_vertices)
+            n_vertices += len(positions)
+
+    if not vertices:
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64)
+    return np.concatenate(vertices), np.concatenate(faces)
+
+
+def load_obj_mesh(file_path: str) -> tuple["np.ndarray", "np.ndarray"]:
+    """Returns all faces of an .obj file as (vertices, faces). Polygons are triangulated as fans.
+
+    Args:
+        file_path (str): Path to the .obj file.
+
+    Returns:
+        np.ndarray, np.ndarray: vertices of shape (n_vertices, 3) and triangle vertex indices of shape (n_faces, 3)
+    """
+    vertices, faces = [], []
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            if line.startswith("v "):
+                vertices.append(line.split()[1:4])
+            elif line.startswith("f "):
+                # Face elements are v, v/vt, v//vn or v/vt/vn with 1-based or negative (relative) indices
+                polygon = [int(element.split("/")[0]) for element in line.split()[1:]]
+                polygon = [i - 1 if i > 0 else len(vertices) + i for i in polygon]
+                faces.extend([polygon[0], polygon[i], polygon[i + 1]] for i in range(1, len(polygon) - 1))
+    return np.array(vertices, dtype=np.float64).reshape(-1, 3), np.array(faces, dtype=np.int64).reshape(-1, 3)
+
+
+def load_mesh(file_path: str) -> tuple["np.ndarray", "np.ndarray"]:
+    """Returns (vertices, faces) of a .glb or .obj file (see load_glb_mesh, load_obj_mesh)."""
+    if file_path.lower().endswith(".glb"):
+        return load_glb_mesh(file_path)
+    if file_path.lower().endswith(".obj"):
+        return load_obj_mesh(file_path)
+    raise ValueError(f"Unsupported mesh file format: {file_path}")
+
+
+def get_primitive_triangles(gltf: dict, primitive: dict) -> int:
+    """Returns the number of triangles of a glTF primitive from its accessor counts, without reading its data."""
+    mode = primitive.get("mode", GLTF_MODE_TRIANGLES)
+    accessor_i = primitive["indices"] if "indices" in primitive else primitive["attributes"].get("POSITION")
+    if accessor_i is None:
+        return 0
+    count = gltf["accessors"][accessor_i]["count"]
+    if mode == GLTF_MODE_TRIANGLES:
+        return count // 3
+    if mode in (GLTF_MODE_TRIANGLE_STRIP, GLTF_MODE_TRIANGLE_FAN):
+        return max(0, count - 2)
+    return 0
+
+
+def get_glb_stats(file_path: str) -> dict:
+    """Returns object, triangle, vertex and material counts and the world space bounds of a .glb file.
+
+    Only the JSON chunk is read: counts come from the accessors, also of Draco compressed primitives, bounds from
+    the POSITION min/max transformed by the node's world matrix. The binary buffer is only read for positions
+    without min/max. Bounds of rotated nodes enclose their mesh but may be larger than its exact bounds.
+
+    Returns:
+        dict: n_objects (nodes), n_meshes (nodes with a mesh, instances count once per node), n_triangles,
+            n_vertices, n_materials, n_draco_primitives, bounds ([min xyz, max xyz] or None) and file_bytes
+    """
+    gltf, bin_chunk = read_glb(file_path, read_bin=False)
+    stats = {
+        "n_objects": 0,
+        "n_meshes": 0,
+        "n_triangles": 0,
+        "n_vertices": 0,
+        "n_materials": len(gltf.get("materials", [])),
+        "n_draco_primitives": 0,
+        "bounds": None,
+        "file_bytes": os.path.getsize(file_path),
+    }
+    corners = []
+    for node, world_matrix in iter_nodes(gltf):
+        stats["n_objects"] += 1
+        if "mesh" not in node:
+            continue
+        stats["n_meshes"] += 1
+        for primitive in gltf["meshes"][node["mesh"]]["primitives"]:
+            stats["n_triangles"] += get_primitive_triangles(gltf, primitive)
+            if "KHR_draco_mesh_compression" in primitive.get("extensions", {}):
+                stats["n_draco_primitives"] += 1
+            position_i = primitive["attributes"].get("POSITION")
+            if position_i is None:
+                continue
+            accessor = gltf["accessors"][position_i]
+            stats["n_vertices"] += accessor["count"]
+            if "min" in accessor and "max" in accessor:
+                vmin, vmax = np.array(accessor["min"][:3]), np.array(accessor["max"][:3])
+            elif "bufferView" in accessor and accessor["count"]:
+                if not bin_chunk:
+                    _, bin_chunk = read_glb(file_path)
+                positions = read_accessor(gltf, bin_chunk, position_i)
+                vmin, vmax = positions.min(axis=0), positions.max(axis=0)
+            else:
+                continue
+            # The 8 corners of the box
+            box = np.array(np.meshgrid(*zip(vmin, vmax), indexing="ij")).reshape(3, -1).T
+            corners.append(box @ world_matrix[:3, :3].T + world_matrix[:3, 3])
+    if corners:
+        corners = np.concatenate(corners)
+        stats["bounds"] = [corners.min(axis=0).tolist(), corners.max(axis=0).tolist()]
+    return stats
+
+
+def get_obj_stats(file_path: str) -> dict:
+    """Returns the counts and bounds of an .obj file (same keys as get_glb_stats), reading it line by line.
+
+    Objects are the "o" statements, or the "g" statements if there are none, at least 1 for a file with faces.
+    """
+    n_triangles, n_o, n_g, materials = 0, 0, 0, set()
+    vertices = []
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            if line.startswith("v "):
+                vertices.append(line.split()[1:4])
+            elif line.startswith("f "):
+                # Polygons with n vertices are split into n - 2 triangles
+                n_triangles += max(0, len(line.split()) - 3)
+            elif line.startswith("o "):
+                n_o += 1
+            elif line.startswith("g "):
+                n_g += 1
+            elif line.startswith("usemtl "):
+                materials.add(line.split()[1])
+    vertices = np.array(vertices, dtype=np.float64).reshape(-1, 3)
+    n_objects = n_o or n_g or int(n_triangles > 0)
+    return {
+        "n_objects": n_objects,
+        "n_meshes": n_objects,
+        "n_triangles": n_triangles,
+        "n_vertices": len(vertices),
+        "n_materials": len(materials),
+        "n_draco_primitives": 0,
+        "bounds": [vertices.min(axis=0).tolist(), vertices.max(axis=0).tolist()] if len(vertices) else None,
+        "file_bytes": os.path.getsize(file_path),
+    }
+
+
+def get_mesh_stats(file_path: str) -> dict:
+    """Returns the counts and bounds of a .glb or .obj file (see get_glb_stats, get_obj_stats)."""
+    if file_path.lower().endswith(".glb"):
+        return get_glb_stats(file_path)
+    if file_path.lower().endswith(".obj"):
+        return get_obj_stats(file_path)
+    raise ValueError(f"Unsupported mesh file format: {file_path}")
+
+
+def normalize_mesh(vertices: "np.ndarray") -> "np.ndarray":
+    """Returns vertices centered at their bounding box center and scaled so that the largest dimension equals 1.
+
+    This matches the normalization applied to parts before rendering.
+    """
+    if len(vertices) == 0:
+        return vertices
+    vmin, vmax = vertices.min(axis=0), vertices.max(axis=0)
+    max_dim = (vmax - vmin).max()
+    return (vertices - (vmin + vmax) / 2) / (max_dim if max_dim > 0 else 1.0)
+
+
+def get_face_normals_and_areas(vertices: "np.ndarray", faces: "np.ndarray") -> tuple["np.ndarray", "np.ndarray"]:
+    """Returns unit normals of shape (n_faces, 3) and areas of shape (n_faces,) of the given triangles."""
+    cross = np.cross(vertices[faces[:, 1]] - vertices[faces[:, 0]], vertices[faces[:, 2]] - vertices[faces[:, 0]])
+    norms = np.linalg.norm(cross, axis=1)
+    normals = cross / np.where(norms > 0, norms, 1.0)[:, None]
+    return normals, norms / 2
+
+
+def sample_surface(
+    vertices: "np.ndarray",
+    faces: "np.ndarray",
+    n_points: int,
+    rng: "np.random.Generator" = None,
+) -> tuple["np.ndarray", "np.ndarray"]:
+    """Returns points sampled uniformly (area weighted) on the surface of a triangle mesh.
+
+    Args:
+        vertices (np.ndarray): Vertices of shape (n_vertices, 3).
+        faces (np.ndarray): Triangle vertex indices of shape (n_faces, 3).
+        n_points (int): Number of points to sample.
+        rng (np.random.Generator): Random generator. Defaults to a generator seeded with 0.
+
+    Returns:
+        np.ndarray, np.ndarray: points of shape (n_points, 3) and the index of the face each point lies on
+    """
+    rng = np.random.default_rng(0) if rng is None else rng
+    _, areas = get_face_normals_and_areas(vertices, faces)
+    assert areas.sum() > 0, "Cannot sample the surface of a mesh without area"
+    face_ids = rng.choice(len(faces), size=n_points, p=areas / areas.sum())
+    # Uniform barycentric coordinates
+    u, v = rng.random((2, n_points))
+    flip = u + v > 1
+    u[flip], v[flip] = 1 - u[flip], 1 - v[flip]
+    v0, v1, v2 = (vertices[faces[face_ids, i]] for i in range(3))
+    points = v0 + u[:, None] * (v1 - v0) + v[:, None] * (v2 - v0)
+    return points, face_ids
@@ -0,0 +1,150 @@
+""" Cache of prepared TOPEX metadata and parsed parts, keyed by the metadata file content and the parser version """
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+
+import pandas as pd
+
+from preprocessing.models.part import Part
+from preprocessing.models.single_part import SinglePart
+from utils import file_utils
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+LOGGER = logging.getLogger(__name__)
+
+# Increase on changes of the cache layout. Changes of the parser sources invalidate the cache automatically.
+CACHE_FORMAT_VERSION = 1
+PARSER_SOURCES = [
+    "preprocessing/utils/metadata.py",
+    "preprocessing/parse_parts.py",
+    "preprocessing/models/part.py",
+    "preprocessing/models/single_part.py",
+]
+
+
+def get_parser_version() -> str:
+    """Returns a version of metadata preparation and part parsing: the cache format and a hash of their sources."""
+    root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    source_hash = hashlib.sha256()
+    for source in PARSER_SOURCES:
+        with open(os.path.join(root_dir, source), "rb") as f:
+            source_hash.update(f.read())
+    return f"v{CACHE_FORMAT_VERSION}-{source_hash.hexdigest()[:12]}"
+
+
+def pack_parts(parts: list[Part]) -> dict:
+    """Returns the part tree as plain tuples. SingleParts shared by several parts are stored once and
+    referenced by index.
+
+    Args:
+        parts (list<Part>): Parsed parts (without scenes).
+    """
+    single_part_indices = {}
+    single_parts = []
+    packed_parts = []
+    for part in parts:
+        indices = []
+        for single_part in part.single_parts:
+            if single_part.id not in single_part_indices:
+                single_part_indices[single_part.id] = len(single_parts)
+                single_parts.append((single_part.id, single_part.name, single_part.material))
+            indices.append(single_part_indices[single_part.id])
+        packed_parts.append((part.id, part.name, part.hierarchy, part.is_spare, indices))
+    return {"single_parts": single_parts, "parts": packed_parts}
+
+
+def unpack_parts(packed: dict) -> list[Part]:
+    """Returns the parts of a packed part tree (see pack_parts), SingleParts are shared like after parsing."""
+    single_parts = [SinglePart(id=id, name=name, material=material) for id, name, material in packed["single_parts"]]
+    return [
+        Part(
+            id=id,
+            name=name,
+            hierarchy=hierarchy,
+            is_spare=is_spare,
+            single_parts=[single_parts[i] for i in indices],
+        )
+        for id, name, hierarchy, is_spare, indices in packed["parts"]
+    ]
+
+
+class ParseCache:
+    """Stores the prepared metadata and the parsed parts of a metadata file in {cache_dir}/{key}/.
+
+    The key consists of the content hash of the metadata file and the parser version, so changed metadata
+    files and parser changes never hit an old entry. The metadata is stored as Parquet if pyarrow is installed
+    and as pickle otherwise, the part tree as pickle of plain tuples (see pack_parts).
+
+    Args:
+        cache_dir (str): Root directory of the cache (created if not existent).
+        metadata_file (str): TOPEX metadata .xlsx file.
+    """
+
+    def __init__(self, cache_dir: str, metadata_file: str):
+        self.metadata_file = metadata_file
+        self.file_hash = file_utils.get_file_hash(metadata_file)
+        self.parser_version = get_parser_version()
+        self.key = f"{self.file_hash[:32]}-{self.parser_version}"
+        self.entry_dir = os.path.join(cache_dir, self.key)
+        self.info_file = os.path.join(self.entry_dir, "info.json")
+
+    def load(self) -> tuple["pd.DataFrame", list[Part]]:
+        """Returns the cached metadata and parts, or None if there is no (complete) entry."""
+        # info.json is written last, so an entry without it is incomplete
+        if not os.path.isfile(self.info_file):
+            return None
+        try:
+            with open(self.info_file, "r") as f:
+                info = json.load(f)
+            metadata_path = os.path.join(self.entry_dir, info["metadata"])
+            if info["metadata"].endswith(".parquet"):
+                metadata = pd.read_parquet(metadata_path)
+            else:
+                metadata = pd.read_pickle(metadata_path)
+            with open(os.path.join(self.entry_dir, "parts.pkl"), "rb") as f:
+                parts = unpack_parts(pickle.load(f))
+        except Exception as e:  # pylint: disable=broad-except
+            LOGGER.warning(f"Ignoring unreadable cache entry {self.entry_dir}: {e}")
+            return None
+        return metadata, parts
+
+    def save(self, metadata: "pd.DataFrame", parts: list[Part]) -> None:
+        """Writes metadata and parts to a temporary directory that is renamed to the entry directory."""
+        tmp_dir = f"{self.entry_dir}.tmp{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        metadata_name = "metadata.pkl"
+        if pyarrow is not None:
+            try:
+                metadata.to_parquet(os.path.join(tmp_dir, "metadata.parquet"))
+                metadata_name = "metadata.parquet"
+            except (pyarrow.ArrowException, TypeError, ValueError) as e:
+                LOGGER.warning(f"Cannot store metadata as Parquet, using pickle: {e}")
+        if metadata_name == "metadata.pkl":
+            metadata.to_pickle(os.path.join(tmp_dir, metadata_name))
+        with open(os.path.join(tmp_dir, "parts.pkl"), "wb") as f:
+            pickle.dump(pack_parts(parts), f, protocol=pickle.HIGHEST_PROTOCOL)
+        info = {
+            "metadata_file": os.path.abspath(self.metadata_file),
+            "file_hash": self.file_hash,
+            "parser_version": self.parser_version,
+            "metadata": metadata_name,
+            "n_rows": len(metadata),
+            "n_parts": len(parts),
+        }
+        with open(os.path.join(tmp_dir, "info.json"), "w") as f:
+            json.dump(info, f, indent=4)
+
+        # Another process may have written the same entry in the meantime
+        shutil.rmtree(self.entry_dir, ignore_errors=True)
+        try:
+            os.replace(tmp_dir, self.entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,70 @@
+""" Serialization of parts to the render configuration (RCFG) format """
+import json
+from typing import TextIO
+
+from preprocessing.models.scene import Scene
+
+
+def part_to_dict(part) -> dict:
+    """Returns the RCFG representation of a part.
+
+    Args:
+        part (Part | dict): A Part object (topex) or part dictionary (OBJ) with an optional Scene.
+    """
+    if isinstance(part, dict):
+        part_dict = dict(part)
+        if isinstance(part_dict.get("scene"), Scene):
+            part_dict["scene"] = part_dict["scene"].to_dict()
+        return part_dict
+    return part.to_dict()
+
+
+def rcfg_to_dict(parts: list) -> dict:
+    """Returns the RCFG representation of the given parts as a dictionary.
+
+    Args:
+        parts (list): List of Part objects or part dictionaries.
+    """
+    return {"parts": [part_to_dict(part) for part in parts]}
+
+
+def dump_rcfg(parts: list, fp: TextIO, indent: int = 4, validate_part=None) -> None:
+    """Writes the RCFG of the given parts to a file object.
+
+    Parts are serialized one at a time, so the RCFG is never held in memory as a whole.
+    The output equals json.dump(rcfg_to_dict(parts), fp, indent=indent, sort_keys=True).
+
+    Args:
+        parts (list): List of Part objects or part dictionaries.
+        fp (TextIO): File object to write to.
+        indent (int): JSON indentation. Defaults to 4.
+        validate_part (callable): Called with (part_dict, index) before each part is written, e.g.
+            RcfgValidator.validate_part (utils/rcfg_validation.py). Defaults to None.
+    """
+    if not parts:
+        fp.write('{"parts": []}' if indent is None else f'{{\n{" " * indent}"parts": []\n}}')
+        return
+    if indent is None:
+        fp.write('{"parts": [')
+        for i, part in enumerate(parts):
+            part_dict = part_to_dict(part)
+            if validate_part is not None:
+                validate_part(part_dict, i)
+            fp.write((", " if i else "") + json.dumps(part_dict, sort_keys=True))
+        fp.write("]}")
+        return
+    # Each part is nested two levels deep: {"parts": [part, ...]}
+    part_newline = "\n" + " " * (2 * indent)
+    fp.write(f'{{\n{" " * indent}"parts": [')
+    for i, part in enumerate(parts):
+        part_dict = part_to_dict(part)
+        if validate_part is not None:
+            validate_part(part_dict, i)
+        part_json = json.dumps(part_dict, indent=indent, sort_keys=True)
+        fp.write(("," if i else "") + part_newline + part_json.replace("\n", part_newline))
+    fp.write(f'\n{" " * indent}]\n}}')
+
+
+def dumps_rcfg(parts: list, indent: int = 4) -> str:
+    """Returns the RCFG of the given parts as a JSON string (see dump_rcfg)."""
+    return json.dumps(rcfg_to_dict(parts), indent=indent, sort_keys=True)
@@ -1,66 +1,141 @@
 """ Sampling algorithms to use for generating random scenes """
 
 import math
-import random
 from typing import Tuple
 import numpy as np
 
+# Spawn key namespace of derived streams (see derive_seed), beyond the number of seed sequences ever spawned
+DERIVED_SEED_TAG = 0xFFFFFFFF
+
+
+def spawn_seeds(seed: int, n: int, shared: bool = False) -> list["np.random.SeedSequence"]:
+    """Returns n seed sequences derived from seed, one for each part that samples a scene.
+
+    The seed sequences are spawned from a single root sequence, so every part receives an independent
+    and reproducible random stream. If shared is set, every part receives the root sequence itself,
+    resulting in identical samples (rigs) for all parts.
+    Seed sequences are cheap to pickle and can be passed to worker processes.
+
+    Args:
+        seed (int): Root seed.
+        n (int): Number of seed sequences to create.
+        shared (bool): Whether all seed sequences should produce the same random stream. Defaults to False.
+
+    Returns:
+        list: List of n np.random.SeedSequence objects.
+    """
+    root = np.random.SeedSequence(seed)
+    if shared:
+        return [root] * n
+    return root.spawn(n)
+
+
+def derive_seed(seed: "np.random.SeedSequence", key: int) -> "np.random.SeedSequence":
+    """Returns a seed sequence for a separate random stream of the same part, identified by key.
+
+    Unlike SeedSequence.spawn, this does not change the state of seed, so the derived stream
+    is the same regardless of how often or in which process it is requested.
+    Derived streams are namespaced below DERIVED_SEED_TAG, so they never equal a spawned stream. In shared
+    mode the part's seed is the root sequence, whose spawned children are the streams of other parts.
+
+    Args:
+        seed (np.random.SeedSequence): Seed sequence of a part (see spawn_seeds).
+        key (int): Identifier of the derived stream.
+    """
+    return np.random.SeedSequence(entropy=seed.entropy, spawn_key=(*seed.spawn_key, DERIVED_SEED_TAG, key))
+
+
+def get_rngs(seeds: list["np.random.SeedSequence"]) -> list["np.random.Generator"]:
+    """Returns a np.random.Generator for each given seed sequence.
+
+    Args:
+        seeds (list): List of np.random.SeedSequence objects (see spawn_seeds).
+    """
+    return [np.random.default_rng(seed) for seed in seeds]
+
+
+def _get_rng(rng: "np.random.Generator") -> "np.random.Generator":
+    """Returns rng or a freshly seeded generator if rng is None."""
+    return np.random.default_rng() if rng is None else rng
+
+
+def _sphere_uniform_from_unit(u: "np.ndarray", r_factor: float) -> "np.ndarray":
+    """Maps uniform samples u of shape (..., 3) in [0, 1) to points of a sphere with radius r_factor.
+
+    The last axis holds the (phi, costheta, radius) samples.
+    """
+    phi = 2 * np.pi * u[..., 0]
+    costheta = 2 * u[..., 1] - 1
+    sintheta = np.sqrt(1 - costheta * costheta)
+    r = r_factor * np.cbrt(u[..., 2])
+    return np.stack((r * sintheta * np.cos(phi), r * sintheta * np.sin(phi), r * costheta), axis=-1)
+
 
 def sphere_uniform(
     n_samples: int = 100,
     r_factor: float = 10.0,
-    seed: int = 42,
-) -> list[list]:
-    """Returns a list of random points sampled on the unit sphere.
+    rng: "np.random.Generator" = None,
+) -> "np.ndarray":
+    """Returns an array of random points sampled on the unit sphere.
 
     Args:
         n_samples (int): Number of points to sample.
         r_factor (float): Radius factor to control the distance of objects to the sphere center.
+        rng (np.random.Generator): Random generator to draw samples from. Defaults to an unseeded generator.
+
+    Returns:
+        np.ndarray: array of shape (n_samples, 3) containing the points
+    """
+    return _sphere_uniform_from_unit(_get_rng(rng).random((n_samples, 3)), r_factor)
+
+
+def sphere_uniform_batch(
+    rngs: list["np.random.Generator"],
+    n_samples: int = 100,
+    r_factor: float = 10.0,
+) -> "np.ndarray":
+    """Returns an array of random points sampled on the unit sphere for each given generator.
+
+    Samples equal those of sphere_uniform() for the same generator state, but the coordinate
+    transformation is computed for all generators in a single array operation.
+
+    Args:
+        rngs (list): Random generators, one for each batch entry (e.g. one per part).
+        n_samples (int): Number of points to sample per generator.
+        r_factor (float): Radius factor to control the distance of objects to the sphere center.
+
+    Returns:
+        np.ndarray: array of shape (len(rngs), n_samples, 3) containing the points
     """
-    np.random.seed(seed)
-    random.seed(seed)
-    points = []
-    for i in range(n_samples):
-        phi = random.uniform(0, 2 * math.pi)
-        costheta = random.uniform(-1, 1)
-        u = random.uniform(0, 1)
-        theta = math.acos(costheta)
-        r = r_factor * u ** (1.0 / 3.0)
-        x = r * math.sin(theta) * math.cos(phi)
-        y = r * math.sin(theta) * math.sin(phi)
-        z = r * math.cos(theta)
-        points.append([x, y, z])
-    return points
+    u = np.empty((len(rngs), n_samples, 3))
+    for i, rng in enumerate(rngs):
+        rng.random(out=u[i])
+    return _sphere_uniform_from_unit(u, r_factor)
 
 
 def sphere_equidistant(
     n_samples: int = 100,
     r_factor=1.0,
-    seed: int = 42,
-) -> list[list]:
-    """Returns a list of regularly sampled points on the unit sphere using fibonacci lattice/ golden spiral
+) -> "np.ndarray":
+    """Returns an array of regularly sampled points on the unit sphere using fibonacci lattice/ golden spiral
     Args:
         n_samples (int): Number of points to sample.. Defaults to 100.
         r_factor (float): Radius factor to control the distance of objects to the sphere center.
     Returns:
-        list: list of sampled points
+        np.ndarray: array of shape (n_samples, 3) containing the points
     """
-    np.random.seed(seed)
-    random.seed(seed)
-    points = []
     # golden angle 3d
     phi = math.pi * (3.0 - math.sqrt(5.0))
-    for i in range(n_samples):
-        # golden angle increment
-        theta = phi * i
-        # y goes from 1 to -1
-        y = 1 - (i / float(n_samples - 1)) * 2 if n_samples > 1 else 0
-        # radius at y
-        r = math.sqrt(1 - y * y)
-        x = r * math.cos(theta)
-        z = r * math.sin(theta)
-        points.append([x * r_factor, y * r_factor, z * r_factor])
-    return points
+    i = np.arange(n_samples)
+    # golden angle increment
+    theta = phi * i
+    # y goes from 1 to -1
+    y = 1 - (i / float(n_samples - 1)) * 2 if n_samples > 1 else np.zeros(n_samples)
+    # radius at y
+    r = np.sqrt(1 - y * y)
+    x = r * np.cos(theta)
+    z = r * np.sin(theta)
+    return np.stack((x, y, z), axis=1) * r_factor
 
 
 def range_uniform(
@@ -68,7 +143,7 @@ def range_uniform(
     xrange: Tuple[float, float] = (-1.0, 1.0),
     yrange: Tuple[float, float] = (-1.0, 1.0),
     zrange: Tuple[float, float] = (-1.0, 1.0),
-    seed: int = 42,
+    rng: "np.random.Generator" = None,
 ) -> "np.ndarray":
     """Return an array of points sampled on given ranges for each coordinate.
 
@@ -77,15 +152,36 @@ def range_uniform(
         xrange (Tuple): min and max value for axis
         yrange (Tuple): min and max value for axis
         zrange (Tuple): min and max value for axis
+        rng (np.random.Generator): Random generator to draw samples from. Defaults to an unseeded generator.
     """
-    np.random.seed(seed)
-    random.seed(seed)
-    randx = np.random.uniform(low=xrange[0], high=xrange[1], size=(n_samples, 1))
-    randy = np.random.uniform(low=yrange[0], high=yrange[1], size=(n_samples, 1))
-    randz = np.random.uniform(low=zrange[0], high=zrange[1], size=(n_samples, 1))
+    low, high = np.array([xrange, yrange, zrange]).T
+    return _get_rng(rng).uniform(low=low, high=high, size=(n_samples, 3))
+
+
+def range_uniform_batch(
+    rngs: list["np.random.Generator"],
+    n_samples: int = 100,
+    xrange: Tuple[float, float] = (-1.0, 1.0),
+    yrange: Tuple[float, float] = (-1.0, 1.0),
+    zrange: Tuple[float, float] = (-1.0, 1.0),
+) -> "np.ndarray":
+    """Return an array of points sampled on given ranges for each coordinate and each given generator.
 
-    points = np.concatenate((randx, randy, randz), axis=1)
-    return points
+    Args:
+        rngs (list): Random generators, one for each batch entry (e.g. one per part).
+        n_samples (int): Number of samples per generator
+        xrange (Tuple): min and max value for axis
+        yrange (Tuple): min and max value for axis
+        zrange (Tuple): min and max value for axis
+
+    Returns:
+        np.ndarray: array of shape (len(rngs), n_samples, 3) containing the points
+    """
+    u = np.empty((len(rngs), n_samples, 3))
+    for i, rng in enumerate(rngs):
+        rng.random(out=u[i])
+    low, high = np.array([xrange, yrange, zrange]).T
+    return low + (high - low) * u
 
 
 def cartesian_to_spherical(point_cart: list) -> tuple[float, float, float]:
@@ -156,14 +252,14 @@ def point_2D_on_circle(
     """Get the position of a point on a circle around the origin rotated by the given angle angle.
 
     Args:
-        angle (float): angle by which the point is rotated
+        angle (float): angle by which the point is rotated. Arrays of angles are supported.
         radius (float): distance between the point and the origin
 
     Returns:
         tuple: new point, meaning (x, y)
     """
-    x = radius * math.cos(angle)
-    y = radius * math.sin(angle)
+    x = radius * np.cos(angle)
+    y = radius * np.sin(angle)
     return x, y
 
 
@@ -209,19 +305,19 @@ def circular(
     """
     # Slicing the circle in n_cameras parts for even spacing
     theta = 2 * math.pi / n_cameras
-    points = []
-    for i in range(n_cameras):
-        # Calculate point on circular orbit for camera i
-        x, y = point_2D_on_circle(theta * i, radius)
-        z = 0.0
-        p = [x, y, z]
-        # Convert the point to spherical notation, rotate by elev_angle and convert back to cartesian
-        sph_theta, sph_phi, sph_r = cartesian_to_spherical(p)
-        sph_theta, sph_phi, sph_r = move_spherical_by_deg_angle(sph_theta, sph_phi, sph_r, elev_angle)
-        p_cart = spherical_to_cartesian(sph_theta, sph_phi, sph_r)
-        p_cart = add_points(p_cart, center)
-        points.append(p_cart)
-    return np.array(points)
+    # Points on the circular orbit are given by their azimuth in spherical notation (inclination is 90 degrees).
+    # Rotate the inclination by elev_angle and convert back to cartesian
+    sph_phi = theta * np.arange(n_cameras)
+    sph_theta = math.pi / 2 - math.radians(elev_angle)
+    points = np.stack(
+        (
+            radius * math.sin(sph_theta) * np.cos(sph_phi),
+            radius * math.sin(sph_theta) * np.sin(sph_phi),
+            np.full(n_cameras, radius * math.cos(sph_theta)),
+        ),
+        axis=1,
+    )
+    return points + np.asarray(center)
 
 
 def isocahedral(
@@ -256,12 +352,7 @@ def isocahedral(
         [-phi, 0, -1],
     ]
 
-    for i in range(len(unit_coordinates)):
-        coord = unit_coordinates[i]
-        coord = scale_point(coord, radius)
-        coord = add_points(coord, center)
-        unit_coordinates[i] = coord
-    return np.array(unit_coordinates)
+    return np.array(unit_coordinates) * radius + np.asarray(center)
 
 
 def dodecahedral(
@@ -326,31 +417,24 @@ def dodecahedral(
         [1 / phi, phi, 0],  # 19
     ]
     # Remove unwanted points
-    for idx in sorted(points_to_exclude, reverse=True):
-        del unit_coordinates[idx]
+    unit_coordinates = np.delete(np.array(unit_coordinates), points_to_exclude, axis=0)
 
     # Supplied coordinates do not have the top and bottom face parallel with the x-y plane
     # First rotate around the y axis, resulting in two faces being parallel
     theta = math.atan(1 / phi)
     rotation_y = np.array(
         [
-            [math.cos(theta), 0, math.sin(theta), 0],
-            [0, 1, 0, 0],
-            [-math.sin(theta), 0, math.cos(theta), 0],
-            [0, 0, 0, 1],
+            [math.cos(theta), 0, math.sin(theta)],
+            [0, 1, 0],
+            [-math.sin(theta), 0, math.cos(theta)],
         ]
     )
-
-    y_rotated_coords = []
-    for c in unit_coordinates:
-        c_ = np.array([c[0], c[1], c[2], 1])
-        c_ = np.matmul(rotation_y, c_)
-        y_rotated_coords.append(c_[:3])
+    y_rotated_coords = unit_coordinates @ rotation_y.T
 
     # Get the 5 corners, which have the highest z value, meaning they make up the top face.
     # Then take the corner farthest in y direction and convert it to spherical coordinates.
-    top_5_in_z_dir = sorted(y_rotated_coords, key=lambda p: p[2], reverse=True)[:5]
-    top_1_in_y_dir = sorted(top_5_in_z_dir, key=lambda p: p[1], reverse=True)[0]
+    top_5_in_z_dir = y_rotated_coords[np.argsort(-y_rotated_coords[:, 2], kind="stable")[:5]]
+    top_1_in_y_dir = top_5_in_z_dir[np.argmax(top_5_in_z_dir[:, 1])]
     theta_top1, _, _ = cartesian_to_spherical(top_1_in_y_dir)
 
     # Use the azimuth angle of the spherical point, which indicates how much it has been rotated from 0 degrees.
@@ -358,27 +442,14 @@ def dodecahedral(
     z_ang = theta_top1 - math.pi / 2
     rotation_z = np.array(
         [
-            [math.cos(-z_ang), -math.sin(-z_ang), 0, 0],
-            [math.sin(-z_ang), math.cos(-z_ang), 0, 0],
-            [0, 0, 1, 0],
-            [0, 0, 0, 1],
+            [math.cos(-z_ang), -math.sin(-z_ang), 0],
+            [math.sin(-z_ang), math.cos(-z_ang), 0],
+            [0, 0, 1],
         ]
     )
+    z_rotated_coords = y_rotated_coords @ rotation_z.T
 
-    z_rotated_coords = []
-    for c in y_rotated_coords:
-        c_ = np.array([c[0], c[1], c[2], 1])
-        c_ = np.matmul(rotation_z, c_)
-        z_rotated_coords.append(c_[:3])
-
-    unit_coordinates = z_rotated_coords
-
-    for i in range(len(unit_coordinates)):
-        coord = unit_coordinates[i]
-        coord = scale_point(coord, radius)
-        coord = add_points(coord, center)
-        unit_coordinates[i] = coord
-    return np.array(unit_coordinates)
+    return z_rotated_coords * radius + np.asarray(center)
 
 
 def n_gonal_antiprism(
@@ -401,21 +472,13 @@ def n_gonal_antiprism(
         np.ndarray: array containing the points
     """
     assert n_base_verts >= 2, f"Function cannot construct an n-gon with {n_base_verts} vertices, has to be >= 2"
-    # Slicing the circle in 8 parts for even spacing
+    # Slicing the circle in n_base_verts parts for even spacing
     angle = 2 * math.pi / n_base_verts
-    points = []
-    # For each iteration, calculate a point on the top n-gon and the bottom n-gon.
-    # The point on the bottom n-gon is shifted by angle / 2, resulting in triangular faces
-    for i in range(n_base_verts):
-        top_angle = angle * i
-        t_x, t_y = point_2D_on_circle(top_angle, radius)
-        t_p = [t_x, t_y, height / 2]
-        t_p = add_points(t_p, center)
-
-        bottom_angle = top_angle + angle / 2
-        b_x, b_y = point_2D_on_circle(bottom_angle, radius)
-        b_p = [b_x, b_y, -height / 2]
-        b_p = add_points(b_p, center)
-
-        points.extend([t_p, b_p])
-    return np.array(points)
+    # Calculate a point on the top n-gon and the bottom n-gon for each slice.
+    # The point on the bottom n-gon is shifted by angle / 2, resulting in triangular faces.
+    # Points are interleaved as [top_0, bottom_0, top_1, bottom_1, ...]
+    angles = angle * np.arange(n_base_verts)[:, None] + np.array([0.0, angle / 2])
+    heights = np.broadcast_to([height / 2, -height / 2], angles.shape)
+    x, y = point_2D_on_circle(angles, radius)
+    points = np.stack((x, y, heights), axis=-1).reshape(-1, 3)
+    return points + np.asarray(center)
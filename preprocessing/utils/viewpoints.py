@@ -0,0 +1,194 @@
+""" Viewpoint scoring and selection using a vectorized software rasterizer (CPU only) """
+import numpy as np
+
+from preprocessing.utils import mesh, sampling
+
+VIEWPOINT_METRICS = ["entropy", "silhouette", "visible_area"]
+
+
+def get_view_basis(direction: "np.ndarray") -> tuple["np.ndarray", "np.ndarray"]:
+    """Returns the (right, up) image plane axes of a camera located in the given direction looking at the origin.
+
+    The world Z-axis is used as up vector, unless the view direction is (almost) parallel to it.
+    """
+    direction = direction / np.linalg.norm(direction)
+    world_up = np.array([0.0, 0.0, 1.0]) if abs(direction[2]) < 0.999 else np.array([0.0, 1.0, 0.0])
+    right = np.cross(world_up, direction)
+    right /= np.linalg.norm(right)
+    return right, np.cross(direction, right)
+
+
+def project_points(
+    points: "np.ndarray",
+    direction: "np.ndarray",
+    resolution: int = 64,
+    extent: float = None,
+) -> tuple["np.ndarray", "np.ndarray"]:
+    """Orthographically projects points onto an image plane facing direction.
+
+    Args:
+        points (np.ndarray): Points of shape (n_points, 3).
+        direction (np.ndarray): Direction from the origin to the camera.
+        resolution (int): Width and height of the image in pixels.
+        extent (float): Half width of the image plane. Defaults to the largest distance of a point to the origin.
+
+    Returns:
+        np.ndarray, np.ndarray: flat pixel index of each point and its depth (distance to the image plane
+        through the origin, growing away from the camera)
+    """
+    direction = direction / np.linalg.norm(direction)
+    right, up = get_view_basis(direction)
+    extent = np.linalg.norm(points, axis=1).max() if extent is None else extent
+    pixel_xy = ((points @ np.stack((right, up), axis=1) / extent + 1) / 2 * resolution).astype(np.int64)
+    np.clip(pixel_xy, 0, resolution - 1, out=pixel_xy)
+    return pixel_xy[:, 1] * resolution + pixel_xy[:, 0], -(points @ direction)
+
+
+def rasterize_points(
+    points: "np.ndarray",
+    direction: "np.ndarray",
+    resolution: int = 64,
+    extent: float = None,
+) -> tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """Orthographically projects surface points onto an image plane facing direction and resolves
+    visibility with a depth buffer. The points act as splats of (at least) one pixel.
+
+    Args:
+        points (np.ndarray): Surface points of shape (n_points, 3).
+        direction (np.ndarray): Direction from the origin to the camera.
+        resolution (int): Width and height of the depth buffer in pixels.
+        extent (float): Half width of the image plane. Defaults to the largest distance of a point to the origin.
+
+    Returns:
+        np.ndarray, np.ndarray, np.ndarray: flat indices of all covered pixels, the index of the
+        front-most point in each covered pixel and its depth (distance to the image plane through the origin)
+    """
+    pixels, depth = project_points(points, direction, resolution=resolution, extent=extent)
+
+    # Sort by pixel, then depth. The first point of each pixel is the visible one.
+    order = np.lexsort((depth, pixels))
+    sorted_pixels = pixels[order]
+    is_first = np.ones(len(order), dtype=bool)
+    is_first[1:] = sorted_pixels[1:] != sorted_pixels[:-1]
+    front = order[is_first]
+    return pixels[front], front, depth[front]
+
+
+def score_viewpoints(
+    vertices: "np.ndarray",
+    faces: "np.ndarray",
+    directions: "np.ndarray",
+    metric: str = "entropy",
+    resolution: int = 64,
+    n_points: int = 20000,
+    rng: "np.random.Generator" = None,
+) -> "np.ndarray":
+    """Returns a score for each view direction that rates how much of the mesh is visible from there.
+
+    Metrics:
+        - entropy: Viewpoint entropy of the projected face areas, including the background
+          (Vázquez et al., "Viewpoint Selection using Viewpoint Entropy", 2001).
+        - silhouette: Fraction of the image covered by the mesh.
+        - visible_area: Fraction of the mesh surface area visible from the view.
+
+    Args:
+        vertices (np.ndarray): Vertices of shape (n_vertices, 3). Expected to be normalized (see mesh.normalize_mesh).
+        faces (np.ndarray): Triangle vertex indices of shape (n_faces, 3).
+        directions (np.ndarray): View directions (from the origin to the camera) of shape (n_views, 3).
+        metric (str): One of VIEWPOINT_METRICS.
+        resolution (int): Resolution of the depth buffer.
+        n_points (int): Number of surface points used as splats.
+        rng (np.random.Generator): Random generator for surface sampling.
+    """
+    assert metric in VIEWPOINT_METRICS, f"Unknown viewpoint metric {metric}. Use one of {VIEWPOINT_METRICS}"
+    points, face_ids = mesh.sample_surface(vertices, faces, n_points=n_points, rng=rng)
+    _, face_areas = mesh.get_face_normals_and_areas(vertices, faces)
+    extent = np.linalg.norm(points, axis=1).max()
+    n_pixels = resolution * resolution
+
+    scores = np.empty(len(directions))
+    for i, direction in enumerate(directions):
+        _, front, _ = rasterize_points(points, direction, resolution=resolution, extent=extent)
+        if metric == "silhouette":
+            scores[i] = len(front) / n_pixels
+            continue
+        visible_faces, face_pixels = np.unique(face_ids[front], return_counts=True)
+        if metric == "visible_area":
+            scores[i] = face_areas[visible_faces].sum() / face_areas.sum()
+            continue
+        p = np.append(face_pixels, n_pixels - len(front)) / n_pixels
+        p = p[p > 0]
+        scores[i] = -(p * np.log2(p)).sum()
+    return scores
+
+
+def select_diverse_viewpoints(
+    directions: "np.ndarray",
+    scores: "np.ndarray",
+    k: int,
+    diversity: float = 0.5,
+) -> "np.ndarray":
+    """Greedily selects k views with high scores that are spread over the sphere (maximal marginal relevance).
+
+    Each step picks the view maximizing (1 - diversity) * score - diversity * similarity, where score is
+    normalized to [0, 1] and similarity is the (non-negative) cosine similarity to the closest selected view.
+
+    Args:
+        directions (np.ndarray): Candidate view directions of shape (n_views, 3).
+        scores (np.ndarray): Score of each candidate.
+        k (int): Number of views to select.
+        diversity (float): Trade-off between score (0) and diversity (1).
+
+    Returns:
+        np.ndarray: Indices of the selected views in order of selection.
+    """
+    assert 0 < k <= len(directions), f"Cannot select {k} of {len(directions)} views"
+    directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+    score_range = scores.max() - scores.min()
+    relevance = (scores - scores.min()) / (score_range if score_range > 0 else 1.0)
+
+    selected = [int(np.argmax(relevance))]
+    similarity = np.maximum(directions @ directions[selected[0]], 0.0)
+    for _ in range(k - 1):
+        mmr = (1 - diversity) * relevance - diversity * similarity
+        mmr[selected] = -np.inf
+        selected.append(int(np.argmax(mmr)))
+        similarity = np.maximum(similarity, directions @ directions[selected[-1]])
+    return np.array(selected)
+
+
+def get_importance_viewpoints(
+    mesh_file: str,
+    n: int,
+    n_candidates: int = 256,
+    metric: str = "entropy",
+    diversity: float = 0.5,
+    resolution: int = 64,
+    n_points: int = 20000,
+    rng: "np.random.Generator" = None,
+) -> "np.ndarray":
+    """Returns n view directions (unit vectors) that show the most information of the given mesh.
+
+    Candidates are spread evenly over the unit sphere (sphere_equidistant), scored with score_viewpoints
+    and reduced to n diverse views with select_diverse_viewpoints.
+
+    Args:
+        mesh_file (str): Path to a .glb or .obj file of the part.
+        n (int): Number of views to select.
+        n_candidates (int): Number of candidate views. At least n.
+        metric (str): Viewpoint metric, one of VIEWPOINT_METRICS.
+        diversity (float): Trade-off between score (0) and diversity (1) of the selected views.
+        resolution (int): Resolution of the depth buffer.
+        n_points (int): Number of surface points used as splats.
+        rng (np.random.Generator): Random generator for surface sampling.
+
+    Returns:
+        np.ndarray: Selected view directions of shape (n, 3).
+    """
+    vertices, faces = mesh.load_mesh(mesh_file)
+    vertices = mesh.normalize_mesh(vertices)
+    candidates = sampling.sphere_equidistant(n_samples=max(n_candidates, n))
+    scores = score_viewpoints(
+        vertices, faces, candidates, metric=metric, resolution=resolution, n_points=n_points, rng=rng
+    )
+    return candidates[select_diverse_viewpoints(candidates, scores, k=n, diversity=diversity)]
@@ -0,0 +1,300 @@
+"""Parameter sweep of preprocessing: loads metadata and parses parts once and writes one RCFG per option combination.
+
+Every combination of the given camera, light, material and envmap modes and seeds becomes a variant in
+{out_dir}/variants/{camera}_{light}_{material}_{envmap}_c{camera_seed}_l{light_seed}/rcfg.json.
+Variants are built in worker processes that receive the parsed parts once at startup.
+{out_dir}/sweep_manifest.json lists the inputs and all generated variants.
+
+Run from project root:
+    python preprocessing_sweep.py --topex_metadata_file ./data/mini_example/mini_example.xlsx \
+        --topex_blend_file ./data/mini_example/mini_example.blend --materials_dir ./data/mini_example/materials \
+        --out_dir ./out/sweep --camera_def_mode sphere-uniform --camera_def_mode circular \
+        --light_seed 43 --light_seed 44 --n_workers 4
+"""
+import concurrent.futures
+import itertools
+import json
+import os
+from types import SimpleNamespace
+import logging
+import click
+
+from utils import logger_utils, timer_utils, trace_utils
+from preprocessing.preprocessing_controller import PreprocessingController
+
+LOGGER = logging.getLogger(__name__)
+
+# Parsed base controller of a worker process, set by init_worker
+_BASE_CONTROLLER = None
+
+
+def init_worker(base_controller: PreprocessingController, trace_dir: str) -> None:
+    """Worker process initializer: keeps the parsed base controller for all variants of the worker."""
+    global _BASE_CONTROLLER  # pylint: disable=global-statement
+    _BASE_CONTROLLER = base_controller
+    trace_utils.init_tracer(trace_dir, "preprocessing_sweep_worker")
+
+
+def get_variant_name(options: dict) -> str:
+    """Returns the directory name of a sweep variant."""
+    return (
+        f"{options['camera_def_mode']}_{options['light_def_mode']}_{options['material_def_mode']}"
+        f"_{options['envmap_def_mode']}_c{options['camera_seed']}_l{options['light_seed']}"
+    )
+
+
+def build_variant(options: dict, variants_dir: str, n_images: int, compact_rcfg: bool) -> dict:
+    """Builds and exports the RCFG of one sweep variant with the base controller of the worker.
+
+    Args:
+        options (dict): camera_def_mode, light_def_mode, material_def_mode, envmap_def_mode, camera_seed, light_seed
+        variants_dir (str): Parent directory of the variant directories.
+        n_images (int): Number of images per part.
+        compact_rcfg (bool): Write the RCFG without indentation.
+
+    Returns:
+        dict: manifest entry of the variant
+    """
+    tstart = timer_utils.time_now()
+    name = get_variant_name(options)
+    with trace_utils.span("sweep_variant", variant=name):
+        ppc = _BASE_CONTROLLER.get_variant(output_dir=f"{variants_dir}/{name}", n_images=n_images, **options)
+        if ppc.materials_dir:
+            ppc.assign_materials()
+        ppc.build_scenes(n_workers=1)
+        ppc.export_rcfg_json(filename="rcfg.json", indent=None if compact_rcfg else 4)
+        if ppc.view_check != "disabled":
+            ppc.export_view_check_stats(filename="view_check_stats.json")
+    return {
+        "name": name,
+        "rcfg_file": f"{ppc.output_dir}/rcfg.json",
+        "options": options,
+        "n_images": ppc.n_images,
+        "seconds": timer_utils.time_now() - tstart,
+    }
+
+
+@click.command()
+@click.option(
+    "--topex_metadata_file",
+    help="Path to xlsx metadata file for topex metadata (machine-metadata.xlsx)",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True),
+    default=None,
+)
+@click.option(
+    "--topex_blend_file",
+    help="Path to blender file from topex (machine.blend)",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True),
+    default=None,
+)
+@click.option(
+    "--materials_dir",
+    help="Path to blender materials directory for topex machine parts",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, readable=True),
+    default=None,
+)
+@click.option(
+    "--obj_dir",
+    help="Input directory for .obj files for data not related to topex. (e.g. ModelNet)",
+    type=click.Path(exists=False, file_okay=False, dir_okay=True),
+    default=None,
+)
+@click.option(
+    "--mesh_dir",
+    help="Directory with previously exported .glb files of the parts (named by part id). Required by camera_def_mode "
+    "importance: run the preprocessing with another camera_def_mode, export_gltfs.py on its RCFG, then the "
+    "preprocessing again with --mesh_dir set to the export directory",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, readable=True),
+    default=None,
+)
+@click.option(
+    "--out_dir",
+    help="Output root directory of the sweep (created if not existent)",
+    type=click.Path(exists=False, file_okay=False, dir_okay=True),
+    show_default=True,
+    default="./out/sweep",
+)
+@click.option(
+    "--n_images_per_part",
+    help="Number of images to render for each part",
+    type=click.INT,
+    show_default=True,
+    default=10,
+)
+@click.option(
+    "--camera_def_mode",
+    help="Camera definition modes of the sweep (repeatable). importance needs --mesh_dir",
+    type=click.Choice(choices=PreprocessingController.CAMERA_DEF_MODES),
+    multiple=True,
+    show_choices=True,
+    default=[PreprocessingController.CAMERA_DEF_MODES[0]],
+)
+@click.option(
+    "--light_def_mode",
+    help="Light definition modes of the sweep (repeatable)",
+    type=click.Choice(choices=PreprocessingController.LIGHT_DEF_MODES),
+    multiple=True,
+    show_choices=True,
+    default=[PreprocessingController.LIGHT_DEF_MODES[0]],
+)
+@click.option(
+    "--material_def_mode",
+    help="Material definition modes of the sweep (repeatable)",
+    type=click.Choice(choices=PreprocessingController.MATERIAL_DEF_MODES),
+    multiple=True,
+    show_choices=True,
+    default=[PreprocessingController.MATERIAL_DEF_MODES[0]],
+)
+@click.option(
+    "--envmap_def_mode",
+    help="Environment Map definition modes of the sweep (repeatable)",
+    type=click.Choice(choices=PreprocessingController.ENVMAP_DEF_MODES),
+    multiple=True,
+    show_choices=True,
+    default=[PreprocessingController.ENVMAP_DEF_MODES[0]],
+)
+@click.option(
+    "--camera_seed",
+    help="Random camera seeds of the sweep (repeatable)",
+    type=int,
+    multiple=True,
+    default=[42],
+)
+@click.option(
+    "--light_seed",
+    help="Random light seeds of the sweep (repeatable)",
+    type=int,
+    multiple=True,
+    default=[43],
+)
+@click.option(
+    "--shared_scenes",
+    help="Use the same cameras and lights for all parts instead of sampling them for each part",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--n_workers",
+    help="Number of worker processes, each builds whole variants",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=1,
+)
+@click.option(
+    "--view_check",
+    help="Check render setups for degenerate views (see preprocessing.py)",
+    type=click.Choice(choices=PreprocessingController.VIEW_CHECK_MODES),
+    show_default=True,
+    show_choices=True,
+    default=PreprocessingController.VIEW_CHECK_MODES[0],
+)
+@click.option(
+    "--cache_dir",
+    help="Cache of prepared metadata and parsed parts, keyed by the metadata file content and the parser version. "
+    "Default: {out_dir}/cache",
+    type=click.Path(file_okay=False, dir_okay=True, writable=True),
+    default=None,
+)
+@click.option(
+    "--no_cache",
+    help="Always read the metadata file and parse the parts, do not read or write the cache",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--trace_dir",
+    help="Record spans of the sweep to {trace_dir}/preprocessing_sweep*.trace.jsonl (see utils/trace_utils.py)",
+    type=click.Path(file_okay=False, dir_okay=True, writable=True),
+    default=None,
+)
+@click.option(
+    "--compact_rcfg",
+    help="Write the RCFGs without indentation (faster and smaller for large machines)",
+    is_flag=True,
+    default=False,
+)
+def main(**kwargs):
+    args = SimpleNamespace(**kwargs)
+    out_dir = args.out_dir
+
+    # Init Logger
+    log_dir = f"{out_dir}/logs"
+    os.makedirs(log_dir, exist_ok=True)
+    logger_utils.init_logger(output_path=log_dir)
+
+    tstart = timer_utils.time_now()
+    LOGGER.info("Start preprocessing sweep with options:")
+    LOGGER.info(args)
+    trace_utils.init_tracer(args.trace_dir, "preprocessing_sweep")
+
+    # All combinations, duplicates of repeated option values removed
+    matrix = {
+        "camera_def_mode": list(dict.fromkeys(args.camera_def_mode)),
+        "light_def_mode": list(dict.fromkeys(args.light_def_mode)),
+        "material_def_mode": list(dict.fromkeys(args.material_def_mode)),
+        "envmap_def_mode": list(dict.fromkeys(args.envmap_def_mode)),
+        "camera_seed": list(dict.fromkeys(args.camera_seed)),
+        "light_seed": list(dict.fromkeys(args.light_seed)),
+    }
+    variant_options = [dict(zip(matrix.keys(), values)) for values in itertools.product(*matrix.values())]
+    LOGGER.info(f"Sweep over {len(variant_options)} variants")
+
+    with trace_utils.span("preprocessing_sweep", out_dir=out_dir, n_variants=len(variant_options)):
+        # Load metadata and parse parts once, the first variant's options are only used for validation
+        base = PreprocessingController(
+            metadata_file=args.topex_metadata_file,
+            blend_file=args.topex_blend_file,
+            materials_dir=args.materials_dir,
+            obj_dir=args.obj_dir,
+            output_dir=out_dir,
+            n_images=args.n_images_per_part,
+            shared_scenes=args.shared_scenes,
+            mesh_dir=args.mesh_dir,
+            view_check=args.view_check,
+            cache_dir=None if args.no_cache else args.cache_dir or f"{out_dir}/cache",
+            **variant_options[0],
+        )
+        if "importance" in matrix["camera_def_mode"]:
+            # Fail before the workers start instead of in the first importance variant
+            base.check_mesh_files(base.get_mesh_files())
+        if args.topex_metadata_file:
+            base.export_augmented_metadata(filename="metadata", fileformats=["csv", "xlsx"])
+
+        variants_dir = f"{out_dir}/variants"
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(args.n_workers, len(variant_options)),
+            initializer=init_worker,
+            initargs=(base, args.trace_dir),
+        ) as executor:
+            futures = [
+                executor.submit(build_variant, options, variants_dir, args.n_images_per_part, args.compact_rcfg)
+                for options in variant_options
+            ]
+            variants = []
+            for i, future in enumerate(futures):
+                variants.append(future.result())
+                LOGGER.info(f"Variant {i + 1}/{len(futures)} {variants[-1]['name']} ({variants[-1]['seconds']:.1f}s)")
+
+    manifest = {
+        "inputs": {
+            "topex_metadata_file": args.topex_metadata_file,
+            "topex_blend_file": args.topex_blend_file,
+            "materials_dir": args.materials_dir,
+            "obj_dir": args.obj_dir,
+            "mesh_dir": args.mesh_dir,
+            "n_images_per_part": args.n_images_per_part,
+            "shared_scenes": args.shared_scenes,
+            "view_check": args.view_check,
+        },
+        "n_parts": len(base.parts),
+        "matrix": matrix,
+        "variants": variants,
+    }
+    with open(f"{out_dir}/sweep_manifest.json", "w") as f:
+        json.dump(manifest, f, indent=4)
+
+    LOGGER.info(f"Preprocessing sweep of {len(variants)} variants finished in {timer_utils.time_since(tstart)}")
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,144 @@
+"""Benchmark depth map encodings: bytes written, write time and precision of each option.
+
+Compares EXR files (codec x half/full float x RGBA/BW channels, written by Blender like the render compositor)
+with per-part .npz and .npy stacks (utils/depth_stack.py). Synthetic depth maps of a sphere with background are used.
+
+Run from project root with Blender (EXR + stacks):
+    blender -b -P scripts/benchmarks/bench_depth_encoding.py -- --res 512 --n_images 32
+or without Blender (stacks only):
+    python scripts/benchmarks/bench_depth_encoding.py --res 512 --n_images 32
+"""
+import argparse
+import os
+import sys
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from utils import depth_stack as depth_stacks  # pylint: disable=wrong-import-position
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+EXR_CODECS = ["NONE", "ZIP", "PIZ", "DWAA"]
+# render.py --depth_exr_color_mode
+EXR_COLOR_MODES = ["RGBA", "BW"]
+
+
+def get_synthetic_depth_maps(n_images: int, res: int, seed: int = 0) -> list["np.ndarray"]:
+    """Returns depth maps of a sphere at random offsets, with Blender's background depth around it."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[-1 : 1 : res * 1j, -1 : 1 : res * 1j]
+    depth_maps = []
+    for _ in range(n_images):
+        cx, cy = rng.uniform(-0.3, 0.3, 2)
+        r2 = (x - cx) ** 2 + (y - cy) ** 2
+        depth = np.full((res, res), depth_stacks.BLENDER_BACKGROUND_DEPTH, dtype=np.float32)
+        inside = r2 < 0.5
+        depth[inside] = 3.0 - np.sqrt(0.5 - r2[inside]) + rng.normal(0, 1e-3, inside.sum())
+        depth_maps.append(depth)
+    return depth_maps
+
+
+def bench_exr(depth_maps: list["np.ndarray"], out_dir: str, codec: str, color_depth: str, color_mode: str) -> dict:
+    """Writes each depth map as EXR with Blender and returns bytes, seconds and max error."""
+    res = depth_maps[0].shape[0]
+    image_settings = bpy.context.scene.render.image_settings
+    image_settings.file_format = "OPEN_EXR"
+    image_settings.color_mode = color_mode
+    image_settings.color_depth = color_depth
+    image_settings.exr_codec = codec
+    image = bpy.data.images.new("depth", width=res, height=res, float_buffer=True)
+
+    seconds, file_paths = 0.0, []
+    for i, depth in enumerate(depth_maps):
+        pixels = np.repeat(depth[::-1].reshape(-1, 1), 4, axis=1)
+        pixels[:, 3] = 1.0
+        image.pixels.foreach_set(pixels.ravel())
+        file_path = f"{out_dir}/depth_{codec}_{color_depth}_{color_mode}_{i:03d}.exr"
+        tstart = time.perf_counter()
+        image.save_render(file_path, scene=bpy.context.scene)
+        seconds += time.perf_counter() - tstart
+        file_paths.append(file_path)
+    bpy.data.images.remove(image)
+
+    # Precision on the object (background exceeds the half float range)
+    readback = bpy.data.images.load(file_paths[0])
+    values = np.empty(res * res * readback.channels, dtype=np.float32)
+    readback.pixels.foreach_get(values)
+    bpy.data.images.remove(readback)
+    depth = values.reshape(res, res, -1)[::-1, :, 0]
+    on_object = depth_maps[0] < depth_stacks.BLENDER_BACKGROUND_DEPTH
+    return {
+        "bytes": sum(os.path.getsize(file_path) for file_path in file_paths),
+        "seconds": seconds,
+        "max_error": float(np.abs(depth[on_object] - depth_maps[0][on_object]).max()),
+    }
+
+
+def bench_stack(depth_maps: list["np.ndarray"], out_dir: str, stack_format: str, dtype: str) -> dict:
+    """Writes the depth maps as a single stack and returns bytes, seconds, read seconds and max error."""
+    tstart = time.perf_counter()
+    file_paths = depth_stacks.write_depth_stack(
+        out_dir, f"bench_{dtype}", depth_maps, list(range(len(depth_maps))), stack_format=stack_format, dtype=dtype
+    )
+    seconds = time.perf_counter() - tstart
+
+    tstart = time.perf_counter()
+    depth, _ = depth_stacks.load_depth_stack(file_paths[0])
+    depth_0 = np.asarray(depth[0], dtype=np.float32)
+    read_seconds = time.perf_counter() - tstart
+    on_object = depth_maps[0] < depth_stacks.BLENDER_BACKGROUND_DEPTH
+    return {
+        "bytes": sum(os.path.getsize(file_path) for file_path in file_paths),
+        "seconds": seconds,
+        "read_first_seconds": read_seconds,
+        "max_error": float(np.abs(depth_0[on_object] - depth_maps[0][on_object]).max()),
+    }
+
+
+def get_args():
+    """Returns script arguments. Arguments after -- are used when running inside Blender."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--res", help="Resolution of the depth maps.", type=int, default=256)
+    parser.add_argument("--n_images", help="Number of depth maps (views of a part).", type=int, default=32)
+    script_args = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else sys.argv[1:]
+    args, _ = parser.parse_known_args(script_args)
+    return args
+
+
+def main():
+    args = get_args()
+    depth_maps = get_synthetic_depth_maps(args.n_images, args.res)
+    out_dir = tempfile.mkdtemp(prefix="bench_depth_")
+    results = {}
+    try:
+        if bpy is not None:
+            for codec in EXR_CODECS:
+                for color_depth in ["16", "32"]:
+                    for color_mode in EXR_COLOR_MODES:
+                        results[f"exr_{codec.lower()}_{color_depth}_{color_mode.lower()}"] = bench_exr(
+                            depth_maps, out_dir, codec, color_depth, color_mode
+                        )
+        else:
+            print("Blender not available, skipping EXR encodings")
+        for stack_format in depth_stacks.DEPTH_STACK_FORMATS[1:]:
+            for dtype in ["float16", "float32"]:
+                results[f"stack_{stack_format}_{dtype}"] = bench_stack(depth_maps, out_dir, stack_format, dtype)
+    finally:
+        shutil.rmtree(out_dir)
+
+    print(f"{args.n_images} depth maps of {args.res}x{args.res}")
+    print(f"{'encoding':<24}{'MB':>10}{'write s':>10}{'max error':>12}")
+    for name, result in results.items():
+        print(f"{name:<24}{result['bytes'] / 1e6:>10.2f}{result['seconds']:>10.3f}{result['max_error']:>12.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Benchmark GLB export settings: file size, export time, Blender import time and geometric error.
+
+Exports representative parts of a .blend machine (mesh objects spread over the range of triangle counts) with
+each setting of SETTINGS (export_gltfs.get_export_options), then imports every GLB into an empty scene.
+The error is the largest distance of an imported vertex to the nearest original vertex, relative to the
+bounding box diagonal of the part (0 for lossless settings), measured on up to --max_error_vertices vertices.
+
+Run from project root with Blender and a machine .blend (e.g. scripts/benchmarks/build_synthetic_blend.py):
+    blender /path/to/machine.blend -b -P scripts/benchmarks/bench_glb_compression.py -- --n_parts 8
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import bpy
+import mathutils
+from mathutils.kdtree import KDTree
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from bpy_modules import export_gltfs  # pylint: disable=wrong-import-position
+
+SETTINGS = {
+    "baseline": export_gltfs.get_export_options(),
+    "no_images": export_gltfs.get_export_options(image_format="NONE"),
+    "draco_l1": export_gltfs.get_export_options(mesh_compression="draco", draco_level=1),
+    "draco_l6": export_gltfs.get_export_options(mesh_compression="draco"),
+    "draco_l10": export_gltfs.get_export_options(mesh_compression="draco", draco_level=10),
+    "draco_l6_q11": export_gltfs.get_export_options(
+        mesh_compression="draco", position_bits=11, normal_bits=8, texcoord_bits=10
+    ),
+    "draco_l6_lossless": export_gltfs.get_export_options(mesh_compression="draco", position_bits=0),
+}
+
+
+def get_representative_parts(n_parts: int) -> list[bpy.types.Object]:
+    """Returns n mesh objects evenly spread over the objects sorted by triangle count."""
+    objects = sorted(
+        (obj for obj in bpy.data.objects if obj.type == "MESH" and len(obj.data.polygons) > 0),
+        key=lambda obj: sum(len(polygon.vertices) - 2 for polygon in obj.data.polygons),
+    )
+    if len(objects) <= n_parts:
+        return objects
+    if n_parts == 1:
+        return objects[-1:]
+    return [objects[round(i * (len(objects) - 1) / (n_parts - 1))] for i in range(n_parts)]
+
+
+def get_world_vertices(objects: list) -> list[mathutils.Vector]:
+    return [obj.matrix_world @ vertex.co for obj in objects if obj.type == "MESH" for vertex in obj.data.vertices]
+
+
+def get_max_error(reference: list[mathutils.Vector], vertices: list[mathutils.Vector], max_vertices: int) -> float:
+    """Returns the largest distance of the vertices to their nearest reference vertex, relative to the bounding
+    box diagonal of the reference."""
+    kd_tree = KDTree(len(reference))
+    for i, vertex in enumerate(reference):
+        kd_tree.insert(vertex, i)
+    kd_tree.balance()
+    if len(vertices) > max_vertices:
+        vertices = random.Random(0).sample(vertices, max_vertices)
+    bbox_min = mathutils.Vector([min(v[i] for v in reference) for i in range(3)])
+    bbox_max = mathutils.Vector([max(v[i] for v in reference) for i in range(3)])
+    diagonal = (bbox_max - bbox_min).length or 1.0
+    return max((kd_tree.find(vertex)[2] for vertex in vertices), default=0.0) / diagonal
+
+
+def get_args():
+    """Returns script arguments as python variables."""
+    parser = argparse.ArgumentParser()
+    argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    parser.add_argument("--n_parts", help="Number of representative parts", type=int, default=8)
+    parser.add_argument("--setting", help="Settings to compare (default: all)", action="append", choices=SETTINGS)
+    parser.add_argument("--max_error_vertices", help="Vertices per part checked for the error", type=int, default=10000)
+    parser.add_argument("--out_json", help="Write the results to this file", type=str, default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = get_args()
+    assert bpy.data.filepath, "Open a machine .blend: blender /path/to/machine.blend -b -P ..."
+    settings = args.setting or list(SETTINGS)
+    parts = get_representative_parts(args.n_parts)
+    references = {obj.name: get_world_vertices([obj]) for obj in parts}
+    n_triangles = sum(sum(len(polygon.vertices) - 2 for polygon in obj.data.polygons) for obj in parts)
+    print(f"GLB compression benchmark [{len(parts)} parts, {n_triangles} triangles, {bpy.data.filepath}]")
+
+    out_dir = tempfile.mkdtemp(prefix="synthnet_glb_bench_")
+    results = {}
+    try:
+        # Export all settings first, imports replace the opened machine with empty scenes
+        for setting in settings:
+            os.makedirs(f"{out_dir}/{setting}")
+            tstart = time.perf_counter()
+            for obj in parts:
+                export_gltfs.export_gltf([obj], f"{out_dir}/{setting}/{obj.name}.glb", SETTINGS[setting])
+            results[setting] = {
+                "export_seconds": time.perf_counter() - tstart,
+                "bytes": sum(os.path.getsize(f"{out_dir}/{setting}/{obj.name}.glb") for obj in parts),
+            }
+        part_names = [obj.name for obj in parts]
+        for setting in settings:
+            import_seconds, max_error = 0.0, 0.0
+            for name in part_names:
+                bpy.ops.wm.read_homefile(use_empty=True)
+                tstart = time.perf_counter()
+                bpy.ops.import_scene.gltf(filepath=f"{out_dir}/{setting}/{name}.glb")
+                import_seconds += time.perf_counter() - tstart
+                vertices = get_world_vertices(bpy.context.scene.objects)
+                max_error = max(max_error, get_max_error(references[name], vertices, args.max_error_vertices))
+            results[setting].update({"import_seconds": import_seconds, "max_error": max_error})
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    baseline = results[settings[0]]
+    print(f"{'setting':20s} {'MB':>9s} {'ratio':>6s} {'export s':>9s} {'import s':>9s} {'max error':>10s}")
+    for setting, result in results.items():
+        print(
+            f"{setting:20s} {result['bytes'] / 1e6:9.2f} {baseline['bytes'] / result['bytes']:6.2f} "
+            f"{result['export_seconds']:9.3f} {result['import_seconds']:9.3f} {result['max_error']:10.2e}"
+        )
+    if args.out_json:
+        with open(args.out_json, "w") as f:
+            json.dump({"parts": part_names, "n_triangles": n_triangles, "results": results}, f, indent=4)
@@ -0,0 +1,79 @@
+"""Benchmark material lookup of apply_materials: prefix index (utils/material_index.py) against the former loop.
+
+legacy: every object name is compared with every single part id (startswith), as in the former apply_materials
+index:  MaterialIndex trie, built once per part, one walk over the characters of each object name
+
+Both return the same material for every object, which is checked before timing. Object names are single part ids
+with Blender suffixes (".001") and some objects that match no single part.
+
+Run from project root:
+    python scripts/benchmarks/bench_material_index.py --n_single_parts 5000 --n_objects 20000
+"""
+import os
+import random
+import sys
+import time
+import uuid
+
+import click
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from utils import material_index  # pylint: disable=wrong-import-position
+
+MATERIALS = ["synthnet_plastic_matte_yellow.blend", "synthnet_steel_burnished_natural.blend", "none"]
+
+
+def build_inputs(n_single_parts: int, n_objects: int, seed: int) -> tuple[list[dict], list[str]]:
+    """Returns single parts with random materials and object names derived from their ids."""
+    rng = random.Random(seed)
+    single_parts = [
+        {"id": uuid.UUID(int=rng.getrandbits(128)).hex[:16], "material": rng.choice(MATERIALS)}
+        for _ in range(n_single_parts)
+    ]
+    names = []
+    for i in range(n_objects):
+        if rng.random() < 0.05:
+            names.append(f"unmatched_{i}")
+        else:
+            names.append(f"{rng.choice(single_parts)['id']}.{i % 1000:03d}")
+    return single_parts, names
+
+
+def lookup_legacy(single_parts: list[dict], names: list[str]) -> list:
+    materials = []
+    for name in names:
+        material = None
+        for single_part in single_parts:
+            if name.startswith(single_part["id"]):
+                if single_part["material"] in ["none", None]:
+                    continue
+                material = single_part["material"]
+                break
+        materials.append(material)
+    return materials
+
+
+def lookup_index(single_parts: list[dict], names: list[str]) -> list:
+    index = material_index.MaterialIndex(single_parts)
+    return [index.lookup(name)[0] for name in names]
+
+
+@click.command()
+@click.option("--n_single_parts", help="Number of single parts of the part", type=int, show_default=True, default=2000)
+@click.option("--n_objects", help="Number of mesh objects in the scene", type=int, show_default=True, default=10_000)
+@click.option("--seed", help="Random seed", type=int, show_default=True, default=0)
+def main(n_single_parts: int, n_objects: int, seed: int):
+    print(f"Material lookup benchmark [n_single_parts={n_single_parts}, n_objects={n_objects}]")
+    single_parts, names = build_inputs(n_single_parts, n_objects, seed)
+    times, results = {}, {}
+    for name, lookup in {"legacy": lookup_legacy, "index": lookup_index}.items():
+        tstart = time.perf_counter()
+        results[name] = lookup(single_parts, names)
+        times[name] = time.perf_counter() - tstart
+        print(f"{name:8s} {times[name]:8.4f}s | {n_objects / times[name]:12.0f} objects/s | x{times['legacy'] / times[name]:.1f}")
+    assert results["legacy"] == results["index"], "Prefix index and legacy loop disagree"
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
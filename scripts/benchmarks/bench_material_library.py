@@ -0,0 +1,81 @@
+"""Benchmark material loading: one .blend per material against a compiled material library.
+
+files:   render.get_bpy_materials, one bpy.data.libraries.load per material file, textures at authoring size
+library: build_material_library.load_material_library, one load of the library with downscaled textures
+
+Load times include decoding the textures of all loaded materials. Texture memory is the size of the decoded pixel
+buffers. Build times of the library are reported for a cold build and an unchanged rebuild (manifest hit).
+
+Run from project root with Blender:
+    blender -b -P scripts/benchmarks/bench_material_library.py -- --material_dir ./data/mini_example/materials --res 256
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import bpy
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from bpy_modules import build_material_library  # pylint: disable=wrong-import-position
+from bpy_modules import render  # pylint: disable=wrong-import-position
+from utils import material_library  # pylint: disable=wrong-import-position
+
+
+def measure_load(load_materials, repeat: int) -> tuple[float, int, int]:
+    """Returns the best load time, the texture memory and the number of materials of a load function."""
+    times = []
+    for _ in range(repeat):
+        bpy.ops.wm.read_homefile(use_empty=True)
+        tstart = time.perf_counter()
+        materials = load_materials()
+        images = {
+            image
+            for material in materials.values()
+            if material.node_tree is not None
+            for image in build_material_library.get_node_images(material.node_tree)
+        }
+        texture_bytes = build_material_library.get_texture_memory(images)
+        times.append(time.perf_counter() - tstart)
+    return min(times), texture_bytes, len(materials)
+
+
+def get_args():
+    """Returns script arguments as python variables."""
+    parser = argparse.ArgumentParser()
+    argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    parser.add_argument("--material_dir", type=str, default="./data/mini_example/materials")
+    parser.add_argument("--res", help="Render resolution (square)", type=int, default=256)
+    parser.add_argument("--texture_size", help="Defaults to the size for --res", type=int, default=None)
+    parser.add_argument("--repeat", help="Runs per method (best is reported)", type=int, default=3)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = get_args()
+    texture_size = args.texture_size or material_library.get_texture_size(args.res, args.res)
+    library_dir = tempfile.mkdtemp(prefix="synthnet_material_library_")
+    try:
+        tstart = time.perf_counter()
+        build_material_library.build_library(args.material_dir, library_dir, texture_size)
+        build_cold = time.perf_counter() - tstart
+        tstart = time.perf_counter()
+        build_material_library.build_library(args.material_dir, library_dir, texture_size)
+        build_warm = time.perf_counter() - tstart
+
+        print(f"Material load benchmark [material_dir={args.material_dir}, texture_size={texture_size}]")
+        print(f"{'build':8s} cold {build_cold:8.3f}s | unchanged rebuild {build_warm:8.3f}s")
+        results = {
+            "files": measure_load(lambda: render.get_bpy_materials(args.material_dir), args.repeat),
+            "library": measure_load(lambda: build_material_library.load_material_library(library_dir), args.repeat),
+        }
+        for name, (seconds, texture_bytes, n_materials) in results.items():
+            print(
+                f"{name:8s} {seconds:8.3f}s | {n_materials:4d} materials | {texture_bytes / 1e6:10.1f} MB textures | "
+                f"x{results['files'][0] / seconds:.1f}"
+            )
+    finally:
+        shutil.rmtree(library_dir, ignore_errors=True)
@@ -0,0 +1,100 @@
+"""Benchmark RCFG validation: compiled validators (utils/rcfg_validation.py) against jsonschema.
+
+legacy:    former PreprocessingController.val_rcfg_json, which reads the schema, serializes the RCFG to a string,
+           parses it again and validates it with jsonschema.validate
+jsonschema: jsonschema.validate of the in-memory RCFG (no JSON round-trip)
+compiled:  compiled validator of the in-memory RCFG
+streaming: compiled validator, one part at a time (as in PreprocessingController.export_rcfg_json)
+
+Run from project root:
+    python scripts/benchmarks/bench_rcfg_validation.py --n_parts 10000 --n_views 32
+"""
+import json
+import os
+import sys
+import time
+
+import click
+import jsonschema
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from preprocessing import define_scenes  # pylint: disable=wrong-import-position
+from preprocessing.models.part import Part  # pylint: disable=wrong-import-position
+from preprocessing.models.single_part import SinglePart  # pylint: disable=wrong-import-position
+from preprocessing.utils import rcfg  # pylint: disable=wrong-import-position
+from utils import rcfg_validation  # pylint: disable=wrong-import-position
+
+SCHEMA_FILE = rcfg_validation.SCHEMA_FILES["topex"]
+
+
+def build_parts(n_parts: int, n_views: int, n_single_parts: int) -> list[Part]:
+    """Returns parts with sampled scenes and shared single parts."""
+    scenes = define_scenes.build_scenes(n_parts, n_views, "sphere-uniform", "sphere-uniform", "static", 42, 43)
+    single_parts = [SinglePart(f"sp-{i}", "single_part") for i in range(n_parts)]
+    return [
+        Part(
+            f"part-{i}",
+            "part",
+            str(i),
+            single_parts=[single_parts[(i + j) % n_parts] for j in range(n_single_parts)],
+            scene=scene,
+        )
+        for i, scene in enumerate(scenes)
+    ]
+
+
+def validate_legacy(parts: list[Part]) -> None:
+    with open(SCHEMA_FILE, "r", encoding="UTF-8") as json_file:
+        rcfg_schema = json.loads(json_file.read())
+    jsonschema.validate(instance=json.loads(rcfg.dumps_rcfg(parts, indent=4)), schema=rcfg_schema)
+
+
+def validate_jsonschema(parts: list[Part]) -> None:
+    with open(SCHEMA_FILE, "r", encoding="UTF-8") as json_file:
+        rcfg_schema = json.load(json_file)
+    jsonschema.validate(instance=rcfg.rcfg_to_dict(parts), schema=rcfg_schema)
+
+
+def validate_compiled(parts: list[Part]) -> None:
+    rcfg_validation.get_validator(SCHEMA_FILE).validate(rcfg.rcfg_to_dict(parts))
+
+
+def validate_streaming(parts: list[Part]) -> None:
+    validator = rcfg_validation.get_validator(SCHEMA_FILE)
+    for i, part in enumerate(parts):
+        validator.validate_part(rcfg.part_to_dict(part), i)
+
+
+@click.command()
+@click.option("--n_parts", help="Number of parts", type=int, show_default=True, default=10_000)
+@click.option("--n_views", help="Number of views (cameras/lights) per part", type=int, show_default=True, default=32)
+@click.option("--n_single_parts", help="Number of single parts per part", type=int, show_default=True, default=8)
+@click.option("--repeat", help="Runs per method (best is reported)", type=int, show_default=True, default=3)
+def main(n_parts: int, n_views: int, n_single_parts: int, repeat: int):
+    print(f"RCFG validation benchmark [n_parts={n_parts}, n_views={n_views}, n_single_parts={n_single_parts}]")
+    parts = build_parts(n_parts, n_views, n_single_parts)
+
+    tstart = time.perf_counter()
+    rcfg_validation.get_validator(SCHEMA_FILE)
+    print(f"{'compile':10s} {time.perf_counter() - tstart:8.4f}s (once per process)")
+
+    methods = {
+        "legacy": validate_legacy,
+        "jsonschema": validate_jsonschema,
+        "compiled": validate_compiled,
+        "streaming": validate_streaming,
+    }
+    times = {}
+    for name, validate in methods.items():
+        runs = []
+        for _ in range(repeat):
+            tstart = time.perf_counter()
+            validate(parts)
+            runs.append(time.perf_counter() - tstart)
+        times[name] = min(runs)
+        print(f"{name:10s} {times[name]:8.4f}s | {n_parts / times[name]:10.0f} parts/s | x{times['legacy'] / times[name]:.1f}")
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,155 @@
+"""Benchmark memory and throughput of the scene model against plain __dict__ models.
+
+The legacy models below replicate the former preprocessing.models classes
+(one Python object per camera/light, duplicated SingleParts, serialization via __dict__).
+
+Run from project root:
+    python scripts/benchmarks/bench_scene_model.py --n_parts 100000 --n_views 32
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import click
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from preprocessing import define_scenes  # pylint: disable=wrong-import-position
+from preprocessing.models.part import Part  # pylint: disable=wrong-import-position
+from preprocessing.models.single_part import SinglePart  # pylint: disable=wrong-import-position
+from preprocessing.utils import rcfg, sampling  # pylint: disable=wrong-import-position
+
+
+class LegacyCamera:
+    def __init__(self, position, type_camera="persp", focal_length=50.0, target=[0, 0, 0], local_rotation=[0.0, 0.0, 0.0]):
+        self.position = position
+        self.type_camera = type_camera
+        self.focal_length = focal_length
+        self.local_rotation = local_rotation
+        self.target = target
+
+
+class LegacyLight:
+    def __init__(self, position, type_light="point", intensity=100, target=[0, 0, 0]):
+        self.position = position
+        self.type_light = type_light
+        self.intensity = intensity
+        self.target = target
+
+
+class LegacyScene:
+    def __init__(self, cameras, lights, envmaps, render_setups):
+        self.cameras = cameras
+        self.lights = lights
+        self.envmaps = envmaps
+        self.render_setups = render_setups
+
+
+class LegacySinglePart:
+    def __init__(self, id, name, material="none"):
+        self.id = id
+        self.name = name
+        self.material = material
+
+
+class LegacyPart:
+    def __init__(self, id, name, hierarchy, is_spare=False, single_parts=[], scene=None):
+        self.id = id
+        self.name = name
+        self.hierarchy = hierarchy
+        self.single_parts = single_parts
+        self.is_spare = is_spare
+        self.scene = scene
+
+
+def build_legacy(n_parts: int, n_views: int, n_single_parts: int) -> list:
+    rngs = sampling.get_rngs(sampling.spawn_seeds(42, n_parts))
+    parts = []
+    for i, rng in enumerate(rngs):
+        cam_positions = sampling.sphere_uniform(n_views, rng=rng).tolist()
+        light_positions = sampling.sphere_uniform(n_views, rng=rng).tolist()
+        roll_angles = np.linspace(0.0, np.pi / 2, n_views, endpoint=False).tolist()
+        scene = LegacyScene(
+            cameras=[LegacyCamera(p, local_rotation=[0.0, 0.0, r]) for p, r in zip(cam_positions, roll_angles)],
+            lights=[LegacyLight(p) for p in light_positions],
+            envmaps=["default.hdr" for _ in range(n_views)],
+            render_setups=[{"camera_i": j, "lights_i": [j], "envmap_fname": "default.hdr"} for j in range(n_views)],
+        )
+        # Every assembly gets its own copies of its single parts
+        single_parts = [LegacySinglePart(f"sp-{(i + j) % n_parts}", "single_part") for j in range(n_single_parts)]
+        parts.append(LegacyPart(f"part-{i}", "part", str(i), single_parts=single_parts, scene=scene))
+    return parts
+
+
+def build_compact(n_parts: int, n_views: int, n_single_parts: int) -> list:
+    scenes = define_scenes.build_scenes(n_parts, n_views, "sphere-uniform", "sphere-uniform", "static", 42, 43)
+    single_parts_index = {}
+    parts = []
+    for i, scene in enumerate(scenes):
+        single_parts = []
+        for j in range(n_single_parts):
+            sp_id = f"sp-{(i + j) % n_parts}"
+            if sp_id not in single_parts_index:
+                single_parts_index[sp_id] = SinglePart(sp_id, "single_part")
+            single_parts.append(single_parts_index[sp_id])
+        parts.append(Part(f"part-{i}", "part", str(i), single_parts=single_parts, scene=scene))
+    return parts
+
+
+def dump_legacy(parts: list, fp) -> None:
+    json.dump({"parts": parts}, fp, default=lambda o: o.__dict__, indent=4, sort_keys=True)
+
+
+def dump_compact(parts: list, fp) -> None:
+    rcfg.dump_rcfg(parts, fp, indent=4)
+
+
+def dump_compact_no_indent(parts: list, fp) -> None:
+    rcfg.dump_rcfg(parts, fp, indent=None)
+
+
+def measure(name: str, build, dumps: dict, n_parts: int, n_views: int, n_single_parts: int) -> None:
+    # Memory is measured in a separate build, as tracemalloc slows down allocations
+    tracemalloc.start()
+    parts = build(n_parts, n_views, n_single_parts)
+    mem_current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del parts
+
+    tstart = time.perf_counter()
+    parts = build(n_parts, n_views, n_single_parts)
+    t_build = time.perf_counter() - tstart
+    print(f"{name:8s} build: {t_build:7.3f}s | memory: {mem_current / 2**20:8.1f} MiB")
+
+    for dump_name, dump in dumps.items():
+        with tempfile.TemporaryFile("w") as fp:
+            tstart = time.perf_counter()
+            dump(parts, fp)
+            t_dump = time.perf_counter() - tstart
+            n_bytes = fp.tell()
+        print(f"{name:8s} serialize ({dump_name}): {t_dump:7.3f}s ({n_bytes / 2**20 / t_dump:6.1f} MiB/s)")
+
+
+@click.command()
+@click.option("--n_parts", help="Number of parts", type=int, show_default=True, default=100_000)
+@click.option("--n_views", help="Number of views (cameras/lights) per part", type=int, show_default=True, default=32)
+@click.option("--n_single_parts", help="Number of single parts per part", type=int, show_default=True, default=8)
+def main(n_parts: int, n_views: int, n_single_parts: int):
+    print(f"Scene model benchmark [n_parts={n_parts}, n_views={n_views}, n_single_parts={n_single_parts}]")
+    measure("legacy", build_legacy, {"indent=4": dump_legacy}, n_parts, n_views, n_single_parts)
+    measure(
+        "compact",
+        build_compact,
+        {"indent=4": dump_compact, "no indent": dump_compact_no_indent},
+        n_parts,
+        n_views,
+        n_single_parts,
+    )
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,88 @@
+"""Benchmark scene sampling (cameras, lights, render setups) for many parts.
+
+Run from project root:
+    python scripts/benchmarks/bench_scene_sampling.py --n_parts 100000 --n_views 32
+"""
+import math
+import os
+import random
+import sys
+import time
+
+import click
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from preprocessing import define_scenes  # pylint: disable=wrong-import-position
+from preprocessing.utils import sampling  # pylint: disable=wrong-import-position
+
+
+def legacy_sphere_uniform(n_samples: int, r_factor: float = 10.0, seed: int = 42) -> list[list]:
+    """Reference implementation: a python loop over points that reseeds the global random state."""
+    np.random.seed(seed)
+    random.seed(seed)
+    points = []
+    for _ in range(n_samples):
+        phi = random.uniform(0, 2 * math.pi)
+        costheta = random.uniform(-1, 1)
+        u = random.uniform(0, 1)
+        theta = math.acos(costheta)
+        r = r_factor * u ** (1.0 / 3.0)
+        points.append([r * math.sin(theta) * math.cos(phi), r * math.sin(theta) * math.sin(phi), r * math.cos(theta)])
+    return points
+
+
+def timed(fn, *args, **kwargs) -> float:
+    """Returns the wall clock time in seconds of calling fn with the given arguments."""
+    tstart = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - tstart
+
+
+@click.command()
+@click.option("--n_parts", help="Number of parts", type=int, show_default=True, default=100_000)
+@click.option("--n_views", help="Number of views (cameras/lights) per part", type=int, show_default=True, default=32)
+@click.option(
+    "--n_workers",
+    help="Worker counts to benchmark build_scenes with",
+    type=int,
+    multiple=True,
+    show_default=True,
+    default=[1, 4],
+)
+@click.option(
+    "--legacy_parts",
+    help="Number of parts to time the legacy per-point loop on (extrapolated to n_parts)",
+    type=int,
+    show_default=True,
+    default=1000,
+)
+def main(n_parts: int, n_views: int, n_workers: tuple, legacy_parts: int):
+    print(f"Scene sampling benchmark [n_parts={n_parts}, n_views={n_views}]")
+
+    t = timed(lambda: [legacy_sphere_uniform(n_views) for _ in range(legacy_parts)])
+    print(f"legacy sphere_uniform loop:       {t / legacy_parts * n_parts:8.3f}s (extrapolated from {legacy_parts})")
+
+    seeds = sampling.spawn_seeds(42, n_parts)
+    t = timed(lambda: sampling.sphere_uniform_batch(sampling.get_rngs(seeds), n_samples=n_views))
+    print(f"sphere_uniform_batch (positions): {t:8.3f}s")
+
+    for mode in ["sphere-uniform", "sphere-equidistant"]:
+        for workers in n_workers:
+            t = timed(
+                define_scenes.build_scenes,
+                n_scenes=n_parts,
+                n_images=n_views,
+                camera_def_mode=mode,
+                light_def_mode="sphere-uniform",
+                envmap_def_mode="static",
+                camera_seed=42,
+                light_seed=43,
+                n_workers=workers,
+            )
+            print(f"build_scenes [{mode}, n_workers={workers}]: {t:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
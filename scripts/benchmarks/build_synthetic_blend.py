@@ -0,0 +1,119 @@
+"""Builds a procedural .blend machine for the part tree of synthetic metadata (see synthetic_data.py).
+
+Assemblies become nested collections named by their part id and single parts become mesh objects
+(UV spheres, cylinders or cubes), which is the structure export_gltfs.py expects from TOPEX .blend files.
+Single parts that are used in several assemblies share their mesh data.
+
+Run from project root:
+    blender -b -P scripts/benchmarks/build_synthetic_blend.py -- \
+        --structure_file ./out/bench_data/structure.json --out_file ./out/bench_data/machine.blend
+"""
+import argparse
+import json
+import random
+
+import bpy
+import bmesh
+
+PRIMITIVES = ["uv_sphere", "cylinder", "cube"]
+
+
+def create_mesh(name: str, primitive: str, n_segments: int) -> bpy.types.Mesh:
+    """Returns a new mesh of the given primitive type.
+
+    Args:
+        name (str): Name of the mesh data.
+        primitive (str): One of PRIMITIVES.
+        n_segments (int): Number of segments of spheres and cylinders.
+    """
+    bm = bmesh.new()
+    if primitive == "uv_sphere":
+        bmesh.ops.create_uvsphere(bm, u_segments=n_segments, v_segments=max(n_segments // 2, 3), radius=0.5)
+    elif primitive == "cylinder":
+        bmesh.ops.create_cone(bm, cap_ends=True, segments=n_segments, radius1=0.3, radius2=0.3, depth=1.0)
+    else:
+        bmesh.ops.create_cube(bm, size=1.0)
+    mesh = bpy.data.meshes.new(name)
+    bm.to_mesh(mesh)
+    bm.free()
+    return mesh
+
+
+def build_machine(structure: list[dict], n_segments: int, seed: int) -> int:
+    """Creates collections and objects of the part tree in the current scene.
+
+    Args:
+        structure (list<dict>): Part tree [{id, hierarchy, is_assembly}] in BOM order.
+        n_segments (int): Number of segments of spheres and cylinders.
+        seed (int): Random seed of primitive types, scales and locations.
+
+    Returns:
+        int: Number of created objects.
+    """
+    rng = random.Random(seed)
+    collections, offsets, meshes = {}, {}, {}
+    n_objects = 0
+    for part in structure:
+        hierarchy = part["hierarchy"]
+        parent_hierarchy = hierarchy.rsplit(".", 1)[0] if "." in hierarchy else None
+        parent_collection = collections[parent_hierarchy] if parent_hierarchy else bpy.context.scene.collection
+        # Each level spreads its children around the parent's location
+        parent_offset = offsets.get(parent_hierarchy, (0.0, 0.0, 0.0))
+        spread = 4.0 / (len(hierarchy.split(".")))
+        offsets[hierarchy] = tuple(p + rng.uniform(-spread, spread) for p in parent_offset)
+
+        if part["is_assembly"]:
+            collection = bpy.data.collections.new(part["id"])
+            parent_collection.children.link(collection)
+            collections[hierarchy] = collection
+            continue
+
+        if part["id"] not in meshes:
+            meshes[part["id"]] = create_mesh(part["id"], rng.choice(PRIMITIVES), n_segments)
+        obj = bpy.data.objects.new(part["id"], meshes[part["id"]])
+        obj.location = offsets[hierarchy]
+        obj.scale = [rng.uniform(0.3, 1.5) for _ in range(3)]
+        parent_collection.objects.link(obj)
+        n_objects += 1
+    return n_objects
+
+
+def get_args():
+    """Returns script arguments as python variables."""
+    parser = argparse.ArgumentParser()
+    # Only consider script args, ignore blender args
+    _, all_arguments = parser.parse_known_args()
+    double_dash_index = all_arguments.index("--")
+    script_args = all_arguments[double_dash_index + 1 :]
+
+    parser.add_argument(
+        "--structure_file",
+        help="structure.json written by synthetic_data.py.",
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        "--out_file",
+        help="Output .blend file.",
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        "--n_segments",
+        help="Number of segments of spheres and cylinders.",
+        type=int,
+        default=32,
+    )
+    args, _ = parser.parse_known_args(script_args)
+    return args
+
+
+if __name__ == "__main__":
+    args = get_args()
+    with open(args.structure_file, "r") as f:
+        structure_data = json.load(f)
+
+    bpy.ops.wm.read_homefile(use_empty=True)
+    n_objects = build_machine(structure_data["parts"], n_segments=args.n_segments, seed=structure_data["seed"])
+    bpy.ops.wm.save_as_mainfile(filepath=args.out_file)
+    print(f"Saved {n_objects} objects of {len(structure_data['parts'])} parts to {args.out_file}")
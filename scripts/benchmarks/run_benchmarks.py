@@ -0,0 +1,491 @@
+"""Reproducible pipeline benchmark on synthetic inputs, with a JSON history and regression comparison.
+
+run:     Generates synthetic inputs (synthetic_data.py, build_synthetic_blend.py) at the given scale and times
+         - preprocessing of the TOPEX metadata and the OBJ tree in pure Python (no Blender needed),
+         - GLTF export and rendering of a subset of parts with headless Blender, CPU Cycles, tiny resolution
+           and few samples,
+         - depth-only rendering (render.py --mode depth) of the same parts (stage render_depth),
+         - rendering with Cycles settings resolved per part from its materials (render.py --adaptive_settings,
+           stage render_adaptive). The synthetic machine has mixed materials, so render and render_adaptive
+           compare one global configuration with per-part profiles,
+         - rendering with a persistent scene (render.py --scene_mode session, stage render_session).
+         For the render stages, part_overhead is the time of render_part without the render work spans
+         (Cycles/depth rasterizing, file moves), i.e. the fixed per-part cost of scene setup and teardown.
+         Stage times are taken from the pipeline's trace spans (utils/trace_utils.py). The median of all
+         repetitions is appended as one record (with commit, host and config) to the history file.
+compare: Compares two records of the history file and flags stages that got slower than the threshold.
+         Exits with status 1 if there are regressions, so it can be used in CI.
+
+Run from project root:
+    python scripts/benchmarks/run_benchmarks.py run --scale small --stage preprocessing --repeat 3
+    python scripts/benchmarks/run_benchmarks.py run --scale tiny --stage preprocessing --stage export --stage render
+    python scripts/benchmarks/run_benchmarks.py compare --base -2 --head -1 --threshold 0.1
+"""
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from preprocessing.preprocessing_controller import PreprocessingController  # pylint: disable=wrong-import-position
+from utils import trace_utils  # pylint: disable=wrong-import-position
+
+import synthetic_data  # pylint: disable=wrong-import-position
+
+SCALES = {
+    "tiny": {"n_parts": 100, "max_depth": 6, "n_objs": 20, "n_images": 4, "n_blender_parts": 5},
+    "small": {"n_parts": 1000, "max_depth": 8, "n_objs": 200, "n_images": 8, "n_blender_parts": 20},
+    "medium": {"n_parts": 5000, "max_depth": 10, "n_objs": 1000, "n_images": 16, "n_blender_parts": 50},
+    "large": {"n_parts": 20000, "max_depth": 12, "n_objs": 5000, "n_images": 32, "n_blender_parts": 100},
+}
+STAGES = ["preprocessing", "export", "render", "render_depth", "render_adaptive", "render_session"]
+BLENDER_STAGES = ["export", "render", "render_depth", "render_adaptive", "render_session"]
+# Spans of render.py that render or write images, the rest of render_part is fixed per-part overhead
+RENDER_WORK_SPANS = [
+    "cycles_render",
+    "file_moves",
+    "scene_triangles",
+    "depth_raster",
+    "depth_write",
+    "depth_stack_write",
+]
+MINI_EXAMPLE_DIR = os.path.join(PROJECT_ROOT, "data", "mini_example")
+DEFAULT_HISTORY_FILE = "./out/benchmarks/history.jsonl"
+
+
+def get_git_state() -> dict:
+    """Returns the current commit and whether tracked files were modified."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": bool(status)}
+
+
+def get_stage_seconds(trace_dir: str) -> dict:
+    """Returns {process/stage: total seconds} of all spans in trace_dir."""
+    stage_seconds = {}
+    for span_record in trace_utils.load_spans([trace_dir]):
+        key = f"{span_record['process']}/{span_record['name']}"
+        stage_seconds[key] = stage_seconds.get(key, 0.0) + span_record["duration"]
+    if "render/render_part" in stage_seconds:
+        work_seconds = sum(stage_seconds.get(f"render/{name}", 0.0) for name in RENDER_WORK_SPANS)
+        stage_seconds["render/part_overhead"] = stage_seconds["render/render_part"] - work_seconds
+    return stage_seconds
+
+
+def prepare_inputs(data_dir: str, config: dict, blender: str) -> dict:
+    """Generates the synthetic inputs for config in data_dir, or reuses them if they were generated before."""
+    config_file = f"{data_dir}/config.json"
+    paths = {
+        "metadata_file": f"{data_dir}/metadata.xlsx",
+        "structure_file": f"{data_dir}/structure.json",
+        "obj_dir": f"{data_dir}/obj",
+        "blend_file": f"{data_dir}/machine.blend",
+    }
+    data_config = {k: config[k] for k in ["n_parts", "max_depth", "n_objs", "seed"]}
+    reuse = False
+    if os.path.isfile(config_file):
+        with open(config_file, "r") as f:
+            reuse = json.load(f) == data_config
+    if reuse:
+        print(f"Reusing synthetic inputs in {data_dir}")
+    else:
+        shutil.rmtree(data_dir, ignore_errors=True)
+        tstart = time.perf_counter()
+        synthetic_data.generate(
+            data_dir,
+            n_parts=config["n_parts"],
+            max_depth=config["max_depth"],
+            n_objs=config["n_objs"],
+            seed=config["seed"],
+        )
+        with open(config_file, "w") as f:
+            json.dump(data_config, f)
+        print(f"Generated synthetic inputs in {data_dir} in {time.perf_counter() - tstart:.2f}s")
+
+    # The .blend file is only built when a Blender stage needs it
+    if blender and not os.path.isfile(paths["blend_file"]):
+        tstart = time.perf_counter()
+        subprocess.run(
+            [
+                blender,
+                "-b",
+                "-P",
+                os.path.join(PROJECT_ROOT, "scripts", "benchmarks", "build_synthetic_blend.py"),
+                "--",
+                "--structure_file",
+                paths["structure_file"],
+                "--out_file",
+                paths["blend_file"],
+            ],
+            check=True,
+            capture_output=True,
+        )
+        print(f"Built {paths['blend_file']} in {time.perf_counter() - tstart:.2f}s")
+    return paths
+
+
+def run_preprocessing(paths: dict, out_dir: str, trace_dir: str, config: dict) -> None:
+    """Runs all preprocessing stages of the TOPEX metadata and of the OBJ tree with tracing to trace_dir."""
+    scene_args = dict(
+        n_images=config["n_images"],
+        camera_def_mode="sphere-equidistant",
+        light_def_mode="sphere-uniform",
+        envmap_def_mode="gray",
+        camera_seed=config["seed"],
+        light_seed=config["seed"] + 1,
+    )
+    trace_utils.init_tracer(trace_dir, "preprocessing_topex")
+    with trace_utils.span("preprocessing"):
+        ppc = PreprocessingController(
+            metadata_file=paths["metadata_file"],
+            # Preprocessing only checks that the .blend file exists, it is read by the GLTF export
+            blend_file=paths["blend_file"] if os.path.isfile(paths["blend_file"]) else paths["metadata_file"],
+            materials_dir=f"{MINI_EXAMPLE_DIR}/materials",
+            obj_dir=None,
+            output_dir=f"{out_dir}/topex",
+            material_def_mode="static",
+            **scene_args,
+        )
+        ppc.assign_materials()
+        ppc.build_scenes(n_workers=config["n_workers"])
+        ppc.export_rcfg_json(filename="rcfg.json", indent=None)
+
+    if config["n_objs"] > 0:
+        trace_utils.init_tracer(trace_dir, "preprocessing_obj")
+        with trace_utils.span("preprocessing"):
+            ppc = PreprocessingController(
+                metadata_file=None,
+                blend_file=None,
+                materials_dir=None,
+                obj_dir=paths["obj_dir"],
+                output_dir=f"{out_dir}/obj",
+                material_def_mode="disabled",
+                **scene_args,
+            )
+            ppc.build_scenes(n_workers=config["n_workers"])
+            ppc.export_rcfg_json(filename="rcfg.json", indent=None)
+    trace_utils.init_tracer(None, None)
+
+
+def write_blender_rcfg(rcfg_file: str, out_file: str, n_parts: int) -> None:
+    """Writes an RCFG with the first n_parts parts of rcfg_file, the workload of the Blender stages."""
+    with open(rcfg_file, "r") as f:
+        rcfg = json.load(f)
+    rcfg["parts"] = rcfg["parts"][:n_parts]
+    with open(out_file, "w") as f:
+        json.dump(rcfg, f)
+
+
+def run_blender_stage(blender: str, args: list[str], blend_file: str = None) -> float:
+    """Runs a Blender script headless and returns its wall clock time (including Blender startup)."""
+    command = [blender] + ([blend_file] if blend_file else []) + ["-b", "-P"] + args
+    tstart = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True)
+    seconds = time.perf_counter() - tstart
+    if result.returncode != 0:
+        print(result.stdout[-5000:])
+        print(result.stderr[-5000:])
+        raise click.ClickException(f"Blender failed: {' '.join(command)}")
+    return seconds
+
+
+def run_render_variant(blender: str, stage: str, render_args: list[str], run_dir: str) -> dict:
+    """Runs render.py with the given arguments in its own output and trace directory, as every render variant
+    traces into render.{pid}.trace.jsonl. Returns {stage/...: seconds} with the render/ keys renamed to the stage."""
+    trace_dir = f"{run_dir}/trace_{stage}"
+    stage_seconds = {
+        f"{stage}/blender_process": run_blender_stage(
+            blender,
+            [os.path.join(PROJECT_ROOT, "bpy_modules", "render.py"), "--"]
+            + render_args
+            + ["--out_dir", f"{run_dir}/{stage}_out", "--trace_dir", trace_dir],
+        )
+    }
+    for key, seconds in get_stage_seconds(trace_dir).items():
+        stage_seconds[key.replace("render/", f"{stage}/", 1)] = seconds
+    return stage_seconds
+
+
+def run_once(paths: dict, run_dir: str, config: dict, stages: list[str], blender: str) -> dict:
+    """Runs all stages once and returns {process/stage: seconds}."""
+    trace_dir = f"{run_dir}/trace"
+    stage_seconds = {}
+    # The Blender stages need an RCFG, so preprocessing always runs
+    run_preprocessing(paths, run_dir, trace_dir, config)
+
+    if any(stage in BLENDER_STAGES for stage in stages):
+        rcfg_file = f"{run_dir}/rcfg_blender.json"
+        gltf_dir = f"{run_dir}/gltf"
+        write_blender_rcfg(f"{run_dir}/topex/rcfg.json", rcfg_file, config["n_blender_parts"])
+        stage_seconds["export/blender_process"] = run_blender_stage(
+            blender,
+            [
+                os.path.join(PROJECT_ROOT, "bpy_modules", "export_gltfs.py"),
+                "--",
+                "--rcfg_file",
+                rcfg_file,
+                "--out_dir",
+                gltf_dir,
+                "--trace_dir",
+                trace_dir,
+            ],
+            blend_file=paths["blend_file"],
+        )
+        # Arguments shared by the Cycles render stages
+        cycles_args = [
+            "--gltf_dir",
+            gltf_dir,
+            "--material_dir",
+            f"{MINI_EXAMPLE_DIR}/materials",
+            "--envmap_dir",
+            f"{MINI_EXAMPLE_DIR}/envmaps",
+            "--rcfg_file",
+            rcfg_file,
+            "--res_x",
+            str(config["resolution"]),
+            "--res_y",
+            str(config["resolution"]),
+            "--samples",
+            str(config["samples"]),
+            "--engine",
+            "CYCLES",
+            "--device",
+            "CPU",
+        ]
+    if "render" in stages:
+        stage_seconds["render/blender_process"] = run_blender_stage(
+            blender,
+            [os.path.join(PROJECT_ROOT, "bpy_modules", "render.py"), "--"]
+            + cycles_args
+            + ["--out_dir", f"{run_dir}/render_out", "--trace_dir", trace_dir],
+        )
+    if "render_depth" in stages:
+        depth_args = [
+            "--gltf_dir",
+            gltf_dir,
+            "--rcfg_file",
+            rcfg_file,
+            "--res_x",
+            str(config["resolution"]),
+            "--res_y",
+            str(config["resolution"]),
+            "--mode",
+            "depth",
+        ]
+        stage_seconds.update(run_render_variant(blender, "render_depth", depth_args, run_dir))
+    if "render_adaptive" in stages:
+        stage_seconds.update(
+            run_render_variant(blender, "render_adaptive", cycles_args + ["--adaptive_settings"], run_dir)
+        )
+    if "render_session" in stages:
+        stage_seconds.update(
+            run_render_variant(blender, "render_session", cycles_args + ["--scene_mode", "session"], run_dir)
+        )
+
+    stage_seconds.update(get_stage_seconds(trace_dir))
+    if "preprocessing" not in stages:
+        stage_seconds = {k: v for k, v in stage_seconds.items() if not k.startswith("preprocessing")}
+    return stage_seconds
+
+
+def load_history(history_file: str) -> list[dict]:
+    """Returns all records of the history file."""
+    if not os.path.isfile(history_file):
+        return []
+    with open(history_file, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def select_record(history: list[dict], ref: str) -> dict:
+    """Returns the record selected by ref: an index into the history (e.g. -1) or a commit (prefix)."""
+    try:
+        return history[int(ref)]
+    except (ValueError, IndexError):
+        pass
+    matches = [record for record in history if record["commit"] and record["commit"].startswith(ref)]
+    if not matches:
+        raise click.BadParameter(f"No benchmark record for {ref}")
+    # The latest record of a commit
+    return matches[-1]
+
+
+@click.group()
+def cli():
+    """Pipeline benchmark suite."""
+
+
+@cli.command()
+@click.option("--scale", help="Input size preset", type=click.Choice(list(SCALES)), default="small", show_default=True)
+@click.option("--n_parts", help="Override: number of BOM rows", type=click.IntRange(min=1), default=None)
+@click.option("--max_depth", help="Override: maximum Pos.-Nr. depth", type=click.IntRange(min=1), default=None)
+@click.option("--n_objs", help="Override: number of OBJ files", type=click.IntRange(min=0), default=None)
+@click.option("--n_images", help="Override: images per part", type=click.IntRange(min=1), default=None)
+@click.option(
+    "--n_blender_parts", help="Override: parts exported and rendered", type=click.IntRange(min=1), default=None
+)
+@click.option(
+    "--stage",
+    "stages",
+    help="Stages to benchmark. Can be given multiple times",
+    type=click.Choice(STAGES),
+    multiple=True,
+    default=["preprocessing"],
+    show_default=True,
+)
+@click.option("--repeat", help="Repetitions, the median is recorded", type=click.IntRange(min=1), default=3)
+@click.option("--n_workers", help="Workers of build_scenes", type=click.IntRange(min=1), default=1, show_default=True)
+@click.option("--resolution", help="Render resolution (square)", type=click.IntRange(min=1), default=32)
+@click.option("--samples", help="Cycles samples", type=click.IntRange(min=1), default=4, show_default=True)
+@click.option("--seed", help="Seed of the synthetic inputs", type=int, default=0, show_default=True)
+@click.option("--blender", help="Blender executable", type=str, default="blender", show_default=True)
+@click.option(
+    "--work_dir",
+    help="Directory for inputs and outputs. Inputs are reused across runs. Defaults to a temporary directory",
+    type=click.Path(file_okay=False),
+    default=None,
+)
+@click.option(
+    "--history_file",
+    help="JSONL file the result is appended to",
+    type=click.Path(dir_okay=False),
+    default=DEFAULT_HISTORY_FILE,
+    show_default=True,
+)
+@click.option("--label", help="Free text stored with the record", type=str, default="")
+def run(**kwargs):
+    """Generates synthetic inputs, runs the stages and appends the median stage times to the history."""
+    stages = list(kwargs["stages"])
+    config = dict(SCALES[kwargs["scale"]], scale=kwargs["scale"])
+    overrides = ["n_parts", "max_depth", "n_objs", "n_images", "n_blender_parts"]
+    config.update({k: kwargs[k] for k in overrides if kwargs[k] is not None})
+    config.update({k: kwargs[k] for k in ["repeat", "n_workers", "resolution", "samples", "seed"]})
+    config["stages"] = stages
+
+    blender = None
+    if any(stage in BLENDER_STAGES for stage in stages):
+        blender = shutil.which(kwargs["blender"])
+        if blender is None:
+            raise click.UsageError(f"Blender executable {kwargs['blender']} not found, needed for {stages}")
+
+    work_dir = kwargs["work_dir"] or tempfile.mkdtemp(prefix="synthnet_bench_")
+    data_dir = f"{work_dir}/data-{config['scale']}"
+    paths = prepare_inputs(data_dir, config, blender)
+
+    runs = []
+    for i in range(config["repeat"]):
+        run_dir = f"{work_dir}/run"
+        shutil.rmtree(run_dir, ignore_errors=True)
+        tstart = time.perf_counter()
+        runs.append(run_once(paths, run_dir, config, stages, blender))
+        print(f"Run {i + 1}/{config['repeat']} done in {time.perf_counter() - tstart:.2f}s")
+    if not kwargs["work_dir"]:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {}
+    for key in sorted({key for stage_seconds in runs for key in stage_seconds}):
+        seconds = [stage_seconds.get(key, 0.0) for stage_seconds in runs]
+        results[key] = {"median": float(np.median(seconds)), "min": float(np.min(seconds)), "runs": seconds}
+
+    record = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        **get_git_state(),
+        "label": kwargs["label"],
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": config,
+        "results": results,
+    }
+    history_file = kwargs["history_file"]
+    os.makedirs(os.path.dirname(os.path.abspath(history_file)), exist_ok=True)
+    with open(history_file, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+    print(f"\n{'stage':<48}{'median s':>12}{'min s':>12}")
+    for key, stats in results.items():
+        print(f"{key:<48}{stats['median']:>12.4f}{stats['min']:>12.4f}")
+    print(f"\nAppended results of {record['commit']} to {history_file}")
+
+
+@cli.command()
+@click.option(
+    "--history_file",
+    help="JSONL history written by run",
+    type=click.Path(exists=True, dir_okay=False),
+    default=DEFAULT_HISTORY_FILE,
+    show_default=True,
+)
+@click.option("--base", help="Baseline record: history index or commit (prefix)", type=str, default="-2")
+@click.option("--head", help="Compared record: history index or commit (prefix)", type=str, default="-1")
+@click.option(
+    "--threshold",
+    help="Relative slowdown that counts as regression",
+    type=click.FloatRange(min=0.0),
+    default=0.1,
+    show_default=True,
+)
+@click.option(
+    "--min_seconds",
+    help="Absolute slowdown below which stages are never flagged (timer noise)",
+    type=click.FloatRange(min=0.0),
+    default=0.01,
+    show_default=True,
+)
+def compare(**kwargs):
+    """Compares the median stage times of two history records and flags regressions."""
+    history = load_history(kwargs["history_file"])
+    base, head = select_record(history, kwargs["base"]), select_record(history, kwargs["head"])
+    print(f"base: {base['commit']} ({base['timestamp']}{', dirty' if base['dirty'] else ''}) {base['label']}")
+    print(f"head: {head['commit']} ({head['timestamp']}{', dirty' if head['dirty'] else ''}) {head['label']}")
+    if base["config"] != head["config"]:
+        print("WARNING: the records were run with different configs, times are not comparable:")
+        for key in sorted(set(base["config"]) | set(head["config"])):
+            if base["config"].get(key) != head["config"].get(key):
+                print(f"    {key}: {base['config'].get(key)} -> {head['config'].get(key)}")
+    if base["host"] != head["host"]:
+        print(f"WARNING: the records were run on different hosts ({base['host']}, {head['host']})")
+
+    regressions = []
+    print(f"\n{'stage':<48}{'base s':>12}{'head s':>12}{'change':>10}")
+    for key in sorted(set(base["results"]) | set(head["results"])):
+        if key not in base["results"] or key not in head["results"]:
+            print(f"{key:<48}{'only in ' + ('head' if key in head['results'] else 'base'):>34}")
+            continue
+        base_seconds, head_seconds = base["results"][key]["median"], head["results"][key]["median"]
+        change = (head_seconds - base_seconds) / base_seconds if base_seconds > 0 else 0.0
+        is_regression = change > kwargs["threshold"] and head_seconds - base_seconds > kwargs["min_seconds"]
+        flag = "  REGRESSION" if is_regression else ""
+        print(f"{key:<48}{base_seconds:>12.4f}{head_seconds:>12.4f}{change:>+10.1%}{flag}")
+        if is_regression:
+            regressions.append(key)
+
+    if regressions:
+        print(f"\n{len(regressions)} stages regressed by more than {kwargs['threshold']:.0%}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,268 @@
+"""Synthetic benchmark inputs at configurable scale: TOPEX metadata, OBJ directory trees and .blend machines.
+
+Writes to out_dir:
+    metadata.xlsx     TOPEX bill of materials with a deep 'Pos.-Nr.' hierarchy (same columns as the mini example)
+    structure.json    Part tree of the metadata, read by build_synthetic_blend.py to build the matching .blend file
+    obj/{split}/{label}/{name}.obj    OBJ directory tree for the OBJ preprocessing mode
+
+Leaf materials only use combinations that map to the materials of data/mini_example/materials.
+Everything is seeded, so the same arguments always produce the same files.
+
+Run from project root:
+    python scripts/benchmarks/synthetic_data.py --out_dir ./out/bench_data --n_parts 2000 --max_depth 8 --n_objs 500
+"""
+import json
+import os
+import click
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+METADATA_COLUMNS = [
+    "Pos.-Nr.",
+    "Menge",
+    "Einheit",
+    "Benennung",
+    "Benennung 2",
+    "Teilenummer",
+    "Herst.-Bezeichnung",
+    "Hersteller",
+    "Werkstoff",
+    " DIN",
+    " Oberfläche",
+    "Artikel-Nr.",
+    "Bem.",
+]
+# (Werkstoff, Oberfläche) of single parts, mapped by preprocessing/utils/metadata.py to a mini example material
+LEAF_MATERIALS = [
+    ("AlMgSi1", "Natur eloxiert"),
+    ("AlMgSi1", "hartcoatiert"),
+    ("CuZn37", "Blank"),
+    ("Polycarbonat", "transparent"),
+    ("X8CrNiS18-9", "brüniert"),
+    ("X8CrNiS18-9", "verzinkt"),
+    ("X8CrNiS18-9", "sandgestrahlt"),
+    ("Kunststoff glänzend", "gelb"),
+]
+LEAF_REMARKS = ["-", "-", "-", "E", "V"]
+OBJ_SPLITS = ["train", "test"]
+
+
+def get_hierarchy(n_parts: int, max_depth: int, max_children: int, rng: "np.random.Generator") -> list[str]:
+    """Returns n_parts 'Pos.-Nr.' values of a random part tree in BOM order (depth first).
+
+    The first branch always reaches max_depth, the other parts are attached to random assemblies
+    with less than max_depth levels and less than max_children children.
+
+    Args:
+        n_parts (int): Number of parts (tree nodes), including the root assembly.
+        max_depth (int): Maximum number of hierarchy levels (root = 1).
+        max_children (int): Maximum number of direct children per assembly.
+        rng (np.random.Generator): Random generator.
+    """
+    assert max_depth >= 1 and max_children >= 1
+    children = {(1,): 0}
+    parents = [(1,)]
+    node = (1,)
+    # Deep branch
+    while len(children) < n_parts and len(node) < max_depth:
+        children[node] += 1
+        node = node + (children[node],)
+        children[node] = 0
+        parents.append(node)
+    # Random attachment to open assemblies
+    while len(children) < n_parts:
+        assert parents, f"Cannot build {n_parts} parts with {max_depth=} and {max_children=}"
+        i = int(rng.integers(len(parents)))
+        parent = parents[i]
+        children[parent] += 1
+        node = parent + (children[parent],)
+        children[node] = 0
+        if len(node) < max_depth:
+            parents.append(node)
+        if children[parent] >= max_children:
+            parents[i] = parents[-1]
+            parents.pop()
+    return [".".join(str(p) for p in node) for node in sorted(children)]
+
+
+def generate_metadata(
+    n_parts: int,
+    max_depth: int,
+    max_children: int = 8,
+    reuse_fraction: float = 0.2,
+    seed: int = 0,
+) -> tuple["pd.DataFrame", list[dict]]:
+    """Returns a synthetic TOPEX metadata table and its part tree.
+
+    Args:
+        n_parts (int): Number of BOM rows.
+        max_depth (int): Maximum depth of the 'Pos.-Nr.' hierarchy.
+        max_children (int): Maximum number of direct children per assembly.
+        reuse_fraction (float): Fraction of single parts that reuse the part number of an earlier single part,
+            like standard parts (screws, bearings) that are used in several assemblies.
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame, list<dict>: metadata rows and the part tree [{id, hierarchy, is_assembly}] in BOM order
+    """
+    rng = np.random.default_rng(seed)
+    hierarchy = get_hierarchy(n_parts, max_depth, max_children, rng)
+    assemblies = {h.rsplit(".", 1)[0] for h in hierarchy if "." in h}
+
+    rows, structure, leaf_ids, leaf_materials = [], [], [], {}
+    for i, pos in enumerate(hierarchy):
+        is_assembly = pos in assemblies
+        if is_assembly:
+            part_id = f"A{i:06d}"
+            material, surface, remark = "-", np.nan, "-"
+        elif leaf_ids and rng.random() < reuse_fraction:
+            part_id = leaf_ids[int(rng.integers(len(leaf_ids)))]
+            material, surface = leaf_materials[part_id]
+            remark = "-"
+        else:
+            part_id = f"P{i:06d}"
+            material, surface = LEAF_MATERIALS[int(rng.integers(len(LEAF_MATERIALS)))]
+            remark = LEAF_REMARKS[int(rng.integers(len(LEAF_REMARKS)))]
+            leaf_ids.append(part_id)
+            leaf_materials[part_id] = (material, surface)
+        rows.append(
+            {
+                "Pos.-Nr.": pos,
+                "Menge": int(rng.integers(1, 5)),
+                "Einheit": "Stück",
+                "Benennung": f"{'Baugruppe' if is_assembly else 'Teil'} {part_id}",
+                "Benennung 2": "Synthetische Testdaten" if is_assembly else np.nan,
+                "Teilenummer": part_id,
+                "Herst.-Bezeichnung": np.nan,
+                "Hersteller": "-",
+                "Werkstoff": material,
+                " DIN": np.nan,
+                " Oberfläche": surface,
+                "Artikel-Nr.": np.nan,
+                "Bem.": remark,
+            }
+        )
+        structure.append({"id": part_id, "hierarchy": pos, "is_assembly": is_assembly})
+    return pd.DataFrame(rows, columns=METADATA_COLUMNS), structure
+
+
+def get_obj_mesh(n_segments: int, rng: "np.random.Generator") -> tuple["np.ndarray", "np.ndarray"]:
+    """Returns a randomly scaled and deformed UV sphere with about 2 * n_segments^2 triangles.
+
+    Returns:
+        np.ndarray, np.ndarray: vertices of shape (n, 3) and 1-based triangle indices of shape (m, 3)
+    """
+    n_rings = max(n_segments // 2, 2)
+    theta = np.linspace(0, np.pi, n_rings + 1)[1:-1]
+    phi = np.linspace(0, 2 * np.pi, n_segments, endpoint=False)
+    theta, phi = np.meshgrid(theta, phi, indexing="ij")
+    radius = 1 + 0.3 * np.sin(rng.integers(1, 5) * phi) * np.sin(theta)
+    ring_vertices = np.stack(
+        [radius * np.sin(theta) * np.cos(phi), radius * np.sin(theta) * np.sin(phi), np.cos(theta)], axis=-1
+    ).reshape(-1, 3)
+    vertices = np.concatenate([[[0, 0, 1]], ring_vertices, [[0, 0, -1]]]) * rng.uniform(0.2, 2.0, 3)
+
+    def ring(r, s):
+        """Returns the vertex indices of segments s of ring r."""
+        return 1 + r * n_segments + s % n_segments
+
+    # Triangle fans at the poles, quads (2 triangles) between rings
+    segments = np.arange(n_segments)
+    faces = [np.stack([np.zeros(n_segments, int), ring(0, segments + 1), ring(0, segments)], axis=1)]
+    for r in range(n_rings - 2):
+        faces.append(np.stack([ring(r, segments), ring(r, segments + 1), ring(r + 1, segments + 1)], axis=1))
+        faces.append(np.stack([ring(r, segments), ring(r + 1, segments + 1), ring(r + 1, segments)], axis=1))
+    south = len(vertices) - 1
+    r = n_rings - 2
+    faces.append(np.stack([ring(r, segments), ring(r, segments + 1), np.full(n_segments, south)], axis=1))
+    # Counter-clockwise winding seen from outside
+    return vertices, np.concatenate(faces)[:, ::-1] + 1
+
+
+def write_obj(file_path: str, vertices: "np.ndarray", faces: "np.ndarray") -> None:
+    """Writes a triangle mesh as OBJ file (faces are 1-based)."""
+    with open(file_path, "w") as f:
+        f.write("\n".join(f"v {x:.6f} {y:.6f} {z:.6f}" for x, y, z in vertices))
+        f.write("\n")
+        f.write("\n".join(f"f {a} {b} {c}" for a, b, c in faces))
+        f.write("\n")
+
+
+def generate_obj_tree(out_dir: str, n_objs: int, n_labels: int = 10, n_segments: int = 32, seed: int = 0) -> int:
+    """Writes n_objs OBJ files to out_dir/{split}/{label}/, the layout of the OBJ preprocessing mode.
+
+    Returns:
+        int: Number of written files.
+    """
+    rng = np.random.default_rng(seed)
+    for i in range(n_objs):
+        split = OBJ_SPLITS[i % len(OBJ_SPLITS)]
+        label = f"label_{i % n_labels:03d}"
+        os.makedirs(f"{out_dir}/{split}/{label}", exist_ok=True)
+        vertices, faces = get_obj_mesh(n_segments, rng)
+        write_obj(f"{out_dir}/{split}/{label}/{label}_{i:06d}.obj", vertices, faces)
+    return n_objs
+
+
+def generate(
+    out_dir: str,
+    n_parts: int,
+    max_depth: int,
+    max_children: int = 8,
+    reuse_fraction: float = 0.2,
+    n_objs: int = 0,
+    n_segments: int = 32,
+    seed: int = 0,
+) -> dict:
+    """Writes metadata.xlsx, structure.json and (if n_objs > 0) the OBJ tree to out_dir and returns their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    metadata, structure = generate_metadata(n_parts, max_depth, max_children, reuse_fraction, seed)
+    paths = {"metadata_file": f"{out_dir}/metadata.xlsx", "structure_file": f"{out_dir}/structure.json"}
+    metadata.to_excel(paths["metadata_file"], index=False)
+    with open(paths["structure_file"], "w") as f:
+        json.dump({"seed": seed, "parts": structure}, f)
+    if n_objs > 0:
+        paths["obj_dir"] = f"{out_dir}/obj"
+        generate_obj_tree(paths["obj_dir"], n_objs, n_segments=n_segments, seed=seed)
+    return paths
+
+
+@click.command()
+@click.option("--out_dir", help="Output directory", type=click.Path(file_okay=False), required=True)
+@click.option("--n_parts", help="Number of BOM rows", type=click.IntRange(min=1), default=1000, show_default=True)
+@click.option("--max_depth", help="Maximum Pos.-Nr. depth", type=click.IntRange(min=1), default=6, show_default=True)
+@click.option(
+    "--max_children", help="Maximum children per assembly", type=click.IntRange(min=1), default=8, show_default=True
+)
+@click.option(
+    "--reuse_fraction",
+    help="Fraction of single parts that reuse an earlier part number",
+    type=click.FloatRange(min=0.0, max=1.0),
+    default=0.2,
+    show_default=True,
+)
+@click.option("--n_objs", help="Number of OBJ files", type=click.IntRange(min=0), default=0, show_default=True)
+@click.option(
+    "--n_segments", help="Segments per OBJ mesh (~2*n^2 triangles)", type=click.IntRange(min=3), default=32
+)
+@click.option("--seed", help="Random seed", type=int, default=0, show_default=True)
+def main(**kwargs):
+    args = SimpleNamespace(**kwargs)
+    paths = generate(
+        args.out_dir,
+        n_parts=args.n_parts,
+        max_depth=args.max_depth,
+        max_children=args.max_children,
+        reuse_fraction=args.reuse_fraction,
+        n_objs=args.n_objs,
+        n_segments=args.n_segments,
+        seed=args.seed,
+    )
+    for name, path in paths.items():
+        print(f"{name}: {path}")
+
+
+if __name__ == "__main__":
+    main()
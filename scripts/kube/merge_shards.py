@@ -0,0 +1,119 @@
+"""Merges the outputs of the shards of a planned run (see scripts/kube/plan_jobs.py) into the run directory.
+
+Moves the GLBs and renders of every shard from {run_dir}/shards/{shard} into {run_dir} (shards have disjoint
+parts, so no file is written twice), merges the render reports and upload manifests like a single run and
+writes dataset_info.json with the image and part counts and the predicted and measured time of each shard.
+Logs and per-batch reports stay in the shard directories.
+
+Run from project root (done by the merge Job of plan_jobs.py):
+    python scripts/kube/merge_shards.py --run_dir /workspace/out/1-drucker --plan_file ./kube/drucker-iso/plan.json
+"""
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import click
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+import pipeline  # pylint: disable=wrong-import-position
+
+# Shard subdirectories that are moved into the run directory
+OUTPUT_DIRS = ["gltf", "render"]
+# Render outputs with one directory per part
+PART_OUTPUT_DIRS = ["rgb", "depth_png", "depth_exr", "mask"]
+
+
+def move_tree(src_dir: str, dst_dir: str) -> int:
+    """Moves all files of src_dir to the same relative paths in dst_dir, returns the number of files.
+
+    Raises:
+        FileExistsError: If a file exists in both, e.g. tar shards (render.py --out_mode shards) of two shards.
+    """
+    n_files = 0
+    for dir_path, _, file_names in os.walk(src_dir):
+        target_dir = os.path.join(dst_dir, os.path.relpath(dir_path, src_dir))
+        os.makedirs(target_dir, exist_ok=True)
+        for file_name in file_names:
+            target_path = os.path.join(target_dir, file_name)
+            if os.path.exists(target_path):
+                raise FileExistsError(f"{target_path} is written by more than one shard")
+            os.replace(os.path.join(dir_path, file_name), target_path)
+            n_files += 1
+    return n_files
+
+
+def get_render_counts(render_dir: str) -> tuple[int, int]:
+    """Returns the number of rendered parts and RGB images (or depth images of depth-only runs)."""
+    part_ids = set()
+    for output in PART_OUTPUT_DIRS:
+        if os.path.isdir(f"{render_dir}/{output}"):
+            part_ids.update(os.listdir(f"{render_dir}/{output}"))
+    image_dir = f"{render_dir}/rgb" if os.path.isdir(f"{render_dir}/rgb") else f"{render_dir}/depth_png"
+    n_images = sum(len(file_names) for _, _, file_names in os.walk(image_dir)) if os.path.isdir(image_dir) else 0
+    return len(part_ids), n_images
+
+
+@click.command()
+@click.option(
+    "--run_dir",
+    help="Run directory with the shard outputs in shards/",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, writable=True),
+    required=True,
+)
+@click.option(
+    "--plan_file",
+    help="Plan of the run (plan.json of plan_jobs.py)",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True),
+    required=True,
+)
+def main(**kwargs):
+    args = SimpleNamespace(**kwargs)
+    run_dir = args.run_dir
+    with open(args.plan_file, "r") as f:
+        plan = json.load(f)
+
+    shard_dirs = [f"{run_dir}/shards/{shard['shard']}" for shard in plan["shards"]]
+    missing = [shard_dir for shard_dir in shard_dirs if not os.path.isdir(shard_dir)]
+    assert not missing, f"{len(missing)} of {len(shard_dirs)} shards have no outputs: {missing}"
+
+    shard_infos = []
+    for shard, shard_dir in zip(plan["shards"], shard_dirs):
+        n_files = sum(move_tree(f"{shard_dir}/{output}", f"{run_dir}/{output}") for output in OUTPUT_DIRS)
+        shard_info = {
+            "shard": shard["shard"],
+            "n_parts": len(shard["part_ids"]),
+            "n_images": shard["n_images"],
+            "n_files": n_files,
+            "predicted_cost": shard["cost"],
+        }
+        if os.path.isfile(f"{shard_dir}/pipeline_report.json"):
+            with open(f"{shard_dir}/pipeline_report.json", "r") as f:
+                shard_info["wall_seconds"] = json.load(f)["wall_seconds"]
+        shard_infos.append(shard_info)
+        print(f"{shard['shard']}: moved {n_files} files")
+
+    # Also concatenates the upload manifests of the shards
+    pipeline.merge_render_reports(shard_dirs, run_dir)
+
+    dataset_info = {}
+    if os.path.isfile(f"{run_dir}/dataset_info.json"):
+        with open(f"{run_dir}/dataset_info.json", "r", encoding="utf-8") as f:
+            dataset_info = json.load(f)
+    n_rendered_parts, n_images_total = get_render_counts(f"{run_dir}/render")
+    dataset_info.update(
+        {
+            "n_images_total": n_images_total,
+            "n_rendered_parts": n_rendered_parts,
+            "n_shards": plan["n_shards"],
+            "shards": shard_infos,
+        }
+    )
+    dataset_info.setdefault("comment", f"Merged from {plan['n_shards']} shards of {plan['name']}")
+    with open(f"{run_dir}/dataset_info.json", "w", encoding="utf-8") as f:
+        json.dump(dataset_info, f, indent=4, ensure_ascii=False)
+    print(f"Merged {plan['n_shards']} shards: {n_rendered_parts} parts, {n_images_total} images")
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
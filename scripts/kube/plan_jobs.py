@@ -0,0 +1,222 @@
+"""Plans a sharded run on Kubernetes: balanced part assignment, Indexed Job manifests and a merge Job.
+
+Parts are read from an RCFG, or from a GLB directory whose parts were already exported. Their cost is the
+estimate of --cost_file, the number of images of the RCFG, or the GLB size. They are split into --n_shards shards
+of balanced total cost (see utils/job_planner.py). Each shard runs pipeline.py (export and render of its parts),
+or render.py if --gltf_dir is given, and writes to {run_dir}/shards/{shard}. After all shards completed, the merge
+Job combines them into {run_dir} (scripts/kube/merge_shards.py).
+
+Writes to --out_dir: plan.json, configmap.yml, render-jobs.yml, merge-job.yml and submit.sh, which applies the
+manifests, waits for the render jobs and starts the merge. Nothing is sent to the cluster by this script.
+
+Run from project root:
+    python scripts/kube/plan_jobs.py --name drucker-iso --rcfg_file ./out/1-drucker/rcfg.json --n_shards 8 \
+        --run_dir /workspace/out/1-drucker --shard_args "--topex_blend_file /workspace/data/drucker.blend \
+        --materials_dir /workspace/data/materials --envmaps_dir /workspace/data/envmaps"
+"""
+import json
+import os
+import re
+import shlex
+import sys
+from types import SimpleNamespace
+
+import click
+import yaml
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils import job_planner  # pylint: disable=wrong-import-position
+
+# Kubernetes object names (DNS-1123 labels), leaving room for the job suffixes
+NAME_PATTERN = re.compile(r"^[a-z0-9]([-a-z0-9]{0,38}[a-z0-9])?$")
+SRC_DIR = "/src-pv/synthnet-render-pipeline"
+
+
+class ManifestDumper(yaml.SafeDumper):
+    """Writes multi-line strings (scripts, part id lists) as literal blocks."""
+
+
+ManifestDumper.add_representer(
+    str,
+    lambda dumper, data: dumper.represent_scalar("tag:yaml.org,2002:str", data, style="|" if "\n" in data else None),
+)
+
+
+def write_manifests(file_path: str, manifests: list[dict]) -> None:
+    with open(file_path, "w") as f:
+        yaml.dump_all(manifests, f, Dumper=ManifestDumper, sort_keys=False, default_flow_style=False, width=120)
+
+
+def get_src_setup(git_ref: str) -> str:
+    """Returns the commands that copy the source of git_ref from the source volume into the working directory.
+
+    The source volume is only read, so shards running at the same time do not pull into the same checkout.
+    """
+    return f"cd /workspace\ngit -C {SRC_DIR} archive {shlex.quote(git_ref)} | tar -x -C /workspace\n"
+
+
+def get_shard_script(args: SimpleNamespace) -> str:
+    """Returns the commands of a shard ($SHARD, $PART_IDS_FILE are set by the job)."""
+    out_dir = f"{args.run_dir}/shards/$SHARD"
+    if args.gltf_dir:
+        command = (
+            f"blender --background --python bpy_modules/render.py -- --gltf_dir {args.pod_gltf_dir} "
+            f"--rcfg_file {args.pod_rcfg_file} --out_dir {out_dir} {args.shard_args} --part_ids $(cat $PART_IDS_FILE)"
+        )
+    else:
+        command = (
+            f"python pipeline.py --rcfg_file {args.pod_rcfg_file} --part_ids_file $PART_IDS_FILE "
+            f"--out_dir {out_dir} {args.shard_args}"
+        )
+    return get_src_setup(args.git_ref) + command + "\n"
+
+
+def get_submit_script(plan: dict, job_names: list[str]) -> str:
+    jobs = " ".join(f"job/{job_name}" for job_name in job_names)
+    return (
+        "#!/bin/bash\n"
+        f"# Runs {plan['n_shards']} shards of {plan['name']} and merges them (generated by scripts/kube/plan_jobs.py)\n"
+        "set -e\n"
+        'cd "$(dirname "$0")"\n'
+        "kubectl apply -f configmap.yml -f render-jobs.yml\n"
+        f"kubectl wait --for=condition=complete --timeout=168h {jobs}\n"
+        "kubectl apply -f merge-job.yml\n"
+    )
+
+
+@click.command()
+@click.option("--name", help="Name of the run, prefix of all Kubernetes objects", type=str, required=True)
+@click.option(
+    "--rcfg_file",
+    help="RCFG of the run (parts and their images)",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True),
+    default=None,
+)
+@click.option(
+    "--gltf_dir",
+    help="Directory of exported GLBs. Shards only render these parts, GLB sizes set the memory requests",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, readable=True),
+    default=None,
+)
+@click.option(
+    "--cost_file",
+    help='Estimated seconds per part ({"parts": {part_id: {"seconds": ...}}}) used to balance the shards',
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True),
+    default=None,
+)
+@click.option("--n_shards", help="Number of shards", type=click.IntRange(min=1), required=True)
+@click.option(
+    "--out_dir",
+    help="Directory of the plan and the manifests. Default: ./kube/{name}",
+    type=click.Path(file_okay=False, dir_okay=True, writable=True),
+    default=None,
+)
+@click.option(
+    "--run_dir",
+    help="Run directory in the pods, shards write to {run_dir}/shards/{shard}. Default: /workspace/out/{name}",
+    type=str,
+    default=None,
+)
+@click.option("--pod_rcfg_file", help="RCFG path in the pods. Default: {run_dir}/rcfg.json", type=str, default=None)
+@click.option("--pod_gltf_dir", help="GLB directory in the pods. Default: {run_dir}/gltf", type=str, default=None)
+@click.option(
+    "--shard_args",
+    help="Further arguments of each shard's pipeline.py (or render.py with --gltf_dir)",
+    type=str,
+    default="",
+)
+@click.option("--image", type=str, show_default=True, default="beuthdritter/synthnet-render-pipeline")
+@click.option("--image_pull_secret", type=str, show_default=True, default="private-registry-auth")
+@click.option("--gpu_type", help="Value of the gpu node selector, empty for none", type=str, default="v100")
+@click.option("--gpus", help="GPUs per shard", type=click.IntRange(min=0), show_default=True, default=1)
+@click.option("--cpu", help="CPU request per shard", type=str, show_default=True, default="4")
+@click.option("--memory_gi", help="Base memory request per shard in GiB", type=int, show_default=True, default=16)
+@click.option("--parallelism", help="Maximum pods per job at once. Default: all", type=int, default=None)
+@click.option("--backoff_limit", help="Retries of failed pods per job", type=int, show_default=True, default=3)
+@click.option("--output_claim", help="PVC of the run directory", type=str, show_default=True, default="output-pvc")
+@click.option("--data_claim", help="PVC mounted at /workspace/data", type=str, default=None)
+@click.option("--src_claim", help="PVC with the source checkout", type=str, show_default=True, default="src-pvc")
+@click.option("--git_ref", help="Source version copied into the pods", type=str, show_default=True, default="develop")
+def main(**kwargs):
+    args = SimpleNamespace(**kwargs)
+    assert NAME_PATTERN.match(args.name), f"--name must be a lowercase DNS label of at most 40 characters: {args.name}"
+    assert args.rcfg_file or args.gltf_dir, "Either --rcfg_file or --gltf_dir is required"
+    out_dir = args.out_dir or f"./kube/{args.name}"
+    args.run_dir = args.run_dir or f"/workspace/out/{args.name}"
+    args.pod_rcfg_file = args.pod_rcfg_file or f"{args.run_dir}/rcfg.json"
+    args.pod_gltf_dir = args.pod_gltf_dir or f"{args.run_dir}/gltf"
+
+    n_images = {}
+    if args.rcfg_file:
+        with open(args.rcfg_file, "r") as f:
+            n_images = job_planner.get_part_images(json.load(f))
+    glb_bytes = {}
+    if args.gltf_dir:
+        glb_bytes = {
+            fn[:-4]: os.path.getsize(os.path.join(args.gltf_dir, fn))
+            for fn in os.listdir(args.gltf_dir)
+            if fn.endswith(".glb")
+        }
+    # Exported parts if known, parts without GLB were not matched in the .blend file
+    part_ids = sorted(glb_bytes) if args.gltf_dir else sorted(n_images)
+
+    if args.cost_file:
+        costs = job_planner.load_costs(args.cost_file)
+        missing = [part_id for part_id in part_ids if part_id not in costs]
+        assert not missing, f"{len(missing)} parts have no cost estimate, e.g. {missing[:5]}"
+        costs = {part_id: costs[part_id] for part_id in part_ids}
+    elif n_images:
+        costs = {part_id: float(n_images.get(part_id, 0)) for part_id in part_ids}
+    else:
+        costs = {part_id: float(glb_bytes[part_id]) for part_id in part_ids}
+
+    shards = job_planner.balance_parts(costs, args.n_shards)
+    plan = job_planner.get_plan(args.name, shards, costs, n_images, glb_bytes, args.memory_gi)
+
+    pod = {
+        "image": args.image,
+        "image_pull_secret": args.image_pull_secret,
+        "node_selector": {"gpu": args.gpu_type} if args.gpu_type else None,
+        "volumes": [{"name": "output-volume", "claim": args.output_claim, "mount_path": "/workspace/out"}],
+    }
+    if args.data_claim:
+        pod["volumes"].append({"name": "data-volume", "claim": args.data_claim, "mount_path": "/workspace/data"})
+    pod["volumes"].append({"name": "src-volume", "claim": args.src_claim, "mount_path": "/src-pv"})
+    options = {
+        "cpu": args.cpu,
+        "gpus": args.gpus,
+        "parallelism": args.parallelism or plan["n_shards"],
+        "backoff_limit": args.backoff_limit,
+    }
+    shard_script = get_shard_script(args)
+    render_jobs = [
+        job_planner.build_render_job(plan, memory_gi, shard_ids, shard_script, pod, options)
+        for memory_gi, shard_ids in job_planner.get_job_groups(plan).items()
+    ]
+    merge_script = get_src_setup(args.git_ref) + (
+        f"python scripts/kube/merge_shards.py --run_dir {args.run_dir} "
+        f"--plan_file {job_planner.SHARDS_MOUNT}/{job_planner.PLAN_FILENAME}\n"
+    )
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(f"{out_dir}/{job_planner.PLAN_FILENAME}", "w") as f:
+        json.dump(plan, f, indent=4)
+    write_manifests(f"{out_dir}/configmap.yml", [job_planner.build_configmap(plan)])
+    write_manifests(f"{out_dir}/render-jobs.yml", render_jobs)
+    write_manifests(f"{out_dir}/merge-job.yml", [job_planner.build_merge_job(plan, merge_script, pod)])
+    with open(f"{out_dir}/submit.sh", "w") as f:
+        f.write(get_submit_script(plan, [job["metadata"]["name"] for job in render_jobs]))
+
+    print(f"Planned {plan['n_parts']} parts in {plan['n_shards']} shards, {len(render_jobs)} render jobs")
+    print(f"{'shard':12s}{'parts':>8s}{'images':>8s}{'cost':>12s}{'memory':>8s}")
+    for shard in plan["shards"]:
+        print(
+            f"{shard['shard']:12s}{len(shard['part_ids']):>8d}{shard['n_images']:>8d}{shard['cost']:>12.1f}"
+            f"{shard['memory_gi']:>6d}Gi"
+        )
+    print(f"Imbalance (largest shard / mean): {plan['imbalance']:.3f}")
+    print(f"Manifests written to {out_dir}, submit with: bash {out_dir}/submit.sh")
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -56,6 +56,8 @@ OUT_DIR=$(python scripts/utils/make_unique_out_dir.py "$OUT_ROOT_DIR" "$RUN_DESC
 echo "Created output directory: $OUT_DIR"
 # Copy input data into the out dir
 cp -R $RESOURCE_DIR "${OUT_DIR}/input_data"
+# Span traces of all steps, summarize with scripts/utils/summarize_trace.py
+TRACE_DIR="${OUT_DIR}/trace"
 ###################################
 
 ########## PREPROCESSING ##########
@@ -77,7 +79,8 @@ python preprocessing.py \
     --material_def_mode $MATERIAL_DEF_MODE \
     --envmap_def_mode $ENVMAP_DEF_MODE \
     --camera_seed $CAMERA_SEED \
-    --light_seed $LIGHT_SEED
+    --light_seed $LIGHT_SEED \
+    --trace_dir $TRACE_DIR
 PREPROCESSING_SECONDS_END=$(($SECONDS - $PREPROCESSING_SECONDS_START))
 ###################################
 
@@ -91,7 +94,8 @@ if [[ $RUN_MODE -ge 2 ]]; then
     EXPORT_SECONDS_START=$SECONDS
     blender $TOPEX_BLENDER_FILE --background --python ./bpy_modules/export_gltfs.py -- \
         --rcfg_file $RCFG_FILE \
-        --out_dir $GLTF_DIR
+        --out_dir $GLTF_DIR \
+        --trace_dir $TRACE_DIR
     EXPORT_SECONDS_END=$(($SECONDS - $EXPORT_SECONDS_START))
 fi
 ###################################
@@ -117,7 +121,8 @@ if [[ $RUN_MODE -ge 3 ]]; then
         --out_quality $OUT_QUALITY \
         --out_format $OUT_FORMAT \
         --engine $ENGINE \
-        --device $DEVICE
+        --device $DEVICE \
+        --trace_dir $TRACE_DIR
     RENDER_SECONDS_END=$(($SECONDS - $RENDER_SECONDS_START))
 fi
 
@@ -126,3 +131,4 @@ echo "Total time (s): $SECONDS"
 echo "Preprocessing time (s): $PREPROCESSING_SECONDS_END"
 echo "GLTF Export time (s): $EXPORT_SECONDS_END"
 echo "Render time (s): $RENDER_SECONDS_END"
+python scripts/utils/summarize_trace.py --trace $TRACE_DIR --chrome_trace "$OUT_DIR/trace.json"
@@ -0,0 +1,133 @@
+"""Predicts the render time of each part of a run before launching it (see utils/cost_model.py).
+
+calibrate: fits the cost model to the render_part spans of past runs (render.py or pipeline.py --trace_dir)
+estimate: dry run, prints the predicted time of each part, the total and the heaviest parts, and writes the
+    estimates as cost file for scripts/kube/plan_jobs.py --cost_file
+
+Triangle counts are read from the GLBs of --gltf_dir or the OBJ files of the RCFG without Blender
+(see preprocessing/utils/mesh.py get_mesh_stats).
+
+Run from project root:
+    python scripts/utils/estimate_costs.py calibrate --run_dir ./out/1-drucker --out_file ./out/cost_model.json
+    python scripts/utils/estimate_costs.py estimate --rcfg_file ./out/2-drucker/rcfg.json \
+        --gltf_dir ./out/2-drucker/gltf --model_file ./out/cost_model.json --adaptive_settings
+"""
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import click
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils import cost_model, render_profiles  # pylint: disable=wrong-import-position
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option(
+    "--run_dir",
+    help="Report directory of a past run with render_settings.json and its traces in {run_dir}/trace (repeatable)",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, readable=True),
+    multiple=True,
+    required=True,
+)
+@click.option(
+    "--out_file",
+    help="Model file (JSON)",
+    type=click.Path(file_okay=True, dir_okay=False, writable=True),
+    required=True,
+)
+def calibrate(**kwargs):
+    """Fits the cost model to the measured part times of past runs."""
+    args = SimpleNamespace(**kwargs)
+    samples = []
+    for run_dir in args.run_dir:
+        run_samples = cost_model.get_calibration_samples(run_dir)
+        print(f"{run_dir}: {len(run_samples)} rendered parts")
+        samples += run_samples
+    if not samples:
+        raise click.ClickException("No render_part spans with image and triangle counts in the given runs")
+
+    model = cost_model.fit_model(samples)
+    model["calibration"]["runs"] = list(args.run_dir)
+    with open(args.out_file, "w") as f:
+        json.dump(model, f, indent=4)
+    for feature, coefficient in model["coefficients"].items():
+        print(f"{feature:22s}{coefficient:>12.4f} s")
+    print(
+        f"Fitted on {model['calibration']['n_parts']} parts, mean absolute error "
+        f"{model['calibration']['mean_abs_error']:.1%}, written to {args.out_file}"
+    )
+
+
+@cli.command()
+@click.option(
+    "--rcfg_file",
+    help="RCFG of the run",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True),
+    required=True,
+)
+@click.option(
+    "--gltf_dir",
+    help="Exported GLBs of the parts. Default: OBJ files of the RCFG, parts of .blend files have no triangles",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, readable=True),
+    default=None,
+)
+@click.option(
+    "--model_file",
+    help="Calibrated model (calibrate). Default: uncalibrated coefficients",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True),
+    default=None,
+)
+@click.option("--res_x", help="Pixel resolution in X direction", type=int, show_default=True, default=256)
+@click.option("--res_y", help="Pixel resolution in Y direction", type=int, show_default=True, default=256)
+@click.option("--samples", help="Cycles samples (render.py --samples)", type=int, show_default=True, default=4096)
+@click.option("--adaptive_settings", help="Render profiles per part (render.py --adaptive_settings)", is_flag=True)
+@click.option(
+    "--render_profiles_file",
+    help="Rule table of render.py --render_profiles_file",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True),
+    default=None,
+)
+@click.option("--n_heaviest", help="Heaviest parts to print", type=click.IntRange(min=0), default=10)
+@click.option(
+    "--out_file",
+    help=f"Estimates (cost file). Default: {cost_model.ESTIMATES_NAME} next to the RCFG",
+    type=click.Path(file_okay=True, dir_okay=False, writable=True),
+    default=None,
+)
+def estimate(**kwargs):
+    """Dry run: predicts the render time of each part."""
+    args = SimpleNamespace(**kwargs)
+    out_file = args.out_file or os.path.join(os.path.dirname(args.rcfg_file), cost_model.ESTIMATES_NAME)
+    profiles, rules = None, None
+    if args.render_profiles_file:
+        profiles, rules = render_profiles.load_rule_table(args.render_profiles_file)
+    with open(args.rcfg_file, "r") as f:
+        rcfg = json.load(f)
+
+    model = cost_model.load_model(args.model_file)
+    settings = {
+        "res_x": args.res_x,
+        "res_y": args.res_y,
+        "samples": args.samples,
+        "adaptive_settings": args.adaptive_settings,
+    }
+    estimates = cost_model.estimate_parts(
+        rcfg, cost_model.inspect_parts(rcfg, args.gltf_dir), settings, model, profiles, rules
+    )
+    cost_model.write_estimates(out_file, estimates, settings, model)
+    for line in cost_model.format_estimates(estimates, args.n_heaviest):
+        print(line)
+    if model["calibration"] is None:
+        print("Uncalibrated model, calibrate it on a past run for reliable times")
+    print(f"Estimates written to {out_file}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,114 @@
+"""Packs the loose image files of an existing run directory into tar shards (see utils/shard_writer.py).
+
+Expects the layout written by bpy_modules/render.py with --out_mode files:
+    {run_dir}/render/rgb/{part_id}/{part_id}_{i:03d}.{png,jpg}
+    {run_dir}/render/depth_png/{part_id}/{part_id}_{i:03d}_depth.png
+    {run_dir}/render/depth_exr/{part_id}/{part_id}_{i:03d}_depth.exr
+
+The result is the same as rendering with --out_mode shards.
+"""
+import os
+import sys
+import json
+import click
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils import shard_writer as shards  # pylint: disable=wrong-import-position
+
+
+def get_samples(run_dir: str) -> list[tuple[str, int, dict]]:
+    """Returns (part_id, image_i, files) for each rendered RGB image of the run, sorted by part id and image index."""
+    rgb_dir = f"{run_dir}/render/rgb"
+    samples = []
+    for part_id in sorted(os.listdir(rgb_dir)):
+        for fn in sorted(os.listdir(f"{rgb_dir}/{part_id}")):
+            name, ext = os.path.splitext(fn)
+            image_i = int(name[len(part_id) + 1 :])
+            files = {f"rgb{ext}": f"{rgb_dir}/{part_id}/{fn}"}
+            for depth_ext, depth_dir in (("png", "depth_png"), ("exr", "depth_exr")):
+                depth_file = f"{run_dir}/render/{depth_dir}/{part_id}/{name}_depth.{depth_ext}"
+                if os.path.isfile(depth_file):
+                    files[f"depth.{depth_ext}"] = depth_file
+            samples.append((part_id, image_i, files))
+    return samples
+
+
+def get_sample_metadata(rcfg_part: dict, part_id: str, image_i: int) -> dict:
+    """Returns the metadata of a sample as written by render.py, or only its ids if the part is not in the RCFG."""
+    metadata = {"part_id": part_id, "image_i": image_i}
+    if rcfg_part is None:
+        return metadata
+    render_setup = rcfg_part["scene"]["render_setups"][image_i]
+    metadata["render_setup"] = render_setup
+    metadata["camera"] = rcfg_part["scene"]["cameras"][render_setup["camera_i"]]
+    metadata["lights"] = [rcfg_part["scene"]["lights"][light_i] for light_i in render_setup["lights_i"]]
+    return metadata
+
+
+@click.command()
+@click.option(
+    "--run_dir",
+    help="Run directory containing render/{rgb,depth_png,depth_exr}",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True),
+    required=True,
+)
+@click.option(
+    "--out_dir",
+    help="Directory to write the shards to. Defaults to {run_dir}/render/shards",
+    type=click.Path(file_okay=False, dir_okay=True, writable=True),
+    default=None,
+)
+@click.option(
+    "--rcfg_file",
+    help="RCFG used for rendering, adds camera and light definitions to each sample. Defaults to {run_dir}/rcfg.json",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    default=None,
+)
+@click.option(
+    "--shard_size_mb",
+    help="Maximum size of a shard in MB",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=1024,
+)
+@click.option(
+    "--remove_source",
+    help="Remove the loose files once they are packed",
+    is_flag=True,
+    default=False,
+)
+def main(**kwargs):
+    args = SimpleNamespace(**kwargs)
+    out_dir = args.out_dir or f"{args.run_dir}/render/shards"
+    rcfg_file = args.rcfg_file or f"{args.run_dir}/rcfg.json"
+
+    rcfg_parts = {}
+    if os.path.isfile(rcfg_file):
+        with open(rcfg_file, "r", encoding="utf-8") as f:
+            rcfg_parts = {part["id"]: part for part in json.load(f)["parts"]}
+    else:
+        print(f"No RCFG found at {rcfg_file}, samples only contain part ids")
+
+    samples = get_samples(args.run_dir)
+    print(f"Packing {len(samples)} samples into {out_dir}")
+    with shards.BackgroundShardWriter(
+        out_dir,
+        remove_files=args.remove_source,
+        max_shard_bytes=args.shard_size_mb * 1024 * 1024,
+    ) as shard_writer:
+        for part_id, image_i, files in samples:
+            shard_writer.submit(
+                key=shards.get_sample_key(part_id, image_i),
+                files=files,
+                metadata=get_sample_metadata(rcfg_parts.get(part_id), part_id, image_i),
+            )
+    shards.merge_indices(out_dir)
+    print(
+        f"Wrote {shard_writer.writer.n_samples} samples into {shard_writer.writer.n_shards} shards "
+        f"({shard_writer.writer.bytes_written / 1e6:.1f} MB)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""Builds an incremental perceptual hash index of rendered images and plans the removal of duplicate parts.
+
+Duplicate parts (same geometry under different ids) render near-identical images for the same render setups.
+This tool
+    1. hashes all images in {render_dir}/{rgb,depth_png}/{part_id}/ in parallel. Hashes are stored in an
+       SQLite index together with file size and modification time, so re-runs only hash new or changed images.
+    2. finds near-duplicate images with banded hash buckets (sub-quadratic, see utils/image_hash.py).
+    3. clusters parts whose images match to at least --min_match_fraction and writes a removal plan,
+       which keeps the smallest id of each cluster.
+
+Parts are only matched if they were rendered from the same views, i.e. with a deterministic camera mode
+(e.g. sphere-equidistant) or --shared_scenes.
+
+Run from project root:
+    python scripts/utils/phash_index.py --run_dir ./out/1-my-run --n_workers 8
+"""
+import os
+import sys
+import json
+import sqlite3
+import time
+import click
+from multiprocessing import Pool
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils import geometry_fingerprint, image_hash  # pylint: disable=wrong-import-position
+
+IMAGE_KINDS = ["rgb", "depth_png"]
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+INSERT_BATCH_SIZE = 1000
+
+
+def to_signed(hash_value: int) -> int:
+    """Converts an unsigned 64 bit hash to a signed integer, as stored by SQLite."""
+    return hash_value - (1 << 64) if hash_value >= (1 << 63) else hash_value
+
+
+def to_unsigned(hash_value: int) -> int:
+    """Converts a signed integer from SQLite back to an unsigned 64 bit hash."""
+    return hash_value & ((1 << 64) - 1)
+
+
+def open_index(index_file: str) -> sqlite3.Connection:
+    """Opens (and creates) the hash index."""
+    connection = sqlite3.connect(index_file)
+    connection.execute(
+        """CREATE TABLE IF NOT EXISTS images (
+            path TEXT PRIMARY KEY,
+            part_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            phash INTEGER NOT NULL
+        )"""
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS images_part_id ON images (part_id)")
+    return connection
+
+
+def get_run_prefix(run_dir: str) -> str:
+    """Returns the path prefix of the indexed images of a run. Several runs can share one index file."""
+    return os.path.join(os.path.abspath(run_dir), "render", "")
+
+
+def scan_images(run_dir: str, kinds: list[str]) -> dict:
+    """Returns path -> (part_id, kind, size, mtime_ns) of all images in {run_dir}/render/{kind}/{part_id}/."""
+    images = {}
+    for kind in kinds:
+        kind_dir = os.path.join(run_dir, "render", kind)
+        if not os.path.isdir(kind_dir):
+            continue
+        for part_entry in os.scandir(kind_dir):
+            if not part_entry.is_dir():
+                continue
+            for entry in os.scandir(part_entry.path):
+                if entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    stat = entry.stat()
+                    images[os.path.abspath(entry.path)] = (part_entry.name, kind, stat.st_size, stat.st_mtime_ns)
+    return images
+
+
+def hash_image(path: str) -> tuple[str, int]:
+    """Returns (path, phash) of an image, or (path, None) if it cannot be read."""
+    try:
+        return path, image_hash.phash_file(path)
+    except Exception as err:  # pylint: disable=broad-except
+        print(f"Cannot hash {path}: {err}")
+        return path, None
+
+
+def update_index(connection: sqlite3.Connection, run_dir: str, kinds: list[str], n_workers: int) -> dict:
+    """Hashes new and changed images of the run and removes deleted ones from the index.
+
+    Returns:
+        dict: Number of scanned, hashed and removed images and the hashing time
+    """
+    images = scan_images(run_dir, kinds)
+    run_prefix = get_run_prefix(run_dir)
+    indexed = {
+        path: (size, mtime_ns)
+        for path, size, mtime_ns in connection.execute(
+            "SELECT path, size, mtime_ns FROM images WHERE substr(path, 1, ?) = ?", (len(run_prefix), run_prefix)
+        )
+    }
+    removed = [path for path in indexed if path not in images]
+    connection.executemany("DELETE FROM images WHERE path = ?", [(path,) for path in removed])
+    to_hash = [path for path, (_, _, size, mtime_ns) in images.items() if indexed.get(path) != (size, mtime_ns)]
+
+    tstart = time.time()
+    rows, n_hashed = [], 0
+    with Pool(processes=n_workers) as pool:
+        for path, hash_value in pool.imap_unordered(hash_image, to_hash, chunksize=64):
+            if hash_value is None:
+                continue
+            part_id, kind, size, mtime_ns = images[path]
+            rows.append((path, part_id, kind, size, mtime_ns, to_signed(hash_value)))
+            if len(rows) >= INSERT_BATCH_SIZE:
+                connection.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?)", rows)
+                connection.commit()
+                n_hashed += len(rows)
+                rows = []
+    connection.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?)", rows)
+    connection.commit()
+    n_hashed += len(rows)
+    return {
+        "n_images": len(images),
+        "n_hashed": n_hashed,
+        "n_removed": len(removed),
+        "hash_seconds": time.time() - tstart,
+    }
+
+
+def find_duplicate_parts(
+    connection: sqlite3.Connection,
+    run_dir: str,
+    max_distance: int,
+    min_match_fraction: float,
+    max_bucket_size: int,
+) -> dict:
+    """Returns the removal plan of a run: clusters of duplicate parts with the part to keep and the parts to remove.
+
+    Only images of the run are compared, also if the index holds images of other runs.
+    """
+    run_prefix = get_run_prefix(run_dir)
+    rows = connection.execute(
+        "SELECT part_id, kind, phash FROM images WHERE substr(path, 1, ?) = ? ORDER BY part_id, path",
+        (len(run_prefix), run_prefix),
+    ).fetchall()
+    n_images_per_part = {}
+    for part_id, _, _ in rows:
+        n_images_per_part[part_id] = n_images_per_part.get(part_id, 0) + 1
+
+    # Near-duplicate images of different parts, compared within each kind of image
+    matched = {}
+    n_skipped_buckets = 0
+    for kind in sorted({kind for _, kind, _ in rows}):
+        kind_rows = [(i, part_id) for i, (part_id, row_kind, _) in enumerate(rows) if row_kind == kind]
+        pairs, n_skipped = image_hash.find_near_duplicates(
+            [to_unsigned(rows[i][2]) for i, _ in kind_rows],
+            max_distance=max_distance,
+            max_bucket_size=max_bucket_size,
+        )
+        n_skipped_buckets += n_skipped
+        for a, b in pairs:
+            (image_a, part_a), (image_b, part_b) = kind_rows[a], kind_rows[b]
+            if part_a == part_b:
+                continue
+            if part_a > part_b:
+                (image_a, part_a), (image_b, part_b) = (image_b, part_b), (image_a, part_a)
+            images_a, images_b = matched.setdefault((part_a, part_b), (set(), set()))
+            images_a.add(image_a)
+            images_b.add(image_b)
+
+    # Cluster parts with union find
+    parents = {}
+
+    def find(part_id):
+        parents.setdefault(part_id, part_id)
+        while parents[part_id] != part_id:
+            parents[part_id] = parents[parents[part_id]]
+            part_id = parents[part_id]
+        return part_id
+
+    match_fractions = {}
+    for (part_a, part_b), (images_a, images_b) in matched.items():
+        fraction = min(len(images_a) / n_images_per_part[part_a], len(images_b) / n_images_per_part[part_b])
+        if fraction >= min_match_fraction:
+            match_fractions[(part_a, part_b)] = fraction
+            root_a, root_b = find(part_a), find(part_b)
+            parents[max(root_a, root_b)] = min(root_a, root_b)
+
+    clusters = {}
+    for part_id in parents:
+        clusters.setdefault(find(part_id), []).append(part_id)
+    plan_clusters = []
+    for keep, members in sorted(clusters.items()):
+        if len(members) < 2:
+            continue
+        plan_clusters.append(
+            {
+                "keep": keep,
+                "remove": sorted(part_id for part_id in members if part_id != keep),
+                "match_fractions": {
+                    f"{part_a}|{part_b}": round(fraction, 3)
+                    for (part_a, part_b), fraction in match_fractions.items()
+                    if part_a in members
+                },
+            }
+        )
+    return {
+        "n_images": len(rows),
+        "n_parts": len(n_images_per_part),
+        "max_distance": max_distance,
+        "min_match_fraction": min_match_fraction,
+        "n_skipped_buckets": n_skipped_buckets,
+        "clusters": plan_clusters,
+        "remove_ids": sorted(part_id for cluster in plan_clusters for part_id in cluster["remove"]),
+    }
+
+
+def remove_alias_links(render_dir: str, removed_paths: set) -> int:
+    """Removes the alias symlinks (see geometry_fingerprint.link_alias_renders) that point at removed files,
+    and the alias image directories that become empty. Returns the number of removed links."""
+    link_dirs = [os.path.join(render_dir, "depth_stack")]
+    for kind in geometry_fingerprint.RENDER_OUTPUT_KINDS:
+        kind_dir = os.path.join(render_dir, kind)
+        if os.path.isdir(kind_dir):
+            link_dirs += [entry.path for entry in os.scandir(kind_dir) if entry.is_dir(follow_symlinks=False)]
+
+    n_removed = 0
+    for link_dir in link_dirs:
+        if not os.path.isdir(link_dir):
+            continue
+        for entry in os.scandir(link_dir):
+            if not entry.is_symlink():
+                continue
+            target = os.path.normpath(os.path.join(link_dir, os.readlink(entry.path)))
+            if target in removed_paths:
+                os.remove(entry.path)
+                n_removed += 1
+        if os.path.basename(os.path.dirname(link_dir)) != "render" and not os.listdir(link_dir):
+            os.rmdir(link_dir)
+    return n_removed
+
+
+def apply_plan(run_dir: str, plan: dict) -> int:
+    """Removes the GLB file and all rendered files of the parts to remove: images of every kind, depth stacks
+    and the alias symlinks that point at them. Returns the number of removed files."""
+    render_dir = os.path.join(os.path.abspath(run_dir), "render")
+    stack_dir = os.path.join(render_dir, "depth_stack")
+    removed_paths = set()
+    for part_id in plan["remove_ids"]:
+        glb_file = os.path.join(run_dir, "gltf", f"{part_id}.glb")
+        if os.path.isfile(glb_file):
+            os.remove(glb_file)
+            removed_paths.add(glb_file)
+        for kind in geometry_fingerprint.RENDER_OUTPUT_KINDS:
+            part_dir = os.path.join(render_dir, kind, part_id)
+            if not os.path.isdir(part_dir):
+                continue
+            for fn in os.listdir(part_dir):
+                os.remove(os.path.join(part_dir, fn))
+                removed_paths.add(os.path.join(part_dir, fn))
+            os.rmdir(part_dir)
+        if os.path.isdir(stack_dir):
+            for fn in os.listdir(stack_dir):
+                if fn.startswith(f"{part_id}_depth."):
+                    os.remove(os.path.join(stack_dir, fn))
+                    removed_paths.add(os.path.join(stack_dir, fn))
+    return len(removed_paths) + remove_alias_links(render_dir, removed_paths)
+
+
+@click.command()
+@click.option(
+    "--run_dir",
+    help="Run directory containing render/{rgb,depth_png}/{part_id}/",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True),
+    required=True,
+)
+@click.option(
+    "--index_file",
+    help="SQLite hash index. Defaults to {run_dir}/phash_index.sqlite",
+    type=click.Path(file_okay=True, dir_okay=False),
+    default=None,
+)
+@click.option(
+    "--kinds",
+    help="Image kinds to hash",
+    type=click.Choice(IMAGE_KINDS),
+    multiple=True,
+    default=IMAGE_KINDS,
+    show_default=True,
+)
+@click.option(
+    "--n_workers",
+    help="Number of hashing processes",
+    type=click.IntRange(min=1),
+    default=os.cpu_count(),
+    show_default=True,
+)
+@click.option(
+    "--max_distance",
+    help="Maximum Hamming distance of near-duplicate images (max_distance + 1 must divide 64)",
+    type=click.Choice(["0", "1", "3", "7"]),
+    default="3",
+    show_default=True,
+)
+@click.option(
+    "--min_match_fraction",
+    help="Minimum fraction of images of both parts that must have a near-duplicate in the other part",
+    type=click.FloatRange(min=0.0, max=1.0),
+    default=0.8,
+    show_default=True,
+)
+@click.option(
+    "--max_bucket_size",
+    help="Hash buckets with more images (e.g. empty renders) are skipped",
+    type=click.IntRange(min=2),
+    default=1000,
+    show_default=True,
+)
+@click.option(
+    "--plan_file",
+    help="Output removal plan. Defaults to {run_dir}/duplicates_plan.json",
+    type=click.Path(file_okay=True, dir_okay=False),
+    default=None,
+)
+@click.option(
+    "--apply",
+    help="Remove the GLB, render files, depth stacks and alias links of the duplicate parts in the plan",
+    is_flag=True,
+    default=False,
+)
+def main(**kwargs):
+    args = SimpleNamespace(**kwargs)
+    index_file = args.index_file or os.path.join(args.run_dir, "phash_index.sqlite")
+    plan_file = args.plan_file or os.path.join(args.run_dir, "duplicates_plan.json")
+
+    connection = open_index(index_file)
+    stats = update_index(connection, args.run_dir, list(args.kinds), args.n_workers)
+    print(
+        f"Indexed {stats['n_images']} images: hashed {stats['n_hashed']} new or changed images "
+        f"in {stats['hash_seconds']:.2f}s, removed {stats['n_removed']} deleted images"
+    )
+
+    tstart = time.time()
+    plan = find_duplicate_parts(
+        connection, args.run_dir, int(args.max_distance), args.min_match_fraction, args.max_bucket_size
+    )
+    connection.close()
+    print(
+        f"Found {len(plan['clusters'])} clusters of duplicate parts ({len(plan['remove_ids'])} parts to remove) "
+        f"in {time.time() - tstart:.2f}s"
+    )
+    if plan["n_skipped_buckets"]:
+        print(f"Skipped {plan['n_skipped_buckets']} hash buckets with more than {args.max_bucket_size} images")
+    with open(plan_file, "w", encoding="utf-8") as f:
+        json.dump(plan, f, indent=4)
+    print(f"Wrote removal plan to {plan_file}")
+
+    if args.apply:
+        n_removed = apply_plan(args.run_dir, plan)
+        print(f"Removed {n_removed} files of {len(plan['remove_ids'])} duplicate parts")
+
+
+if __name__ == "__main__":
+    main()
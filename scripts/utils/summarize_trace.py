@@ -0,0 +1,103 @@
+"""Summarizes pipeline traces (see utils/trace_utils.py): per-stage count, total time, share and percentiles.
+
+Run from project root:
+    python scripts/utils/summarize_trace.py --trace ./out/1-my-run/trace --chrome_trace ./out/1-my-run/trace.json
+"""
+import os
+import sys
+import json
+import click
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils import trace_utils  # pylint: disable=wrong-import-position
+
+PERCENTILES = [50, 90, 99]
+
+
+def summarize_spans(spans: list[dict]) -> list[dict]:
+    """Returns per (process, stage) statistics, sorted by total time.
+
+    The share is relative to the wall-clock time of the process's root spans (spans without parent).
+    """
+    process_wall_time = {}
+    durations = {}
+    for span_record in spans:
+        if span_record["parent"] is None:
+            process = span_record["process"]
+            process_wall_time[process] = process_wall_time.get(process, 0.0) + span_record["duration"]
+        durations.setdefault((span_record["process"], span_record["name"]), []).append(span_record["duration"])
+
+    summary = []
+    for (process, name), stage_durations in durations.items():
+        stage_durations = np.array(stage_durations)
+        wall_time = process_wall_time.get(process, 0.0)
+        stats = {
+            "process": process,
+            "stage": name,
+            "count": len(stage_durations),
+            "total": float(stage_durations.sum()),
+            "share": float(stage_durations.sum() / wall_time) if wall_time > 0 else None,
+            "mean": float(stage_durations.mean()),
+            "max": float(stage_durations.max()),
+        }
+        stats.update({f"p{p}": float(np.percentile(stage_durations, p)) for p in PERCENTILES})
+        summary.append(stats)
+    return sorted(summary, key=lambda stats: (stats["process"], -stats["total"]))
+
+
+def print_summary(summary: list[dict]) -> None:
+    """Prints the summary as table, grouped by process."""
+    header = f"{'stage':<28}{'count':>8}{'total s':>11}{'share':>8}{'mean s':>10}"
+    header += "".join(f"{f'p{p} s':>10}" for p in PERCENTILES) + f"{'max s':>10}"
+    process = None
+    for stats in summary:
+        if stats["process"] != process:
+            process = stats["process"]
+            print(f"\n[{process}]")
+            print(header)
+        share = f"{stats['share']:.1%}" if stats["share"] is not None else "-"
+        row = f"{stats['stage']:<28}{stats['count']:>8}{stats['total']:>11.2f}{share:>8}{stats['mean']:>10.3f}"
+        row += "".join(f"{stats[f'p{p}']:>10.3f}" for p in PERCENTILES) + f"{stats['max']:>10.3f}"
+        print(row)
+
+
+@click.command()
+@click.option(
+    "--trace",
+    help="Trace file or directory with *.trace.jsonl files. Can be given multiple times",
+    type=click.Path(exists=True),
+    multiple=True,
+    required=True,
+)
+@click.option(
+    "--chrome_trace",
+    help="Write all spans in Chrome trace format to this file (open with chrome://tracing or ui.perfetto.dev)",
+    type=click.Path(file_okay=True, dir_okay=False, writable=True),
+    default=None,
+)
+@click.option(
+    "--json_out",
+    help="Write the summary as JSON to this file",
+    type=click.Path(file_okay=True, dir_okay=False, writable=True),
+    default=None,
+)
+def main(**kwargs):
+    args = SimpleNamespace(**kwargs)
+    spans = trace_utils.load_spans(list(args.trace))
+    print(f"Loaded {len(spans)} spans")
+    summary = summarize_spans(spans)
+    print_summary(summary)
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=4)
+    if args.chrome_trace:
+        trace_utils.write_chrome_trace(spans, args.chrome_trace)
+        print(f"\nWrote Chrome trace to {args.chrome_trace}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+"""Makes the project modules importable when pytest is run from another directory."""
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
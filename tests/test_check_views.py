@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from preprocessing import check_views, define_scenes
+from preprocessing.models.camera import get_camera_array
+from preprocessing.models.light import get_light_array
+from preprocessing.models.scene import Scene
+from preprocessing.utils import sampling
+
+# Unit cube as 12 triangles
+CUBE_VERTICES = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.float64)
+CUBE_FACES = np.array(
+    [[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5], [0, 4, 5], [0, 5, 1], [2, 3, 7], [2, 7, 6], [0, 2, 6], [0, 6, 4]]
+    + [[1, 5, 7], [1, 7, 3]]
+)
+
+
+def write_obj(file_path, scale=(1.0, 1.0, 1.0)) -> str:
+    with open(file_path, "w") as f:
+        f.write("".join(f"v {x} {y} {z}\n" for x, y, z in CUBE_VERTICES * scale))
+        f.write("".join(f"f {a + 1} {b + 1} {c + 1}\n" for a, b, c in CUBE_FACES))
+    return str(file_path)
+
+
+@pytest.fixture(name="cube")
+def fixture_cube(tmp_path):
+    return check_views.get_check_geometry(write_obj(tmp_path / "cube.obj"), rng=np.random.default_rng(0))
+
+
+def get_scene(camera_positions: list, light_positions: list, camera_targets: list = None) -> Scene:
+    cameras = get_camera_array(np.array(camera_positions, dtype=float))
+    if camera_targets is not None:
+        cameras["target"] = camera_targets
+    render_setups = [{"camera_i": i, "lights_i": [i], "envmap_fname": "none"} for i in range(len(camera_positions))]
+    lights = get_light_array(np.array(light_positions, dtype=float))
+    return Scene(cameras=cameras, lights=lights, render_setups=render_setups)
+
+
+def get_reasons(scene: Scene) -> list:
+    return [render_setup["view_check"]["reasons"] for render_setup in scene.render_setups]
+
+
+def test_check_view_reasons(cube):
+    camera = np.array([3.0, 0.0, 0.0])
+    assert check_views.check_view(cube, camera, np.array([[3.0, 1.0, 1.0]])) == []
+    assert check_views.check_view(cube, camera, np.array([[-3.0, 0.0, 0.0]])) == ["light_behind_part"]
+    assert "light_inside_part" in check_views.check_view(cube, camera, np.array([[0.0, 0.0, 0.0]]))
+
+
+def test_edge_on_view_of_a_plate_is_degenerate(tmp_path):
+    plate = check_views.get_check_geometry(
+        write_obj(tmp_path / "plate.obj", scale=(1.0, 1.0, 0.02)), rng=np.random.default_rng(0)
+    )
+    lights = np.array([[3.0, 3.0, 3.0]])
+    assert check_views.check_view(plate, np.array([0.0, 0.0, 3.0]), lights) == []
+    assert check_views.check_view(plate, np.array([3.0, 0.0, 0.0]), lights) == ["degenerate_silhouette"]
+
+
+@pytest.mark.parametrize("with_mesh", [True, False])
+def test_cameras_inside_the_bounds_or_looking_away(cube, with_mesh):
+    geometry = cube if with_mesh else check_views.get_check_geometry(None)
+    lights = [[3.0, 1.0, 1.0]] * 4
+    scene = get_scene(
+        # Far away, inside the bounding box, looking away from the part, on its target
+        [[3.0, 0.0, 0.0], [0.2, 0.0, 0.0], [3.0, 0.0, 0.0], [0.0, 0.0, 0.0]],
+        lights,
+        camera_targets=[[0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [6.0, 0.0, 0.0], [0.0, 0.0, 0.0]],
+    )
+    checked = check_views.check_scene(scene, geometry, "flag", "sphere-uniform", rng=np.random.default_rng(0))
+    # The camera looking away sees the part from -X after zooming, where the light does not reach
+    assert get_reasons(checked) == [[], [], ["light_behind_part"], ["degenerate_silhouette"]]
+    assert [render_setup["view_check"]["attempts"] for render_setup in checked.render_setups] == [1, 1, 1, 1]
+    np.testing.assert_array_equal(checked.camera_array, scene.camera_array)
+
+
+def test_resample_fixes_invalid_setups(cube):
+    scene = get_scene(
+        [[3.0, 0.0, 0.0], [3.0, 0.0, 0.0], [0.0, 0.0, 0.0]],
+        [[3.0, 1.0, 1.0], [-3.0, 0.0, 0.0], [0.0, 0.0, 0.0]],
+    )
+    camera_array, light_array = scene.camera_array.copy(), scene.light_array.copy()
+    checked = check_views.check_scene(scene, cube, "resample", "sphere-uniform", rng=np.random.default_rng(3))
+
+    checks = [render_setup["view_check"] for render_setup in checked.render_setups]
+    assert all(check["valid"] for check in checks)
+    assert checks[0]["attempts"] == 1 and checks[1]["attempts"] > 1 and checks[2]["attempts"] > 1
+    assert checks[1]["reasons"][0] == "light_behind_part"
+    assert {"light_inside_part", "degenerate_silhouette"} <= set(checks[2]["reasons"])
+    # The valid setup is unchanged, the camera on its target got distance 1
+    np.testing.assert_array_equal(checked.camera_array[0], camera_array[0])
+    assert np.linalg.norm(checked.camera_array[2]["position"]) == pytest.approx(1.0)
+    # The given scene is not modified and the same generator state gives the same result
+    np.testing.assert_array_equal(scene.camera_array, camera_array)
+    np.testing.assert_array_equal(scene.light_array, light_array)
+    again = check_views.check_scene(scene, cube, "resample", "sphere-uniform", rng=np.random.default_rng(3))
+    np.testing.assert_array_equal(again.camera_array, checked.camera_array)
+    np.testing.assert_array_equal(again.light_array, checked.light_array)
+
+    stats = check_views.get_view_check_stats(checked.render_setups)
+    assert stats["n_setups"] == 3 and stats["n_rejected"] == 2 and stats["n_resampled"] == 2
+    assert stats["n_invalid"] == 0 and stats["reasons"]["light_behind_part"] >= 1
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_resampled_scenes_do_not_depend_on_the_number_of_workers(tmp_path, shared):
+    mesh_files = [write_obj(tmp_path / "cube.obj")] * 4
+    args = (4, 6, "sphere-uniform", "sphere-uniform", "disabled", 1, 2)
+    kwargs = dict(shared=shared, mesh_files=mesh_files, view_check="resample")
+    scenes = define_scenes.build_scenes(*args, n_workers=1, **kwargs)
+    other = define_scenes.build_scenes(*args, n_workers=2, **kwargs)
+    for scene, other_scene in zip(scenes, other):
+        np.testing.assert_array_equal(scene.camera_array, other_scene.camera_array)
+        np.testing.assert_array_equal(scene.light_array, other_scene.light_array)
+        assert scene.render_setups == other_scene.render_setups
+
+
+def test_view_check_streams_differ_from_part_streams():
+    # In shared mode the light seed of every part is the root sequence
+    root = np.random.SeedSequence(2)
+    for key in [check_views.VIEW_CHECK_SEED_KEY, check_views.VIEW_CHECK_GEOMETRY_SEED_KEY]:
+        # Stream of part number key, i.e. root.spawn(key + 1)[key]
+        part_stream = np.random.SeedSequence(2, spawn_key=(key,)).generate_state(4)
+        assert not np.array_equal(sampling.derive_seed(root, key).generate_state(4), part_stream)
@@ -0,0 +1,138 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from utils import cost_model, render_profiles, trace_utils
+
+COEFFICIENTS = {
+    "parts": 2.0,
+    "images": 0.4,
+    "mtriangles": 3.0,
+    "image_mtriangles": 0.0,
+    "gpaths": 0.8,
+    "transmissive_gpaths": 0.7,
+}
+
+
+def get_samples(n_parts: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    samples = []
+    for i in range(n_parts):
+        features = cost_model.get_features(
+            int(rng.integers(1, 20)),
+            int(rng.integers(1000, 2_000_000)),
+            128,
+            128,
+            int(rng.choice([64, 256, 1024])),
+            int(rng.choice([4, 12])),
+            "transmissive" if i % 3 == 0 else "glossy",
+        )
+        samples.append({"part_id": f"part_{i}", "features": features, "seconds": 0.0})
+        samples[-1]["seconds"] = cost_model.predict({"coefficients": COEFFICIENTS}, features)
+    return samples
+
+
+def test_fit_recovers_coefficients():
+    model = cost_model.fit_model(get_samples(40))
+    for feature, coefficient in COEFFICIENTS.items():
+        assert model["coefficients"][feature] == pytest.approx(coefficient, abs=1e-6)
+    assert model["calibration"]["n_parts"] == 40
+    assert model["calibration"]["mean_abs_error"] < 1e-6
+
+
+def test_fit_drops_negative_coefficients():
+    samples = get_samples(40, seed=1)
+    rng = np.random.default_rng(1)
+    for sample in samples:
+        # Parts with more triangles measured slightly faster, which would fit a negative coefficient
+        sample["seconds"] = max(0.1, sample["seconds"] - 5.0 * sample["features"]["mtriangles"] + rng.normal(0, 0.01))
+    model = cost_model.fit_model(samples)
+    assert model["coefficients"]["mtriangles"] == 0.0
+    assert all(coefficient >= 0.0 for coefficient in model["coefficients"].values())
+    assert set(model["coefficients"]) == set(cost_model.FEATURES)
+
+
+def test_fit_with_few_parts_scales_defaults():
+    samples = get_samples(5)
+    for sample in samples:
+        sample["seconds"] = 2.0 * cost_model.predict(cost_model.DEFAULT_MODEL, sample["features"])
+    model = cost_model.fit_model(samples)
+    for feature, coefficient in cost_model.DEFAULT_COEFFICIENTS.items():
+        assert model["coefficients"][feature] == pytest.approx(2.0 * coefficient)
+
+
+def test_load_model(tmp_path):
+    assert cost_model.load_model() is cost_model.DEFAULT_MODEL
+    model_file = tmp_path / "model.json"
+    model_file.write_text(json.dumps({"coefficients": {"parts": 1.0, "pixels": 1.0}, "calibration": None}))
+    with pytest.raises(AssertionError, match="unknown features"):
+        cost_model.load_model(str(model_file))
+
+
+def write_run(run_dir: str, engine: str = "CYCLES") -> None:
+    os.makedirs(f"{run_dir}/trace")
+    render_settings = {
+        "engine": engine,
+        "resolution_x": 64,
+        "resolution_y": 32,
+        "cycles": {"samples": 128, "max_bounces": 12},
+        "depth": {"mode": "full"},
+    }
+    with open(f"{run_dir}/render_settings.json", "w") as f:
+        json.dump(render_settings, f)
+    with open(f"{run_dir}/part_render_settings.json", "w") as f:
+        json.dump({"b": {"profile": "matte", "cycles": {"samples": 32, "max_bounces": 4}}}, f)
+    spans = [
+        {"name": "render_part", "duration": 10.0, "attrs": {"part_id": "a", "n_images": 4, "n_triangles": 2_000_000}},
+        {"name": "render_part", "duration": 2.0, "attrs": {"part_id": "b", "n_images": 2, "n_triangles": 1000}},
+        # Failed part without image count and a span of another kind
+        {"name": "render_part", "duration": 1.0, "attrs": {"part_id": "c"}},
+        {"name": "import_glb", "duration": 1.0, "attrs": {"part_id": "a", "n_images": 4, "n_triangles": 0}},
+    ]
+    # Two render workers, each with its own trace file
+    for pid, worker_spans in [(101, spans[1::2]), (102, spans[::2])]:
+        with open(trace_utils.get_trace_file(f"{run_dir}/trace", "render", pid), "w") as f:
+            for span_record in worker_spans:
+                f.write(json.dumps(dict(span_record, start=float(spans.index(span_record)))) + "\n")
+
+
+def test_calibration_samples_of_a_run(tmp_path):
+    write_run(str(tmp_path / "run"))
+    samples = cost_model.get_calibration_samples(str(tmp_path / "run"))
+    assert [(sample["part_id"], sample["seconds"]) for sample in samples] == [("a", 10.0), ("b", 2.0)]
+    assert samples[0]["features"] == cost_model.get_features(4, 2_000_000, 64, 32, 128, 12, None)
+    # Part b was rendered with the settings of its profile
+    assert samples[1]["features"] == cost_model.get_features(2, 1000, 64, 32, 32, 4, "matte")
+
+    write_run(str(tmp_path / "eevee"), engine="BLENDER_EEVEE")
+    assert cost_model.get_calibration_samples(str(tmp_path / "eevee")) == []
+
+
+def test_estimate_parts():
+    rcfg = {
+        "parts": [
+            {"id": "glass", "single_parts": [{"material": "glass_clear"}], "scene": {"render_setups": [{}, {}]}},
+            {"id": "matte", "single_parts": [{"material": "steel_matte"}], "scene": {"render_setups": [{}, {}]}},
+            {"id": "none", "single_parts": [], "scene": {"render_setups": [{}]}},
+        ]
+    }
+    mesh_stats = {
+        "glass": {"n_triangles": 1_000_000, "n_objects": 2, "bounds": [[0, 0, 0], [1, 1, 1]]},
+        "matte": {"n_triangles": 1_000_000, "n_objects": 1, "bounds": [[0, 0, 0], [1, 1, 1]]},
+    }
+    settings = {"res_x": 128, "res_y": 128, "samples": 1024, "adaptive_settings": False}
+    estimates = cost_model.estimate_parts(rcfg, mesh_stats, settings, cost_model.DEFAULT_MODEL)
+    assert estimates["glass"]["material_class"] == cost_model.TRANSMISSIVE_PROFILE
+    assert estimates["glass"]["seconds"] > estimates["matte"]["seconds"] > estimates["none"]["seconds"]
+    assert not estimates["none"]["has_geometry"] and estimates["none"]["n_triangles"] == 0
+
+    adaptive_settings = dict(settings, adaptive_settings=True)
+    adaptive = cost_model.estimate_parts(rcfg, mesh_stats, adaptive_settings, cost_model.DEFAULT_MODEL)
+    assert adaptive["matte"]["samples"] == int(1024 * render_profiles.PROFILES["matte"]["samples_factor"])
+    assert adaptive["matte"]["seconds"] < estimates["matte"]["seconds"]
+
+    lines = cost_model.format_estimates(estimates, n_heaviest=1)
+    assert lines[-1].split()[-3] == "glass"
+    assert "1 parts have no GLB or OBJ file, their triangles are not counted" in lines
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from utils import depth_raster, depth_stack
+
+# Cube of side 2 around the origin as 12 triangles
+CUBE_VERTICES = np.array([[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=np.float64)
+CUBE_FACES = np.array(
+    [[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5], [0, 4, 5], [0, 5, 1], [2, 3, 7], [2, 7, 6], [0, 2, 6], [0, 6, 4]]
+    + [[1, 5, 7], [1, 7, 3]]
+)
+FRAME = (-0.6, 0.6, 0.45, -0.45, 1.0)
+RESOLUTION = (32, 24)
+
+
+def to_camera_space(vertices: np.ndarray, angles: tuple, translation: tuple) -> np.ndarray:
+    rx, ry = angles
+    rotation_x = np.array([[1, 0, 0], [0, np.cos(rx), -np.sin(rx)], [0, np.sin(rx), np.cos(rx)]])
+    rotation_y = np.array([[np.cos(ry), 0, np.sin(ry)], [0, 1, 0], [-np.sin(ry), 0, np.cos(ry)]])
+    return vertices @ (rotation_y @ rotation_x).T + translation
+
+
+def raycast_reference(vertices, faces, frame, resolution, ortho=False, clip_start=1e-6, clip_end=np.inf):
+    """Casts a ray through each pixel center against every triangle (Moeller-Trumbore)."""
+    left, right, top, bottom, frame_depth = frame
+    res_x, res_y = resolution
+    x = left + (np.arange(res_x) + 0.5) / res_x * (right - left)
+    y = top - (np.arange(res_y) + 0.5) / res_y * (top - bottom)
+    points = np.stack(np.broadcast_arrays(x[None, :], y[:, None], -frame_depth), axis=-1).reshape(-1, 3)
+    if ortho:
+        origins, directions = points * [1, 1, 0], np.broadcast_to([0.0, 0.0, -1.0], points.shape)
+    else:
+        origins, directions = np.zeros_like(points), points / np.linalg.norm(points, axis=1, keepdims=True)
+    depth = np.full(len(points), depth_stack.BLENDER_BACKGROUND_DEPTH, dtype=np.float32)
+    for j, (origin, direction) in enumerate(zip(origins, directions)):
+        hits = []
+        for a, b, c in vertices[faces]:
+            edge_1, edge_2 = b - a, c - a
+            p = np.cross(direction, edge_2)
+            det = edge_1 @ p
+            if abs(det) < 1e-12:
+                continue
+            s = origin - a
+            u = s @ p / det
+            q = np.cross(s, edge_1)
+            v = direction @ q / det
+            distance = edge_2 @ q / det
+            if u >= 0 and v >= 0 and u + v <= 1 and 0 < distance <= clip_end:
+                hit_depth = -(origin + distance * direction)[2]
+                if hit_depth >= clip_start:
+                    hits.append(hit_depth)
+        if hits:
+            depth[j] = min(hits)
+    return depth.reshape(res_y, res_x)
+
+
+@pytest.mark.parametrize("ortho", [False, True])
+def test_depth_matches_ray_casting(ortho):
+    vertices = to_camera_space(CUBE_VERTICES, (0.4, 0.7), (0.2, -0.1, -5.0))
+    frame = (-3.0, 3.0, 2.25, -2.25, 1.0) if ortho else FRAME
+    depth = depth_raster.rasterize_depth(vertices, CUBE_FACES, frame, RESOLUTION, ortho=ortho)
+    reference = raycast_reference(vertices, CUBE_FACES, frame, RESOLUTION, ortho=ortho)
+    assert depth.dtype == np.float32 and depth.shape == (24, 32)
+    assert (depth < depth_stack.BLENDER_BACKGROUND_DEPTH).sum() > 100
+    np.testing.assert_allclose(depth, reference, rtol=1e-5)
+
+
+def test_camera_inside_the_mesh_clips_at_the_near_plane():
+    vertices = to_camera_space(CUBE_VERTICES, (0.3, 0.2), (0.0, 0.0, -0.5))
+    depth = depth_raster.rasterize_depth(vertices, CUBE_FACES, FRAME, RESOLUTION, clip_start=0.1)
+    reference = raycast_reference(vertices, CUBE_FACES, FRAME, RESOLUTION, clip_start=0.1)
+    # All pixels see the inside of the cube
+    assert (depth < depth_stack.BLENDER_BACKGROUND_DEPTH).all()
+    np.testing.assert_allclose(depth, reference, rtol=1e-5)
+
+
+def test_clip_near_splits_triangles():
+    triangle = np.array([[[0.0, 0.0, 1.0], [1.0, 0.0, -1.0], [0.0, 1.0, -1.0]]])
+    clipped = depth_raster.clip_near(triangle, 0.5)
+    assert clipped.shape == (2, 3, 3)
+    assert np.all(-clipped[..., 2] >= 0.5 - 1e-12)
+    assert len(depth_raster.clip_near(triangle * [1, 1, -1], 0.5)) == 1
+    assert len(depth_raster.clip_near(triangle + [0, 0, 5], 0.5)) == 0
+
+
+def test_clip_end_and_empty_meshes(monkeypatch):
+    vertices = to_camera_space(CUBE_VERTICES, (0.4, 0.7), (0.0, 0.0, -5.0))
+    depth = depth_raster.rasterize_depth(vertices, CUBE_FACES, FRAME, RESOLUTION, clip_end=4.5)
+    np.testing.assert_allclose(depth, raycast_reference(vertices, CUBE_FACES, FRAME, RESOLUTION, clip_end=4.5))
+    empty = depth_raster.rasterize_depth(np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64), FRAME, RESOLUTION)
+    assert (empty == depth_stack.BLENDER_BACKGROUND_DEPTH).all()
+
+    # Small batches give the same depth map
+    full = depth_raster.rasterize_depth(vertices, CUBE_FACES, FRAME, RESOLUTION)
+    monkeypatch.setattr(depth_raster, "MAX_BATCH_CANDIDATES", 7)
+    np.testing.assert_array_equal(depth_raster.rasterize_depth(vertices, CUBE_FACES, FRAME, RESOLUTION), full)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from utils import depth_stack
+
+
+def get_depth_maps(n: int = 3, shape: tuple = (6, 8)) -> list:
+    rng = np.random.default_rng(0)
+    depth_maps = []
+    for _ in range(n):
+        depth = rng.uniform(1.0, 5.0, size=shape).astype(np.float32)
+        # Pixels without geometry as written by the renderer
+        depth[:2] = depth_stack.BLENDER_BACKGROUND_DEPTH
+        depth[:, -1] = depth_stack.BLENDER_BACKGROUND_DEPTH
+        depth_maps.append(depth)
+    return depth_maps
+
+
+@pytest.mark.parametrize("stack_format", ["npz", "npy"])
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_write_load_roundtrip(tmp_path, stack_format, dtype):
+    depth_maps = get_depth_maps()
+    files = depth_stack.write_depth_stack(
+        str(tmp_path), "p-1", depth_maps, [0, 2, 5], stack_format=stack_format, dtype=dtype
+    )
+    assert [file_path.rsplit("/", 1)[1] for file_path in files] == (
+        ["p-1_depth.npz"] if stack_format == "npz" else ["p-1_depth.npy", "p-1_depth.json"]
+    )
+
+    stack, header = depth_stack.load_depth_stack(files[0])
+    assert header == {
+        "part_id": "p-1",
+        "image_indices": [0, 2, 5],
+        "dtype": dtype,
+        "shape": [3, 6, 8],
+        "background_depth": depth_stack.BLENDER_BACKGROUND_DEPTH,
+    }
+    assert stack.dtype == np.dtype(dtype) and stack.shape == (3, 6, 8)
+    expected = np.stack(depth_maps)
+    background = expected == depth_stack.BLENDER_BACKGROUND_DEPTH
+    # The background exceeds the float16 range and is stored as inf, both compare >= background_depth
+    np.testing.assert_array_equal(stack.astype(np.float64) >= header["background_depth"], background)
+    if dtype == "float32":
+        np.testing.assert_array_equal(stack, expected)
+    else:
+        assert np.isinf(stack[background]).all()
+        np.testing.assert_allclose(stack[~background], expected[~background], rtol=1e-3)
+
+
+def test_npy_stacks_are_memory_mapped(tmp_path):
+    files = depth_stack.write_depth_stack(str(tmp_path), "p-1", get_depth_maps(), [0, 1, 2], stack_format="npy")
+    stack, _ = depth_stack.load_depth_stack(files[0])
+    assert isinstance(stack, np.memmap) and not stack.flags.writeable
+    in_memory, _ = depth_stack.load_depth_stack(files[0], mmap=False)
+    assert not isinstance(in_memory, np.memmap)
+    np.testing.assert_array_equal(in_memory, stack)
+
+
+def test_unknown_stack_format(tmp_path):
+    with pytest.raises(AssertionError, match="Unknown depth stack format"):
+        depth_stack.write_depth_stack(str(tmp_path), "p-1", get_depth_maps(), [0, 1, 2], stack_format="none")
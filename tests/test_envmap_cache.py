@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from utils import envmap_cache
+
+
+def get_rcfg(envmap_fnames: list, focal_length: float = 50.0) -> dict:
+    render_setups = [{"camera_i": 0, "lights_i": [0], "envmap_fname": fname} for fname in envmap_fnames]
+    # Setups rejected by the view check are not rendered
+    render_setups.append({"camera_i": 0, "lights_i": [0], "envmap_fname": "lost.hdr", "view_check": {"valid": False}})
+    scene = {"cameras": [{"focal_length": focal_length}], "render_setups": render_setups}
+    return {"parts": [{"id": "p-1", "scene": scene}]}
+
+
+@pytest.fixture(name="envmap_dir")
+def fixture_envmap_dir(tmp_path):
+    envmap_dir = tmp_path / "envmaps"
+    envmap_dir.mkdir()
+    (envmap_dir / "studio.hdr").write_bytes(b"hdr content")
+    (envmap_dir / "park.jpg").write_bytes(b"jpg content")
+    return envmap_dir
+
+
+def write_cache(cache_files: dict) -> None:
+    # Stands in for prepare_envmaps.write_cache_file
+    for _, cache_file in cache_files.values():
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(cache_file, "wb") as f:
+            f.write(b"cached")
+
+
+def test_cache_is_reused_for_the_same_key(tmp_path, envmap_dir):
+    rcfg, cache_dir = get_rcfg(["studio.hdr", "park.jpg", "studio.hdr"]), str(tmp_path / "cache")
+    size, cache_files = envmap_cache.get_cache_files(rcfg, str(envmap_dir), cache_dir, 256, 256)
+    assert sorted(cache_files) == ["park.jpg", "studio.hdr"]
+    assert [os.path.splitext(cache_file)[1] for _, cache_file in cache_files.values()] == [".png", ".exr"]
+    assert os.path.basename(cache_files["park.jpg"][1]).startswith("park-")
+    assert cache_files["park.jpg"][1].endswith(f"-{size[0]}x{size[1]}.png")
+    write_cache(cache_files)
+
+    # The same sources and resolution hit the existing copies, also from another envmap directory
+    assert envmap_cache.get_cache_files(rcfg, str(envmap_dir), cache_dir, 256, 256) == (size, cache_files)
+    other_dir = tmp_path / "other_envmaps"
+    os.rename(envmap_dir, other_dir)
+    _, other_files = envmap_cache.get_cache_files(rcfg, str(other_dir), cache_dir, 256, 256)
+    assert {fname: files[1] for fname, files in other_files.items()} == {
+        fname: files[1] for fname, files in cache_files.items()
+    }
+    assert all(os.path.isfile(cache_file) for _, cache_file in other_files.values())
+
+
+def test_cache_is_invalidated_by_source_changes(tmp_path, envmap_dir):
+    rcfg, cache_dir = get_rcfg(["studio.hdr", "park.jpg"]), str(tmp_path / "cache")
+    size, cache_files = envmap_cache.get_cache_files(rcfg, str(envmap_dir), cache_dir, 256, 256)
+    write_cache(cache_files)
+
+    (envmap_dir / "studio.hdr").write_bytes(b"new hdr content")
+    _, changed_files = envmap_cache.get_cache_files(rcfg, str(envmap_dir), cache_dir, 256, 256)
+    assert changed_files["park.jpg"] == cache_files["park.jpg"]
+    assert changed_files["studio.hdr"][1] != cache_files["studio.hdr"][1]
+    assert not os.path.isfile(changed_files["studio.hdr"][1])
+
+    # A larger resolution or a longer focal length needs a larger copy
+    for other_size, other_files in [
+        envmap_cache.get_cache_files(rcfg, str(envmap_dir), cache_dir, 512, 512),
+        envmap_cache.get_cache_files(get_rcfg(["studio.hdr", "park.jpg"], 100.0), str(envmap_dir), cache_dir, 256, 256),
+    ]:
+        assert other_size[0] > size[0]
+        assert not any(os.path.isfile(cache_file) for _, cache_file in other_files.values())
+
+
+def test_missing_envmaps(tmp_path, envmap_dir):
+    with pytest.raises(envmap_cache.MissingEnvmapError, match="2 envmaps .* missing"):
+        envmap_cache.get_cache_files(
+            get_rcfg(["studio.hdr", "lost.hdr", "none"]), str(envmap_dir), str(tmp_path / "cache"), 256, 256
+        )
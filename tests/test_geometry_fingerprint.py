@@ -0,0 +1,101 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from utils import geometry_fingerprint
+
+# Unit cube as 12 triangles
+CUBE_VERTICES = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.float64)
+CUBE_FACES = np.array(
+    [[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5], [0, 4, 5], [0, 5, 1], [2, 3, 7], [2, 7, 6], [0, 2, 6], [0, 6, 4]]
+    + [[1, 5, 7], [1, 7, 3]]
+)
+
+
+def test_fingerprint_invariances():
+    fingerprint = geometry_fingerprint.get_geometry_fingerprint(CUBE_VERTICES, CUBE_FACES)
+    # Translation
+    assert geometry_fingerprint.get_geometry_fingerprint(CUBE_VERTICES + [10.0, -3.0, 0.5], CUBE_FACES) == fingerprint
+    # Vertex order
+    order = np.random.default_rng(0).permutation(len(CUBE_VERTICES))
+    inverse = np.argsort(order)
+    assert geometry_fingerprint.get_geometry_fingerprint(CUBE_VERTICES[order], inverse[CUBE_FACES]) == fingerprint
+    # Face order and winding
+    faces = np.roll(CUBE_FACES[::-1], 1, axis=1)
+    assert geometry_fingerprint.get_geometry_fingerprint(CUBE_VERTICES, faces) == fingerprint
+    # Far below the tolerance
+    assert geometry_fingerprint.get_geometry_fingerprint(CUBE_VERTICES + 1e-7, CUBE_FACES) == fingerprint
+
+
+def test_fingerprint_differs_for_other_geometry():
+    fingerprint = geometry_fingerprint.get_geometry_fingerprint(CUBE_VERTICES, CUBE_FACES)
+    assert geometry_fingerprint.get_geometry_fingerprint(CUBE_VERTICES * 1.01, CUBE_FACES) != fingerprint
+    assert geometry_fingerprint.get_geometry_fingerprint(CUBE_VERTICES, CUBE_FACES[:-1]) != fingerprint
+    # A vertex moved by more than the tolerance
+    vertices = CUBE_VERTICES.copy()
+    vertices[7] += 1e-3
+    assert geometry_fingerprint.get_geometry_fingerprint(vertices, CUBE_FACES) != fingerprint
+    assert geometry_fingerprint.get_geometry_fingerprint(vertices, CUBE_FACES, tolerance=1e-2) == (
+        geometry_fingerprint.get_geometry_fingerprint(CUBE_VERTICES, CUBE_FACES, tolerance=1e-2)
+    )
+    assert geometry_fingerprint.get_geometry_fingerprint(np.zeros((0, 3)), np.zeros((0, 3))) != fingerprint
+
+
+def test_registry_manifest_roundtrip(tmp_path):
+    registry = geometry_fingerprint.FingerprintRegistry(tolerance=1e-3)
+    assert registry.register("p-1", "a") is None
+    assert registry.register("p-2", "b") is None
+    assert registry.register("p-3", "a") == "p-1"
+    assert registry.register("p-4", "a") == "p-1"
+    manifest_path = registry.write(str(tmp_path))
+
+    assert geometry_fingerprint.load_aliases(str(tmp_path)) == {"p-3": "p-1", "p-4": "p-1"}
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    assert manifest["tolerance"] == 1e-3
+    assert manifest["fingerprints"] == {"p-1": "a", "p-2": "b", "p-3": "a", "p-4": "a"}
+    # The manifest states that aliases show the render setups of their canonical part
+    assert manifest["alias_renders"] == geometry_fingerprint.ALIAS_RENDERS_NOTE
+    assert geometry_fingerprint.load_aliases(str(tmp_path / "missing")) == {}
+
+
+def write_renders(render_dir, part_id: str) -> list:
+    files = []
+    for kind in geometry_fingerprint.RENDER_OUTPUT_KINDS[:2]:
+        os.makedirs(render_dir / kind / part_id)
+        for i in range(2):
+            file_path = render_dir / kind / part_id / f"{part_id}_{i:03d}.png"
+            file_path.write_text(f"{kind} {i}")
+            files.append(file_path)
+    os.makedirs(render_dir / "depth_stack")
+    for fn in [f"{part_id}_depth.npy", f"{part_id}_depth.json"]:
+        (render_dir / "depth_stack" / fn).write_text(fn)
+        files.append(render_dir / "depth_stack" / fn)
+    return files
+
+
+@pytest.mark.parametrize("moved", [False, True])
+def test_link_alias_renders(tmp_path, moved):
+    render_dir = tmp_path / "render"
+    write_renders(render_dir, "p-1")
+    (render_dir / "depth_stack" / "p-10_depth.npy").write_text("other part")
+
+    assert geometry_fingerprint.link_alias_renders(str(render_dir), "p-3", "p-1") == 6
+    # Linking again does nothing
+    assert geometry_fingerprint.link_alias_renders(str(render_dir), "p-3", "p-1") == 0
+    if moved:
+        # Relative links survive moving the render directory
+        os.rename(render_dir, tmp_path / "moved")
+        render_dir = tmp_path / "moved"
+
+    for kind in geometry_fingerprint.RENDER_OUTPUT_KINDS[:2]:
+        assert sorted(os.listdir(render_dir / kind / "p-3")) == ["p-3_000.png", "p-3_001.png"]
+        alias_path = render_dir / kind / "p-3" / "p-3_001.png"
+        assert os.path.islink(alias_path) and not os.path.isabs(os.readlink(alias_path))
+        assert alias_path.read_text() == f"{kind} 1"
+    assert not (render_dir / geometry_fingerprint.RENDER_OUTPUT_KINDS[2] / "p-3").exists()
+    stack_files = ["p-10_depth.npy", "p-1_depth.json", "p-1_depth.npy", "p-3_depth.json", "p-3_depth.npy"]
+    assert sorted(os.listdir(render_dir / "depth_stack")) == stack_files
+    assert (render_dir / "depth_stack" / "p-3_depth.npy").read_text() == "p-1_depth.npy"
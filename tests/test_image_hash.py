@@ -0,0 +1,81 @@
+import itertools
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from utils import image_hash
+
+COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}  # channels -> PNG color type
+
+
+def unfilter_reference(raw: bytes, height: int, stride: int, bpp: int) -> bytes:
+    """Byte by byte PNG unfiltering as in the PNG specification."""
+    pixels, prev = bytearray(), bytearray(stride)
+    for y in range(height):
+        filter_type, row = raw[y * (stride + 1)], bytearray(raw[y * (stride + 1) + 1 : (y + 1) * (stride + 1)])
+        for i in range(stride):
+            a = row[i - bpp] if i >= bpp else 0
+            b, c = prev[i], prev[i - bpp] if i >= bpp else 0
+            p = a + b - c
+            paeth = a if abs(p - a) <= abs(p - b) and abs(p - a) <= abs(p - c) else b if abs(p - b) <= abs(p - c) else c
+            row[i] = (row[i] + [0, a, b, (a + b) >> 1, paeth][filter_type]) & 0xFF
+        pixels += row
+        prev = row
+    return bytes(pixels)
+
+
+def write_png(file_path: str, raw: bytes, height: int, width: int, channels: int, bit_depth: int):
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+    header = struct.pack(">IIBBBBB", width, height, bit_depth, COLOR_TYPES[channels], 0, 0, 0)
+    with open(file_path, "wb") as f:
+        f.write(image_hash.PNG_SIGNATURE + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw)))
+        f.write(chunk(b"IEND", b""))
+
+
+@pytest.mark.parametrize("channels, bit_depth", list(itertools.product([1, 2, 3, 4], [8, 16])))
+def test_read_png_matches_reference_unfiltering(tmp_path, channels, bit_depth):
+    rng = np.random.default_rng(channels * bit_depth)
+    height, width, bpp = 9, 7, channels * bit_depth // 8
+    raw = b"".join(
+        bytes([rng.integers(0, 5)]) + rng.integers(0, 256, width * bpp, dtype=np.uint8).tobytes()
+        for _ in range(height)
+    )
+    write_png(str(tmp_path / "image.png"), raw, height, width, channels, bit_depth)
+
+    pixels = image_hash.read_png(str(tmp_path / "image.png"))
+    dtype = np.uint8 if bit_depth == 8 else np.dtype(">u2")
+    expected = np.frombuffer(unfilter_reference(raw, height, width * bpp, bpp), dtype=dtype)
+    assert pixels.shape == (height, width, channels)
+    np.testing.assert_array_equal(pixels, expected.reshape(height, width, channels) / float(2**bit_depth - 1))
+
+
+def test_phash_is_robust_to_small_changes():
+    rng = np.random.default_rng(0)
+    image = np.kron(rng.random((8, 8)), np.ones((32, 32)))
+    noisy = np.clip(image * 0.9 + 0.05 + rng.normal(0, 0.01, image.shape), 0, 1)
+    other = np.kron(rng.random((8, 8)), np.ones((32, 32)))
+    assert image_hash.hamming_distance(image_hash.phash(image), image_hash.phash(noisy)) <= 3
+    assert image_hash.hamming_distance(image_hash.phash(image), image_hash.phash(other)) > 10
+
+
+@pytest.mark.parametrize("max_distance", [1, 3, 7])
+def test_find_near_duplicates_matches_all_pairs(max_distance):
+    rng = np.random.default_rng(max_distance)
+    bases = [int(value) for value in rng.integers(0, 2**63, 20, dtype=np.int64)]
+    # Near-duplicates of the bases with up to max_distance + 2 flipped bits
+    hashes = bases + [
+        base ^ sum(1 << int(bit) for bit in rng.choice(64, rng.integers(1, max_distance + 3), replace=False))
+        for base in bases
+    ]
+    expected = [
+        (i, j)
+        for i, j in itertools.combinations(range(len(hashes)), 2)
+        if image_hash.hamming_distance(hashes[i], hashes[j]) <= max_distance
+    ]
+    pairs, n_skipped = image_hash.find_near_duplicates(hashes, max_distance=max_distance)
+    assert n_skipped == 0
+    assert pairs == expected
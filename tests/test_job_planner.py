@@ -0,0 +1,92 @@
+import itertools
+import json
+
+import pytest
+
+from utils import job_planner
+
+
+def get_totals(shards: list, costs: dict) -> list:
+    return [sum(costs[part_id] for part_id in part_ids) for part_ids in shards]
+
+
+def test_balance_parts_longest_processing_time_first():
+    costs = {"a": 7.0, "b": 5.0, "c": 4.0, "d": 3.0, "e": 3.0, "f": 2.0}
+    shards = job_planner.balance_parts(costs, 2)
+    # a -> 0, b -> 1, c -> 1, d -> 0, e -> 1 (9 < 10), f -> 0
+    assert shards == [["a", "d", "f"], ["b", "c", "e"]]
+    assert get_totals(shards, costs) == [12.0, 12.0]
+
+
+def test_balance_parts_within_lpt_bound():
+    costs = {f"part_{i:02d}": float((i * 37) % 23 + 1) for i in range(40)}
+    for n_shards in [1, 3, 7]:
+        shards = job_planner.balance_parts(costs, n_shards)
+        assert sorted(itertools.chain(*shards)) == sorted(costs)
+        # LPT makespan is at most 4/3 of the optimum, which is at least the mean and the largest part
+        optimum_bound = max(sum(costs.values()) / n_shards, max(costs.values()))
+        assert max(get_totals(shards, costs)) <= 4 / 3 * optimum_bound
+
+
+def test_balance_parts_is_reproducible_with_ties():
+    costs = {part_id: 1.0 for part_id in "edcba"}
+    assert job_planner.balance_parts(costs, 2) == [["a", "c", "e"], ["b", "d"]]
+    assert job_planner.balance_parts(dict(reversed(costs.items())), 2) == [["a", "c", "e"], ["b", "d"]]
+
+
+def test_balance_parts_with_fewer_parts_than_shards():
+    assert job_planner.balance_parts({"a": 1.0, "b": 2.0}, 5) == [["b"], ["a"]]
+    with pytest.raises(AssertionError):
+        job_planner.balance_parts({"a": 1.0}, 0)
+
+
+def test_part_images_skip_invalid_render_setups():
+    render_setups = [{}, {"view_check": {"valid": False}}, {"view_check": {"valid": True}}]
+    rcfg = {
+        "parts": [{"id": "a", "scene": {"render_setups": render_setups}}, {"id": "b", "scene": {"render_setups": []}}]
+    }
+    assert job_planner.get_part_images(rcfg) == {"a": 2, "b": 0}
+
+
+def test_load_costs(tmp_path):
+    cost_file = tmp_path / "cost_estimate.json"
+    cost_file.write_text(json.dumps({"total_seconds": 3.0, "parts": {"a": {"seconds": 1.0}, "b": {"seconds": 2.0}}}))
+    assert job_planner.load_costs(str(cost_file)) == {"a": 1.0, "b": 2.0}
+
+
+@pytest.mark.parametrize(
+    "max_glb_bytes, base_gi, memory_gi", [(0, 4, 8), (100 << 20, 4, 8), (200 << 20, 4, 16), (0, 16, 16)]
+)
+def test_memory_is_rounded_to_steps(max_glb_bytes, base_gi, memory_gi):
+    assert job_planner.get_memory_gi(max_glb_bytes, base_gi) == memory_gi
+
+
+def test_plan_and_job_groups():
+    costs = {"a": 4.0, "b": 3.0, "c": 2.0, "d": 1.0}
+    glb_bytes = {"a": 300 << 20, "b": 1 << 20}
+    plan = job_planner.get_plan("run", job_planner.balance_parts(costs, 2), costs, {"a": 3, "c": 2}, glb_bytes, 4)
+    assert plan["n_parts"] == 4 and plan["n_shards"] == 2 and plan["total_cost"] == 10.0
+    assert plan["imbalance"] == 1.0
+    assert [shard["shard"] for shard in plan["shards"]] == ["shard-000", "shard-001"]
+    assert [shard["n_images"] for shard in plan["shards"]] == [3, 2]
+    assert [shard["memory_gi"] for shard in plan["shards"]] == [16, 8]
+    assert job_planner.get_job_groups(plan) == {8: [1], 16: [0]}
+
+    configmap = job_planner.build_configmap(plan)
+    assert configmap["data"]["shard-000.txt"] == "a\nd\n"
+    assert json.loads(configmap["data"][job_planner.PLAN_FILENAME]) == plan
+
+
+def test_render_job_maps_completion_index_to_shard():
+    plan = job_planner.get_plan("run", [["a"], ["b"], ["c"]], {"a": 1.0, "b": 1.0, "c": 1.0}, {}, {}, 4)
+    pod = {"image": "synthnet:latest", "image_pull_secret": None, "node_selector": {"gpu": "true"}, "volumes": []}
+    options = {"cpu": 4, "gpus": 1, "parallelism": 2, "backoff_limit": 3}
+    job = job_planner.build_render_job(plan, 8, [0, 2], "render.sh $SHARD", pod, options)
+    assert job["spec"]["completions"] == 2 and job["spec"]["parallelism"] == 2
+    container = job["spec"]["template"]["spec"]["containers"][0]
+    assert "SHARDS=(shard-000 shard-002)\n" in container["args"][0]
+    assert container["resources"]["limits"] == {"nvidia.com/gpu": 1}
+    assert job["spec"]["template"]["spec"]["nodeSelector"] == {"gpu": "true"}
+
+    merge_job = job_planner.build_merge_job(plan, "merge.sh", pod)
+    assert "nodeSelector" not in merge_job["spec"]["template"]["spec"]
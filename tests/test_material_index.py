@@ -0,0 +1,57 @@
+import importlib.util
+import os
+
+import pytest
+
+from utils import material_index
+
+SPEC = importlib.util.spec_from_file_location(
+    "bench_material_index",
+    os.path.join(os.path.dirname(__file__), "..", "scripts", "benchmarks", "bench_material_index.py"),
+)
+bench_material_index = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(bench_material_index)
+
+SINGLE_PARTS = [
+    {"id": "a1", "material": "none"},
+    {"id": "a1b2", "material": "steel"},
+    {"id": "a1", "material": "brass"},
+    {"id": "c3", "material": None},
+    {"id": "a", "material": "plastic"},
+]
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        # The first single part in RCFG order with a material wins, not the longest prefix
+        ("a1b2.001", ("steel", True)),
+        ("a1.001", ("brass", True)),
+        ("a1", ("brass", True)),
+        ("a9", ("plastic", True)),
+        # Matches only single parts without material
+        ("c3.002", (None, True)),
+        ("b1", (None, False)),
+        ("", (None, False)),
+    ],
+)
+def test_lookup(name, expected):
+    assert material_index.MaterialIndex(SINGLE_PARTS).lookup(name) == expected
+
+
+def test_empty_index():
+    assert material_index.MaterialIndex([]).lookup("a1") == (None, False)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_matches_the_linear_lookup(seed):
+    single_parts, names = bench_material_index.build_inputs(200, 1000, seed)
+    # Ids that are prefixes of other ids
+    single_parts += [
+        {"id": single_part["id"][:4], "material": material}
+        for single_part, material in zip(single_parts[:20], bench_material_index.MATERIALS * 7)
+    ]
+    names += [single_part["id"][:6] for single_part in single_parts[:20]]
+    assert bench_material_index.lookup_index(single_parts, names) == bench_material_index.lookup_legacy(
+        single_parts, names
+    )
@@ -0,0 +1,103 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from preprocessing.utils import mesh
+
+# Unit cube as 12 triangles
+CUBE_VERTICES = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.float32)
+CUBE_FACES = np.array(
+    [[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5], [0, 4, 5], [0, 5, 1], [2, 3, 7], [2, 7, 6], [0, 2, 6], [0, 6, 4]]
+    + [[1, 5, 7], [1, 7, 3]],
+    dtype=np.uint32,
+)
+
+
+def write_glb(file_path: str, nodes: list, min_max: bool = True, extra_primitives: list = ()):
+    """Writes a .glb file with the cube as mesh 0, referenced by the given nodes (children of node 0)."""
+    positions, indices = CUBE_VERTICES.tobytes(), CUBE_FACES.tobytes()
+    position_accessor = {"bufferView": 0, "componentType": 5126, "count": len(CUBE_VERTICES), "type": "VEC3"}
+    if min_max:
+        position_accessor.update(min=[0.0, 0.0, 0.0], max=[1.0, 1.0, 1.0])
+    gltf = {
+        "asset": {"version": "2.0"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"children": list(range(1, len(nodes) + 1))}] + nodes,
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1, "material": 0}, *extra_primitives]}],
+        "materials": [{"name": "steel"}],
+        "buffers": [{"byteLength": len(positions) + len(indices)}],
+        "bufferViews": [
+            {"buffer": 0, "byteLength": len(positions)},
+            {"buffer": 0, "byteOffset": len(positions), "byteLength": len(indices)},
+        ],
+        "accessors": [
+            position_accessor,
+            {"bufferView": 1, "componentType": 5125, "count": CUBE_FACES.size, "type": "SCALAR"},
+        ],
+    }
+    json_chunk = json.dumps(gltf).encode("utf-8")
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    bin_chunk = positions + indices
+    body = struct.pack("<II", len(json_chunk), mesh.GLB_CHUNK_JSON) + json_chunk
+    body += struct.pack("<II", len(bin_chunk), mesh.GLB_CHUNK_BIN) + bin_chunk
+    with open(file_path, "wb") as f:
+        f.write(struct.pack("<4sII", mesh.GLB_MAGIC, 2, 12 + len(body)) + body)
+
+
+@pytest.mark.parametrize("min_max", [True, False])
+def test_glb_stats_match_loaded_mesh(tmp_path, min_max):
+    nodes = [{"mesh": 0, "translation": [5.0, 0.0, 0.0]}, {"mesh": 0, "scale": [2.0, 2.0, 2.0]}]
+    write_glb(str(tmp_path / "part.glb"), nodes, min_max=min_max)
+    stats = mesh.get_mesh_stats(str(tmp_path / "part.glb"))
+    vertices, faces = mesh.load_mesh(str(tmp_path / "part.glb"))
+
+    assert stats["n_objects"] == 3 and stats["n_meshes"] == 2 and stats["n_materials"] == 1
+    assert stats["n_triangles"] == len(faces) == 24
+    assert stats["n_vertices"] == len(vertices) == 16
+    np.testing.assert_allclose(stats["bounds"], [vertices.min(axis=0), vertices.max(axis=0)])
+    np.testing.assert_allclose(stats["bounds"], [[0.0, 0.0, 0.0], [6.0, 2.0, 2.0]])
+
+
+def test_glb_stats_of_rotated_nodes_enclose_the_mesh(tmp_path):
+    write_glb(str(tmp_path / "part.glb"), [{"mesh": 0, "rotation": [0.0, 0.0, 0.3826834, 0.9238795]}])
+    stats = mesh.get_glb_stats(str(tmp_path / "part.glb"))
+    vertices, _ = mesh.load_glb_mesh(str(tmp_path / "part.glb"))
+    assert np.all(np.array(stats["bounds"][0]) <= vertices.min(axis=0) + 1e-6)
+    assert np.all(np.array(stats["bounds"][1]) >= vertices.max(axis=0) - 1e-6)
+
+
+def test_glb_stats_count_strips_fans_and_draco(tmp_path):
+    extra_primitives = [
+        {"attributes": {"POSITION": 0}, "mode": mesh.GLTF_MODE_TRIANGLE_STRIP},
+        {"attributes": {"POSITION": 0}, "mode": mesh.GLTF_MODE_TRIANGLE_FAN},
+        {"attributes": {"POSITION": 0}, "mode": 1},
+        {"attributes": {"POSITION": 0}, "indices": 1, "extensions": {"KHR_draco_mesh_compression": {}}},
+    ]
+    write_glb(str(tmp_path / "part.glb"), [{"mesh": 0}], extra_primitives=extra_primitives)
+    stats = mesh.get_glb_stats(str(tmp_path / "part.glb"))
+    # Indexed triangles 12 + strip 6 + fan 6 + lines 0 + Draco 12
+    assert stats["n_triangles"] == 36
+    assert stats["n_draco_primitives"] == 1
+
+
+def test_obj_stats(tmp_path):
+    obj_file = tmp_path / "part.obj"
+    obj_file.write_text(
+        "o cube\nusemtl steel\n"
+        + "".join(f"v {x} {y} {z}\n" for x, y, z in CUBE_VERTICES * 2)
+        + "f 1 2 4 3\nf 5 6 8 7\nusemtl glass\nf 1 2 6\n"
+    )
+    stats = mesh.get_mesh_stats(str(obj_file))
+    vertices, faces = mesh.load_mesh(str(obj_file))
+    assert stats["n_objects"] == 1 and stats["n_materials"] == 2
+    assert stats["n_triangles"] == len(faces) == 5
+    assert stats["n_vertices"] == len(vertices) == 8
+    assert stats["bounds"] == [[0.0, 0.0, 0.0], [2.0, 2.0, 2.0]]
+
+
+def test_unsupported_mesh_format(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported mesh file format"):
+        mesh.get_mesh_stats(str(tmp_path / "part.stl"))
@@ -0,0 +1,127 @@
+import json
+import os
+
+import pytest
+
+from utils import file_utils, output_sink
+
+
+class FlakyBackend(output_sink.LocalDirBackend):
+    """Local backend whose first n_failures puts fail, either with an error or with a corrupted copy."""
+
+    name = "flaky"
+
+    def __init__(self, root: str, n_failures: int = 0, corrupt: bool = False):
+        super().__init__(root)
+        self.n_failures = n_failures
+        self.corrupt = corrupt
+        self.n_puts = 0
+
+    def put(self, local_path: str, rel_path: str, sha256: str) -> None:
+        self.n_puts += 1
+        if self.n_puts > self.n_failures:
+            super().put(local_path, rel_path, sha256)
+        elif self.corrupt:
+            os.makedirs(os.path.dirname(os.path.join(self.root, rel_path)), exist_ok=True)
+            with open(os.path.join(self.root, rel_path), "wb") as f:
+                f.write(b"corrupted")
+        else:
+            raise OSError("Connection reset")
+
+
+@pytest.fixture(autouse=True)
+def flaky_backend(monkeypatch):
+    monkeypatch.setitem(output_sink.BACKENDS, FlakyBackend.name, FlakyBackend)
+
+
+def stage_file(sink: output_sink.OutputSink, rel_path: str, data: bytes):
+    file_path = os.path.join(sink.staging_dir, rel_path)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "wb") as f:
+        f.write(data)
+
+
+def read_manifest(file_path: str) -> list:
+    with open(file_path, "r") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize("backend", ["local", "objectdir"])
+def test_uploads_files_and_writes_manifest(tmp_path, backend):
+    out_dir = str(tmp_path / "out")
+    sink = output_sink.OutputSink(out_dir, str(tmp_path / "staging"), backend=backend, batch_size=2)
+    for part_i in range(3):
+        sink.wait_for_space()
+        for kind in ["rgb", "mask"]:
+            stage_file(sink, f"render/{kind}/part{part_i}/part{part_i}_000.png", os.urandom(100 + part_i))
+        assert sink.commit() == 2
+    stats = sink.close()
+
+    assert stats["files"] == 6 and stats["bytes"] == 2 * (100 + 101 + 102) and stats["retries"] == 0
+    assert not os.path.exists(sink.staging_dir)
+    if backend == "local":
+        manifest = read_manifest(os.path.join(out_dir, output_sink.MANIFEST_FILENAME))
+        assert len(manifest) == 6
+        for entry in manifest:
+            assert file_utils.get_file_hash(os.path.join(out_dir, entry["path"])) == entry["sha256"]
+
+
+def test_files_are_committed_once(tmp_path):
+    sink = output_sink.OutputSink(str(tmp_path / "out"), str(tmp_path / "staging"))
+    stage_file(sink, "a.txt", b"a")
+    assert sink.commit() == 1
+    assert sink.commit() == 0
+    stage_file(sink, "b.txt", b"b")
+    assert sink.commit() == 1
+    assert sink.close()["files"] == 2
+
+
+def test_manifest_name(tmp_path):
+    out_dir = str(tmp_path / "out")
+    with output_sink.OutputSink(out_dir, str(tmp_path / "staging"), manifest_name="reports/batch_1.jsonl") as sink:
+        stage_file(sink, "a.txt", b"a")
+    assert [entry["path"] for entry in read_manifest(os.path.join(out_dir, "reports/batch_1.jsonl"))] == ["a.txt"]
+    assert not os.path.exists(os.path.join(out_dir, output_sink.MANIFEST_FILENAME))
+
+
+@pytest.mark.parametrize("corrupt", [False, True])
+def test_failed_uploads_are_retried(tmp_path, corrupt):
+    out_dir = str(tmp_path / "out")
+    sink = output_sink.OutputSink(
+        out_dir, str(tmp_path / "staging"), backend="flaky", retry_delay=0.0, n_failures=2, corrupt=corrupt
+    )
+    stage_file(sink, "render/a.png", b"image")
+    stats = sink.close()
+    assert stats["retries"] == 2 and stats["files"] == 1
+    with open(os.path.join(out_dir, "render/a.png"), "rb") as f:
+        assert f.read() == b"image"
+
+
+@pytest.mark.parametrize("corrupt", [False, True])
+def test_upload_error_after_all_retries(tmp_path, corrupt):
+    sink = output_sink.OutputSink(
+        str(tmp_path / "out"),
+        str(tmp_path / "staging"),
+        backend="flaky",
+        max_retries=1,
+        retry_delay=0.0,
+        n_failures=2,
+        corrupt=corrupt,
+    )
+    stage_file(sink, "render/a.png", b"image")
+    sink.commit()
+    with pytest.raises(RuntimeError, match="failed after 2 attempts"):
+        sink.close()
+    # Files that failed to upload stay in the staging directory
+    assert os.path.isfile(os.path.join(sink.staging_dir, "render/a.png"))
+
+
+def test_wait_for_space_blocks_until_uploaded(tmp_path):
+    sink = output_sink.OutputSink(
+        str(tmp_path / "out"), str(tmp_path / "staging"), backend="objectdir", max_staging_bytes=100, latency=0.05
+    )
+    stage_file(sink, "a.bin", bytes(1000))
+    sink.commit()
+    assert sink.wait_for_space() > 0.0
+    assert sink.staged_bytes == 0
+    assert sink.close()["max_staged_bytes"] == 1000
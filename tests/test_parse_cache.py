@@ -0,0 +1,59 @@
+import os
+
+import pandas as pd
+
+from preprocessing.models.part import Part
+from preprocessing.models.single_part import SinglePart
+from preprocessing.utils import parse_cache
+
+
+def get_parts() -> list:
+    screw = SinglePart(id="sp-1", name="screw", material="steel")
+    plate = SinglePart(id="sp-2", name="plate", material="aluminium")
+    return [
+        Part(id="p-1", name="bracket", hierarchy="1.1", single_parts=[screw, plate]),
+        Part(id="p-2", name="spare screw", hierarchy="1.2", is_spare=True, single_parts=[screw]),
+    ]
+
+
+def test_pack_parts_shares_single_parts():
+    packed = parse_cache.pack_parts(get_parts())
+    assert len(packed["single_parts"]) == 2
+    parts = parse_cache.unpack_parts(packed)
+    assert [(part.id, part.name, part.hierarchy, part.is_spare) for part in parts] == [
+        ("p-1", "bracket", "1.1", False),
+        ("p-2", "spare screw", "1.2", True),
+    ]
+    assert [single_part.material for single_part in parts[0].single_parts] == ["steel", "aluminium"]
+    assert parts[0].single_parts[0] is parts[1].single_parts[0]
+
+
+def test_cache_roundtrip_and_invalidation(tmp_path):
+    metadata_file = tmp_path / "metadata.xlsx"
+    metadata_file.write_bytes(b"metadata v1")
+    cache_dir = str(tmp_path / "cache")
+    metadata = pd.DataFrame({"id": ["p-1", "p-2"], "quantity": [1, 4]})
+
+    cache = parse_cache.ParseCache(cache_dir, str(metadata_file))
+    assert cache.load() is None
+    cache.save(metadata, get_parts())
+    cached_metadata, cached_parts = parse_cache.ParseCache(cache_dir, str(metadata_file)).load()
+    pd.testing.assert_frame_equal(cached_metadata, metadata)
+    assert [part.id for part in cached_parts] == ["p-1", "p-2"]
+
+    # Edited metadata files get a new key
+    metadata_file.write_bytes(b"metadata v2")
+    assert parse_cache.ParseCache(cache_dir, str(metadata_file)).load() is None
+
+
+def test_incomplete_or_unreadable_entries_are_ignored(tmp_path):
+    metadata_file = tmp_path / "metadata.xlsx"
+    metadata_file.write_bytes(b"metadata")
+    cache = parse_cache.ParseCache(str(tmp_path / "cache"), str(metadata_file))
+    cache.save(pd.DataFrame({"id": ["p-1"]}), get_parts())
+
+    with open(os.path.join(cache.entry_dir, "parts.pkl"), "wb") as f:
+        f.write(b"truncated")
+    assert cache.load() is None
+    os.remove(cache.info_file)
+    assert cache.load() is None
@@ -0,0 +1,71 @@
+import importlib.util
+import os
+
+import pytest
+
+from utils import geometry_fingerprint
+
+SPEC = importlib.util.spec_from_file_location(
+    "phash_index", os.path.join(os.path.dirname(__file__), "..", "scripts", "utils", "phash_index.py")
+)
+phash_index = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(phash_index)
+
+HASHES = [0x0123456789ABCDEF, 0xFEDCBA9876543210, 0x00FF00FF00FF00FF]
+
+
+def add_images(connection, run_dir: str, part_id: str, hashes: list) -> None:
+    run_prefix = phash_index.get_run_prefix(run_dir)
+    rows = [
+        (f"{run_prefix}rgb/{part_id}/{part_id}_{i:03d}.png", part_id, "rgb", 1, 1, phash_index.to_signed(hash_value))
+        for i, hash_value in enumerate(hashes)
+    ]
+    connection.executemany("INSERT INTO images VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+
+def test_duplicates_are_searched_within_the_run(tmp_path):
+    connection = phash_index.open_index(str(tmp_path / "phash.sqlite"))
+    run_a, run_b = str(tmp_path / "run-a"), str(tmp_path / "run-b")
+    add_images(connection, run_a, "p-1", HASHES)
+    add_images(connection, run_a, "p-2", HASHES[:1])
+    # Same part ids and images in another run, and a run whose directory name extends run a
+    add_images(connection, run_b, "p-1", HASHES)
+    add_images(connection, run_b, "p-3", HASHES)
+    add_images(connection, run_a + "-2", "p-3", HASHES)
+
+    plan_a = phash_index.find_duplicate_parts(connection, run_a, 0, 0.5, 100)
+    assert plan_a["remove_ids"] == []
+    plan_b = phash_index.find_duplicate_parts(connection, run_b, 0, 0.5, 100)
+    assert plan_b["remove_ids"] == ["p-3"]
+    assert [(cluster["keep"], cluster["remove"]) for cluster in plan_b["clusters"]] == [("p-1", ["p-3"])]
+
+
+def write_files(directory, file_names: list) -> None:
+    os.makedirs(directory, exist_ok=True)
+    for fn in file_names:
+        (directory / fn).write_bytes(b"image")
+
+
+@pytest.mark.parametrize("stack_extension", ["npz", "npy"])
+def test_apply_plan_removes_depth_stacks_and_alias_links(tmp_path, stack_extension):
+    run_dir = tmp_path / "run"
+    render_dir = run_dir / "render"
+    write_files(run_dir / "gltf", ["p-1.glb", "p-2.glb"])
+    for part_id in ["p-1", "p-2"]:
+        write_files(render_dir / "rgb" / part_id, [f"{part_id}_000.png"])
+        write_files(render_dir / "mask" / part_id, [f"{part_id}_000_mask.png"])
+        write_files(render_dir / "depth_stack", [f"{part_id}_depth.{stack_extension}"])
+    # p-3 aliases the removed part, p-4 the kept one
+    assert geometry_fingerprint.link_alias_renders(str(render_dir), "p-3", "p-2") == 3
+    assert geometry_fingerprint.link_alias_renders(str(render_dir), "p-4", "p-1") == 3
+
+    n_removed = phash_index.apply_plan(str(run_dir), {"remove_ids": ["p-2"]})
+    assert n_removed == 7
+    assert sorted(os.listdir(run_dir / "gltf")) == ["p-1.glb"]
+    assert sorted(os.listdir(render_dir / "rgb")) == ["p-1", "p-4"]
+    assert sorted(os.listdir(render_dir / "mask")) == ["p-1", "p-4"]
+    assert sorted(os.listdir(render_dir / "depth_stack")) == [
+        f"p-1_depth.{stack_extension}",
+        f"p-4_depth.{stack_extension}",
+    ]
+    assert os.path.isfile(render_dir / "rgb" / "p-4" / "p-4_000.png")
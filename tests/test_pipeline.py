@@ -0,0 +1,51 @@
+import logging
+import threading
+
+import click
+import pytest
+
+import pipeline
+from utils import stage_runner
+
+
+def get_args_of_workers(extra_args: str, n_workers: int) -> dict:
+    """Returns the arguments pipeline.get_worker_args returns in each worker of a stage."""
+    worker_args = {}
+    lock = threading.Lock()
+
+    def process_batch(batch_i: int, batch):
+        with lock:
+            worker_args[stage_runner.get_worker_index()] = pipeline.get_worker_args(extra_args)
+
+    # Each batch blocks its worker until all workers have one, so every worker gets a batch
+    barrier = threading.Barrier(n_workers)
+
+    def wait_for_all_workers(batch_i: int, batch):
+        barrier.wait()
+        process_batch(batch_i, batch)
+
+    stage_runner.run_stages([stage_runner.Stage("render", wait_for_all_workers, n_workers)], [[]] * n_workers)
+    return worker_args
+
+
+@pytest.mark.parametrize("port_arg", ["--metrics_port 9100", "--metrics_port=9100"])
+def test_metrics_port_is_offset_per_worker(port_arg):
+    worker_args = get_args_of_workers(f"--samples 64 {port_arg} --trace_dir '/tmp/a b'", n_workers=3)
+    assert sorted(worker_args) == [0, 1, 2]
+    for worker_i, args in worker_args.items():
+        assert " ".join(args) == f"--samples 64 {port_arg.replace('9100', str(9100 + worker_i))} --trace_dir /tmp/a b"
+
+
+@pytest.mark.parametrize("render_args", ["--out_mode shards", "--samples 64 --out_mode=shards"])
+def test_shards_out_mode_is_rejected(render_args):
+    with pytest.raises(click.UsageError, match="pack_shards.py"):
+        pipeline.check_render_args(render_args)
+    pipeline.check_render_args("--out_mode files --samples 64")
+
+
+def test_log_report_of_stages_without_utilization(caplog):
+    report = stage_runner.run_stages([stage_runner.Stage("export", lambda batch_i, batch: None)], [])
+    report["stages"]["render"] = dict(report["stages"]["export"], utilization=None)
+    with caplog.at_level(logging.INFO):
+        pipeline.log_report(report)
+    assert caplog.records[-1].getMessage().startswith("render") and caplog.records[-1].getMessage().endswith("-")
@@ -0,0 +1,108 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+from preprocessing.models.camera import Camera, cameras_to_array, camera_array_to_cameras, get_camera_array
+from preprocessing.models.light import Light
+from preprocessing.models.part import Part
+from preprocessing.models.scene import Scene
+from preprocessing.models.single_part import SinglePart
+from preprocessing.utils import rcfg
+
+CAMERA_DICTS = [
+    {"focal_length": 50.0, "local_rotation": [0.0, 0.0, 0.0], "position": [1.5, -2.0, 0.25], "target": [0, 0, 0]},
+    {"focal_length": 50.0, "local_rotation": [0.0, 0.0, 1.2], "position": [0.0, 3.0, 1e-05], "target": [0, 0, 0]},
+]
+LIGHT_DICTS = [
+    {"intensity": 100, "position": [4.0, 0.5, -1.0], "target": [0, 0, 0], "type_light": "point"},
+    {"intensity": 100, "position": [-2.0, 2.0, 2.0], "target": [0, 0, 0], "type_light": "point"},
+]
+RENDER_SETUPS = [
+    {"camera_i": 0, "envmap_fname": "white.jpg", "lights_i": [0]},
+    {"camera_i": 1, "envmap_fname": "white.jpg", "lights_i": [1]},
+]
+SCREW = {"id": "sp-1", "material": "steel", "name": "screw"}
+# RCFG written by the previous __dict__ models with json.dump(..., default=lambda o: o.__dict__, indent=4,
+# sort_keys=True) for the parts of get_parts()
+GOLDEN_RCFG = {
+    "parts": [
+        {
+            "hierarchy": "1.1",
+            "id": "p-1",
+            "is_spare": False,
+            "name": "bracket",
+            "scene": {
+                "cameras": [dict(camera, type_camera="persp") for camera in CAMERA_DICTS],
+                "envmaps": ["white.jpg", "white.jpg"],
+                "lights": LIGHT_DICTS,
+                "render_setups": RENDER_SETUPS,
+            },
+            "single_parts": [SCREW],
+        },
+        {"hierarchy": "1.2", "id": "p-2", "is_spare": True, "name": "spare", "scene": None, "single_parts": [SCREW]},
+    ]
+}
+
+
+def get_parts() -> list:
+    screw = SinglePart(**SCREW)
+    scene = Scene(
+        cameras=[
+            Camera(position=[1.5, -2.0, 0.25]),
+            Camera(position=[0.0, 3.0, 1e-05], local_rotation=[0.0, 0.0, 1.2]),
+        ],
+        lights=[Light(position=[4.0, 0.5, -1.0]), Light(position=[-2.0, 2.0, 2.0])],
+        envmaps=["white.jpg", "white.jpg"],
+        render_setups=RENDER_SETUPS,
+    )
+    return [
+        Part(id="p-1", name="bracket", hierarchy="1.1", single_parts=[screw], scene=scene),
+        Part(id="p-2", name="spare", hierarchy="1.2", is_spare=True, single_parts=[screw]),
+    ]
+
+
+@pytest.mark.parametrize("indent", [4, 2, None])
+def test_dump_matches_previous_json_dump(indent):
+    fp = io.StringIO()
+    rcfg.dump_rcfg(get_parts(), fp, indent=indent)
+    # json.loads keeps ints and floats apart, so this is the text of the previous output
+    assert fp.getvalue() == json.dumps(GOLDEN_RCFG, indent=indent, sort_keys=True)
+    assert rcfg.dumps_rcfg(get_parts(), indent=indent) == fp.getvalue()
+
+
+def test_dump_empty_and_validated_parts():
+    for indent in [4, None]:
+        fp = io.StringIO()
+        rcfg.dump_rcfg([], fp, indent=indent)
+        assert fp.getvalue() == json.dumps({"parts": []}, indent=indent)
+
+    validated = []
+    rcfg.dump_rcfg(get_parts(), io.StringIO(), validate_part=lambda part, i: validated.append((part["id"], i)))
+    assert validated == [("p-1", 0), ("p-2", 1)]
+
+
+def test_part_dicts_with_scene_objects():
+    part = {"id": "obj-1", "path": "obj-1.obj", "scene": get_parts()[0].scene}
+    assert rcfg.part_to_dict(part)["scene"] == GOLDEN_RCFG["parts"][0]["scene"]
+    # The part dictionary itself is not modified
+    assert isinstance(part["scene"], Scene)
+
+
+def test_camera_array_roundtrip():
+    cameras = get_camera_array(np.array([[1.0, 2.0, 3.0], [0.0, -1.0, 0.5]]), roll_angles=np.array([0.0, 0.3]))
+    camera_objects = camera_array_to_cameras(cameras)
+    assert [camera.local_rotation for camera in camera_objects] == [[0.0, 0.0, 0.0], [0.0, 0.0, 0.3]]
+    assert [camera.target for camera in camera_objects] == [[0, 0, 0], [0, 0, 0]]
+    np.testing.assert_array_equal(cameras_to_array(camera_objects), cameras)
+
+    cameras["target"][1] = [0.5, 1.0, 0.0]
+    assert [camera.target for camera in camera_array_to_cameras(cameras)] == [[0, 0, 0], [0.5, 1, 0]]
+
+
+def test_models_are_slotted():
+    for obj in [get_parts()[0], SinglePart(**SCREW), Camera(position=[0.0, 0.0, 1.0]), Scene()]:
+        assert not hasattr(obj, "__dict__")
+    # No shared mutable defaults
+    assert Part(id="a", name="a", hierarchy="1").single_parts is not Part(id="b", name="b", hierarchy="2").single_parts
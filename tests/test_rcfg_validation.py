@@ -0,0 +1,95 @@
+import jsonschema
+import pytest
+
+from utils import rcfg_validation
+
+SCHEMA = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "object",
+    "required": ["parts"],
+    "properties": {
+        "parts": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["id", "cameras"],
+                "properties": {
+                    "id": {"type": "string", "description": "Annotations are ignored"},
+                    "count": {"type": ["integer", "null"]},
+                    "spare": {"type": "boolean"},
+                    "cameras": {"type": "array", "items": {"$ref": "#/definitions/camera"}},
+                },
+            },
+        }
+    },
+    "definitions": {
+        "point": {"type": "array", "items": {"type": "number"}},
+        "camera": {
+            "type": "object",
+            "required": ["position"],
+            "properties": {"position": {"$ref": "#/definitions/point"}, "focal_length": {"type": "number"}},
+        },
+    },
+}
+
+
+def get_part(**kwargs) -> dict:
+    return {"id": "p-1", "count": 2, "spare": False, "cameras": [{"position": [0, 1.5, 2]}], **kwargs}
+
+
+INSTANCES = [
+    {"parts": []},
+    {"parts": [get_part(), get_part(count=None, extra="ignored")]},
+    {"parts": [get_part(count=2.0)]},
+    {},
+    {"parts": {}},
+    {"parts": [get_part(id=1)]},
+    {"parts": [get_part(count=True)]},
+    {"parts": [get_part(count=2.5)]},
+    {"parts": [get_part(spare=0)]},
+    {"parts": [get_part(cameras=[{"position": [0, "1", 2]}])]},
+    {"parts": [get_part(cameras=[{"position": [0, True, 2]}])]},
+    {"parts": [get_part(cameras=[{"focal_length": 50}])]},
+    {"parts": [{"id": "p-1"}]},
+]
+
+
+@pytest.mark.parametrize("instance", INSTANCES)
+def test_matches_jsonschema(instance):
+    validator = rcfg_validation.RcfgValidator(SCHEMA)
+    assert validator.is_valid(instance) == jsonschema.Draft7Validator(SCHEMA).is_valid(instance)
+
+
+def test_error_paths():
+    validator = rcfg_validation.RcfgValidator(SCHEMA)
+    with pytest.raises(rcfg_validation.RcfgValidationError) as error:
+        validator.validate({"parts": [get_part(), get_part(cameras=[{"position": [0, None, 2]}])]})
+    assert error.value.json_path == "parts[1].cameras[0].position[1]"
+    assert "is not of type 'number'" in str(error.value)
+
+    with pytest.raises(rcfg_validation.RcfgValidationError) as error:
+        validator.validate_part(get_part(cameras=[{}]), 3)
+    assert str(error.value) == "'position' is a required property at parts[3].cameras[0]"
+
+    with pytest.raises(rcfg_validation.RcfgValidationError) as error:
+        validator.validate([])
+    assert error.value.json_path == "<root>"
+
+
+def test_unsupported_keywords_are_rejected():
+    schema = {"type": "object", "properties": {"samples": {"type": "integer", "minimum": 1}}}
+    with pytest.raises(NotImplementedError, match="minimum"):
+        rcfg_validation.RcfgValidator(schema)
+
+
+@pytest.mark.parametrize("schema_name", ["topex", "obj"])
+def test_rcfg_schemas_compile(schema_name):
+    validator = rcfg_validation.get_validator(rcfg_validation.SCHEMA_FILES[schema_name])
+    assert validator is rcfg_validation.get_validator(rcfg_validation.SCHEMA_FILES[schema_name])
+    assert validator.is_valid({"parts": []})
+    assert not validator.is_valid({"parts": [{}]})
+
+
+def test_schema_file_of_rcfg():
+    assert rcfg_validation.get_schema_file({"parts": [{"id": "a", "path": "a.obj"}]}).endswith("obj.json")
+    assert rcfg_validation.get_schema_file({"parts": []}).endswith("topex.json")
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from utils import render_profiles
+
+
+def get_part(*materials) -> dict:
+    return {"id": "p-1", "single_parts": [{"id": f"sp-{i}", "material": m} for i, m in enumerate(materials)]}
+
+
+@pytest.mark.parametrize(
+    "materials, profile",
+    [
+        (["synthnet_steel_burnished_natural.blend", "synthnet_Brass_polished.blend"], "glossy"),
+        (["synthnet_plastic_matte_yellow.blend", "synthnet_aluminium_sandblasted.blend"], "matte"),
+        # "any" of transmissive comes first and wins over "all" of the other rules
+        (["synthnet_steel_glossy.blend", "synthnet_plexiglas_clear.blend"], "transmissive"),
+        # sandblasted aluminium matches matte and glossy, the earlier rule wins
+        (["synthnet_aluminium_sandblasted.blend"], "matte"),
+        # "all": one material that matches no pattern falls back to the default
+        (["synthnet_steel_burnished_natural.blend", "synthnet_rubber_black.blend"], "default"),
+        (["synthnet_rubber_black.blend"], "default"),
+        # Parts without materials
+        (["none", None], "default"),
+        ([], "default"),
+        # "none" is ignored for "all"
+        (["synthnet_steel_burnished_natural.blend", "none"], "glossy"),
+    ],
+)
+def test_rule_precedence_and_fallback(materials, profile):
+    assert render_profiles.match_profile(render_profiles.get_part_materials(get_part(*materials))) == profile
+
+
+def test_resolve_settings_scales_samples():
+    profile, settings = render_profiles.resolve_settings(get_part("synthnet_plastic_matte_red.blend"), 4096)
+    assert profile == "matte" and settings["samples"] == 1024
+    assert "samples_factor" not in settings and settings["max_bounces"] == 4
+    # The default profile keeps the former global settings
+    profile, settings = render_profiles.resolve_settings(get_part("none"), 4096)
+    expected = dict(render_profiles.DEFAULT_SETTINGS, samples=4096)
+    del expected["samples_factor"]
+    assert profile == "default" and settings == expected
+    # At least one sample
+    assert render_profiles.resolve_settings(get_part("synthnet_plastic_matte_red.blend"), 1)[1]["samples"] == 1
+    # The profile tables are not modified
+    assert render_profiles.PROFILES["matte"]["samples_factor"] == 0.25
+
+
+def test_load_rule_table(tmp_path):
+    table_path = tmp_path / "profiles.json"
+    table_path.write_text(
+        json.dumps(
+            {
+                "profiles": {"rubber": {"samples_factor": 0.1}},
+                "rules": [{"profile": "rubber", "match": "any", "patterns": ["*RUBBER*"]}],
+            }
+        )
+    )
+    profiles, rules = render_profiles.load_rule_table(str(table_path))
+    assert profiles["rubber"] == {**render_profiles.DEFAULT_SETTINGS, "samples_factor": 0.1}
+    assert set(render_profiles.PROFILES) < set(profiles) and "rubber" not in render_profiles.PROFILES
+    # The rules replace the default rules, patterns are case insensitive
+    part = get_part("synthnet_rubber_black.blend", "synthnet_glass_clear.blend")
+    assert render_profiles.resolve_settings(part, 100, profiles, rules) == (
+        "rubber",
+        {**render_profiles.resolve_settings(get_part(), 100)[1], "samples": 10},
+    )
+    assert render_profiles.match_profile(["synthnet_glass_clear.blend"], rules) == "default"
+
+    # Without rules, the default rules are used
+    table_path.write_text(json.dumps({"profiles": {"matte": {"max_bounces": 3}}}))
+    profiles, rules = render_profiles.load_rule_table(str(table_path))
+    assert rules == render_profiles.RULES and profiles["matte"]["max_bounces"] == 3
+
+
+@pytest.mark.parametrize(
+    "table, message",
+    [
+        ({"profiles": {"fast": {"bounces": 1}}}, "Unknown settings"),
+        ({"rules": [{"profile": "fast", "match": "any", "patterns": []}]}, "unknown profile"),
+        ({"rules": [{"profile": "matte", "match": "some", "patterns": []}]}, "Unknown match"),
+    ],
+)
+def test_invalid_rule_tables(tmp_path, table, message):
+    table_path = tmp_path / "profiles.json"
+    table_path.write_text(json.dumps(table))
+    with pytest.raises(AssertionError, match=message):
+        render_profiles.load_rule_table(str(table_path))
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from preprocessing import define_scenes
+from preprocessing.utils import sampling
+
+
+def get_draws(seeds: list, n: int = 4) -> np.ndarray:
+    return np.array([rng.random(n) for rng in sampling.get_rngs(seeds)])
+
+
+def test_part_streams_do_not_depend_on_the_number_or_order_of_requests():
+    seeds = sampling.spawn_seeds(42, 8)
+    draws = get_draws(seeds)
+    assert len(np.unique(draws[:, 0])) == 8
+    # More parts and reversed order give the same stream for each part
+    np.testing.assert_array_equal(get_draws(sampling.spawn_seeds(42, 12))[:8], draws)
+    np.testing.assert_array_equal(get_draws(seeds[::-1]), draws[::-1])
+    # Chunks as submitted to worker processes
+    np.testing.assert_array_equal(np.concatenate([get_draws(seeds[:3]), get_draws(seeds[3:])]), draws)
+
+    shared = sampling.spawn_seeds(42, 3, shared=True)
+    assert (get_draws(shared) == get_draws(shared)[0]).all()
+
+
+def test_derived_streams_are_stable_and_independent():
+    seed = sampling.spawn_seeds(7, 4)[2]
+    derived = sampling.derive_seed(seed, 5).generate_state(4)
+    np.testing.assert_array_equal(sampling.derive_seed(seed, 5).generate_state(4), derived)
+    # Deriving does not spawn from the part's sequence
+    assert seed.n_children_spawned == 0
+    assert not np.array_equal(sampling.derive_seed(seed, 6).generate_state(4), derived)
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_derived_streams_never_equal_spawned_streams(shared):
+    key = 3
+    seeds = sampling.spawn_seeds(7, key + 2, shared=shared)
+    derived = {tuple(sampling.derive_seed(seed, key).generate_state(4)) for seed in seeds}
+    spawned = np.random.SeedSequence(7).spawn(key + 2)
+    # In shared mode the part seed is the root, whose child key is the stream of part key otherwise
+    spawned += [child for seed in spawned for child in np.random.SeedSequence(7, spawn_key=seed.spawn_key).spawn(4)]
+    assert derived.isdisjoint(tuple(seed.generate_state(4)) for seed in spawned)
+
+
+def get_scene_arrays(scenes: list) -> list:
+    return [(scene.camera_array.tobytes(), scene.light_array.tobytes()) for scene in scenes]
+
+
+def test_scenes_do_not_depend_on_the_number_of_workers():
+    args = (6, 3, "sphere-uniform", "sphere-uniform", "disabled", 1, 2)
+    scenes = define_scenes.build_scenes(*args, n_workers=1)
+    assert len(set(get_scene_arrays(scenes))) == 6
+    assert get_scene_arrays(define_scenes.build_scenes(*args, n_workers=3)) == get_scene_arrays(scenes)
+    assert get_scene_arrays(define_scenes.build_scenes(8, *args[1:], n_workers=2))[:6] == get_scene_arrays(scenes)
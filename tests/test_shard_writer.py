@@ -0,0 +1,102 @@
+import io
+import json
+import os
+import tarfile
+
+import pytest
+
+from utils import shard_writer
+
+
+def write_samples(writer: shard_writer.ShardWriter, n_samples: int, size: int, part_id: str = "part") -> dict:
+    samples = {}
+    for i in range(n_samples):
+        key = shard_writer.get_sample_key(part_id, i)
+        samples[key] = {"rgb.png": os.urandom(size), "json": json.dumps({"i": i}).encode("utf-8")}
+        writer.write(key, samples[key], mtime=0.0)
+    return samples
+
+
+def get_shard_paths(out_dir: str) -> list:
+    return sorted(os.path.join(out_dir, fn) for fn in os.listdir(out_dir) if fn.endswith(".tar"))
+
+
+def test_sample_key_has_no_dots():
+    assert shard_writer.get_sample_key("part.v2", 3) == "part_v2_003"
+
+
+@pytest.mark.parametrize("part_id", ["part", "p" * 150])
+def test_member_bytes_match_tar_file(tmp_path, part_id):
+    info = tarfile.TarInfo(f"{shard_writer.get_sample_key(part_id, 0)}.rgb.png")
+    info.size = 1000
+    with tarfile.open(tmp_path / "a.tar", "w", format=tarfile.PAX_FORMAT) as tar:
+        tar.addfile(info, io.BytesIO(bytes(info.size)))
+        offset = tar.offset
+    assert offset == shard_writer.get_member_bytes(info)
+    assert os.path.getsize(tmp_path / "a.tar") == shard_writer.get_archive_bytes(offset)
+
+
+@pytest.mark.parametrize("max_shard_bytes", [30 << 10, 100 << 10])
+def test_shards_do_not_exceed_max_bytes(tmp_path, max_shard_bytes):
+    with shard_writer.ShardWriter(str(tmp_path), max_shard_bytes=max_shard_bytes) as writer:
+        write_samples(writer, 60, 3000, part_id="p" * 120)
+    shard_paths = get_shard_paths(str(tmp_path))
+    assert len(shard_paths) > 1
+    assert all(os.path.getsize(path) <= max_shard_bytes for path in shard_paths)
+    assert writer.n_shards == len(shard_paths)
+
+
+def test_large_sample_gets_own_shard(tmp_path):
+    with shard_writer.ShardWriter(str(tmp_path), max_shard_bytes=20 << 10) as writer:
+        write_samples(writer, 1, 1000, part_id="small")
+        write_samples(writer, 1, 50 << 10, part_id="large")
+        write_samples(writer, 1, 1000, part_id="after")
+    assert len(get_shard_paths(str(tmp_path))) == 3
+
+
+def test_sidecar_offsets_point_to_member_data(tmp_path):
+    with shard_writer.ShardWriter(str(tmp_path), max_shard_bytes=50 << 10) as writer:
+        samples = write_samples(writer, 20, 2000)
+    for shard_path in get_shard_paths(str(tmp_path)):
+        with open(f"{shard_path[:-4]}.json", "r") as f:
+            sidecar = json.load(f)
+        with tarfile.open(shard_path, "r") as tar:
+            assert [member["name"] for member in sidecar["members"]] == tar.getnames()
+        for member in sidecar["members"]:
+            key, ext = member["name"].split(".", 1)
+            data = shard_writer.read_member(shard_path, member["offset"], member["size"])
+            assert data == samples[key][ext]
+
+
+def test_merge_indices_of_multiple_writers(tmp_path):
+    out_dir = str(tmp_path)
+    samples = {}
+    for start_index, part_id in [(0, "first"), (1000, "second")]:
+        with shard_writer.ShardWriter(out_dir, max_shard_bytes=20 << 10, start_index=start_index) as writer:
+            samples.update(write_samples(writer, 10, 4000, part_id=part_id))
+
+    index_path = shard_writer.merge_indices(out_dir)
+    assert index_path == os.path.join(out_dir, shard_writer.INDEX_FILENAME)
+    assert not [fn for fn in os.listdir(out_dir) if fn.endswith(f".{shard_writer.INDEX_FILENAME}")]
+
+    index = shard_writer.load_index(out_dir)
+    assert set(index) == set(samples)
+    assert index["second_000"]["shard"] == "shard-001000.tar"
+    for key, entry in index.items():
+        for ext, (offset, size) in entry["members"].items():
+            assert shard_writer.read_member(os.path.join(out_dir, entry["shard"]), offset, size) == samples[key][ext]
+
+
+def test_background_writer_removes_files_and_raises_errors(tmp_path):
+    out_dir, file_path = str(tmp_path / "shards"), tmp_path / "image.png"
+    file_path.write_bytes(b"png")
+    with shard_writer.BackgroundShardWriter(out_dir) as writer:
+        writer.submit("part_000", {"rgb.png": str(file_path)}, metadata={"part_id": "part"})
+    assert not file_path.exists()
+    shard_writer.merge_indices(out_dir)
+    assert set(shard_writer.load_index(out_dir)["part_000"]["members"]) == {"rgb.png", "json"}
+
+    writer = shard_writer.BackgroundShardWriter(out_dir, start_index=1)
+    writer.submit("part_001", {"rgb.png": str(tmp_path / "missing.png")})
+    with pytest.raises(RuntimeError, match="Writing shards failed"):
+        writer.close()
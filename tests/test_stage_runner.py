@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from utils import stage_runner
+
+
+class Recorder:
+    """process_batch that records the processed batches and the worker indices."""
+
+    def __init__(self, seconds: float = 0.0, fail_batch: int = None):
+        self.seconds = seconds
+        self.fail_batch = fail_batch
+        self.lock = threading.Lock()
+        self.batches = []
+        self.worker_indices = set()
+
+    def __call__(self, batch_i: int, batch):
+        if batch_i == self.fail_batch:
+            raise ValueError("Blender exited with code 1")
+        time.sleep(self.seconds)
+        with self.lock:
+            self.batches.append(batch_i)
+            self.worker_indices.add(stage_runner.get_worker_index())
+
+
+def test_all_batches_pass_all_stages_in_order():
+    export, render = Recorder(0.03), Recorder(0.03)
+    done = []
+    report = stage_runner.run_stages(
+        [stage_runner.Stage("export", export), stage_runner.Stage("render", render)],
+        [["part_a"], ["part_b"], ["part_c"], ["part_d"]],
+        on_batch_done=lambda stage, batch_i, seconds: done.append((stage.name, batch_i)),
+    )
+    assert export.batches == render.batches == [0, 1, 2, 3]
+    assert done.index(("export", 3)) < done.index(("render", 3))
+    assert report["stages"]["render"]["n_batches"] == 4
+    # Export and render overlap, so the pipeline is faster than running the stages one after another
+    assert report["wall_seconds"] < report["sequential_seconds"]
+
+
+def test_worker_indices():
+    render = Recorder(0.02)
+    report = stage_runner.run_stages([stage_runner.Stage("render", render, n_workers=3)], list(range(9)))
+    assert render.worker_indices == {0, 1, 2}
+    assert sorted(render.batches) == list(range(9))
+    assert 0 < report["stages"]["render"]["utilization"] <= 1
+
+
+def test_failed_batch_stops_the_pipeline():
+    export, render = Recorder(fail_batch=1), Recorder()
+    with pytest.raises(stage_runner.StageError, match="export of batch 1 failed: Blender exited with code 1"):
+        stage_runner.run_stages(
+            [stage_runner.Stage("export", export), stage_runner.Stage("render", render)], list(range(5))
+        )
+    # Batches after the failure are skipped, the failed one never reaches the next stage
+    assert export.batches == [0]
+    assert 1 not in render.batches
+
+
+def test_failure_in_later_stage_does_not_block_upstream():
+    export, render = Recorder(), Recorder(fail_batch=0)
+    errors = []
+
+    def run():
+        try:
+            stage_runner.run_stages(
+                [stage_runner.Stage("export", export), stage_runner.Stage("render", render)],
+                list(range(20)),
+                max_queued=1,
+            )
+        except stage_runner.StageError as err:
+            errors.append(err)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=10.0)
+    assert not thread.is_alive(), "Export workers are blocked by the queue of the failed render stage"
+    assert len(errors) == 1 and "render of batch 0 failed" in str(errors[0])
+    assert render.batches == []
+
+
+def test_report_of_a_stage_without_batches():
+    report = stage_runner.run_stages([stage_runner.Stage("export", Recorder())], [])
+    assert report["stages"]["export"]["n_batches"] == 0
+    assert report["stages"]["export"]["first_batch_done"] is None
@@ -0,0 +1,62 @@
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from utils import trace_utils
+
+
+@pytest.fixture(name="trace_dir")
+def fixture_trace_dir(tmp_path):
+    yield str(tmp_path / "trace")
+    trace_utils.init_tracer(None, None)
+
+
+def record_part(part_id: str) -> int:
+    with trace_utils.span("part", part_id=part_id):
+        with trace_utils.span("cycles_render"):
+            pass
+    return os.getpid()
+
+
+def test_workers_write_their_own_files_and_exports_merge_them(trace_dir, tmp_path):
+    trace_utils.init_tracer(trace_dir, "render")
+    record_part("p-0")
+    # Forked workers inherit the tracer of the parent
+    with multiprocessing.get_context("fork").Pool(2) as pool:
+        worker_pids = set(pool.map(record_part, [f"p-{i}" for i in range(1, 7)]))
+    trace_utils.init_tracer(None, None)
+
+    pids = {os.getpid()} | worker_pids
+    assert sorted(os.listdir(trace_dir)) == sorted(f"render.{pid}{trace_utils.TRACE_SUFFIX}" for pid in pids)
+    for pid in pids:
+        with open(trace_utils.get_trace_file(trace_dir, "render", pid), "r") as f:
+            assert {json.loads(line)["pid"] for line in f} == {pid}
+
+    spans = trace_utils.load_spans([trace_dir])
+    assert len(spans) == 14
+    assert [span_record["start"] for span_record in spans] == sorted(span_record["start"] for span_record in spans)
+    assert sorted(span_record["attrs"]["part_id"] for span_record in spans if span_record["name"] == "part") == [
+        f"p-{i}" for i in range(7)
+    ]
+
+    chrome_trace = str(tmp_path / "trace.json")
+    trace_utils.write_chrome_trace(spans, chrome_trace)
+    with open(chrome_trace, "r") as f:
+        events = json.load(f)["traceEvents"]
+    assert len([event for event in events if event["ph"] == "X"]) == 14
+    assert {event["pid"] for event in events if event["ph"] == "M"} == pids
+
+
+def test_parent_spans_and_disabled_tracing(trace_dir):
+    assert trace_utils.init_tracer(None, "render") is None
+    record_part("p-0")
+    assert not os.path.exists(trace_dir)
+
+    tracer = trace_utils.init_tracer(trace_dir, "export")
+    assert tracer.trace_file == trace_utils.get_trace_file(trace_dir, "export")
+    record_part("p-1")
+    part_span, render_span = sorted(trace_utils.load_spans([tracer.trace_file]), key=lambda record: record["id"])
+    assert part_span["parent"] is None and render_span["parent"] == part_span["id"]
+    assert part_span["process"] == "export" and part_span["attrs"] == {"part_id": "p-1"}
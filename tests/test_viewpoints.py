@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from preprocessing.utils import mesh, viewpoints
+
+# Unit cube as 12 triangles
+CUBE_VERTICES = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.float64)
+CUBE_FACES = np.array(
+    [[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5], [0, 4, 5], [0, 5, 1], [2, 3, 7], [2, 7, 6], [0, 2, 6], [0, 6, 4]]
+    + [[1, 5, 7], [1, 7, 3]]
+)
+# Flat plate: large silhouette from +-Z, thin from the sides
+PLATE_VERTICES = mesh.normalize_mesh(CUBE_VERTICES * [1.0, 0.8, 0.05])
+AXES = np.array([[0.0, 0.0, 1.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, -1.0]])
+
+
+def test_rasterize_points_keeps_the_front_point():
+    points = np.array([[0.0, 0.0, 0.5], [0.0, 0.0, -0.5], [0.9, 0.0, 0.0]])
+    pixels, front, depth = viewpoints.rasterize_points(points, np.array([0.0, 0.0, 1.0]), resolution=8)
+    assert len(np.unique(pixels)) == len(pixels) == 2
+    # The point nearer to the camera on +Z hides the one behind it
+    assert sorted(front.tolist()) == [0, 2]
+    np.testing.assert_allclose(depth[front == 0], [-0.5])
+
+    _, front, _ = viewpoints.rasterize_points(points, np.array([0.0, 0.0, -1.0]), resolution=8)
+    assert sorted(front.tolist()) == [1, 2]
+
+
+@pytest.mark.parametrize("metric", viewpoints.VIEWPOINT_METRICS)
+def test_plate_scores_highest_from_the_top(metric):
+    scores = viewpoints.score_viewpoints(
+        PLATE_VERTICES, CUBE_FACES, AXES, metric=metric, resolution=16, rng=np.random.default_rng(0)
+    )
+    assert scores[0] > 2 * max(scores[1], scores[2])
+    assert scores[0] == pytest.approx(scores[3], rel=0.1)
+
+
+def test_visible_area_of_a_cube_from_an_axis():
+    vertices = mesh.normalize_mesh(CUBE_VERTICES)
+    # Several splats per pixel, so that the sides seen edge-on are hidden by the front side
+    scores = viewpoints.score_viewpoints(
+        vertices, CUBE_FACES, AXES, metric="visible_area", resolution=16, rng=np.random.default_rng(0)
+    )
+    # One of six sides is visible
+    np.testing.assert_allclose(scores, 1 / 6)
+
+
+def test_diverse_selection_picks_distinct_views():
+    directions = np.array([[0.0, 0.0, 1.0], [0.1, 0.0, 1.0], [1.0, 0.0, 0.0], [0.0, 0.0, -1.0]])
+    scores = np.array([1.0, 0.95, 0.5, 0.2])
+    # Without diversity the views are ordered by score
+    assert viewpoints.select_diverse_viewpoints(directions, scores, k=4, diversity=0.0).tolist() == [0, 1, 2, 3]
+    # With diversity the near duplicate of the best view comes last
+    selected = viewpoints.select_diverse_viewpoints(directions, scores, k=4, diversity=0.5)
+    assert selected.tolist() == [0, 2, 3, 1]
+    # Only diversity: the opposite view (similarity 0) comes first after the best view
+    assert viewpoints.select_diverse_viewpoints(directions, scores, k=2, diversity=1.0).tolist()[1] in [2, 3]
+    with pytest.raises(AssertionError):
+        viewpoints.select_diverse_viewpoints(directions, scores, k=5)
+
+
+def test_importance_viewpoints_are_distinct_and_reproducible(tmp_path):
+    obj_file = tmp_path / "plate.obj"
+    obj_file.write_text(
+        "".join(f"v {x} {y} {z}\n" for x, y, z in PLATE_VERTICES)
+        + "".join(f"f {a + 1} {b + 1} {c + 1}\n" for a, b, c in CUBE_FACES)
+    )
+    kwargs = dict(n=6, n_candidates=64, resolution=32, n_points=4000)
+    views = viewpoints.get_importance_viewpoints(str(obj_file), rng=np.random.default_rng(1), **kwargs)
+    assert views.shape == (6, 3)
+    np.testing.assert_allclose(np.linalg.norm(views, axis=1), 1.0)
+    # No two selected views are the same
+    similarity = views @ views.T
+    assert similarity[~np.eye(6, dtype=bool)].max() < 0.99
+    # The first view is one of the candidates closest to the top or bottom of the plate
+    assert abs(views[0, 2]) > 0.8
+    np.testing.assert_array_equal(
+        viewpoints.get_importance_viewpoints(str(obj_file), rng=np.random.default_rng(1), **kwargs), views
+    )
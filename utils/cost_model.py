@@ -0,0 +1,280 @@
+"""Predicts the render time of each part before a run (see scripts/utils/estimate_costs.py).
+
+The time of a part (its render_part span in render.py) is modeled as a non-negative linear combination of:
+    parts               1 per part: GLB import, material application, scene cleanup
+    images              render setups: envmap and camera setup, compositing, file writes
+    mtriangles          million triangles (see preprocessing/utils/mesh.py): import and BVH build
+    image_mtriangles    images * million triangles: scene sync and ray traversal of each image
+    gpaths              images * pixels * samples * (1 + max bounces) / 1e9: upper bound of the traced path
+                        segments, adaptive sampling stops earlier
+    transmissive_gpaths gpaths of parts with transmissive materials (glass paths converge slowest)
+
+Samples and bounces are those of the part's render profile with --adaptive_settings (see utils/render_profiles.py),
+else the global settings. The material class of a part is the profile its materials match, also without
+--adaptive_settings.
+
+The default coefficients are rough values for a single GPU. A model calibrated on the traces of past runs
+(render.py --trace_dir) replaces them: the coefficients are fitted by least squares, features with negative
+coefficients are dropped and the fit is repeated. Runs with fewer parts than twice the number of features only
+scale the default coefficients.
+
+Models and estimates are JSON files:
+    model: {"coefficients": {feature: seconds per unit}, "calibration": {runs, n_parts, mean_abs_error} or null}
+    estimates: {"total_seconds", "settings", "model", "parts": {part_id: {"seconds", "n_images", ...}}}, the cost
+    file of scripts/kube/plan_jobs.py --cost_file
+"""
+import json
+import logging
+import os
+
+import numpy as np
+
+from preprocessing.utils import mesh
+from utils import job_planner, render_profiles, trace_utils
+
+LOGGER = logging.getLogger(__name__)
+
+FEATURES = ["parts", "images", "mtriangles", "image_mtriangles", "gpaths", "transmissive_gpaths"]
+DEFAULT_COEFFICIENTS = {
+    "parts": 3.0,
+    "images": 0.5,
+    "mtriangles": 4.0,
+    "image_mtriangles": 0.5,
+    "gpaths": 0.3,
+    "transmissive_gpaths": 0.3,
+}
+DEFAULT_MODEL = {"coefficients": DEFAULT_COEFFICIENTS, "calibration": None}
+TRANSMISSIVE_PROFILE = "transmissive"
+ESTIMATES_NAME = "cost_estimate.json"
+# Parts predicted to take longer than this multiple of the median are reported as outliers
+OUTLIER_FACTOR = 3.0
+
+
+def get_features(
+    n_images: int, n_triangles: int, res_x: int, res_y: int, samples: int, max_bounces: int, material_class: str
+) -> dict:
+    """Returns the model features of a part (see module docstring)."""
+    mtriangles = n_triangles / 1e6
+    gpaths = n_images * res_x * res_y * samples * (1 + max_bounces) / 1e9
+    return {
+        "parts": 1.0,
+        "images": float(n_images),
+        "mtriangles": mtriangles,
+        "image_mtriangles": n_images * mtriangles,
+        "gpaths": gpaths,
+        "transmissive_gpaths": gpaths if material_class == TRANSMISSIVE_PROFILE else 0.0,
+    }
+
+
+def predict(model: dict, features: dict) -> float:
+    """Returns the predicted seconds of a part."""
+    return sum(model["coefficients"].get(feature, 0.0) * features[feature] for feature in FEATURES)
+
+
+def load_model(model_file: str = None) -> dict:
+    """Returns the model of a JSON file, DEFAULT_MODEL if model_file is None."""
+    if model_file is None:
+        return DEFAULT_MODEL
+    with open(model_file, "r") as f:
+        model = json.load(f)
+    unknown = set(model["coefficients"]) - set(FEATURES)
+    assert not unknown, f"{model_file} has unknown features {sorted(unknown)}, known are {FEATURES}"
+    return model
+
+
+def fit_model(samples: list[dict]) -> dict:
+    """Fits the coefficients to measured part times.
+
+    Args:
+        samples (list[dict]): Per part {"features": dict, "seconds": float} (see get_calibration_samples).
+
+    Returns:
+        dict: Model with the fitted coefficients and the mean absolute relative error of the fit.
+    """
+    assert samples, "No calibration samples"
+    x = np.array([[sample["features"][feature] for feature in FEATURES] for sample in samples])
+    y = np.array([sample["seconds"] for sample in samples])
+    if len(samples) < 2 * len(FEATURES):
+        # Too few parts to fit every coefficient, only scale the defaults
+        x_default = x @ np.array([DEFAULT_COEFFICIENTS[feature] for feature in FEATURES])
+        scale = float(x_default @ y / (x_default @ x_default)) if x_default @ x_default > 0 else 1.0
+        coefficients = {feature: DEFAULT_COEFFICIENTS[feature] * scale for feature in FEATURES}
+    else:
+        active = [i for i in range(len(FEATURES)) if x[:, i].any()]
+        while True:
+            solution = np.linalg.lstsq(x[:, active], y, rcond=None)[0]
+            if (solution >= 0).all():
+                break
+            # Drop the most negative feature, its effect is covered by the others
+            active.pop(int(np.argmin(solution)))
+        coefficients = {feature: 0.0 for feature in FEATURES}
+        coefficients.update({FEATURES[i]: float(value) for i, value in zip(active, solution)})
+
+    model = {"coefficients": coefficients}
+    predicted = np.array([predict(model, sample["features"]) for sample in samples])
+    relative_errors = np.abs(predicted - y) / np.maximum(y, 1e-6)
+    model["calibration"] = {"n_parts": len(samples), "mean_abs_error": float(relative_errors.mean())}
+    return model
+
+
+def get_material_class(rcfg_part: dict, rules: list = None) -> str:
+    """Returns the render profile matched by the materials of a part (see utils/render_profiles.py)."""
+    return render_profiles.match_profile(render_profiles.get_part_materials(rcfg_part), rules)
+
+
+def get_calibration_samples(run_dir: str, trace_dir: str = None) -> list[dict]:
+    """Returns the measured time and the features of each rendered part of a past run.
+
+    Args:
+        run_dir (str): Report directory of the render run with render_settings.json and, if written,
+            part_render_settings.json and rcfg.json (material classes).
+        trace_dir (str): Trace files of the run with render_part spans. Default: {run_dir}/trace.
+
+    Returns:
+        list[dict]: Per part {"part_id", "seconds", "features"}. Empty for depth-only or non-Cycles runs.
+    """
+    trace_dir = trace_dir or f"{run_dir}/trace"
+    with open(f"{run_dir}/render_settings.json", "r") as f:
+        render_settings = json.load(f)
+    if render_settings.get("depth", {}).get("mode", "full") != "full" or render_settings["engine"] != "CYCLES":
+        LOGGER.warning(f"{run_dir} is no Cycles run of mode full, it is not used for calibration")
+        return []
+    part_render_settings = {}
+    if os.path.isfile(f"{run_dir}/part_render_settings.json"):
+        with open(f"{run_dir}/part_render_settings.json", "r") as f:
+            part_render_settings = json.load(f)
+    material_classes = {}
+    if os.path.isfile(f"{run_dir}/rcfg.json"):
+        with open(f"{run_dir}/rcfg.json", "r") as f:
+            material_classes = {part["id"]: get_material_class(part) for part in json.load(f)["parts"]}
+
+    samples = []
+    for span_record in trace_utils.load_spans([trace_dir]):
+        attrs = span_record["attrs"]
+        # Parts that failed have no image count
+        if span_record["name"] != "render_part" or not attrs.get("n_images") or "n_triangles" not in attrs:
+            continue
+        part_id = attrs["part_id"]
+        cycles_settings = part_render_settings.get(part_id, {}).get("cycles", render_settings["cycles"])
+        material_class = part_render_settings.get(part_id, {}).get("profile", material_classes.get(part_id))
+        features = get_features(
+            attrs["n_images"],
+            attrs["n_triangles"],
+            render_settings["resolution_x"],
+            render_settings["resolution_y"],
+            attrs.get("samples", cycles_settings["samples"]),
+            cycles_settings["max_bounces"],
+            material_class,
+        )
+        samples.append({"part_id": part_id, "seconds": span_record["duration"], "features": features})
+    return samples
+
+
+def inspect_parts(rcfg: dict, gltf_dir: str = None) -> dict:
+    """Returns the geometry statistics of each part with a GLB in gltf_dir or an OBJ file (RCFG path).
+
+    Parts of .blend files only have geometry statistics after their GLTF export.
+    """
+    mesh_stats = {}
+    for part in rcfg["parts"]:
+        mesh_file = None
+        if gltf_dir and os.path.isfile(f"{gltf_dir}/{part['id']}.glb"):
+            mesh_file = f"{gltf_dir}/{part['id']}.glb"
+        elif "path" in part and os.path.isfile(part["path"]):
+            mesh_file = part["path"]
+        if mesh_file is not None:
+            mesh_stats[part["id"]] = mesh.get_mesh_stats(mesh_file)
+    return mesh_stats
+
+
+def estimate_parts(
+    rcfg: dict,
+    mesh_stats: dict,
+    settings: dict,
+    model: dict,
+    profiles: dict = None,
+    rules: list = None,
+) -> dict:
+    """Returns the predicted render time of each part of an RCFG.
+
+    Args:
+        rcfg (dict): RCFG of the run.
+        mesh_stats (dict): Geometry statistics by part id (see mesh.get_mesh_stats). Parts without
+            statistics are estimated without triangles.
+        settings (dict): res_x, res_y, samples and adaptive_settings of the render run.
+        model (dict): Cost model (see load_model).
+        profiles (dict): Render profiles, see render_profiles.resolve_settings.
+        rules (list): Rule table, see render_profiles.resolve_settings.
+
+    Returns:
+        dict: Per part id {"seconds", "n_images", "n_triangles", "n_objects", "material_class", "samples",
+            "max_bounces", "bounds", "has_geometry"}
+    """
+    n_images = job_planner.get_part_images(rcfg)
+    estimates = {}
+    for part in rcfg["parts"]:
+        part_id = part["id"]
+        material_class = get_material_class(part, rules)
+        if settings["adaptive_settings"]:
+            _, cycles_settings = render_profiles.resolve_settings(part, settings["samples"], profiles, rules)
+        else:
+            cycles_settings = dict(render_profiles.DEFAULT_SETTINGS, samples=settings["samples"])
+        stats = mesh_stats.get(part_id, {})
+        features = get_features(
+            n_images[part_id],
+            stats.get("n_triangles", 0),
+            settings["res_x"],
+            settings["res_y"],
+            cycles_settings["samples"],
+            cycles_settings["max_bounces"],
+            material_class,
+        )
+        estimates[part_id] = {
+            "seconds": predict(model, features),
+            "n_images": n_images[part_id],
+            "n_triangles": stats.get("n_triangles", 0),
+            "n_objects": stats.get("n_objects", 0),
+            "material_class": material_class,
+            "samples": cycles_settings["samples"],
+            "max_bounces": cycles_settings["max_bounces"],
+            "bounds": stats.get("bounds"),
+            "has_geometry": bool(stats),
+        }
+    return estimates
+
+
+def write_estimates(out_file: str, estimates: dict, settings: dict, model: dict) -> None:
+    """Writes the estimates as cost file (see module docstring)."""
+    cost_file = {
+        "total_seconds": sum(estimate["seconds"] for estimate in estimates.values()),
+        "settings": settings,
+        "model": model,
+        "parts": estimates,
+    }
+    with open(out_file, "w") as f:
+        json.dump(cost_file, f, indent=4)
+
+
+def format_estimates(estimates: dict, n_heaviest: int = 10) -> list[str]:
+    """Returns the lines of the per-part table, the total time and the heaviest parts, outliers marked with *."""
+    lines = [f"{'part':32s}{'images':>8s}{'Mtris':>9s}{'class':>14s}{'samples':>9s}{'est. s':>11s}"]
+    for part_id, estimate in sorted(estimates.items()):
+        lines.append(
+            f"{part_id:32s}{estimate['n_images']:>8d}{estimate['n_triangles'] / 1e6:>9.3f}"
+            f"{estimate['material_class']:>14s}{estimate['samples']:>9d}{estimate['seconds']:>11.1f}"
+        )
+    seconds = sorted((estimate["seconds"] for estimate in estimates.values()), reverse=True)
+    total = sum(seconds)
+    median = float(np.median(seconds)) if seconds else 0.0
+    lines.append(f"Total: {len(estimates)} parts, {total:.0f}s ({total / 3600:.2f}h) on one render worker")
+    n_missing = sum(1 for estimate in estimates.values() if not estimate["has_geometry"])
+    if n_missing:
+        lines.append(f"{n_missing} parts have no GLB or OBJ file, their triangles are not counted")
+    lines.append(f"Heaviest parts (* more than {OUTLIER_FACTOR:g}x the median of {median:.1f}s):")
+    heaviest = sorted(estimates, key=lambda part_id: -estimates[part_id]["seconds"])[:n_heaviest]
+    for part_id in heaviest:
+        part_seconds = estimates[part_id]["seconds"]
+        marker = "*" if median > 0 and part_seconds > OUTLIER_FACTOR * median else " "
+        share = part_seconds / total if total > 0 else 0.0
+        lines.append(f"{marker} {part_id:32s}{part_seconds:>11.1f}s{share:>8.1%}")
+    return lines
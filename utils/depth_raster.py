@@ -0,0 +1,131 @@
+"""Z-buffer rasterizer for depth maps of triangle meshes.
+
+Only depends on numpy (available in Blender's python), so it can be used from the render script.
+
+The depth of each pixel is the view-axis depth of the nearest triangle at the pixel center, i.e. the same value
+as casting a ray through the pixel center and converting the hit distance to depth like Cycles' Z pass.
+All triangles are processed in batches: each triangle is tested against the pixel centers of its screen space
+bounding box only, so the work grows with the number of triangles plus their covered pixels, not with
+pixels times triangles. Perspective depth is interpolated as 1 / depth, which is exact for planar triangles.
+
+Coordinates are in camera space: the camera looks along -Z, +X is right and +Y is up.
+"""
+import numpy as np
+
+from utils import depth_stack
+
+# Maximum number of (triangle, pixel) candidates evaluated at once, bounds the temporary memory
+MAX_BATCH_CANDIDATES = 1 << 22
+
+
+def clip_near(triangles: "np.ndarray", clip_start: float) -> "np.ndarray":
+    """Clips triangles of shape (n, 3, 3) at the plane of depth clip_start.
+
+    Returns:
+        np.ndarray: Triangles in front of the plane. Triangles with one vertex behind it become two triangles.
+    """
+    behind = -triangles[..., 2] < clip_start
+    n_behind = behind.sum(axis=1)
+    clipped = [triangles[n_behind == 0]]
+    for n, odd_value in [(1, True), (2, False)]:
+        tris = triangles[n_behind == n]
+        if not len(tris):
+            continue
+        # Rotate the vertices (keeping the winding) so that the vertex on its own side of the plane comes first
+        first = np.argmax(behind[n_behind == n] == odd_value, axis=1)
+        tris = tris[np.arange(len(tris))[:, None], (first[:, None] + np.arange(3)) % 3]
+        a, b, c = tris[:, 0], tris[:, 1], tris[:, 2]
+        a_depth = -a[:, 2:]
+        ab = a + (b - a) * (clip_start - a_depth) / (-b[:, 2:] - a_depth)
+        ac = a + (c - a) * (clip_start - a_depth) / (-c[:, 2:] - a_depth)
+        if n == 1:
+            clipped += [np.stack([ab, b, c], axis=1), np.stack([ab, c, ac], axis=1)]
+        else:
+            clipped.append(np.stack([a, ab, ac], axis=1))
+    return np.concatenate(clipped)
+
+
+def rasterize_depth(
+    vertices: "np.ndarray",
+    faces: "np.ndarray",
+    frame: tuple,
+    resolution: tuple,
+    ortho: bool = False,
+    clip_start: float = 1e-6,
+    clip_end: float = np.inf,
+) -> "np.ndarray":
+    """Returns the depth map of the triangles as seen by the camera.
+
+    Args:
+        vertices (np.ndarray): Vertex positions in camera space of shape (n_vertices, 3).
+        faces (np.ndarray): Vertex indices of the triangles of shape (n_triangles, 3).
+        frame (tuple): left, right, top, bottom and depth of the camera frame in camera space, as given by the
+            corners of Blender's Camera.view_frame. The depth is ignored by orthographic cameras.
+        resolution (tuple): Image width and height in pixels.
+        ortho (bool): Orthographic instead of perspective projection.
+        clip_start (float): Geometry nearer than this view-axis depth is clipped.
+        clip_end (float): Hits farther than this distance along the pixel's ray are ignored.
+
+    Returns:
+        np.ndarray: float32 depth map of shape (height, width), top row first, with
+            depth_stack.BLENDER_BACKGROUND_DEPTH for pixels without geometry.
+    """
+    left, right, top, bottom, frame_depth = frame
+    res_x, res_y = resolution
+    z_buffer = np.full(res_x * res_y, np.inf)
+    if len(faces):
+        triangles = clip_near(np.asarray(vertices, dtype=np.float64)[np.asarray(faces)], clip_start)
+        depth = -triangles[..., 2]
+        scale = 1.0 if ortho else frame_depth / depth
+        # Screen position in pixels, pixel centers at (i + 0.5, j + 0.5) with j = 0 the top row
+        px = (triangles[..., 0] * scale - left) / (right - left) * res_x
+        py = (top - triangles[..., 1] * scale) / (top - bottom) * res_y
+        # Screen space linear quantity: depth for orthographic, 1 / depth for perspective projection
+        values = depth if ortho else 1.0 / depth
+        area = (px[:, 1] - px[:, 0]) * (py[:, 2] - py[:, 0]) - (px[:, 2] - px[:, 0]) * (py[:, 1] - py[:, 0])
+        i_min = np.maximum(np.ceil(px.min(axis=1) - 0.5), 0)
+        i_max = np.minimum(np.floor(px.max(axis=1) - 0.5), res_x - 1)
+        j_min = np.maximum(np.ceil(py.min(axis=1) - 0.5), 0)
+        j_max = np.minimum(np.floor(py.max(axis=1) - 0.5), res_y - 1)
+        visible = (area != 0) & (i_max >= i_min) & (j_max >= j_min)
+        widths = (i_max - i_min + 1).astype(np.int64)
+        n_candidates = np.where(visible, widths * (j_max - j_min + 1).astype(np.int64), 0)
+
+        ends = np.cumsum(n_candidates)
+        start_tri = 0
+        while start_tri < len(n_candidates):
+            first_candidate = ends[start_tri] - n_candidates[start_tri]
+            end_tri = int(np.searchsorted(ends, first_candidate + MAX_BATCH_CANDIDATES, side="right"))
+            end_tri = max(end_tri, start_tri + 1)
+            batch = np.arange(start_tri, end_tri)
+            start_tri = end_tri
+            counts = n_candidates[batch]
+            if not counts.sum():
+                continue
+            tri = np.repeat(batch, counts)
+            offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            cx = i_min[tri] + offset % widths[tri] + 0.5
+            cy = j_min[tri] + offset // widths[tri] + 0.5
+            # Barycentric coordinates from edge functions. Shared edges give exactly negated values on both
+            # triangles, so including the edges (>= 0) leaves no holes between triangles.
+            x, y = px[tri], py[tri]
+            w0 = ((x[:, 1] - cx) * (y[:, 2] - cy) - (x[:, 2] - cx) * (y[:, 1] - cy)) / area[tri]
+            w1 = ((x[:, 2] - cx) * (y[:, 0] - cy) - (x[:, 0] - cx) * (y[:, 2] - cy)) / area[tri]
+            w2 = ((x[:, 0] - cx) * (y[:, 1] - cy) - (x[:, 1] - cx) * (y[:, 0] - cy)) / area[tri]
+            inside = (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+            v = values[tri[inside]]
+            interpolated = w0[inside] * v[:, 0] + w1[inside] * v[:, 1] + w2[inside] * v[:, 2]
+            pixel = (cy[inside] - 0.5).astype(np.int64) * res_x + (cx[inside] - 0.5).astype(np.int64)
+            np.minimum.at(z_buffer, pixel, interpolated if ortho else 1.0 / interpolated)
+
+    z_buffer = z_buffer.reshape(res_y, res_x)
+    if np.isfinite(clip_end):
+        # Distance along the ray through the pixel center is depth / cos(angle to the view axis)
+        x = left + (np.arange(res_x) + 0.5) / res_x * (right - left)
+        y = top - (np.arange(res_y) + 0.5) / res_y * (top - bottom)
+        ray_lengths = 1.0 if ortho else np.sqrt(x[None, :] ** 2 + y[:, None] ** 2 + frame_depth**2) / frame_depth
+        z_buffer[z_buffer * ray_lengths > clip_end] = np.inf
+    depth_map = np.full(z_buffer.shape, depth_stack.BLENDER_BACKGROUND_DEPTH, dtype=np.float32)
+    hit = np.isfinite(z_buffer)
+    depth_map[hit] = z_buffer[hit]
+    return depth_map
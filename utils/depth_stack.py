@@ -0,0 +1,87 @@
+"""Stacks all depth maps of a part into a single .npz or memory-mappable .npy file.
+
+Only depends on numpy (available in Blender's python), so it can be used from the render script.
+
+Formats:
+    npz: Compressed archive {part_id}_depth.npz with the arrays depth (n_images, height, width)
+         and header (JSON string).
+    npy: Uncompressed {part_id}_depth.npy that can be memory-mapped (np.load(..., mmap_mode="r")),
+         with the header in {part_id}_depth.json.
+
+The header describes the stack: part_id, image_indices (render setup index of each depth map),
+dtype, shape and the background value written by the renderer for pixels without geometry.
+"""
+import json
+import os
+import numpy as np
+
+DEPTH_STACK_FORMATS = ["none", "npz", "npy"]
+# Z-pass value Blender writes for pixels that do not hit any geometry
+BLENDER_BACKGROUND_DEPTH = 1e10
+
+
+def get_depth_stack_header(part_id: str, image_indices: list[int], depth_stack: "np.ndarray") -> dict:
+    """Returns the header of a depth stack."""
+    return {
+        "part_id": part_id,
+        "image_indices": list(image_indices),
+        "dtype": str(depth_stack.dtype),
+        "shape": list(depth_stack.shape),
+        "background_depth": BLENDER_BACKGROUND_DEPTH,
+    }
+
+
+def write_depth_stack(
+    out_dir: str,
+    part_id: str,
+    depth_maps: list["np.ndarray"],
+    image_indices: list[int],
+    stack_format: str = "npy",
+    dtype: str = "float32",
+) -> list[str]:
+    """Writes the depth maps of a part as a single stack.
+
+    Args:
+        out_dir (str): Output directory.
+        part_id (str): Id of the part, used as filename prefix.
+        depth_maps (list<np.ndarray>): Depth maps of shape (height, width).
+        image_indices (list<int>): Index of the render setup of each depth map.
+        stack_format (str): npz (compressed) or npy (memory-mappable with a JSON header file).
+        dtype (str): float16 or float32. Background depth exceeds the float16 range and is stored as inf.
+
+    Returns:
+        list<str>: Paths of the written files.
+    """
+    assert stack_format in DEPTH_STACK_FORMATS[1:], f"Unknown depth stack format {stack_format}"
+    assert len(depth_maps) == len(image_indices)
+    os.makedirs(out_dir, exist_ok=True)
+    with np.errstate(over="ignore"):
+        depth_stack = np.stack(depth_maps).astype(dtype)
+    header = get_depth_stack_header(part_id, image_indices, depth_stack)
+
+    if stack_format == "npz":
+        out_path = f"{out_dir}/{part_id}_depth.npz"
+        np.savez_compressed(out_path, depth=depth_stack, header=np.array(json.dumps(header)))
+        return [out_path]
+
+    out_path = f"{out_dir}/{part_id}_depth.npy"
+    header_path = f"{out_dir}/{part_id}_depth.json"
+    np.save(out_path, depth_stack)
+    with open(header_path, "w") as f:
+        json.dump(header, f)
+    return [out_path, header_path]
+
+
+def load_depth_stack(file_path: str, mmap: bool = True) -> tuple["np.ndarray", dict]:
+    """Returns the depth stack of shape (n_images, height, width) and its header.
+
+    Args:
+        file_path (str): Path to a .npz or .npy depth stack.
+        mmap (bool): Whether to memory-map .npy stacks instead of reading them into memory.
+    """
+    if file_path.endswith(".npz"):
+        with np.load(file_path) as data:
+            return data["depth"], json.loads(str(data["header"]))
+    with open(f"{file_path[:-4]}.json", "r") as f:
+        header = json.load(f)
+    return np.load(file_path, mmap_mode="r" if mmap else None), header
@@ -0,0 +1,108 @@
+"""Checks of the envmaps referenced by an RCFG and naming of their resolution-matched cache copies.
+
+Only uses the standard library, so it can be imported from Blender scripts (see bpy_modules/prepare_envmaps.py).
+
+Renders at low resolution never see the full resolution of an envmap, but decoding and sampling it costs time
+and memory for every render setup. An equirectangular envmap of width w covers 360 degrees, so a camera with
+horizontal field of view fov that renders res_x pixels needs at most w = res_x * 360 / fov for one envmap pixel
+per image pixel (same for the vertical axis, envmaps have an aspect ratio of 2:1). The cache stores a copy of
+each envmap at that size (never larger than the source), in a normalized format: OpenEXR (half float) for HDR
+sources, PNG for 8 bit sources.
+
+Cache files are named {stem}-{content hash}-{width}x{height}.{exr|png}, so changed sources or render
+resolutions never hit an old copy and several runs can share one cache directory.
+"""
+import math
+import os
+
+from utils import file_utils
+
+# Placeholder of render setups without envmap (see preprocessing/define_scenes.py)
+NO_ENVMAP = "none"
+HDR_EXTENSIONS = [".hdr", ".exr"]
+# Blender's default sensor width in mm, applied to the larger image dimension (sensor fit AUTO)
+SENSOR_WIDTH = 36.0
+DEFAULT_FOCAL_LENGTH = 50.0
+
+
+class MissingEnvmapError(FileNotFoundError):
+    """Envmaps referenced by the RCFG that do not exist in the envmap directory."""
+
+
+def get_referenced_envmaps(rcfg: dict) -> list[str]:
+    """Returns the distinct envmap_fname of all render setups that are rendered (valid view check)."""
+    envmaps = set()
+    for part in rcfg["parts"]:
+        for render_setup in part["scene"]["render_setups"]:
+            if render_setup.get("view_check", {}).get("valid", True):
+                envmaps.add(render_setup["envmap_fname"])
+    return sorted(envmaps)
+
+
+def check_envmaps(envmap_fnames: list[str], envmap_dir: str) -> None:
+    """Raises MissingEnvmapError with all envmaps that are not files in envmap_dir, including "none"
+    placeholders of RCFGs created with envmap_def_mode disabled."""
+    missing = [
+        fname
+        for fname in envmap_fnames
+        if fname == NO_ENVMAP or not os.path.isfile(os.path.join(envmap_dir, fname))
+    ]
+    if missing:
+        raise MissingEnvmapError(
+            f"{len(missing)} envmaps referenced by the RCFG are missing in {envmap_dir}: {', '.join(missing)}"
+        )
+
+
+def get_min_fov(rcfg: dict, res_x: int, res_y: int) -> tuple[float, float]:
+    """Returns the smallest horizontal and vertical field of view (radians) of all cameras in the RCFG."""
+    max_focal_length = max(
+        (
+            camera.get("focal_length", DEFAULT_FOCAL_LENGTH)
+            for part in rcfg["parts"]
+            for camera in part["scene"]["cameras"]
+        ),
+        default=DEFAULT_FOCAL_LENGTH,
+    )
+    # The sensor width applies to the larger image dimension
+    fov = 2 * math.atan(SENSOR_WIDTH / (2 * max_focal_length))
+    if res_x >= res_y:
+        return fov, 2 * math.atan(math.tan(fov / 2) * res_y / res_x)
+    return 2 * math.atan(math.tan(fov / 2) * res_x / res_y), fov
+
+
+def get_target_size(res_x: int, res_y: int, fov_x: float, fov_y: float) -> tuple[int, int]:
+    """Returns the (width, height) of an equirectangular envmap with one envmap pixel per image pixel."""
+    width = max(res_x * 2 * math.pi / fov_x, 2 * res_y * math.pi / fov_y)
+    width = 2 * math.ceil(width / 2)
+    return width, width // 2
+
+
+def is_hdr(file_path: str) -> bool:
+    """Returns whether the envmap is a float (HDR) image by its extension."""
+    return os.path.splitext(file_path)[1].lower() in HDR_EXTENSIONS
+
+
+def get_cache_file(cache_dir: str, envmap_file: str, width: int, height: int) -> str:
+    """Returns the path of the cached copy of envmap_file at the given target size."""
+    stem = os.path.splitext(os.path.basename(envmap_file))[0]
+    extension = "exr" if is_hdr(envmap_file) else "png"
+    file_hash = file_utils.get_file_hash(envmap_file)
+    return os.path.join(cache_dir, f"{stem}-{file_hash[:16]}-{width}x{height}.{extension}")
+
+
+def get_cache_files(rcfg: dict, envmap_dir: str, cache_dir: str, res_x: int, res_y: int) -> tuple:
+    """Checks the envmaps referenced by the RCFG and returns the source and cache file of each of them.
+
+    A cache file that exists can be reused, its name changes with the source content and the target size.
+
+    Returns:
+        tuple[int, int], dict: Target size (width, height) and (envmap_file, cache_file) of each envmap_fname.
+    """
+    envmap_fnames = get_referenced_envmaps(rcfg)
+    check_envmaps(envmap_fnames, envmap_dir)
+    width, height = get_target_size(res_x, res_y, *get_min_fov(rcfg, res_x, res_y))
+    cache_files = {}
+    for envmap_fname in envmap_fnames:
+        envmap_file = os.path.join(envmap_dir, envmap_fname)
+        cache_files[envmap_fname] = (envmap_file, get_cache_file(cache_dir, envmap_file, width, height))
+    return (width, height), cache_files
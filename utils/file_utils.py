@@ -0,0 +1,16 @@
+"""File helpers shared by the pipeline stages.
+
+Only uses the standard library, so it can be imported from Blender scripts.
+"""
+import hashlib
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def get_file_hash(file_path: str) -> str:
+    """Returns the sha256 hex digest of a file's content."""
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
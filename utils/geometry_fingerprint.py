@@ -0,0 +1,152 @@
+"""Geometry fingerprints to detect duplicate parts before rendering, and alias handling for their outputs.
+
+Only depends on numpy and the standard library, so it can be used from the Blender scripts.
+
+A fingerprint is invariant to object naming, translation, vertex order and face order. Vertices are quantized
+to a grid of the given tolerance, so coordinates that differ by much less than the tolerance yield the same
+fingerprint (values close to a grid boundary may still differ).
+
+Alias manifest (aliases.json, written to the GLTF output directory):
+    {"tolerance": float, "fingerprints": {part_id: fingerprint}, "aliases": {alias_id: canonical_id},
+     "alias_renders": ALIAS_RENDERS_NOTE}
+
+Aliased parts are not rendered, their images are links to the images of the canonical part (link_alias_renders).
+These images show the canonical part's render setups (cameras, lights, envmaps) and materials, not the scene and
+materials of the alias's own RCFG entry. Readers look up the setups of an alias's images under its canonical id.
+"""
+import hashlib
+import json
+import os
+import numpy as np
+
+ALIASES_FILENAME = "aliases.json"
+ALIAS_RENDERS_NOTE = (
+    "Images of an alias are those of its canonical part, rendered with the render setups and materials of the "
+    "canonical part's RCFG entry. The scene and materials of the alias's own RCFG entry are not rendered."
+)
+# Output directories of render.py that contain one subdirectory of images per part
+RENDER_OUTPUT_KINDS = ["rgb", "depth_png", "depth_exr", "mask"]
+
+
+def get_geometry_fingerprint(vertices: "np.ndarray", faces: "np.ndarray", tolerance: float = 1e-4) -> str:
+    """Returns a fingerprint of a triangle mesh.
+
+    Args:
+        vertices (np.ndarray): World space vertices of shape (n_vertices, 3) of all objects of a part.
+        faces (np.ndarray): Triangle vertex indices of shape (n_faces, 3).
+        tolerance (float): Quantization step in scene units.
+
+    Returns:
+        str: Hex digest of the sorted, centered and quantized geometry.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+    if len(vertices) == 0:
+        return hashlib.sha1(b"empty").hexdigest()
+
+    # Translation: center at the bounding box center
+    center = (vertices.min(axis=0) + vertices.max(axis=0)) / 2
+    quantized = np.round((vertices - center) / tolerance).astype(np.int64)
+
+    # Vertex order: replace each vertex by the rank of its (deduplicated) quantized position
+    unique_vertices, vertex_ranks = np.unique(quantized, axis=0, return_inverse=True)
+    vertex_ranks = vertex_ranks.reshape(-1)
+    # Face order: sort the vertices of each face, then the faces; drop faces that collapsed by quantization
+    ranked_faces = np.sort(vertex_ranks[faces], axis=1)
+    ranked_faces = ranked_faces[(ranked_faces[:, 0] != ranked_faces[:, 1]) & (ranked_faces[:, 1] != ranked_faces[:, 2])]
+    ranked_faces = np.unique(ranked_faces, axis=0)
+
+    digest = hashlib.sha1()
+    digest.update(np.array(unique_vertices.shape + ranked_faces.shape, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(unique_vertices).tobytes())
+    digest.update(np.ascontiguousarray(ranked_faces).tobytes())
+    return digest.hexdigest()
+
+
+class FingerprintRegistry:
+    """Keeps track of seen fingerprints and aliases duplicate parts to the first part with the same geometry.
+
+    Args:
+        tolerance (float): Quantization step used for fingerprints (stored in the manifest).
+    """
+
+    def __init__(self, tolerance: float = 1e-4):
+        self.tolerance = tolerance
+        self.fingerprints = {}
+        self.aliases = {}
+        self._canonical_ids = {}
+
+    def register(self, part_id: str, fingerprint: str) -> str:
+        """Registers the fingerprint of a part.
+
+        Returns:
+            str: Id of the canonical part with the same geometry or None if the geometry is new.
+        """
+        self.fingerprints[part_id] = fingerprint
+        canonical_id = self._canonical_ids.setdefault(fingerprint, part_id)
+        if canonical_id == part_id:
+            return None
+        self.aliases[part_id] = canonical_id
+        return canonical_id
+
+    def write(self, out_dir: str) -> str:
+        """Writes the alias manifest to out_dir and returns its path."""
+        manifest_path = os.path.join(out_dir, ALIASES_FILENAME)
+        with open(manifest_path, "w") as f:
+            json.dump(
+                {
+                    "tolerance": self.tolerance,
+                    "fingerprints": self.fingerprints,
+                    "aliases": self.aliases,
+                    "alias_renders": ALIAS_RENDERS_NOTE,
+                },
+                f,
+                indent=4,
+            )
+        return manifest_path
+
+
+def load_aliases(gltf_dir: str) -> dict:
+    """Returns alias_id -> canonical_id from the alias manifest in gltf_dir, or an empty dict if there is none."""
+    manifest_path = os.path.join(gltf_dir, ALIASES_FILENAME)
+    if not os.path.isfile(manifest_path):
+        return {}
+    with open(manifest_path, "r") as f:
+        return json.load(f)["aliases"]
+
+
+def link_alias_renders(render_dir: str, alias_id: str, canonical_id: str) -> int:
+    """Links the rendered images of the canonical part to the alias part with relative symlinks.
+
+    Files are named like the alias would have been rendered ({alias_id}_{i:03d}...).
+
+    Args:
+        render_dir (str): Render output directory containing {rgb,depth_png,depth_exr,mask}/{part_id}/ and depth_stack/.
+        alias_id (str): Id of the duplicate part that was not rendered.
+        canonical_id (str): Id of the rendered part with the same geometry.
+
+    Returns:
+        int: Number of linked files.
+    """
+    n_linked = 0
+    for kind in RENDER_OUTPUT_KINDS:
+        canonical_dir = os.path.join(render_dir, kind, canonical_id)
+        if not os.path.isdir(canonical_dir):
+            continue
+        alias_dir = os.path.join(render_dir, kind, alias_id)
+        os.makedirs(alias_dir, exist_ok=True)
+        for fn in os.listdir(canonical_dir):
+            alias_path = os.path.join(alias_dir, alias_id + fn[len(canonical_id) :])
+            if not os.path.lexists(alias_path):
+                os.symlink(os.path.join("..", canonical_id, fn), alias_path)
+                n_linked += 1
+
+    stack_dir = os.path.join(render_dir, "depth_stack")
+    if os.path.isdir(stack_dir):
+        for fn in os.listdir(stack_dir):
+            if fn.startswith(f"{canonical_id}_depth."):
+                alias_path = os.path.join(stack_dir, alias_id + fn[len(canonical_id) :])
+                if not os.path.lexists(alias_path):
+                    os.symlink(fn, alias_path)
+                    n_linked += 1
+    return n_linked
@@ -0,0 +1,184 @@
+"""Perceptual image hashes (pHash) and near-duplicate lookup via banded hash buckets.
+
+Images are read with Pillow (requirements.txt). Environments without it, e.g. the Python of Blender, fall back to a
+numpy PNG decoder (8/16 bit, non-interlaced), which covers the PNG files written by the render script.
+"""
+import struct
+import zlib
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+HASH_SIZE = 8
+DCT_SIZE = 32
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}  # color type -> channels (palette images are not supported)
+
+
+def _unfilter_png(raw: bytes, height: int, width: int, bpp: int) -> "np.ndarray":
+    """Reverses the PNG filters of all scanlines and returns the bytes as array of shape (height, width * bpp).
+
+    Each byte depends on the reconstructed bytes to its left, above and above left, so the pixels of one
+    anti-diagonal (x + y = const) are independent and reconstructed together, whatever the filters of their rows.
+    """
+    data = np.frombuffer(raw, np.uint8)[: height * (width * bpp + 1)].reshape(height, width * bpp + 1)
+    filter_types = data[:, 0]
+    filtered = data[:, 1:].reshape(height, width, bpp).astype(np.int16)
+    # Reconstructed pixels with a row and column of zeros before the first row and column
+    pixels = np.zeros((height + 1, width + 1, bpp), dtype=np.int16)
+    for diagonal in range(height + width - 1):
+        ys = np.arange(max(0, diagonal - width + 1), min(height, diagonal + 1))
+        xs = diagonal - ys
+        left, up, up_left = pixels[ys + 1, xs], pixels[ys, xs + 1], pixels[ys, xs]
+        p = left + up - up_left
+        pa, pb, pc = np.abs(p - left), np.abs(p - up), np.abs(p - up_left)
+        paeth = np.where((pa <= pb) & (pa <= pc), left, np.where(pb <= pc, up, up_left))
+        filter_type = filter_types[ys][:, None]
+        # None, Sub, Up, Average, Paeth
+        predictor = np.select(
+            [filter_type == 1, filter_type == 2, filter_type == 3, filter_type == 4],
+            [left, up, (left + up) >> 1, paeth],
+            0,
+        )
+        pixels[ys + 1, xs + 1] = (filtered[ys, xs] + predictor) & 0xFF
+    return pixels[1:, 1:].astype(np.uint8).reshape(height, width * bpp)
+
+
+def read_png(file_path: str) -> "np.ndarray":
+    """Returns the pixels of a PNG file as array of shape (height, width, channels) with values in [0, 1]."""
+    with open(file_path, "rb") as f:
+        data = f.read()
+    assert data[:8] == PNG_SIGNATURE, f"{file_path} is not a PNG file"
+
+    offset, idat = 8, []
+    while offset < len(data):
+        length, chunk_type = struct.unpack_from(">I4s", data, offset)
+        chunk = data[offset + 8 : offset + 8 + length]
+        if chunk_type == b"IHDR":
+            width, height, bit_depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", chunk)
+        elif chunk_type == b"IDAT":
+            idat.append(chunk)
+        elif chunk_type == b"IEND":
+            break
+        offset += 12 + length
+    assert color_type in PNG_CHANNELS and bit_depth in (8, 16), f"Unsupported PNG format in {file_path}"
+    assert interlace == 0, f"Interlaced PNG files are not supported: {file_path}"
+
+    channels = PNG_CHANNELS[color_type]
+    bpp = channels * bit_depth // 8
+    pixels = _unfilter_png(zlib.decompress(b"".join(idat)), height, width, bpp)
+
+    dtype = np.uint8 if bit_depth == 8 else np.dtype(">u2")
+    return np.frombuffer(pixels.tobytes(), dtype=dtype).reshape(height, width, channels) / float(2**bit_depth - 1)
+
+
+def read_image_gray(file_path: str) -> "np.ndarray":
+    """Returns an image as grayscale array of shape (height, width) in [0, 1].
+
+    Transparent pixels are composited onto black, so the background of renders does not affect the hash.
+    """
+    if Image is not None:
+        with Image.open(file_path) as image:
+            image = image.convert("LA")
+            pixels = np.asarray(image, dtype=np.float64) / 255.0
+    else:
+        assert file_path.lower().endswith(".png"), f"PIL is required to read {file_path}"
+        pixels = read_png(file_path)
+    channels = pixels.shape[2]
+    if channels >= 3:
+        gray = pixels[..., :3] @ np.array([0.299, 0.587, 0.114])
+    else:
+        gray = pixels[..., 0]
+    if channels in (2, 4):
+        gray = gray * pixels[..., -1]
+    return gray
+
+
+def resize_area(image: "np.ndarray", size: int) -> "np.ndarray":
+    """Downscales a 2D image to (size, size) by averaging the pixels of each target cell."""
+    rows = np.linspace(0, image.shape[0], size + 1).astype(int)[:-1]
+    cols = np.linspace(0, image.shape[1], size + 1).astype(int)[:-1]
+    sums = np.add.reduceat(np.add.reduceat(image, rows, axis=0), cols, axis=1)
+    counts = np.outer(np.diff(np.append(rows, image.shape[0])), np.diff(np.append(cols, image.shape[1])))
+    return sums / counts
+
+
+def _dct_matrix(n: int) -> "np.ndarray":
+    """Returns the orthonormal DCT-II matrix of size n."""
+    k = np.arange(n)[:, None]
+    matrix = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+DCT_MATRIX = _dct_matrix(DCT_SIZE)
+
+
+def phash(image: "np.ndarray") -> int:
+    """Returns the 64 bit perceptual hash of a grayscale image.
+
+    The image is downscaled to 32x32 and transformed with a 2D DCT. Each bit tells whether one of the
+    8x8 lowest frequency coefficients is above their median (DC excluded from the median).
+    """
+    coefficients = DCT_MATRIX @ resize_area(image, DCT_SIZE) @ DCT_MATRIX.T
+    low = coefficients[:HASH_SIZE, :HASH_SIZE].ravel()
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def phash_file(file_path: str) -> int:
+    """Returns the perceptual hash of an image file (see phash)."""
+    return phash(read_image_gray(file_path))
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """Returns the number of differing bits of two hashes."""
+    return bin(hash_a ^ hash_b).count("1")
+
+
+def get_bands(hash_value: int, n_bands: int = 4) -> list[int]:
+    """Splits a 64 bit hash into n_bands equally sized bands (most significant first)."""
+    band_bits = 64 // n_bands
+    mask = (1 << band_bits) - 1
+    return [(hash_value >> (band_bits * (n_bands - 1 - i))) & mask for i in range(n_bands)]
+
+
+def find_near_duplicates(
+    hashes: list[int],
+    max_distance: int = 3,
+    max_bucket_size: int = 1000,
+) -> tuple[list[tuple[int, int]], int]:
+    """Returns all pairs of indices (i < j) of hashes with a Hamming distance of at most max_distance.
+
+    Hashes are split into max_distance + 1 bands. Hashes within max_distance share at least one band
+    (pigeonhole principle), so only hashes in the same band bucket are compared instead of all pairs.
+
+    Args:
+        hashes (list<int>): 64 bit hashes.
+        max_distance (int): Maximum Hamming distance of near-duplicates.
+        max_bucket_size (int): Buckets with more hashes (e.g. empty renders) are skipped to stay sub-quadratic.
+
+    Returns:
+        list<tuple>, int: pairs of near-duplicate indices and the number of skipped buckets
+    """
+    n_bands = max_distance + 1
+    assert 64 % n_bands == 0, f"max_distance + 1 must divide 64, got {max_distance}"
+    buckets = {}
+    for i, hash_value in enumerate(hashes):
+        for band_i, band in enumerate(get_bands(hash_value, n_bands)):
+            buckets.setdefault((band_i, band), []).append(i)
+
+    pairs, n_skipped = set(), 0
+    for members in buckets.values():
+        if len(members) > max_bucket_size:
+            n_skipped += 1
+            continue
+        for a in range(len(members)):
+            for b in range(a + 1, len(members)):
+                i, j = members[a], members[b]
+                if hamming_distance(hashes[i], hashes[j]) <= max_distance:
+                    pairs.add((i, j) if i < j else (j, i))
+    return sorted(pairs), n_skipped
@@ -0,0 +1,236 @@
+"""Plans the split of a run into shards and builds the Kubernetes manifests of its jobs (see scripts/kube/plan_jobs.py).
+
+Only uses the standard library. Manifests are built as plain dicts, the CLI writes them as YAML.
+
+Parts are assigned to shards by the longest processing time first rule: parts sorted by descending cost, each
+assigned to the shard with the lowest total cost so far. The cost of a part is its estimated render seconds
+(cost file: {"parts": {part_id: {"seconds": ...}}}, written by scripts/utils/estimate_costs.py), its number of
+images or the size of its GLB.
+
+Each shard requests memory for its largest GLB: the base request plus a multiple of the GLB size, rounded up
+to a multiple of MEMORY_STEP_GI. Shards with the same request are run by one Indexed Job, whose pods map their
+JOB_COMPLETION_INDEX to a shard id and read the shard's part ids from a ConfigMap. A merge Job combines the
+outputs of all shards into the run directory after all render jobs completed (scripts/kube/merge_shards.py).
+"""
+import heapq
+import json
+import math
+
+PLAN_FILENAME = "plan.json"
+SHARDS_MOUNT = "/etc/synthnet-shards"
+# Decoded meshes, textures and BVH of a part take a multiple of its GLB size
+GLB_MEMORY_FACTOR = 40
+# Memory requests are rounded up to few classes, one job per class
+MEMORY_STEP_GI = 8
+# Kubernetes limits ConfigMaps to 1 MiB
+MAX_CONFIGMAP_BYTES = 1 << 20
+
+
+def get_shard_name(shard_id: int) -> str:
+    return f"shard-{shard_id:03d}"
+
+
+def get_part_images(rcfg: dict) -> dict:
+    """Returns the number of rendered images (valid render setups) of each part of the RCFG."""
+    return {
+        part["id"]: sum(
+            1
+            for render_setup in part["scene"]["render_setups"]
+            if render_setup.get("view_check", {}).get("valid", True)
+        )
+        for part in rcfg["parts"]
+    }
+
+
+def load_costs(cost_file: str) -> dict:
+    """Returns the estimated seconds of each part of a cost file ({"parts": {part_id: {"seconds": ...}}})."""
+    with open(cost_file, "r") as f:
+        return {part_id: estimate["seconds"] for part_id, estimate in json.load(f)["parts"].items()}
+
+
+def balance_parts(costs: dict, n_shards: int) -> list[list[str]]:
+    """Assigns parts to shards with the longest processing time first rule.
+
+    Args:
+        costs (dict): Cost of each part id.
+        n_shards (int): Number of shards. Fewer shards are returned if there are fewer parts.
+
+    Returns:
+        list[list[str]]: Part ids of each shard, in descending cost.
+    """
+    assert n_shards >= 1
+    n_shards = min(n_shards, len(costs))
+    shards = [[] for _ in range(n_shards)]
+    # (total cost, shard id), ties go to the lower shard id so plans are reproducible
+    heap = [(0.0, shard_id) for shard_id in range(n_shards)]
+    for part_id in sorted(costs, key=lambda part_id: (-costs[part_id], part_id)):
+        total, shard_id = heapq.heappop(heap)
+        shards[shard_id].append(part_id)
+        heapq.heappush(heap, (total + costs[part_id], shard_id))
+    return shards
+
+
+def get_memory_gi(max_glb_bytes: int, base_gi: int, glb_memory_factor: float = GLB_MEMORY_FACTOR) -> int:
+    """Returns the memory request of a shard in GiB: base plus the estimate for its largest GLB, rounded up to a
+    multiple of MEMORY_STEP_GI."""
+    memory_gi = base_gi + max_glb_bytes * glb_memory_factor / (1 << 30)
+    return max(1, math.ceil(memory_gi / MEMORY_STEP_GI)) * MEMORY_STEP_GI
+
+
+def get_plan(
+    name: str,
+    shards: list[list[str]],
+    costs: dict,
+    n_images: dict,
+    glb_bytes: dict,
+    base_memory_gi: int,
+) -> dict:
+    """Returns the plan of a run: per shard its parts, total cost, number of images and memory request."""
+    plan_shards = []
+    for shard_id, part_ids in enumerate(shards):
+        max_glb_bytes = max((glb_bytes.get(part_id, 0) for part_id in part_ids), default=0)
+        plan_shards.append(
+            {
+                "shard": get_shard_name(shard_id),
+                "part_ids": part_ids,
+                "cost": sum(costs[part_id] for part_id in part_ids),
+                "n_images": sum(n_images.get(part_id, 0) for part_id in part_ids),
+                "max_glb_bytes": max_glb_bytes,
+                "memory_gi": get_memory_gi(max_glb_bytes, base_memory_gi),
+            }
+        )
+    totals = [shard["cost"] for shard in plan_shards]
+    mean = sum(totals) / len(totals) if totals else 0.0
+    return {
+        "name": name,
+        "n_parts": sum(len(part_ids) for part_ids in shards),
+        "n_shards": len(plan_shards),
+        "total_cost": sum(totals),
+        # Makespan relative to a perfect split
+        "imbalance": max(totals) / mean if mean > 0 else 1.0,
+        "shards": plan_shards,
+    }
+
+
+def get_job_groups(plan: dict) -> dict:
+    """Returns the shard ids of each memory request (GiB), one Indexed Job per request."""
+    groups = {}
+    for shard_id, shard in enumerate(plan["shards"]):
+        groups.setdefault(shard["memory_gi"], []).append(shard_id)
+    return dict(sorted(groups.items()))
+
+
+def build_configmap(plan: dict) -> dict:
+    """Returns the ConfigMap with the part ids of each shard ({shard}.txt) and the plan."""
+    data = {
+        f"{shard['shard']}.txt": "".join(f"{part_id}\n" for part_id in shard["part_ids"]) for shard in plan["shards"]
+    }
+    data[PLAN_FILENAME] = json.dumps(plan, indent=4)
+    n_bytes = sum(len(value.encode()) for value in data.values())
+    assert n_bytes < MAX_CONFIGMAP_BYTES, f"ConfigMap of {n_bytes} bytes exceeds the Kubernetes limit"
+    return {
+        "apiVersion": "v1",
+        "kind": "ConfigMap",
+        "metadata": {"name": f"{plan['name']}-shards", "labels": {"app": "synthnet", "run": plan["name"]}},
+        "data": data,
+    }
+
+
+def build_pod_spec(plan: dict, container: dict, pod: dict) -> dict:
+    """Returns the pod spec of a job.
+
+    Args:
+        plan (dict): Plan of the run (see get_plan).
+        container (dict): Container spec (name, command, args, resources).
+        pod (dict): image, image_pull_secret, node_selector (dict or None) and volumes (list of
+            {name, claim, mount_path}) shared by all pods.
+    """
+    volume_mounts = [{"name": volume["name"], "mountPath": volume["mount_path"]} for volume in pod["volumes"]]
+    volume_mounts.append({"name": "shards", "mountPath": SHARDS_MOUNT, "readOnly": True})
+    volumes = [
+        {"name": volume["name"], "persistentVolumeClaim": {"claimName": volume["claim"]}} for volume in pod["volumes"]
+    ]
+    volumes.append({"name": "shards", "configMap": {"name": f"{plan['name']}-shards"}})
+    pod_spec = {
+        "restartPolicy": "Never",
+        "containers": [dict(container, image=pod["image"], volumeMounts=volume_mounts)],
+        "volumes": volumes,
+    }
+    if pod.get("image_pull_secret"):
+        pod_spec["imagePullSecrets"] = [{"name": pod["image_pull_secret"]}]
+    if pod.get("node_selector"):
+        pod_spec["nodeSelector"] = pod["node_selector"]
+    return pod_spec
+
+
+def build_render_job(plan: dict, memory_gi: int, shard_ids: list[int], script: str, pod: dict, options: dict) -> dict:
+    """Returns the Indexed Job that runs the given shards.
+
+    Args:
+        plan (dict): Plan of the run (see get_plan).
+        memory_gi (int): Memory request of the shards.
+        shard_ids (list[int]): Shards of the job, pod i runs shard_ids[i].
+        script (str): Bash commands of a shard. $SHARD is the shard name and $PART_IDS_FILE its part id file.
+        pod (dict): Pod settings (see build_pod_spec).
+        options (dict): cpu (request), gpus (limit), parallelism (max. pods at once) and backoff_limit.
+    """
+    shard_names = " ".join(get_shard_name(shard_id) for shard_id in shard_ids)
+    container = {
+        "name": "render",
+        "command": ["/bin/bash", "-c"],
+        "args": [
+            "set -e\n"
+            f"SHARDS=({shard_names})\n"
+            "SHARD=${SHARDS[$JOB_COMPLETION_INDEX]}\n"
+            f"PART_IDS_FILE={SHARDS_MOUNT}/$SHARD.txt\n"
+            f"{script}"
+        ],
+        "resources": {
+            "requests": {"memory": f"{memory_gi}Gi", "cpu": str(options["cpu"])},
+            "limits": {"nvidia.com/gpu": options["gpus"]} if options["gpus"] else {},
+        },
+    }
+    return {
+        "apiVersion": "batch/v1",
+        "kind": "Job",
+        "metadata": {
+            "name": f"{plan['name']}-render-{memory_gi}gi",
+            "labels": {"app": "synthnet", "run": plan["name"], "step": "render"},
+        },
+        "spec": {
+            "completionMode": "Indexed",
+            "completions": len(shard_ids),
+            "parallelism": min(len(shard_ids), options["parallelism"]),
+            "backoffLimit": options["backoff_limit"],
+            "template": {
+                "metadata": {"labels": {"app": "synthnet", "run": plan["name"], "step": "render"}},
+                "spec": build_pod_spec(plan, container, pod),
+            },
+        },
+    }
+
+
+def build_merge_job(plan: dict, script: str, pod: dict) -> dict:
+    """Returns the Job that merges the outputs of all shards, without GPU."""
+    container = {
+        "name": "merge",
+        "command": ["/bin/bash", "-c"],
+        "args": [f"set -e\n{script}"],
+        "resources": {"requests": {"memory": "2Gi", "cpu": "1"}},
+    }
+    pod = dict(pod, node_selector=None)
+    return {
+        "apiVersion": "batch/v1",
+        "kind": "Job",
+        "metadata": {
+            "name": f"{plan['name']}-merge",
+            "labels": {"app": "synthnet", "run": plan["name"], "step": "merge"},
+        },
+        "spec": {
+            "backoffLimit": 1,
+            "template": {
+                "metadata": {"labels": {"app": "synthnet", "run": plan["name"], "step": "merge"}},
+                "spec": build_pod_spec(plan, container, pod),
+            },
+        },
+    }
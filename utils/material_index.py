@@ -0,0 +1,62 @@
+"""Prefix index of the single part ids of an RCFG part, used to find the material of each Blender object.
+
+Only uses the standard library, so it can be imported from Blender scripts.
+
+Objects imported from a part's GLB are named after their single part id, with suffixes added by Blender or the
+exporter (e.g. "a1b2c3.001"). An object gets the material of the first single part, in RCFG order, whose id is
+a prefix of the object name and that has a material; single parts without material ("none") are skipped.
+Instead of comparing every object with every single part, the ids are stored in a trie, so a lookup only walks
+the characters of the object name.
+
+Usage:
+    index = MaterialIndex(rcfg_part["single_parts"])
+    material, matched = index.lookup(bpy_obj.name)
+"""
+
+NO_MATERIAL = ["none", None]
+# Key of the entries stored at the node where a single part id ends (characters are the other keys)
+_END = None
+
+
+class MaterialIndex:
+    """Trie of single part ids with the position and material of each single part.
+
+    Args:
+        single_parts (list[dict]): Single parts of an RCFG part, with id and material.
+    """
+
+    def __init__(self, single_parts: list[dict]):
+        self.root = {}
+        for order, single_part in enumerate(single_parts):
+            node = self.root
+            for char in single_part["id"]:
+                node = node.setdefault(char, {})
+            node.setdefault(_END, []).append((order, single_part["material"]))
+
+    def lookup(self, name: str) -> tuple:
+        """Returns the material of an object name and whether any single part id is a prefix of the name.
+
+        Returns:
+            str, bool: Material of the first matching single part with a material (None if there is none),
+                whether the name matched a single part at all.
+        """
+        best, matched = None, False
+        node = self.root
+        for char in name:
+            if _END in node:
+                best, matched = self._best(node[_END], best), True
+            node = node.get(char)
+            if node is None:
+                break
+        else:
+            if _END in node:
+                best, matched = self._best(node[_END], best), True
+        return (best[1] if best is not None else None), matched
+
+    @staticmethod
+    def _best(entries: list, best: tuple) -> tuple:
+        """Returns the entry with a material that comes first in the RCFG, out of entries and best."""
+        for entry in entries:
+            if entry[1] not in NO_MATERIAL and (best is None or entry[0] < best[0]):
+                best = entry
+        return best
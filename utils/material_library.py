@@ -0,0 +1,78 @@
+"""Manifest of a compiled material library (see bpy_modules/build_material_library.py).
+
+Only uses the standard library, so it can be imported from Blender scripts.
+
+The library directory contains one .blend with all materials and their textures (packed, downscaled to a maximum
+size) and a manifest that maps each material file of the materials directory to the material in the library:
+
+    {
+        "texture_size": 512,
+        "library": "materials.blend",
+        "materials": {
+            "synthnet_plastic_matte_yellow.blend": {
+                "hash": "<sha256 of the material .blend>",
+                "material": "<name of the material in the library>",
+                "textures": [{"image": "...", "source_size": [4096, 4096], "size": [512, 512]}]
+            }
+        }
+    }
+
+Material files are keyed by file name like the materials of the RCFG. On a rebuild, materials with an unchanged
+hash and texture size are kept in the library and only new or changed ones are compiled.
+"""
+import json
+import os
+
+from utils import file_utils
+
+MANIFEST_FILENAME = "material_library.json"
+LIBRARY_FILENAME = "materials.blend"
+# Texture size relative to the render resolution: a texture may be seen magnified on parts that fill the image
+TEXTURE_SIZE_FACTOR = 2
+
+
+def get_texture_size(res_x: int, res_y: int) -> int:
+    """Returns the maximum texture size for renders at the given resolution (next power of two)."""
+    size = max(res_x, res_y) * TEXTURE_SIZE_FACTOR
+    return 1 << (size - 1).bit_length()
+
+
+def get_manifest_file(library_dir: str) -> str:
+    return os.path.join(library_dir, MANIFEST_FILENAME)
+
+
+def load_manifest(library_dir: str) -> dict:
+    """Returns the manifest of the library, an empty manifest if there is none."""
+    manifest_file = get_manifest_file(library_dir)
+    if not os.path.isfile(manifest_file):
+        return {"texture_size": None, "library": LIBRARY_FILENAME, "materials": {}}
+    with open(manifest_file, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(library_dir: str, manifest: dict) -> None:
+    """Writes the manifest atomically."""
+    manifest_file = get_manifest_file(library_dir)
+    with open(f"{manifest_file}.tmp{os.getpid()}", "w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(f"{manifest_file}.tmp{os.getpid()}", manifest_file)
+
+
+def plan_build(manifest: dict, material_dir: str, material_fns: list[str], texture_size: int) -> dict:
+    """Returns which materials of the library are kept, built (new or changed) and removed.
+
+    Args:
+        manifest (dict): Manifest of the existing library (see load_manifest).
+        material_dir (str): Directory with one .blend file per material.
+        material_fns (list[str]): Material files to include in the library.
+        texture_size (int): Maximum texture size. A change rebuilds all materials.
+
+    Returns:
+        dict: keep, build and remove (lists of material files), hashes (content hash of each material file).
+    """
+    hashes = {fn: file_utils.get_file_hash(os.path.join(material_dir, fn)) for fn in material_fns}
+    entries = manifest["materials"] if manifest["texture_size"] == texture_size else {}
+    keep = [fn for fn in material_fns if fn in entries and entries[fn]["hash"] == hashes[fn]]
+    build = [fn for fn in material_fns if fn not in keep]
+    remove = [fn for fn in manifest["materials"] if fn not in keep]
+    return {"keep": keep, "build": build, "remove": remove, "hashes": hashes}
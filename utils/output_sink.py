@@ -0,0 +1,308 @@
+"""Node-local staging of outputs with a background uploader to the final destination.
+
+Only uses the standard library, so it can be imported from Blender scripts.
+
+The render loop writes into a staging directory on node-local disk or tmpfs instead of the (network) output
+directory. After each part, commit hands the part's finished files to an uploader thread, which copies them in
+batches to a storage backend, verifies their sha256 checksums, retries failed uploads and removes the staged
+copies. wait_for_space blocks the render loop while the staged, not yet uploaded bytes exceed max_staging_bytes.
+
+Backends implement put(local_path, rel_path, sha256) and get_sha256(rel_path):
+    local:      the output directory (e.g. a mounted PVC), files are written to a temporary name and renamed
+    objectdir:  local stand-in of an object store, flat keys with content-addressed metadata (etag = sha256),
+                to develop and test object storage uploads without a bucket
+
+Usage:
+    sink = OutputSink(out_dir, staging_root="/tmp/staging", backend="local", max_staging_bytes=8 << 30)
+    for part in parts:
+        sink.wait_for_space()
+        render_into(sink.staging_dir)
+        sink.commit()
+    sink.close()  # waits for all uploads, writes the upload manifest (MANIFEST_FILENAME or manifest_name)
+"""
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from utils import file_utils
+
+MANIFEST_FILENAME = "upload_manifest.jsonl"
+
+
+class ChecksumError(IOError):
+    """The uploaded copy of a file does not match the checksum of the staged file."""
+
+
+class StorageBackend:
+    """Destination of uploaded files, addressed by paths relative to the output root (with "/" separators)."""
+
+    name = None
+
+    def put(self, local_path: str, rel_path: str, sha256: str) -> None:
+        """Uploads a file. Must not leave a partial object at rel_path if it fails."""
+        raise NotImplementedError
+
+    def get_sha256(self, rel_path: str) -> str:
+        """Returns the checksum of the stored object, used to verify uploads."""
+        raise NotImplementedError
+
+
+class LocalDirBackend(StorageBackend):
+    """Copies files into a directory, e.g. a mounted network volume.
+
+    Args:
+        root (str): Output directory.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def put(self, local_path: str, rel_path: str, sha256: str) -> None:
+        dst_path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        tmp_path = f"{dst_path}.upload{os.getpid()}"
+        try:
+            shutil.copyfile(local_path, tmp_path)
+            os.replace(tmp_path, dst_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get_sha256(self, rel_path: str) -> str:
+        return file_utils.get_file_hash(os.path.join(self.root, rel_path))
+
+
+class ObjectDirBackend(StorageBackend):
+    """Local stand-in of an object store: objects are stored under their quoted key in {root}/objects/ with
+    a metadata document (etag, size) in {root}/meta/. There are no directories or renames, like in a bucket.
+
+    Args:
+        root (str): Directory of the stand-in bucket.
+        latency (float): Seconds added to every request, to emulate a remote store.
+    """
+
+    name = "objectdir"
+
+    def __init__(self, root: str, latency: float = 0.0):
+        self.root = root
+        self.latency = latency
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(root, "meta"), exist_ok=True)
+
+    def _paths(self, rel_path: str) -> tuple[str, str]:
+        key = urllib.parse.quote(rel_path, safe="")
+        return os.path.join(self.root, "objects", key), os.path.join(self.root, "meta", f"{key}.json")
+
+    def put(self, local_path: str, rel_path: str, sha256: str) -> None:
+        time.sleep(self.latency)
+        object_path, meta_path = self._paths(rel_path)
+        # Objects become visible atomically, like a completed upload
+        shutil.copyfile(local_path, f"{object_path}.part")
+        os.replace(f"{object_path}.part", object_path)
+        with open(f"{meta_path}.part", "w") as f:
+            json.dump({"key": rel_path, "etag": sha256, "size": os.path.getsize(object_path)}, f)
+        os.replace(f"{meta_path}.part", meta_path)
+
+    def get_sha256(self, rel_path: str) -> str:
+        time.sleep(self.latency)
+        object_path, _ = self._paths(rel_path)
+        return file_utils.get_file_hash(object_path)
+
+
+BACKENDS = {LocalDirBackend.name: LocalDirBackend, ObjectDirBackend.name: ObjectDirBackend}
+
+
+def create_backend(name: str, root: str, **kwargs) -> StorageBackend:
+    """Returns the storage backend of the given name (see BACKENDS) for the output root."""
+    assert name in BACKENDS, f"Unknown output backend {name}, one of {list(BACKENDS)}"
+    return BACKENDS[name](root, **kwargs)
+
+
+class OutputSink:
+    """Staging directory for outputs that are uploaded to a storage backend by a background thread.
+
+    Errors of the uploader thread (after all retries) are raised on the next commit, wait_for_space or on close.
+
+    Args:
+        out_dir (str): Final output directory (root of the backend).
+        staging_root (str): Node-local directory, a unique staging directory is created in it.
+        backend (str): Name of the storage backend (see BACKENDS).
+        max_staging_bytes (int): wait_for_space blocks while more staged bytes are waiting for upload.
+            The staging directory can exceed it by the output of one part.
+        batch_size (int): Maximum number of files uploaded per batch.
+        max_retries (int): Retries of a failed upload, with exponentially growing delay.
+        retry_delay (float): Delay before the first retry in seconds.
+        manifest_name (str): Path of the upload manifest relative to out_dir. Processes writing to the same
+            out_dir (e.g. the render batches of pipeline.py) need different names, else they replace each
+            other's manifest.
+        backend_kwargs: Further arguments of the backend.
+    """
+
+    def __init__(
+        self,
+        out_dir: str,
+        staging_root: str,
+        backend: str = "local",
+        max_staging_bytes: int = 8 << 30,
+        batch_size: int = 64,
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+        manifest_name: str = MANIFEST_FILENAME,
+        **backend_kwargs,
+    ):
+        assert max_staging_bytes > 0 and batch_size > 0 and max_retries >= 0
+        os.makedirs(staging_root, exist_ok=True)
+        self.out_dir = out_dir
+        self.staging_dir = tempfile.mkdtemp(prefix="synthnet-staging-", dir=staging_root)
+        self.backend = create_backend(backend, out_dir, **backend_kwargs)
+        self.max_staging_bytes = max_staging_bytes
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.manifest_name = manifest_name
+        self.queue = queue.Queue()
+        # Committed files are never committed again, also after their staged copy is removed
+        self.committed = set()
+        self.manifest = []
+        self.error = None
+        self.condition = threading.Condition()
+        # Statistics
+        self.staged_bytes = 0
+        self.max_staged_bytes = 0
+        self.n_files = 0
+        self.bytes_uploaded = 0
+        self.n_retries = 0
+        self.upload_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.thread = threading.Thread(target=self._run, name="OutputSink", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                break
+            if self.error is not None:
+                continue
+            tstart = time.time()
+            for rel_path, size in batch:
+                try:
+                    self._upload(rel_path)
+                except Exception as err:  # pylint: disable=broad-except
+                    self.error = err
+                    break
+                with self.condition:
+                    self.staged_bytes -= size
+                    self.condition.notify_all()
+            self.upload_seconds += time.time() - tstart
+        with self.condition:
+            self.condition.notify_all()
+
+    def _upload(self, rel_path: str) -> None:
+        """Uploads a staged file with retries, verifies its checksum and removes the staged copy."""
+        local_path = os.path.join(self.staging_dir, rel_path)
+        sha256 = file_utils.get_file_hash(local_path)
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.backend.put(local_path, rel_path, sha256)
+                uploaded_sha256 = self.backend.get_sha256(rel_path)
+                if uploaded_sha256 != sha256:
+                    raise ChecksumError(f"Checksum mismatch of {rel_path}: {uploaded_sha256} != {sha256}")
+                break
+            except (OSError, ChecksumError) as err:
+                if attempt == self.max_retries:
+                    raise IOError(f"Upload of {rel_path} failed after {attempt + 1} attempts: {err}") from err
+                self.n_retries += 1
+                time.sleep(self.retry_delay * 2**attempt)
+        size = os.path.getsize(local_path)
+        os.remove(local_path)
+        self.manifest.append({"path": rel_path, "bytes": size, "sha256": sha256})
+        self.n_files += 1
+        self.bytes_uploaded += size
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise RuntimeError(f"Uploading outputs failed: {self.error}") from self.error
+
+    def commit(self) -> int:
+        """Queues all files in the staging directory that were not committed before for upload. Call it when a part
+        is finished, committed files must not be modified afterwards.
+
+        Returns:
+            int: Number of queued files.
+        """
+        self._raise_error()
+        batch = []
+        for dir_path, _, file_names in os.walk(self.staging_dir):
+            for file_name in file_names:
+                file_path = os.path.join(dir_path, file_name)
+                rel_path = os.path.relpath(file_path, self.staging_dir).replace(os.sep, "/")
+                if rel_path not in self.committed:
+                    batch.append((rel_path, os.path.getsize(file_path)))
+        with self.condition:
+            self.committed.update(rel_path for rel_path, _ in batch)
+            self.staged_bytes += sum(size for _, size in batch)
+            self.max_staged_bytes = max(self.max_staged_bytes, self.staged_bytes)
+        for i in range(0, len(batch), self.batch_size):
+            self.queue.put(batch[i : i + self.batch_size])
+        return len(batch)
+
+    def wait_for_space(self) -> float:
+        """Blocks while the staged bytes exceed max_staging_bytes.
+
+        Returns:
+            float: Seconds waited.
+        """
+        tstart = time.time()
+        with self.condition:
+            while self.staged_bytes > self.max_staging_bytes and self.error is None and self.thread.is_alive():
+                self.condition.wait(timeout=1.0)
+        self._raise_error()
+        waited = time.time() - tstart
+        self.wait_seconds += waited
+        return waited
+
+    def close(self) -> dict:
+        """Uploads all remaining files, uploads the manifest (manifest_name, one line per file: path, bytes,
+        sha256) and removes the staging directory.
+
+        Returns:
+            dict: Upload statistics (see get_stats).
+        """
+        self.commit()
+        self.queue.put(None)
+        self.thread.join()
+        self._raise_error()
+        manifest_path = os.path.join(self.staging_dir, os.path.basename(self.manifest_name))
+        with open(manifest_path, "w") as f:
+            for entry in self.manifest:
+                f.write(json.dumps(entry) + "\n")
+        self.backend.put(manifest_path, self.manifest_name, file_utils.get_file_hash(manifest_path))
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        return self.get_stats()
+
+    def get_stats(self) -> dict:
+        """Returns upload statistics."""
+        return {
+            "backend": self.backend.name,
+            "files": self.n_files,
+            "bytes": self.bytes_uploaded,
+            "retries": self.n_retries,
+            "upload_seconds": self.upload_seconds,
+            "wait_seconds": self.wait_seconds,
+            "max_staged_bytes": self.max_staged_bytes,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.thread.is_alive():
+            self.close()
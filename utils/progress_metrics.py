@@ -0,0 +1,264 @@
+"""Live progress metrics of long running export and render jobs.
+
+Only uses the standard library, so it can be imported from Blender scripts.
+
+ProgressMetrics listens to the pipeline's trace spans (utils/trace_utils.py): the end of a part span
+(e.g. render_part) counts a finished part, the end of an image span (e.g. cycles_render) a finished image,
+and every span updates a moving average of its stage. From these it derives images/min, ETA, time since
+the last progress (stall detection) and the resident memory of the process. The metrics are
+
+    - rewritten atomically to a status JSON file after each part (and at most every status_interval seconds),
+    - served in Prometheus text format on http://{host}:{port}/metrics (and as JSON on /status) if a port is set.
+
+Usage:
+    metrics = ProgressMetrics("render", n_parts=100, n_images=3200, status_file=f"{out_dir}/render_status.json",
+                              port=9100)
+    ...  # spans of the render loop
+    metrics.close()
+"""
+import collections
+import http.server
+import json
+import os
+import resource
+import sys
+import threading
+
+from utils import timer_utils, trace_utils
+
+METRIC_PREFIX = "synthnet"
+
+
+def get_rss_bytes() -> int:
+    """Returns the current resident set size of the process (the peak RSS if it cannot be read)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def write_json_atomic(file_path: str, data: dict) -> None:
+    """Writes JSON to a temporary file and renames it, so readers never see a partially written file."""
+    tmp_path = f"{file_path}.tmp{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, file_path)
+
+
+class ProgressMetrics:
+    """Counts finished parts, images and stage durations of a job and exposes them as status file and endpoint.
+
+    Args:
+        job (str): Name of the job (export, render), used as label.
+        n_parts (int): Number of parts to process.
+        n_images (int): Number of images to render, None if the job does not produce images.
+        status_file (str): Status JSON file, rewritten atomically. None to disable.
+        port (int): Port of the Prometheus endpoint. None or 0 to disable.
+        host (str): Interface the endpoint binds to.
+        part_span (str): Name of the span that marks a finished part.
+        image_span (str): Name of the span that marks a finished image.
+        window (int): Number of recent parts/images the rate and the stage moving averages are computed over.
+        status_interval (float): Minimum seconds between status file writes on finished images.
+        print_fn (callable): If set, called with a progress line after each finished part.
+    """
+
+    def __init__(
+        self,
+        job: str,
+        n_parts: int,
+        n_images: int = None,
+        status_file: str = None,
+        port: int = None,
+        host: str = "0.0.0.0",
+        part_span: str = "render_part",
+        image_span: str = "cycles_render",
+        window: int = 50,
+        status_interval: float = 10.0,
+        print_fn=None,
+    ):
+        self.job = job
+        self.n_parts = n_parts
+        self.n_images = n_images
+        self.status_file = status_file
+        self.part_span = part_span
+        self.image_span = image_span
+        self.status_interval = status_interval
+        self.print_fn = print_fn
+        self.start_time = timer_utils.time_now()
+        self.last_progress_time = self.start_time
+        self.last_status_time = 0.0
+        self.parts_done = 0
+        self.images_done = 0
+        self.finished = False
+        # (time, parts_done, images_done) of the most recent progress events
+        self._progress = collections.deque(maxlen=window + 1)
+        self._progress.append((self.start_time, 0, 0))
+        self._alpha = 2.0 / (window + 1)
+        self._stages = {}
+        self._lock = threading.Lock()
+
+        self._server = None
+        if port:
+            self._server = http.server.ThreadingHTTPServer((host, port), self._get_handler())
+            threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        trace_utils.add_listener(self.on_span)
+        self.write_status()
+
+    def on_span(self, name: str, duration: float, attrs: dict) -> None:
+        """Span listener: updates the stage averages and counts finished parts and images."""
+        now = timer_utils.time_now()
+        with self._lock:
+            stage = self._stages.setdefault(name, {"count": 0, "total": 0.0, "avg": duration, "last": duration})
+            stage["count"] += 1
+            stage["total"] += duration
+            stage["avg"] += self._alpha * (duration - stage["avg"])
+            stage["last"] = duration
+            is_progress = name in (self.part_span, self.image_span)
+            if name == self.part_span:
+                self.parts_done += 1
+            elif name == self.image_span:
+                self.images_done += 1
+            if is_progress:
+                self.last_progress_time = now
+                self._progress.append((now, self.parts_done, self.images_done))
+        if name == self.part_span or (is_progress and now - self.last_status_time >= self.status_interval):
+            self.write_status()
+        if name == self.part_span and self.print_fn is not None:
+            self.print_fn(self.get_progress_line())
+
+    def get_status(self) -> dict:
+        """Returns all metrics as dict."""
+        now = timer_utils.time_now()
+        with self._lock:
+            (t0, parts0, images0), (t1, parts1, images1) = self._progress[0], self._progress[-1]
+            stages = {name: dict(stage) for name, stage in self._stages.items()}
+            parts_done, images_done = self.parts_done, self.images_done
+        window_minutes = (t1 - t0) / 60
+        images_per_minute = (images1 - images0) / window_minutes if window_minutes > 0 else None
+        parts_per_minute = (parts1 - parts0) / window_minutes if window_minutes > 0 else None
+
+        # ETA from the recent rate, which adapts to changing part sizes, or from the overall rate
+        eta_seconds = None
+        if self.n_images and images_per_minute:
+            eta_seconds = max(self.n_images - images_done, 0) / images_per_minute * 60
+        elif self.n_parts and parts_per_minute:
+            eta_seconds = max(self.n_parts - parts_done, 0) / parts_per_minute * 60
+        elif self.n_parts and parts_done:
+            eta_seconds = timer_utils.remaining_seconds(self.start_time, parts_done / self.n_parts)
+        if self.finished:
+            eta_seconds = 0.0
+
+        return {
+            "job": self.job,
+            "pid": os.getpid(),
+            "finished": self.finished,
+            "updated_at": now,
+            "start_time": self.start_time,
+            "elapsed_seconds": now - self.start_time,
+            "parts_total": self.n_parts,
+            "parts_done": parts_done,
+            "images_total": self.n_images,
+            "images_done": images_done,
+            "images_per_minute": images_per_minute,
+            "parts_per_minute": parts_per_minute,
+            "eta_seconds": eta_seconds,
+            "eta": timer_utils.as_hms(eta_seconds) if eta_seconds is not None else None,
+            "seconds_since_progress": now - self.last_progress_time,
+            "rss_bytes": get_rss_bytes(),
+            "stages": stages,
+        }
+
+    def to_prometheus(self) -> str:
+        """Returns all metrics in Prometheus text exposition format."""
+        status = self.get_status()
+        job = f'job="{self.job}"'
+        gauges = [
+            ("parts_total", "Number of parts to process", status["parts_total"]),
+            ("parts_done", "Number of finished parts", status["parts_done"]),
+            ("images_total", "Number of images to render", status["images_total"]),
+            ("images_done", "Number of rendered images", status["images_done"]),
+            ("images_per_minute", "Images per minute over the recent window", status["images_per_minute"]),
+            ("parts_per_minute", "Parts per minute over the recent window", status["parts_per_minute"]),
+            ("eta_seconds", "Estimated seconds until the job is finished", status["eta_seconds"]),
+            ("elapsed_seconds", "Seconds since the job started", status["elapsed_seconds"]),
+            (
+                "seconds_since_progress",
+                "Seconds since the last finished part or image",
+                status["seconds_since_progress"],
+            ),
+            ("rss_bytes", "Resident memory of the process", status["rss_bytes"]),
+            ("finished", "1 if the job is finished", int(status["finished"])),
+        ]
+        lines = []
+        for name, help_text, value in gauges:
+            if value is None:
+                continue
+            lines += [
+                f"# HELP {METRIC_PREFIX}_{name} {help_text}",
+                f"# TYPE {METRIC_PREFIX}_{name} gauge",
+                f"{METRIC_PREFIX}_{name}{{{job}}} {value}",
+            ]
+        stage_metrics = [
+            ("stage_seconds_avg", "gauge", "Moving average of the stage duration", "avg"),
+            ("stage_seconds_total", "counter", "Total seconds spent in the stage", "total"),
+            ("stage_count", "counter", "Number of finished stage spans", "count"),
+        ]
+        for name, metric_type, help_text, key in stage_metrics:
+            lines += [f"# HELP {METRIC_PREFIX}_{name} {help_text}", f"# TYPE {METRIC_PREFIX}_{name} {metric_type}"]
+            for stage, stats in sorted(status["stages"].items()):
+                lines.append(f'{METRIC_PREFIX}_{name}{{{job},stage="{stage}"}} {stats[key]}')
+        return "\n".join(lines) + "\n"
+
+    def write_status(self) -> None:
+        """Rewrites the status file."""
+        if self.status_file is None:
+            return
+        self.last_status_time = timer_utils.time_now()
+        write_json_atomic(self.status_file, self.get_status())
+
+    def get_progress_line(self) -> str:
+        """Returns a one line progress summary for logs."""
+        status = self.get_status()
+        line = f"Progress: {status['parts_done']}/{status['parts_total']} parts"
+        if status["images_total"]:
+            line += f", {status['images_done']}/{status['images_total']} images"
+        if status["images_per_minute"]:
+            line += f", {status['images_per_minute']:.1f} images/min"
+        return line + f", ETA {status['eta'] or 'unknown'}, RSS {status['rss_bytes'] / 1e6:.0f} MB"
+
+    def close(self) -> None:
+        """Marks the job as finished, writes the final status and stops the endpoint."""
+        trace_utils.remove_listener(self.on_span)
+        self.finished = True
+        self.write_status()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _get_handler(self):
+        """Returns the request handler class of the endpoint."""
+        metrics = self
+
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):  # pylint: disable=invalid-name
+                if self.path.startswith("/metrics"):
+                    body, content_type = metrics.to_prometheus(), "text/plain; version=0.0.4"
+                elif self.path.startswith("/status"):
+                    body, content_type = json.dumps(metrics.get_status()), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                pass
+
+        return MetricsHandler
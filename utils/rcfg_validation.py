@@ -0,0 +1,292 @@
+"""Validation of render configurations (RCFG) with validators compiled from the JSON schemas.
+
+Only uses the standard library, so it can be imported from Blender scripts.
+
+The schema (validation/schemas/rcfg_schema_{topex,obj}.json) is translated once into Python source with one
+function per referenced sub-schema, which is compiled and cached per schema file. The validators check
+in-memory dicts and lists directly, so the RCFG does not have to be serialized and parsed again. Draft-07
+keywords used by the RCFG schemas are supported (type, required, properties, items, $ref to $id or JSON pointer),
+annotations are ignored and schemas with other validation keywords are rejected at compile time.
+
+Usage:
+    validator = rcfg_validation.get_validator(rcfg_validation.SCHEMA_FILES["topex"])
+    validator.validate(rcfg)  # whole RCFG
+    for i, part in enumerate(parts):
+        validator.validate_part(part, i)  # one part at a time, e.g. while streaming
+
+Errors raise RcfgValidationError with the path of the invalid value, e.g. parts[3].scene.cameras[0].position.
+"""
+import collections
+import json
+import os
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SCHEMA_FILES = {
+    "topex": os.path.join(ROOT_DIR, "validation", "schemas", "rcfg_schema_topex.json"),
+    "obj": os.path.join(ROOT_DIR, "validation", "schemas", "rcfg_schema_obj.json"),
+}
+
+# Checks of a value {v} for each JSON type
+TYPE_CHECKS = {
+    "object": "isinstance({v}, dict)",
+    "array": "isinstance({v}, (list, tuple))",
+    "string": "isinstance({v}, str)",
+    "number": "(isinstance({v}, (int, float)) and not isinstance({v}, bool))",
+    "integer": "((isinstance({v}, int) and not isinstance({v}, bool)) or (isinstance({v}, float) and {v}.is_integer()))",
+    "boolean": "isinstance({v}, bool)",
+    "null": "{v} is None",
+}
+# Draft-07 validation keywords that are not implemented. Other keys are annotations and ignored.
+UNSUPPORTED_KEYWORDS = {
+    "enum",
+    "const",
+    "multipleOf",
+    "maximum",
+    "exclusiveMaximum",
+    "minimum",
+    "exclusiveMinimum",
+    "maxLength",
+    "minLength",
+    "pattern",
+    "format",
+    "additionalItems",
+    "maxItems",
+    "minItems",
+    "uniqueItems",
+    "contains",
+    "maxProperties",
+    "minProperties",
+    "additionalProperties",
+    "patternProperties",
+    "dependencies",
+    "propertyNames",
+    "if",
+    "then",
+    "else",
+    "allOf",
+    "anyOf",
+    "oneOf",
+    "not",
+}
+_validators = {}
+
+
+class RcfgValidationError(ValueError):
+    """An RCFG value that does not match the schema.
+
+    Attributes:
+        message (str): Description of the error.
+        path (collections.deque): Keys and indices from the validated document to the invalid value.
+    """
+
+    def __init__(self, message: str, path=()):
+        self.message = message
+        self.path = collections.deque(path)
+        super().__init__(message)
+
+    @property
+    def json_path(self) -> str:
+        """Returns the path of the invalid value, e.g. parts[3].scene.cameras[0]."""
+        json_path = ""
+        for key in self.path:
+            json_path += f"[{key}]" if isinstance(key, int) else (f".{key}" if json_path else str(key))
+        return json_path or "<root>"
+
+    def __str__(self):
+        return f"{self.message} at {self.json_path}"
+
+
+def _type_error(v, types: list) -> RcfgValidationError:
+    return RcfgValidationError(f"{v!r:.80} is not of type {' or '.join(repr(t) for t in types)}")
+
+
+def _required_error(key: str) -> RcfgValidationError:
+    return RcfgValidationError(f"{key!r} is a required property")
+
+
+class _SchemaCompiler:
+    """Generates the Python source of a validator from a JSON schema.
+
+    Each sub-schema that is the target of a $ref or an entry point becomes a function _v{n}(v), all other
+    sub-schemas are inlined. Errors of nested values are re-raised with their key or index added to the path.
+    """
+
+    def __init__(self, schema: dict):
+        self.root = schema
+        self.ids = {}
+        self._collect_ids(schema)
+        self.functions = {}  # id(sub-schema) -> function name
+        self.pending = []
+        self.sources = []
+
+    def _collect_ids(self, schema) -> None:
+        """Registers all sub-schemas with an $id, wherever they are nested."""
+        if isinstance(schema, dict):
+            if isinstance(schema.get("$id"), str):
+                self.ids[schema["$id"]] = schema
+            for value in schema.values():
+                self._collect_ids(value)
+        elif isinstance(schema, list):
+            for value in schema:
+                self._collect_ids(value)
+
+    def resolve(self, ref: str) -> dict:
+        """Returns the sub-schema of a $ref ($id or JSON pointer into the root schema)."""
+        if ref in self.ids:
+            return self.ids[ref]
+        if ref.startswith("#"):
+            schema = self.root
+            for token in ref[1:].split("/")[1:]:
+                token = token.replace("~1", "/").replace("~0", "~")
+                schema = schema[int(token)] if isinstance(schema, list) else schema[token]
+            return schema
+        raise ValueError(f"Unresolvable $ref {ref!r}")
+
+    def function(self, schema: dict) -> str:
+        """Returns the name of the validator function of a sub-schema, generated on first use."""
+        key = id(schema)
+        if key not in self.functions:
+            self.functions[key] = f"_v{len(self.functions)}"
+            self.pending.append(schema)
+        return self.functions[key]
+
+    def compile(self, entry_points: dict) -> str:
+        """Returns the module source with one function per entry point schema, named by its key."""
+        aliases = [f"{name} = {self.function(schema)}" for name, schema in entry_points.items()]
+        while self.pending:
+            schema = self.pending.pop()
+            lines = [f"def {self.functions[id(schema)]}(v):"]
+            lines += self.gen(schema, "v", 1) or ["    pass"]
+            self.sources.append("\n".join(lines))
+        return "\n\n".join(self.sources + aliases) + "\n"
+
+    def gen(self, schema, var: str, depth: int) -> list[str]:
+        """Returns the (indented) lines that validate the value in variable var against schema."""
+        if schema is True or schema == {}:
+            return []
+        if not isinstance(schema, dict):
+            raise ValueError(f"Unsupported schema {schema!r}")
+        unsupported = UNSUPPORTED_KEYWORDS.intersection(schema)
+        if unsupported:
+            raise NotImplementedError(f"Schema keywords {sorted(unsupported)} are not supported")
+        ind = "    " * depth
+        lines = []
+        if "$ref" in schema:
+            # draft-07: siblings of $ref are ignored
+            return [f"{ind}{self.function(self.resolve(schema['$ref']))}({var})"]
+
+        types = schema.get("type")
+        types = [types] if isinstance(types, str) else types
+        if types is not None:
+            check = " or ".join(self._type_check(t, var) for t in types)
+            lines.append(f"{ind}if not ({check}):")
+            lines.append(f"{ind}    raise _type_error({var}, {types!r})")
+
+        # Keywords of objects and arrays only apply to values of that type
+        object_lines = []
+        for key in schema.get("required", []):
+            object_lines.append(f"{ind}    if {key!r} not in {var}:")
+            object_lines.append(f"{ind}        raise _required_error({key!r})")
+        for key, sub_schema in schema.get("properties", {}).items():
+            sub_var = f"p{depth}"
+            sub_lines = self.gen(sub_schema, sub_var, depth + 3)
+            if not sub_lines:
+                continue
+            object_lines.append(f"{ind}    {sub_var} = {var}.get({key!r}, _MISSING)")
+            object_lines.append(f"{ind}    if {sub_var} is not _MISSING:")
+            object_lines.append(f"{ind}        try:")
+            object_lines += sub_lines
+            object_lines.append(f"{ind}        except RcfgValidationError as e:")
+            object_lines.append(f"{ind}            e.path.appendleft({key!r})")
+            object_lines.append(f"{ind}            raise")
+        if object_lines:
+            lines.append(f"{ind}if {self._type_check('object', var)}:")
+            lines += object_lines
+
+        if "items" in schema:
+            if isinstance(schema["items"], list):
+                raise NotImplementedError("Tuple validation with items arrays is not supported")
+            item_var = f"i{depth}"
+            item_lines = self.gen(schema["items"], item_var, depth + 3)
+            if item_lines:
+                lines.append(f"{ind}if {self._type_check('array', var)}:")
+                lines.append(f"{ind}    for n{depth}, {item_var} in enumerate({var}):")
+                lines.append(f"{ind}        try:")
+                lines += item_lines
+                lines.append(f"{ind}        except RcfgValidationError as e:")
+                lines.append(f"{ind}            e.path.appendleft(n{depth})")
+                lines.append(f"{ind}            raise")
+        return lines
+
+    @staticmethod
+    def _type_check(json_type: str, var: str) -> str:
+        """Returns the check of a JSON type for variable var."""
+        if json_type not in TYPE_CHECKS:
+            raise ValueError(f"Unknown type {json_type!r}")
+        return TYPE_CHECKS[json_type].format(v=var)
+
+
+class RcfgValidator:
+    """Validator of a compiled RCFG schema.
+
+    Args:
+        schema (dict): The RCFG JSON schema. Parts are validated against schema.properties.parts.items.
+    """
+
+    def __init__(self, schema: dict):
+        compiler = _SchemaCompiler(schema)
+        entry_points = {"validate_rcfg": schema}
+        part_schema = schema.get("properties", {}).get("parts", {}).get("items")
+        if part_schema is not None:
+            entry_points["validate_part"] = part_schema
+        # Generated source, kept for debugging
+        self.source = compiler.compile(entry_points)
+        namespace = {
+            "RcfgValidationError": RcfgValidationError,
+            "_type_error": _type_error,
+            "_required_error": _required_error,
+            "_MISSING": object(),
+        }
+        exec(compile(self.source, "<rcfg_validator>", "exec"), namespace)  # pylint: disable=exec-used
+        self._validate_rcfg = namespace["validate_rcfg"]
+        self._validate_part = namespace.get("validate_part")
+
+    def validate(self, rcfg: dict) -> None:
+        """Validates a whole RCFG. Raises RcfgValidationError."""
+        self._validate_rcfg(rcfg)
+
+    def validate_part(self, part: dict, index: int = None) -> None:
+        """Validates a single part of the RCFG's parts list. Raises RcfgValidationError.
+
+        Args:
+            part (dict): RCFG representation of the part.
+            index (int): Index of the part in the parts list, only used for the error path.
+        """
+        try:
+            self._validate_part(part)
+        except RcfgValidationError as e:
+            e.path.extendleft([index, "parts"] if index is not None else [f"parts[{part.get('id', '?')}]"])
+            raise
+
+    def is_valid(self, rcfg: dict) -> bool:
+        """Returns whether the RCFG is valid."""
+        try:
+            self._validate_rcfg(rcfg)
+        except RcfgValidationError:
+            return False
+        return True
+
+
+def get_validator(schema_file: str) -> RcfgValidator:
+    """Returns the compiled validator of a schema file, compiled once per process."""
+    schema_file = os.path.abspath(schema_file)
+    if schema_file not in _validators:
+        with open(schema_file, "r", encoding="UTF-8") as f:
+            _validators[schema_file] = RcfgValidator(json.load(f))
+    return _validators[schema_file]
+
+
+def get_schema_file(rcfg: dict) -> str:
+    """Returns the schema file of an RCFG: OBJ if its parts reference OBJ files by path, TOPEX otherwise."""
+    parts = rcfg.get("parts") or [{}]
+    return SCHEMA_FILES["obj"] if "path" in parts[0] else SCHEMA_FILES["topex"]
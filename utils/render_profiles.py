@@ -0,0 +1,124 @@
+"""Per-part Cycles settings, resolved from the materials of the part's single parts through a rule table.
+
+Only uses the standard library, so it can be imported from Blender scripts.
+
+A profile is a set of Cycles settings (light path bounces, adaptive sampling threshold and a factor on the
+number of samples). Rules map the RCFG materials of a part (single_parts[].material) to a profile and are
+checked in order, the first matching rule wins:
+
+    {"profile": "transmissive", "match": "any", "patterns": ["*transparent*", "*plexiglas*"]}
+
+match "any": at least one material of the part matches one of the patterns (fnmatch, case insensitive),
+match "all": every material of the part matches one of the patterns.
+Materials "none" (no material assigned) are ignored. Parts without any matching rule get DEFAULT_PROFILE,
+which equals the former global settings of render.py.
+
+Usage:
+    profile_name, settings = render_profiles.resolve_settings(rcfg_part, base_samples=4096)
+    apply_render_settings(..., cycles_settings=settings)
+"""
+import fnmatch
+import json
+
+DEFAULT_PROFILE = "default"
+# Cycles settings of the default profile, the global settings of render.py before profiles were introduced
+DEFAULT_SETTINGS = {
+    "samples_factor": 1.0,
+    "adaptive_threshold": 0.01,
+    "max_bounces": 12,
+    "diffuse_bounces": 4,
+    "glossy_bounces": 4,
+    "transmission_bounces": 12,
+    "transparent_max_bounces": 8,
+}
+PROFILES = {
+    DEFAULT_PROFILE: dict(DEFAULT_SETTINGS),
+    # Glass-like materials need deep transmission paths and converge slowly
+    "transmissive": dict(DEFAULT_SETTINGS),
+    # Metals and glossy plastics: reflections of reflections, but no refraction
+    "glossy": {
+        "samples_factor": 0.5,
+        "adaptive_threshold": 0.01,
+        "max_bounces": 6,
+        "diffuse_bounces": 2,
+        "glossy_bounces": 4,
+        "transmission_bounces": 0,
+        "transparent_max_bounces": 2,
+    },
+    # Matte, opaque materials converge with few bounces and samples
+    "matte": {
+        "samples_factor": 0.25,
+        "adaptive_threshold": 0.02,
+        "max_bounces": 4,
+        "diffuse_bounces": 2,
+        "glossy_bounces": 1,
+        "transmission_bounces": 0,
+        "transparent_max_bounces": 0,
+    },
+}
+RULES = [
+    {"profile": "transmissive", "match": "any", "patterns": ["*transparent*", "*plexiglas*", "*glass*"]},
+    {"profile": "matte", "match": "all", "patterns": ["*matte*", "*sandblasted*"]},
+    {"profile": "glossy", "match": "all", "patterns": ["*glossy*", "*aluminium*", "*steel*", "*brass*"]},
+]
+NO_MATERIAL = ["none", None]
+
+
+def load_rule_table(file_path: str) -> tuple[dict, list]:
+    """Returns the profiles and rules of a JSON rule table {"profiles": {...}, "rules": [...]}.
+
+    Profiles are merged into PROFILES and only need to contain the settings that differ from DEFAULT_SETTINGS.
+    Rules replace RULES if given.
+    """
+    with open(file_path, "r") as f:
+        table = json.load(f)
+    profiles = {name: dict(settings) for name, settings in PROFILES.items()}
+    for name, settings in table.get("profiles", {}).items():
+        unknown = set(settings) - set(DEFAULT_SETTINGS)
+        assert not unknown, f"Unknown settings {sorted(unknown)} in profile {name}"
+        profiles[name] = {**DEFAULT_SETTINGS, **settings}
+    rules = table.get("rules", RULES)
+    for rule in rules:
+        assert rule["profile"] in profiles, f"Rule references unknown profile {rule['profile']}"
+        assert rule["match"] in ["any", "all"], f"Unknown match {rule['match']} (any, all)"
+    return profiles, rules
+
+
+def get_part_materials(rcfg_part: dict) -> list[str]:
+    """Returns the distinct materials assigned to the single parts of an RCFG part (without "none")."""
+    materials = {single_part.get("material") for single_part in rcfg_part.get("single_parts", [])}
+    return sorted(material for material in materials if material not in NO_MATERIAL)
+
+
+def match_profile(materials: list[str], rules: list = None) -> str:
+    """Returns the profile name of the first rule that matches the materials, DEFAULT_PROFILE if none matches."""
+    rules = RULES if rules is None else rules
+    if not materials:
+        return DEFAULT_PROFILE
+    for rule in rules:
+        patterns = [pattern.lower() for pattern in rule["patterns"]]
+        matches = [
+            any(fnmatch.fnmatchcase(material.lower(), pattern) for pattern in patterns) for material in materials
+        ]
+        if (rule["match"] == "any" and any(matches)) or (rule["match"] == "all" and all(matches)):
+            return rule["profile"]
+    return DEFAULT_PROFILE
+
+
+def resolve_settings(rcfg_part: dict, base_samples: int, profiles: dict = None, rules: list = None) -> tuple:
+    """Returns the profile name and the Cycles settings of an RCFG part.
+
+    Args:
+        rcfg_part (dict): Machine part definition with single_parts[].material.
+        base_samples (int): Samples of the default profile, scaled by the profile's samples_factor.
+        profiles (dict): Profile settings by name. Defaults to PROFILES.
+        rules (list): Rule table. Defaults to RULES.
+
+    Returns:
+        str, dict: profile name and settings {samples, adaptive_threshold, *_bounces} (scene.cycles attributes)
+    """
+    profiles = PROFILES if profiles is None else profiles
+    profile = match_profile(get_part_materials(rcfg_part), rules)
+    settings = dict(profiles[profile])
+    settings["samples"] = max(1, round(base_samples * settings.pop("samples_factor")))
+    return profile, settings
@@ -0,0 +1,244 @@
+"""Writes rendered samples into size-bounded tar shards (WebDataset layout) with JSON sidecars and an index.
+
+Only uses the standard library, so it can be imported from Blender scripts.
+
+Layout of a shard directory:
+    shard-000000.tar    Samples as tar members named {key}.{ext} (e.g. part_000.rgb.png, part_000.json)
+    shard-000000.json   Sidecar with the byte offset and size of each member's data in the tar file
+    index.jsonl         One line per sample: {"key", "shard", "members": {ext: [offset, size]}}
+
+Members can be read without unpacking a shard with read_member (random access via the offsets).
+"""
+import io
+import json
+import os
+import queue
+import tarfile
+import threading
+import time
+
+TAR_BLOCK_SIZE = tarfile.BLOCKSIZE
+TAR_RECORD_SIZE = tarfile.RECORDSIZE
+INDEX_FILENAME = "index.jsonl"
+
+
+def get_padded_size(size: int, block_size: int = TAR_BLOCK_SIZE) -> int:
+    """Returns the size rounded up to a multiple of block_size."""
+    return -(-size // block_size) * block_size
+
+
+def get_member_bytes(info: tarfile.TarInfo) -> int:
+    """Returns the bytes a member takes in a PAX tar file: its header blocks (incl. extended headers for long names)
+    and its data padded to full blocks."""
+    header = info.tobuf(tarfile.PAX_FORMAT, tarfile.ENCODING, "surrogateescape")
+    return len(header) + get_padded_size(info.size)
+
+
+def get_archive_bytes(offset: int) -> int:
+    """Returns the size of a closed tar file whose members end at offset: two zero blocks mark the end of the
+    archive, and the file is padded to a full record."""
+    return get_padded_size(offset + 2 * TAR_BLOCK_SIZE, TAR_RECORD_SIZE)
+
+
+def get_sample_key(part_id: str, i: int) -> str:
+    """Returns the sample key of the i-th render of a part. Dots are replaced, as they separate key and extension."""
+    return f"{part_id}_{i:03d}".replace(".", "_")
+
+
+class ShardWriter:
+    """Writes samples into tar shards of at most max_shard_bytes, counting the tar headers, the block padding of
+    each member and the end-of-archive padding. A single sample larger than max_shard_bytes gets its own shard.
+
+    Args:
+        out_dir (str): Directory to write the shards, sidecars and index to.
+        prefix (str): Filename prefix of the shards.
+        max_shard_bytes (int): Maximum size of a shard in bytes.
+        start_index (int): Index of the first shard. Use different start indices to write to the same directory
+            from multiple processes (their index files must be merged afterwards, see merge_indices).
+    """
+
+    def __init__(self, out_dir: str, prefix: str = "shard", max_shard_bytes: int = 1 << 30, start_index: int = 0):
+        assert max_shard_bytes > 0
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.max_shard_bytes = max_shard_bytes
+        self.shard_index = start_index - 1
+        self.tar = None
+        self.shard_name = None
+        self.shard_members = []
+        self.index_file = open(os.path.join(out_dir, f"{prefix}-{start_index:06d}.{INDEX_FILENAME}"), "a")
+        # Statistics
+        self.n_samples = 0
+        self.n_shards = 0
+        self.bytes_written = 0
+
+    def _open_shard(self):
+        self._close_shard()
+        self.shard_index += 1
+        self.shard_name = f"{self.prefix}-{self.shard_index:06d}.tar"
+        self.tar = tarfile.open(os.path.join(self.out_dir, self.shard_name), "w", format=tarfile.PAX_FORMAT)
+        self.shard_members = []
+        self.n_shards += 1
+
+    def _close_shard(self):
+        if self.tar is None:
+            return
+        self.tar.close()
+        sidecar_path = os.path.join(self.out_dir, f"{self.shard_name[:-4]}.json")
+        with open(sidecar_path, "w") as f:
+            json.dump({"shard": self.shard_name, "members": self.shard_members}, f)
+        self.tar = None
+
+    def write(self, key: str, members: dict, mtime: float = None):
+        """Writes a sample to the current shard.
+
+        Args:
+            key (str): Sample key, unique within the dataset (see get_sample_key). Must not contain dots.
+            members (dict): File extension (e.g. rgb.png, depth.exr, json) -> content as bytes.
+            mtime (float): Modification time of the members. Defaults to now.
+        """
+        assert "." not in key, f"Sample key {key} must not contain dots (WebDataset convention)"
+        mtime = time.time() if mtime is None else mtime
+        infos = {}
+        for ext, data in members.items():
+            infos[ext] = tarfile.TarInfo(f"{key}.{ext}")
+            infos[ext].size = len(data)
+            infos[ext].mtime = mtime
+        sample_bytes = sum(get_member_bytes(info) for info in infos.values())
+        if self.tar is None or (
+            self.tar.offset > 0 and get_archive_bytes(self.tar.offset + sample_bytes) > self.max_shard_bytes
+        ):
+            self._open_shard()
+
+        sample_members = {}
+        for ext, data in members.items():
+            info = infos[ext]
+            self.tar.addfile(info, io.BytesIO(data))
+            # The data block(s) directly precede the current end of the archive
+            offset = self.tar.offset - get_padded_size(len(data))
+            sample_members[ext] = [offset, len(data)]
+            self.shard_members.append({"name": info.name, "offset": offset, "size": len(data)})
+            self.bytes_written += len(data)
+
+        self.index_file.write(json.dumps({"key": key, "shard": self.shard_name, "members": sample_members}) + "\n")
+        self.n_samples += 1
+
+    def close(self):
+        """Closes the current shard and the index file."""
+        self._close_shard()
+        self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BackgroundShardWriter:
+    """Writes samples with a ShardWriter in a background thread, so rendering does not wait for disk I/O.
+
+    Samples are passed as file paths, which are read (and optionally removed) by the writer thread.
+    Errors of the writer thread are raised on the next submit or on close.
+
+    Args:
+        out_dir (str): Directory to write the shards to.
+        max_queue_size (int): Maximum number of pending samples. submit blocks if the queue is full.
+        remove_files (bool): Whether to remove the submitted files once they are written to a shard.
+        kwargs: Further arguments of ShardWriter.
+    """
+
+    def __init__(self, out_dir: str, max_queue_size: int = 64, remove_files: bool = True, **kwargs):
+        self.writer = ShardWriter(out_dir, **kwargs)
+        self.remove_files = remove_files
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.error = None
+        self.write_seconds = 0.0
+        self.thread = threading.Thread(target=self._run, name="ShardWriter", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue
+            key, files, metadata = item
+            try:
+                tstart = time.time()
+                members = {}
+                for ext, file_path in files.items():
+                    with open(file_path, "rb") as f:
+                        members[ext] = f.read()
+                if metadata is not None:
+                    members["json"] = json.dumps(metadata).encode("utf-8")
+                self.writer.write(key, members)
+                if self.remove_files:
+                    for file_path in files.values():
+                        os.remove(file_path)
+                self.write_seconds += time.time() - tstart
+            except Exception as err:  # pylint: disable=broad-except
+                self.error = err
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise RuntimeError(f"Writing shards failed: {self.error}") from self.error
+
+    def submit(self, key: str, files: dict, metadata: dict = None):
+        """Queues a sample for writing.
+
+        Args:
+            key (str): Sample key (see ShardWriter.write).
+            files (dict): File extension (e.g. rgb.png) -> path of the file to add.
+            metadata (dict): JSON serializable metadata, added as {key}.json member.
+        """
+        self._raise_error()
+        self.queue.put((key, files, metadata))
+
+    def close(self):
+        """Waits for all pending samples to be written and closes the writer."""
+        self.queue.put(None)
+        self.thread.join()
+        self.writer.close()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def merge_indices(out_dir: str) -> str:
+    """Merges the index files of all writers in out_dir (see ShardWriter start_index) into a single index.jsonl.
+
+    Returns:
+        str: Path of the merged index file.
+    """
+    index_path = os.path.join(out_dir, INDEX_FILENAME)
+    writer_indices = sorted(fn for fn in os.listdir(out_dir) if fn.endswith(f".{INDEX_FILENAME}"))
+    with open(index_path, "w") as index_file:
+        for fn in writer_indices:
+            with open(os.path.join(out_dir, fn), "r") as f:
+                index_file.write(f.read())
+            os.remove(os.path.join(out_dir, fn))
+    return index_path
+
+
+def load_index(out_dir: str) -> dict:
+    """Returns the merged index of a shard directory as dict: key -> {"shard", "members"}."""
+    index = {}
+    with open(os.path.join(out_dir, INDEX_FILENAME), "r") as f:
+        for line in f:
+            entry = json.loads(line)
+            index[entry["key"]] = {"shard": entry["shard"], "members": entry["members"]}
+    return index
+
+
+def read_member(shard_path: str, offset: int, size: int) -> bytes:
+    """Returns the data of a tar member given its offset and size (see index / sidecar files)."""
+    with open(shard_path, "rb") as f:
+        f.seek(offset)
+        return f.read(size)
@@ -0,0 +1,161 @@
+"""Streams batches through a chain of stages with bounded queues between them (used by pipeline.py).
+
+Only uses the standard library.
+
+Each stage runs a function per batch in n_workers threads, typically a subprocess such as a Blender export or
+render of the batch's parts. A batch is handed to the next stage as soon as it is done, so batch k is processed
+by stage 2 while batch k+1 is processed by stage 1. The queue in front of each later stage holds at most
+max_queued batches: a stage that runs ahead blocks until the next stage catches up (backpressure).
+
+Per stage, the runner measures:
+    busy:     time the workers spent processing batches
+    starved:  time the workers waited for input (the previous stage is the bottleneck)
+    blocked:  time the workers waited for room in the next queue (the next stage is the bottleneck)
+and the utilization busy / (n_workers * wall time).
+
+process_batch can call get_worker_index to get the index of its worker within the stage, e.g. to give concurrent
+subprocesses different ports.
+
+Usage:
+    stages = [Stage("export", export_batch, n_workers=2), Stage("render", render_batch)]
+    report = run_stages(stages, batches, max_queued=2)
+"""
+import queue
+import threading
+import time
+
+from utils import trace_utils
+
+_worker = threading.local()
+
+
+class Stage:
+    """Stage of a pipeline.
+
+    Args:
+        name (str): Name of the stage, used in spans and the report.
+        process_batch (callable): Called with (batch_i, batch) for each batch. Exceptions stop the pipeline.
+        n_workers (int): Number of batches processed concurrently.
+    """
+
+    def __init__(self, name: str, process_batch, n_workers: int = 1):
+        assert n_workers >= 1, f"Stage {name} needs at least one worker"
+        self.name = name
+        self.process_batch = process_batch
+        self.n_workers = n_workers
+        self.lock = threading.Lock()
+        self.busy_seconds = 0.0
+        self.starved_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.n_batches = 0
+        self.first_done = None
+        self.last_done = None
+
+    def add_time(self, counter: str, seconds: float) -> None:
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + seconds)
+
+    def get_report(self, tstart: float, wall_seconds: float) -> dict:
+        """Returns the statistics of the stage, times relative to the start of the pipeline."""
+        return {
+            "n_workers": self.n_workers,
+            "n_batches": self.n_batches,
+            "busy_seconds": self.busy_seconds,
+            "starved_seconds": self.starved_seconds,
+            "blocked_seconds": self.blocked_seconds,
+            "utilization": self.busy_seconds / (self.n_workers * wall_seconds) if wall_seconds > 0 else None,
+            "first_batch_done": self.first_done - tstart if self.first_done is not None else None,
+            "last_batch_done": self.last_done - tstart if self.last_done is not None else None,
+        }
+
+
+def get_worker_index() -> int:
+    """Returns the index of the worker (0 to n_workers - 1) of its stage that runs the current process_batch call."""
+    return _worker.index
+
+
+class StageError(RuntimeError):
+    """Processing a batch failed, raised by run_stages after all workers stopped."""
+
+
+def run_stages(stages: list[Stage], batches: list, max_queued: int = 2, on_batch_done=None) -> dict:
+    """Runs all batches through the stages and returns the report.
+
+    Args:
+        stages (list[Stage]): Stages in pipeline order.
+        batches (list): Batches, passed to the process_batch function of each stage with their index.
+        max_queued (int): Maximum number of batches waiting in front of each stage after the first one.
+        on_batch_done (callable): Called with (stage, batch_i, seconds) after each processed batch.
+
+    Returns:
+        dict: wall_seconds, sequential_seconds (estimated wall time of running the stages one after another with
+            the same workers) and the report of each stage (see Stage.get_report).
+
+    Raises:
+        StageError: If a batch failed. Remaining batches are skipped, running ones are finished.
+    """
+    assert max_queued >= 1
+    # The first stage gets all batches at once, later stages are bounded
+    queues = [queue.Queue()] + [queue.Queue(maxsize=max_queued) for _ in stages[1:]]
+    errors = []
+
+    def work(stage_i: int, worker_i: int) -> None:
+        _worker.index = worker_i
+        stage = stages[stage_i]
+        in_queue = queues[stage_i]
+        out_queue = queues[stage_i + 1] if stage_i + 1 < len(stages) else None
+        while True:
+            twait = time.perf_counter()
+            item = in_queue.get()
+            stage.add_time("starved_seconds", time.perf_counter() - twait)
+            if item is None:
+                break
+            # After an error, drain the queue so upstream workers are not blocked
+            if errors:
+                continue
+            batch_i, batch = item
+            tbatch = time.perf_counter()
+            try:
+                with trace_utils.span("pipeline_batch", stage=stage.name, batch=batch_i):
+                    stage.process_batch(batch_i, batch)
+            except Exception as err:  # pylint: disable=broad-except
+                errors.append(StageError(f"{stage.name} of batch {batch_i} failed: {err}"))
+                continue
+            seconds = time.perf_counter() - tbatch
+            stage.add_time("busy_seconds", seconds)
+            with stage.lock:
+                stage.n_batches += 1
+                stage.first_done = stage.first_done or time.time()
+                stage.last_done = time.time()
+            if on_batch_done is not None:
+                on_batch_done(stage, batch_i, seconds)
+            if out_queue is not None:
+                twait = time.perf_counter()
+                out_queue.put(item)
+                stage.add_time("blocked_seconds", time.perf_counter() - twait)
+
+    tstart = time.time()
+    threads = [
+        [threading.Thread(target=work, args=(i, j), name=f"{stage.name}-{j}") for j in range(stage.n_workers)]
+        for i, stage in enumerate(stages)
+    ]
+    for stage_threads in threads:
+        for thread in stage_threads:
+            thread.start()
+    for batch_i, batch in enumerate(batches):
+        queues[0].put((batch_i, batch))
+    # End of stream: once all workers of a stage are done, the workers of the next stage are stopped
+    for i, stage in enumerate(stages):
+        for _ in range(stage.n_workers):
+            queues[i].put(None)
+        for thread in threads[i]:
+            thread.join()
+    wall_seconds = time.time() - tstart
+
+    if errors:
+        raise errors[0]
+    return {
+        "wall_seconds": wall_seconds,
+        "sequential_seconds": sum(stage.busy_seconds / stage.n_workers for stage in stages),
+        "stages": {stage.name: stage.get_report(tstart, wall_seconds) for stage in stages},
+    }
@@ -27,6 +27,22 @@ def as_hms(seconds: float) -> str:
     return f"{hours:3}h {minutes:2}m {sseconds:5.2f}s"
 
 
+def remaining_seconds(start_time: float, current_percent: float) -> float:
+    """Estimates the remaining seconds from the elapsed time, assuming a constant rate.
+
+    Args:
+        start_time (float): Starting time in seconds.
+        current_percent (float): Current percentage - range(0.0, 1.0).
+
+    Returns:
+        seconds (float): Estimated remaining seconds, None if there is no progress yet.
+    """
+    if current_percent <= 0:
+        return None
+    elapsed_sec = time.time() - start_time
+    return (elapsed_sec / current_percent) - elapsed_sec
+
+
 def remaining(start_time: float, current_percent: float) -> str:
     """Computes remaining time.
 
@@ -34,9 +50,9 @@ def remaining(start_time: float, current_percent: float) -> str:
         start_time (float): Starting time in seconds.
         current_percent (float): Current percentage - range(0.0, 1.0).
     """
-    now = time.time()
-    elapsed_sec = now - start_time
-    estimated_remaining_sec = (elapsed_sec / (current_percent)) - elapsed_sec
+    estimated_remaining_sec = remaining_seconds(start_time, current_percent)
+    if estimated_remaining_sec is None:
+        return "unknown"
     return as_hms(estimated_remaining_sec)
 
 
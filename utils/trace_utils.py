@@ -0,0 +1,198 @@
+"""Structured tracing of pipeline stages (spans) shared by preprocessing, GLTF export and rendering.
+
+Only uses the standard library, so it can be imported from Blender scripts.
+
+Spans are appended as JSON lines to {trace_dir}/{process_name}.{pid}.trace.jsonl as soon as they end:
+    {"name", "process", "pid", "tid", "id", "parent", "start" (unix seconds), "duration" (seconds), "attrs"}
+Each process writes its own file, so parallel workers with the same process name (e.g. the render processes of
+the pipeline) never interleave their lines. A forked child opens its own file on its first span.
+
+Usage:
+    trace_utils.init_tracer(trace_dir, "render")
+    with trace_utils.span("cycles_render", part_id=part_id) as attrs:
+        ...
+        attrs["n_files"] = 3  # attributes can be added while the span is open
+
+Without init_tracer, spans are not recorded and cost almost nothing.
+Listeners (add_listener) are called with (name, duration, attrs) at the end of every span, also without
+init_tracer, e.g. to keep live progress metrics (see utils/progress_metrics.py).
+load_spans merges the trace files of all processes, which can then be converted to Chrome trace format
+(chrome://tracing, Perfetto) with write_chrome_trace and summarized with scripts/utils/summarize_trace.py.
+"""
+import contextlib
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+
+TRACE_SUFFIX = ".trace.jsonl"
+
+
+def get_trace_file(trace_dir: str, process_name: str, pid: int = None) -> str:
+    """Returns the trace file of a process (the current process by default)."""
+    return os.path.join(trace_dir, f"{process_name}.{os.getpid() if pid is None else pid}{TRACE_SUFFIX}")
+
+
+class Tracer:
+    """Records spans to a JSONL file per process.
+
+    Args:
+        trace_dir (str): Directory of the trace files.
+        process_name (str): Name of the traced process (preprocessing, export, render), used in the file name.
+    """
+
+    def __init__(self, trace_dir: str, process_name: str):
+        os.makedirs(trace_dir, exist_ok=True)
+        self.trace_dir = trace_dir
+        self.process_name = process_name
+        self._pid = os.getpid()
+        self.trace_file = get_trace_file(trace_dir, process_name, self._pid)
+        self._file = open(self.trace_file, "a", buffering=1)
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attrs):
+        """Context manager that records a span. Yields the attrs dict, which can be extended inside the span."""
+        stack = self._local.__dict__.setdefault("stack", [])
+        span_id = next(self._ids)
+        parent_id = stack[-1] if stack else None
+        stack.append(span_id)
+        start = time.time()
+        tstart = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            duration = time.perf_counter() - tstart
+            stack.pop()
+            record = {
+                "name": name,
+                "process": self.process_name,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "id": span_id,
+                "parent": parent_id,
+                "start": start,
+                "duration": duration,
+                "attrs": attrs,
+            }
+            line = json.dumps(record, default=str)
+            with self._lock:
+                if record["pid"] != self._pid:
+                    # Forked child: the inherited file belongs to the parent process
+                    self._pid = record["pid"]
+                    self.trace_file = get_trace_file(self.trace_dir, self.process_name, self._pid)
+                    self._file = open(self.trace_file, "a", buffering=1)
+                self._file.write(line + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+_TRACER = None
+_LISTENERS = []
+
+
+def init_tracer(trace_dir: str, process_name: str) -> Tracer:
+    """Initializes the process-wide tracer used by span. Tracing stays disabled if trace_dir is None."""
+    global _TRACER  # pylint: disable=global-statement
+    if _TRACER is not None:
+        _TRACER.close()
+    _TRACER = Tracer(trace_dir, process_name) if trace_dir else None
+    return _TRACER
+
+
+def add_listener(listener) -> None:
+    """Registers a function that is called with (name, duration, attrs) at the end of each span."""
+    _LISTENERS.append(listener)
+
+
+def remove_listener(listener) -> None:
+    """Unregisters a span listener."""
+    _LISTENERS.remove(listener)
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs):
+    """Records a span with the process-wide tracer (see Tracer.span) and notifies listeners.
+
+    Does nothing if tracing is disabled and there are no listeners.
+    """
+    if _TRACER is None and not _LISTENERS:
+        yield attrs
+        return
+    tstart = time.perf_counter()
+    try:
+        if _TRACER is None:
+            yield attrs
+        else:
+            with _TRACER.span(name, **attrs) as span_attrs:
+                yield span_attrs
+    finally:
+        duration = time.perf_counter() - tstart
+        for listener in list(_LISTENERS):
+            listener(name, duration, attrs)
+
+
+def traced(name: str = None):
+    """Decorator that records each call of a function as span (named after the function by default)."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name or fn.__name__):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def get_trace_files(paths: list[str]) -> list[str]:
+    """Returns all trace files in the given files and directories."""
+    trace_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            trace_files += sorted(os.path.join(path, fn) for fn in os.listdir(path) if fn.endswith(TRACE_SUFFIX))
+        else:
+            trace_files.append(path)
+    return trace_files
+
+
+def load_spans(paths: list[str]) -> list[dict]:
+    """Returns the spans of all trace files in the given files and directories, merged in order of their start."""
+    spans = []
+    for trace_file in get_trace_files(paths):
+        with open(trace_file, "r") as f:
+            spans += [json.loads(line) for line in f if line.strip()]
+    return sorted(spans, key=lambda span_record: span_record["start"])
+
+
+def write_chrome_trace(spans: list[dict], out_path: str) -> None:
+    """Writes spans in Chrome trace event format (complete events), one track per process and thread.
+
+    Spans of several trace files (see load_spans) are merged into one trace, with one named track per pid.
+    """
+    events = [
+        {
+            "name": span_record["name"],
+            "cat": span_record["process"],
+            "ph": "X",
+            "ts": span_record["start"] * 1e6,
+            "dur": span_record["duration"] * 1e6,
+            "pid": span_record["pid"],
+            "tid": span_record["tid"],
+            "args": span_record["attrs"],
+        }
+        for span_record in spans
+    ]
+    processes = {(span_record["pid"], span_record["process"]) for span_record in spans}
+    events += [
+        {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": process_name}}
+        for pid, process_name in sorted(processes)
+    ]
+    with open(out_path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)